@@ -0,0 +1,88 @@
+"""partition history tables
+
+Partition repost_search and monitored_sub_checked by month so retention can drop whole partitions.
+
+MySQL doesn't allow foreign keys on partitioned tables or pointing at them, so those are dropped, and the partition
+column has to be part of the primary key.  Existing rows get a partition for every month they cover.  New months
+are added by RetentionManager.
+
+post_hash is left alone.  It's read by post_id on hot paths, which would have to probe every monthly partition
+
+Revision ID: 2f7bc3dba469
+Revises:
+Create Date: 2026-10-17 13:10:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+from redditrepostsleuth.core.db.retention import add_months, build_partition_by_sql
+
+# revision identifiers, used by Alembic.
+revision = '2f7bc3dba469'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+PARTITIONED_TABLES = {
+    'repost_search': 'searched_at',
+    'monitored_sub_checked': 'checked_at',
+}
+MONTHS_AHEAD = 3
+# Recreated on downgrade
+FOREIGN_KEYS = [
+    ('repost_search', 'post_id', 'post'),
+    ('repost_search', 'post_type_id', 'post_type'),
+    ('repost', 'search_id', 'repost_search'),
+    ('monitored_sub_checked', 'post_id', 'post'),
+    ('monitored_sub_checked', 'post_type_id', 'post_type'),
+    ('monitored_sub_checked', 'monitored_sub_id', 'monitored_sub'),
+    ('monitored_sub_checked', 'search_id', 'repost_search'),
+]
+
+
+def _foreign_keys(conn) -> set[tuple[str, str]]:
+    rows = conn.execute(
+        sa.text(
+            'SELECT DISTINCT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE '
+            'WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL '
+            'AND (TABLE_NAME IN :tables OR REFERENCED_TABLE_NAME IN :tables)'
+        ).bindparams(sa.bindparam('tables', expanding=True)),
+        {'tables': list(PARTITIONED_TABLES)}
+    )
+    return {(row.TABLE_NAME, row.CONSTRAINT_NAME) for row in rows}
+
+
+def _months(conn, table: str, column: str) -> list[date]:
+    oldest = conn.execute(sa.text(f'SELECT MIN({column}) FROM {table}')).scalar()
+    month = (oldest.date() if oldest else date.today()).replace(day=1)
+    last = add_months(date.today().replace(day=1), MONTHS_AHEAD)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def upgrade():
+    conn = op.get_bind()
+    for table, constraint in _foreign_keys(conn):
+        op.drop_constraint(constraint, table, type_='foreignkey')
+
+    # The partition column ends up in the primary key so it can't be null
+    op.execute("UPDATE monitored_sub_checked SET checked_at = '1970-01-01' WHERE checked_at IS NULL")
+
+    for table, column in PARTITIONED_TABLES.items():
+        op.execute(f'ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id, {column})')
+        op.execute(build_partition_by_sql(table, column, _months(conn, table, column)))
+
+
+def downgrade():
+    for table, column in PARTITIONED_TABLES.items():
+        op.execute(f'ALTER TABLE {table} REMOVE PARTITIONING')
+        op.execute(f'ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY (id)')
+
+    for table, column, referred_table in FOREIGN_KEYS:
+        op.create_foreign_key(None, table, referred_table, [column], ['id'])
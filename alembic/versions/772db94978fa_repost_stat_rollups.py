@@ -0,0 +1,68 @@
+"""repost stat rollups
+
+Daily repost counts by author and by reposted post, plus the high water mark of the last repost rolled up.  The
+first stats run after this backfills them from the whole repost table
+
+Revision ID: 772db94978fa
+Revises: 2f7bc3dba469
+Create Date: 2026-10-17 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = '772db94978fa'
+down_revision = '2f7bc3dba469'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'stat_repost_daily_author',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('author', sa.String(length=25), nullable=False),
+        sa.Column('post_type_id', mysql.TINYINT(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('repost_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_type_id'], ['post_type.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_author_type_day', 'stat_repost_daily_author', ['author', 'post_type_id', 'day'], unique=True)
+    op.create_index('idx_author_rollup_type_day', 'stat_repost_daily_author', ['post_type_id', 'day'])
+
+    op.create_table(
+        'stat_repost_daily_post',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('repost_of_id', sa.Integer(), nullable=False),
+        sa.Column('post_type_id', mysql.TINYINT(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('repost_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['repost_of_id'], ['post.id']),
+        sa.ForeignKeyConstraint(['post_type_id'], ['post_type.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'idx_repost_of_type_day', 'stat_repost_daily_post', ['repost_of_id', 'post_type_id', 'day'], unique=True
+    )
+    op.create_index('idx_post_rollup_type_day', 'stat_repost_daily_post', ['post_type_id', 'day'])
+
+    op.create_table(
+        'stat_rollup_state',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('stat_rollup_state')
+    op.drop_index('idx_post_rollup_type_day', table_name='stat_repost_daily_post')
+    op.drop_index('idx_repost_of_type_day', table_name='stat_repost_daily_post')
+    op.drop_table('stat_repost_daily_post')
+    op.drop_index('idx_author_rollup_type_day', table_name='stat_repost_daily_author')
+    op.drop_index('idx_author_type_day', table_name='stat_repost_daily_author')
+    op.drop_table('stat_repost_daily_author')
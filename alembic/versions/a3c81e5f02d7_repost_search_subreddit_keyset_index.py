@@ -0,0 +1,25 @@
+"""repost search subreddit keyset index
+
+Lets the site's subreddit history pages walk repost_search newest first by id without sorting every search for the
+subreddit
+
+Revision ID: a3c81e5f02d7
+Revises: 772db94978fa
+Create Date: 2026-10-17 15:10:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a3c81e5f02d7'
+down_revision = '772db94978fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_subreddit_source_id', 'repost_search', ['subreddit', 'source', 'id'])
+
+
+def downgrade():
+    op.drop_index('idx_subreddit_source_id', table_name='repost_search')
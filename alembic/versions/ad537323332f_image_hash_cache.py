@@ -0,0 +1,41 @@
+"""image hash cache
+
+Hashes of every image we've downloaded, keyed by a SHA-256 of the URL and of the image bytes, so the same image is
+only decoded once
+
+Revision ID: ad537323332f
+Revises: a3c81e5f02d7
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'ad537323332f'
+down_revision = 'a3c81e5f02d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_hash_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('url_hash', sa.String(length=64), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('dhash_h', sa.String(length=64), nullable=True),
+        sa.Column('dhash_v', sa.String(length=64), nullable=True),
+        sa.Column('ahash', sa.String(length=64), nullable=True),
+        sa.Column('meme_dhash', sa.String(length=256), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_image_hash_cache_url', 'image_hash_cache', ['url_hash'], unique=True)
+    op.create_index('idx_image_hash_cache_content', 'image_hash_cache', ['content_hash'])
+
+
+def downgrade():
+    op.drop_index('idx_image_hash_cache_content', table_name='image_hash_cache')
+    op.drop_index('idx_image_hash_cache_url', table_name='image_hash_cache')
+    op.drop_table('image_hash_cache')
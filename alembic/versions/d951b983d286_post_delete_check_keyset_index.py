@@ -0,0 +1,24 @@
+"""post delete check keyset index
+
+Lets the deleted post cleanup walk posts by last_deleted_check and id without a filesort
+
+Revision ID: d951b983d286
+Revises: ad537323332f
+Create Date: 2026-10-17 16:10:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd951b983d286'
+down_revision = 'ad537323332f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_delete_check_keyset', 'post', ['last_deleted_check', 'id'])
+
+
+def downgrade():
+    op.drop_index('idx_delete_check_keyset', table_name='post')
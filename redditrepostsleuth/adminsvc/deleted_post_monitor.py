@@ -1,9 +1,12 @@
 import json
 import os
 import time
-from asyncio import run, ensure_future, gather
+from asyncio import run, ensure_future, gather, Semaphore, to_thread, sleep
+from datetime import datetime, timedelta
+from typing import Optional, Iterator
 
 from aiohttp import ClientSession, ClientTimeout, ClientHttpProxyError, ClientConnectorError, TCPConnector
+from celery.result import AsyncResult
 
 from redditrepostsleuth.core.util.utils import build_reddit_query_string
 from redditrepostsleuth.core.celery.admin_tasks import update_last_deleted_check, bulk_delete
@@ -92,77 +95,159 @@ def merge_results(results: list[DeleteCheckResult]) -> DeleteCheckResult:
 
 
 def db_ids_from_post_ids(post_ids: list[str], posts: list[Post]) -> list[int]:
+    db_ids = {post.post_id: post.id for post in posts}
     results = []
     for post_id in post_ids:
-        post = next((x for x in posts if x.post_id == post_id), None)
-        if not post:
+        db_id = db_ids.get(post_id)
+        if not db_id:
             log.error('Failed to find posts with ID %s', post_id)
             continue
-        results.append(post.id)
+        results.append(db_id)
     log.debug('DB IDs: %s', results)
     return results
 
+
+def stream_posts_for_delete_check(
+        uowm: UnitOfWorkManager,
+        days: int,
+        page_size: int = 7000,
+        max_rows: Optional[int] = None
+) -> Iterator[list]:
+    """
+    Yield pages of posts due a delete check, keyset paginated on (last_deleted_check, id) so each page is a cheap
+    index range scan and memory doesn't grow with the backlog.  Only id and post_id are loaded.
+
+    The cutoffs are fixed when the scan starts so posts updated while we scan aren't picked up again
+    :param uowm: Unit of work manager
+    :param days: Check posts that haven't been checked in this many days
+    :param page_size: Rows per page
+    :param max_rows: Stop after this many rows
+    """
+    checked_before = datetime.now() - timedelta(days=days)
+    created_after = datetime.now() - timedelta(days=90)
+    after = None
+    fetched = 0
+    while max_rows is None or fetched < max_rows:
+        limit = page_size if max_rows is None else min(page_size, max_rows - fetched)
+        with uowm.start() as uow:
+            rows = uow.posts.find_keyset_page_for_delete_check(checked_before, created_after, after=after, limit=limit)
+        if not rows:
+            return
+        fetched += len(rows)
+        after = (rows[-1].last_deleted_check, rows[-1].id)
+        yield rows
+        if len(rows) < limit:
+            return
+
+
+async def check_page(
+        rows: list,
+        session: ClientSession,
+        semaphore: Semaphore,
+        proxy_manager: ProxyManager,
+        util_api: str
+) -> DeleteCheckResult:
+    """
+    Check a page of posts against the util API, 100 posts per request.  The semaphore is shared across pages to
+    bound the number of requests in flight
+    """
+    async def fetch(req_chunk: list) -> BatchedPostRequestJob:
+        url = f'{util_api}/reddit/info?submission_ids={build_reddit_query_string([p.post_id for p in req_chunk])}'
+        job = BatchedPostRequestJob(url, req_chunk, JobStatus.STARTED, proxy_manager.get_proxy())
+        async with semaphore:
+            return await fetch_page(job, session)
+
+    results: list[BatchedPostRequestJob] = await gather(*[fetch(chunk) for chunk in chunk_list(rows, 100)])
+    log.debug('Merging job results')
+    return merge_results(list(map(check_reddit_batch, results)))
+
+
+def send_results(result: DeleteCheckResult) -> list[AsyncResult]:
+    celery_jobs = [bulk_delete.apply_async((result.to_delete,), queue='post_delete')]
+    for update_batch in chunk_list(result.to_update, 2000):
+        celery_jobs.append(update_last_deleted_check.apply_async((update_batch, )))
+    return celery_jobs
+
+
+def wait_for_jobs(celery_jobs: list[AsyncResult]) -> None:
+    for j in celery_jobs:
+        j.get()
+
+
+async def run_delete_check(
+        uowm: UnitOfWorkManager,
+        proxy_manager: ProxyManager,
+        util_api: str,
+        days: int = 1,
+        page_size: int = 7000,
+        max_rows: Optional[int] = None,
+        concurrency: int = 50
+) -> tuple[int, int]:
+    """
+    Stream posts due a delete check through the util API.  The next page is read from the DB while the current one is
+    being checked, and the Celery jobs from the previous page are only waited on once the current page is checked
+    :return: Tuple of posts checked and posts sent for deletion
+    """
+    pages = stream_posts_for_delete_check(uowm, days, page_size=page_size, max_rows=max_rows)
+    semaphore = Semaphore(concurrency)
+    processed_count = 0
+    total_deleted = 0
+    pending_jobs = []
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        next_page = ensure_future(to_thread(next, pages, None))
+        while True:
+            rows = await next_page
+            if not rows:
+                break
+            next_page = ensure_future(to_thread(next, pages, None))
+            start = time.perf_counter()
+            result = await check_page(rows, session, semaphore, proxy_manager, util_api)
+            log.info('Results: To Delete: %s - To Update: %s - To Recheck %s - Check time: %s',
+                     len(result.to_delete), len(result.to_update), len(result.to_recheck),
+                     round(time.perf_counter() - start, 5))
+            processed_count += len(rows)
+            total_deleted += len(result.to_delete)
+            await to_thread(wait_for_jobs, pending_jobs)
+            log.info('Sending results to Celery')
+            pending_jobs = send_results(result)
+
+    log.info('Waiting For Celery Jobs to Complete')
+    await to_thread(wait_for_jobs, pending_jobs)
+    return processed_count, total_deleted
+
+
 async def main():
     config = Config()
     uowm = UnitOfWorkManager(get_db_engine(config))
     proxy_manager = ProxyManager(uowm, 600)
     query_limit = int(os.getenv('QUERY_LIMIT', 20000))
+    page_size = int(os.getenv('PAGE_SIZE', 7000))
+    concurrency = int(os.getenv('REQUEST_CONCURRENCY', 50))
 
     processed_count = 0
     total_deleted = 0
     while True:
         start = time.perf_counter()
-        with uowm.start() as uow:
-            proxy_manager.enabled_expired_cooldowns()
-            #posts = uow.posts.find_all_for_delete_check(90, limit=query_limit)
-            posts = uow.posts.find_all_recent_for_delete_check(1, limit=query_limit)
-            if not posts:
-                log.info('No posts to check')
-                time.sleep(30)
-                continue
-            processed_count += query_limit
-            celery_jobs = []
-            for batch in chunk_list(posts, 7000):
-                log.info('First: %s %s - Last: %s %s', batch[0].post_id, batch[0].created_at, batch[-1].post_id,
-                         batch[-1].created_at)
-                tasks = []
-                conn = TCPConnector(limit=0)
-
-                async with ClientSession(connector=conn) as session:
-                    for req_chunk in chunk_list(batch, 100):
-                        #url = build_reddit_req_url([p.post_id for p in req_chunk])
-                        url = f'{config.util_api}/reddit/info?submission_ids={build_reddit_query_string([p.post_id for p in req_chunk])}'
-                        job = BatchedPostRequestJob(url, req_chunk, JobStatus.STARTED, proxy_manager.get_proxy())
-                        tasks.append(ensure_future(fetch_page(job, session)))
-
-                    results: list[BatchedPostRequestJob] = await gather(*tasks)
-
-                    log.debug('Merging job results')
-                    processed_results = list(map(check_reddit_batch, results))
-                    merged_results = merge_results(processed_results)
-                    log.info('Results: To Delete: %s - To Update: %s - To Recheck %s',
-                             len(merged_results.to_delete), len(merged_results.to_update),
-                             len(merged_results.to_recheck))
-
-                    log.info('Sending to deleted queue')
-                    total_deleted += len(merged_results.to_delete)
-                    # for p in merged_results.to_delete:
-                    #     log.debug('Sending %s to delete queue - https://redd.it/%s', p, p)
-                    #     delete_post_task.apply_async((p,))
-                    celery_jobs.append(bulk_delete.apply_async((merged_results.to_delete,), queue='post_delete'))
-
-                    log.info('Sending update jobs to Celery')
-                    for update_batch in chunk_list(merged_results.to_update, 2000):
-                        celery_jobs.append(update_last_deleted_check.apply_async((update_batch, )))
-
-            log.info('Waiting For Celery Jobs to Complete')
-            log.info(f'Total Processed: {processed_count}')
-            log.info(f'Total Deleted: {total_deleted}')
-            log.info(f'Delete Percent: {round(total_deleted / processed_count * 100, 2)}')
-            for j in celery_jobs:
-                j.get()
-                #log.info('Job Complete: %s', j.id)
-            log.info('Batch time: %s', round(time.perf_counter() - start, 5))
+        proxy_manager.enabled_expired_cooldowns()
+        processed, deleted = await run_delete_check(
+            uowm,
+            proxy_manager,
+            config.util_api,
+            days=1,
+            page_size=page_size,
+            max_rows=query_limit,
+            concurrency=concurrency
+        )
+        if not processed:
+            log.info('No posts to check')
+            await sleep(30)
+            continue
+        processed_count += processed
+        total_deleted += deleted
+        log.info(f'Total Processed: {processed_count}')
+        log.info(f'Total Deleted: {total_deleted}')
+        log.info(f'Delete Percent: {round(total_deleted / processed_count * 100, 2)}')
+        log.info('Batch time: %s', round(time.perf_counter() - start, 5))
 
 
 if __name__ == '__main__':
@@ -13,6 +13,7 @@ from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.notification.notification_service import NotificationService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
 from redditrepostsleuth.core.util.replytemplates import TOP_POST_WATCH_SUBJECT, WATCH_ENABLED, REPORT_RESPONSE
@@ -141,7 +142,8 @@ if __name__ == '__main__':
     uowm = UnitOfWorkManager(get_db_engine(config))
     reddit = get_reddit_instance(config)
     event_logger = EventLogging(config=config)
-    response_handler = ResponseHandler(reddit, uowm, event_logger, source='submonitor')
+    response_handler = ResponseHandler(reddit, uowm, event_logger, source='submonitor',
+                                       rate_limiter=get_reddit_rate_limiter())
     invite = InboxMonitor(uowm, reddit, response_handler)
     while True:
         invite.check_inbox()
\ No newline at end of file
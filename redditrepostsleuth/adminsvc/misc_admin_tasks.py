@@ -10,6 +10,7 @@ from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import MemeTemplatePotential, \
     MemeTemplate, StatsTopRepost
 from redditrepostsleuth.core.db.db_utils import get_db_engine
+from redditrepostsleuth.core.db.reference_cache import invalidate_reference_cache, BANNED_SUBREDDIT
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.notification.notification_service import NotificationService
@@ -40,6 +41,7 @@ def update_ban_list(uowm: UnitOfWorkManager, reddit: Reddit, notification_svc: N
             else:
                 log.info('[Subreddit Ban Check] No longer banned on %s', ban.subreddit)
                 uow.banned_subreddit.remove(ban)
+                invalidate_reference_cache(BANNED_SUBREDDIT, ban.subreddit)
                 if notification_svc:
                     notification_svc.send_notification(
                         f'Removed https://reddit.com/r/{ban.subreddit} from ban list',
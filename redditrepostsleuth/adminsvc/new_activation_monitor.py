@@ -11,6 +11,7 @@ from redditrepostsleuth.core.celery.tasks.reddit_action_tasks import send_modmai
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import MonitoredSub
 from redditrepostsleuth.core.db.db_utils import get_db_engine
+from redditrepostsleuth.core.db.reference_cache import invalidate_reference_cache, MONITORED_SUB
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.notification.notification_service import NotificationService
@@ -91,6 +92,7 @@ class NewActivationMonitor:
             except RedditAPIException as e:
                 log.exception('Failed to send activation PM', exc_info=True)
             uow.commit()
+        invalidate_reference_cache(MONITORED_SUB, subreddit.display_name)
 
     def _create_wiki_page(self, subreddit: Subreddit) -> NoReturn:
         template = json.dumps(DEFAULT_CONFIG_VALUES)
@@ -113,6 +115,8 @@ class NewActivationMonitor:
             except Exception as e:
                 log.exception('Unknown exception saving monitored sub', exc_info=True)
                 raise
+        # Workers may have cached that this sub isn't monitored
+        invalidate_reference_cache(MONITORED_SUB, msg.subreddit.display_name)
         return monitored_sub
 
     def is_already_active(self, subreddit: Text) -> bool:
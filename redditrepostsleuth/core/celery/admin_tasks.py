@@ -1,15 +1,12 @@
 import os
-from datetime import datetime
-from time import perf_counter
 from typing import NoReturn
 
 import pymysql
-from celery import Task
 
 from redditrepostsleuth.core.celery import celery
 from redditrepostsleuth.core.celery.basetasks import AdminTask
-from redditrepostsleuth.core.config import Config
-from redditrepostsleuth.core.db.databasemodels import MonitoredSub, Post
+from redditrepostsleuth.core.db.databasemodels import MonitoredSub
+from redditrepostsleuth.core.db.purge_engine import PurgeEngine
 from redditrepostsleuth.core.logfilters import ContextFilter
 from redditrepostsleuth.core.logging import log, configure_logger
 
@@ -20,17 +17,6 @@ log = configure_logger(
 )
 
 
-class PyMysqlTask(Task):
-    def __init__(self):
-        self.config = Config()
-
-    def get_conn(self):
-        return pymysql.connect(host=self.config.db_host,
-                        user=self.config.db_user,
-                        password=self.config.db_password,
-                        db=self.config.db_name,
-                        cursorclass=pymysql.cursors.SSDictCursor)
-
 def get_conn():
     return pymysql.connect(host=os.getenv('DB_HOST'),
                            user=os.getenv('DB_USER'),
@@ -40,70 +26,35 @@ def get_conn():
 
 def cleanup_post(post_id: str, uowm) -> None:
     try:
-        with uowm.start() as uow:
-            uow.posts.remove_by_post_id(post_id)
-            uow.image_post.remove_by_post_id(post_id)
-            uow.investigate_post.remove_by_post_id(post_id)
-            #uow.image_repost.remove_by_post_id(post_id)
-            uow.bot_comment.remove_by_post_id(post_id)
-            uow.summons.remove_by_post_id(post_id)
-            uow.image_search.remove_by_post_id(post_id)
-            uow.user_report.remove_by_post_id(post_id)
-            uow.repostwatch.remove_by_post_id(post_id)
-            uow.commit()
-            log.info('Deleted post %s', post_id)
+        PurgeEngine(uowm).purge_posts([post_id])
+        log.info('Deleted post %s', post_id)
     except Exception as e:
         log.exception('')
 
-@celery.task(bind=True, base=PyMysqlTask)
+@celery.task(bind=True, base=AdminTask)
 def bulk_delete(self, post_ids: list[str]):
     if not post_ids:
         return
-    db_conn = self.get_conn()
     try:
         log.debug('Deleting Batch')
-        in_params = ','.join(['%s'] * len(post_ids))
-        queries = [
-            'DELETE FROM reddit_post where post_id IN (%s)' % in_params,
-            'DELETE FROM reddit_image_post WHERE post_id in (%s)' % in_params,
-            'DELETE FROM investigate_post WHERE post_id in (%s)' % in_params,
-            'DELETE FROM reddit_bot_comment WHERE post_id in (%s)' % in_params,
-            'DELETE FROM reddit_bot_summons WHERE post_id in (%s)' % in_params,
-            'DELETE FROM reddit_image_search WHERE post_id in (%s)' % in_params,
-            'DELETE FROM reddit_user_report WHERE post_id in (%s)' % in_params,
-            'DELETE FROM reddit_repost_watch WHERE post_id in (%s)' % in_params,
-        ]
-
-        with db_conn.cursor() as cur:
-            for q in queries:
-                res = cur.execute(q, post_ids)
-            db_conn.commit()
+        PurgeEngine(self.uowm, chunk_size=int(self.config.purge_chunk_size or 1000)).purge_posts(post_ids)
     except Exception as e:
         log.exception('')
-    finally:
-        db_conn.close()
 
 @celery.task(bind=True, base=AdminTask)
 def delete_post_task(self, post_id: str) -> None:
     cleanup_post(post_id, self.uowm)
 
 def update_last_delete_check(ids: list[int], uowm) -> None:
-    with uowm.start() as uow:
-        batch = []
-        for id in ids:
-            batch.append({'id': id, 'last_deleted_check': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})
-        uow.session.bulk_update_mappings(Post, batch)
-        uow.commit()
+    PurgeEngine(uowm).update_last_deleted_check(ids)
 
 @celery.task(bind=True, base=AdminTask)
 def update_last_deleted_check(self, post_ids: list[int]) -> None:
     try:
         log.info('Updating last deleted check timestamp for %s posts', len(post_ids))
-        start = perf_counter()
         update_last_delete_check(post_ids, self.uowm)
-        print(f'Save Time: {round(perf_counter() - start, 5)}')
     except Exception as e:
-        log.exception()
+        log.exception('')
 
 
 @celery.task(bind=True, base=AdminTask)
@@ -32,6 +32,12 @@ if os.getenv('SENTRY_DNS', None):
             ignore_errors=[IngestHighMatchMeme, ImageConversionException, WorkerLostError, TooManyRequests]
         )
 
+@signals.celeryd_init.connect
+def record_worker_options(options=None, **_kwargs):
+    from redditrepostsleuth.core.services.service_registry import set_worker_options
+    options = options or {}
+    set_worker_options(options.get('pool'), options.get('concurrency'))
+
 @after_setup_logger.connect
 def setup_loggers(logger, *args, **kwargs):
     logger.handlers = []
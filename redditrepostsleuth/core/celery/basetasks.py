@@ -2,68 +2,84 @@ import datetime
 
 from celery import Task
 
-from redditrepostsleuth.core.config import Config
-from redditrepostsleuth.core.db.db_utils import get_db_engine
-from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
-from redditrepostsleuth.core.notification.notification_service import NotificationService
-from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.image_hash_cache import ImageHashCacheService
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter, BACKGROUND_LANE
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
+from redditrepostsleuth.core.services.service_registry import get_service_registry
 from redditrepostsleuth.core.services.subreddit_config_updater import SubredditConfigUpdater
-from redditrepostsleuth.core.util.helpers import get_reddit_instance
 
 
 class EventLoggerTask(Task):
     def __init__(self):
-        self.config = Config()
-        self.event_logger = EventLogging(config=self.config)
+        services = get_service_registry()
+        self.config = services.config
+        self.event_logger = services.event_logger
 
 class SqlAlchemyTask(Task):
     def __init__(self):
-        self.config = Config()
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        self.event_logger = EventLogging()
+        services = get_service_registry()
+        self.config = services.config
+        self.uowm = services.uowm
+        self.event_logger = services.event_logger
 
 
 class RepostTask(SqlAlchemyTask):
     def __init__(self):
         super().__init__()
-        self.notification_svc = NotificationService(self.config)
+        services = get_service_registry()
+        self.notification_svc = services.notification_svc
         self.link_blacklist = [] # Temp fix.  People were spamming onlyfans links 10s of thousands of times
-        self.reddit = get_reddit_instance(self.config)
+        self.reddit = services.reddit
 
 
 class AnnoyTask(Task):
     def __init__(self):
-        self.config = Config()
+        services = get_service_registry()
+        self.config = services.config
         from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        self.notification_svc = NotificationService(self.config)
-        self.event_logger = EventLogging()
-        self.reddit = get_reddit_instance(self.config)
-        self.dup_service = DuplicateImageService(self.uowm, self.event_logger, self.reddit)
+        self.uowm = services.uowm
+        self.notification_svc = services.notification_svc
+        self.event_logger = services.event_logger
+        self.reddit = services.reddit
+        self.http_session = services.http_session
+        hash_cache = None
+        if self.config.image_hash_cache_enabled:
+            hash_cache = ImageHashCacheService(
+                self.uowm,
+                event_logger=self.event_logger,
+                redis_client=services.redis_client,
+                redis_ttl=int(self.config.image_hash_cache_ttl or 604800)
+            )
+        self.dup_service = DuplicateImageService(self.uowm, self.event_logger, self.reddit, hash_cache=hash_cache)
 
 class RedditTask(Task):
     def __init__(self):
-        self.config = Config()
-        self.reddit = get_reddit_instance(self.config)
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        self.event_logger = EventLogging(config=self.config)
-        self.notification_svc = NotificationService(self.config)
-        self.response_handler = ResponseHandler(self.reddit, self.uowm, self.event_logger, live_response=self.config.live_responses)
+        services = get_service_registry()
+        self.config = services.config
+        self.reddit = services.reddit
+        self.uowm = services.uowm
+        self.event_logger = services.event_logger
+        self.notification_svc = services.notification_svc
+        self.response_handler = ResponseHandler(self.reddit, self.uowm, self.event_logger, live_response=self.config.live_responses,
+                                                rate_limiter=get_reddit_rate_limiter())
 
 class AdminTask(Task):
     def __init__(self):
-        self.config = Config()
-        self.reddit = get_reddit_instance(self.config)
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        self.event_logger = EventLogging(config=self.config)
+        services = get_service_registry()
+        self.config = services.config
+        self.reddit = services.reddit
+        self.uowm = services.uowm
+        self.event_logger = services.event_logger
+        rate_limiter = get_reddit_rate_limiter()
         self.response_handler = ResponseHandler(self.reddit, self.uowm, self.event_logger,
-                                                live_response=self.config.live_responses)
-        self.notification_svc = NotificationService(self.config)
+                                                live_response=self.config.live_responses,
+                                                rate_limiter=rate_limiter, rate_limit_lane=BACKGROUND_LANE)
+        self.notification_svc = services.notification_svc
         self.config_updater = SubredditConfigUpdater(
             self.uowm,
             self.reddit,
             self.response_handler,
             self.config,
-            notification_svc=self.notification_svc
+            notification_svc=self.notification_svc,
+            rate_limiter=rate_limiter
         )
@@ -19,6 +19,8 @@ task_routes = {
     'redditrepostsleuth.core.celery.tasks.ingest_tasks.save_subreddit': {'queue': 'save_subreddit'},
     'redditrepostsleuth.core.celery.tasks.ingest_tasks.ingest_repost_check': {'queue': 'repost'},
     'redditrepostsleuth.core.celery.tasks.repost_tasks.check_image_repost_save': {'queue': 'repost_image'},
+    'redditrepostsleuth.core.celery.tasks.repost_tasks.check_image_reposts_batch': {'queue': 'repost_image'},
+    'redditrepostsleuth.core.celery.tasks.repost_tasks.queue_image_repost_batches': {'queue': 'scheduled_tasks'},
     'redditrepostsleuth.core.celery.tasks.repost_tasks.link_repost_check': {'queue': 'repost_link'},
     'redditrepostsleuth.core.celery.tasks.repost_tasks.check_for_text_repost_task': {'queue': 'repost_text'},
     'redditrepostsleuth.core.celery.admin_tasks.check_if_watched_post_is_active': {'queue': 'watch_remove_deleted'},
@@ -66,11 +68,11 @@ beat_schedule = {
     },
     'update-top-reposts': {
         'task': 'redditrepostsleuth.core.celery.tasks.scheduled_tasks.update_all_top_reposts_task',
-        'schedule': 86400
+        'schedule': 3600
     },
     'update-top-reposters': {
         'task': 'redditrepostsleuth.core.celery.tasks.scheduled_tasks.update_all_top_reposters_task',
-        'schedule': 86400
+        'schedule': 3600
     },
     'update-daily-reposters': {
         'task': 'redditrepostsleuth.core.celery.tasks.scheduled_tasks.update_daily_top_reposters_task',
@@ -96,6 +98,10 @@ beat_schedule = {
         'task': 'redditrepostsleuth.core.celery.tasks.scheduled_tasks.update_daily_stats',
         'schedule': 86400
     },
+    'queue-image-repost-batches': {
+        'task': 'redditrepostsleuth.core.celery.tasks.repost_tasks.queue_image_repost_batches',
+        'schedule': 10
+    },
     'search-history-cleanup': {
         'task': 'redditrepostsleuth.core.celery.tasks.scheduled_tasks.queue_search_history_cleanup',
         'schedule': 3600
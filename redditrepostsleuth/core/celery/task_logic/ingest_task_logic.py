@@ -1,10 +1,13 @@
+import asyncio
 import logging
 import os
+from concurrent.futures import Executor
 from hashlib import md5
 from typing import Optional
 from urllib.parse import urlparse
 
 import imagehash
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
 import redgifs
 from redgifs import HTTPException
 
@@ -12,9 +15,11 @@ from redditrepostsleuth.core.db.databasemodels import Post, PostHash
 from redditrepostsleuth.core.exception import ImageRemovedException, ImageConversionException, InvalidImageUrlException, \
     GalleryNotProcessed
 from redditrepostsleuth.core.proxy_manager import ProxyManager
+from redditrepostsleuth.core.services.image_hash_cache import ImageHashCacheService
 from redditrepostsleuth.core.services.redgifs_token_manager import RedGifsTokenManager
 from redditrepostsleuth.core.util.constants import GENERIC_USER_AGENT
-from redditrepostsleuth.core.util.imagehashing import generate_img_by_url_requests
+from redditrepostsleuth.core.util.imagehashing import generate_img_by_url_requests, compute_image_hashes, \
+    image_from_bytes, get_image_request_headers
 from redditrepostsleuth.core.util.objectmapping import reddit_submission_to_post
 
 log = logging.getLogger(__name__)
@@ -46,7 +51,8 @@ def pre_process_post(
         submission: dict,
         proxy_manager: ProxyManager,
         redgif_manager: RedGifsTokenManager,
-        domains_to_proxy: list[str]
+        domains_to_proxy: list[str],
+        hash_cache: ImageHashCacheService = None
 ) -> Optional[Post]:
 
     post = reddit_submission_to_post(submission)
@@ -69,7 +75,7 @@ def pre_process_post(
                     redgif_manager.remove_redgifs_token(proxy or 'localhost')
                     raise e
 
-        process_image_post(post, url=redgif_url, proxy=proxy)
+        process_image_post(post, url=redgif_url, proxy=proxy, hash_cache=hash_cache)
     elif post.post_type_id == 6: # gallery
         process_gallery(post, submission)
 
@@ -80,19 +86,32 @@ def pre_process_post(
     return post
 
 
-def process_image_post(post: Post, url: str = None, proxy: str = None, hash_size: int = 16) -> Post:
+def process_image_post(
+        post: Post,
+        url: str = None,
+        proxy: str = None,
+        hash_size: int = 16,
+        hash_cache: ImageHashCacheService = None
+) -> Post:
     """
     Process an image post to generate the required hashes
     :param proxy: Proxy to request image with
     :param post: post object
     :param url: Alternate URL to use
     :param hash_size: Size of hash
+    :param hash_cache: Optional hash cache to check before downloading the image
     :return: Post object with hashes
     """
     log.debug('Hashing image with URL: %s', post.url)
     if url:
         log.info('Hashing %s', post.url)
 
+    if hash_cache:
+        hashes = hash_cache.get_image_hashes(url or post.url, hash_size=hash_size, proxy=proxy)
+        post.hashes.append(PostHash(hash=hashes['dhash_h'], hash_type_id=1, post_created_at=post.created_at))
+        post.hashes.append(PostHash(hash=hashes['dhash_v'], hash_type_id=2, post_created_at=post.created_at))
+        return post
+
     try:
         img = generate_img_by_url_requests(url or post.url, proxy=proxy)
     except ImageConversionException as e:
@@ -100,10 +119,9 @@ def process_image_post(post: Post, url: str = None, proxy: str = None, hash_size
         raise
 
     try:
-        dhash_h = imagehash.dhash(img, hash_size=hash_size)
-        dhash_v = imagehash.dhash_vertical(img, hash_size=hash_size)
-        post.hashes.append(PostHash(hash=str(dhash_h), hash_type_id=1, post_created_at=post.created_at))
-        post.hashes.append(PostHash(hash=str(dhash_v), hash_type_id=2, post_created_at=post.created_at))
+        hashes = compute_image_hashes(img, hash_size=hash_size, hash_types=('dhash_h', 'dhash_v'))
+        post.hashes.append(PostHash(hash=hashes['dhash_h'], hash_type_id=1, post_created_at=post.created_at))
+        post.hashes.append(PostHash(hash=hashes['dhash_v'], hash_type_id=2, post_created_at=post.created_at))
     except OSError as e:
         log.warning('Problem hashing image: %s', e)
     except Exception as e:
@@ -112,6 +130,107 @@ def process_image_post(post: Post, url: str = None, proxy: str = None, hash_size
 
     return post
 
+def hash_image_bytes(data: bytes, hash_size: int = 16) -> dict:
+    """
+    Decode downloaded image bytes and generate the hashes we save on ingest.
+    Kept at module level so it can be sent to a process pool
+    :param data: Image bytes
+    :param hash_size: Size of hash
+    :return: dict with dhash_h and dhash_v
+    """
+    return compute_image_hashes(image_from_bytes(data), hash_size=hash_size, hash_types=('dhash_h', 'dhash_v'))
+
+
+async def fetch_image_bytes(session: ClientSession, url: str, proxy: str = None, timeout: int = 7) -> bytes:
+    """
+    Async version of get_image_bytes_by_url_requests
+    :param session: AIOHTTP session to use
+    :param url: Image URL
+    :param proxy: Optional proxy
+    :param timeout: Request timeout in seconds
+    :return: Image bytes
+    """
+    try:
+        async with session.get(url, headers=get_image_request_headers(url), proxy=proxy, timeout=ClientTimeout(total=timeout)) as resp:
+            if resp.status == 200:
+                return await resp.read()
+            log.warning('Status %s from image URL %s', resp.status, url)
+            if resp.status == 404:
+                raise ImageRemovedException('Image removed')
+            elif resp.status == 403:
+                raise InvalidImageUrlException(f'Unauthorized on {url}')
+            raise ImageConversionException(f'Status {resp.status}')
+    except (ClientError, asyncio.TimeoutError, ValueError) as e:
+        raise ImageConversionException(str(e))
+
+
+async def hash_image_posts(
+        posts: list[Post],
+        proxy_manager: ProxyManager = None,
+        domains_to_proxy: list[str] = None,
+        executor: Executor = None,
+        max_connections: int = 100,
+        per_domain_limit: int = 8,
+        hash_size: int = 16
+) -> list[Post]:
+    """
+    Fetch the images for a batch of image posts concurrently and hash them.  Decoding and hashing is CPU bound so it's
+    handed off to the provided executor.  Use a ProcessPoolExecutor where the calling process is allowed to fork
+    :param posts: Image posts to hash
+    :param proxy_manager: Proxy manager used for domains in domains_to_proxy
+    :param domains_to_proxy: Domains to request through a proxy
+    :param executor: Executor used to decode and hash images.  Defaults to the loop's thread pool
+    :param max_connections: Max concurrent connections
+    :param per_domain_limit: Max concurrent requests to the same domain
+    :param hash_size: Size of hash
+    :return: Posts that were successfully hashed
+    """
+    domains_to_proxy = domains_to_proxy or []
+    domain_limits: dict[str, asyncio.Semaphore] = {}
+    loop = asyncio.get_running_loop()
+    proxy_failures = []
+    proxy_successes = []
+
+    async def process(session: ClientSession, post: Post) -> Optional[Post]:
+        domain = urlparse(post.url).netloc
+        if domain not in domain_limits:
+            domain_limits[domain] = asyncio.Semaphore(per_domain_limit)
+        proxy = None
+        if proxy_manager and domain in domains_to_proxy:
+            proxy = proxy_manager.get_proxy()
+        try:
+            async with domain_limits[domain]:
+                data = await fetch_image_bytes(session, post.url, proxy=proxy.address if proxy else None)
+        except (ImageRemovedException, InvalidImageUrlException) as e:
+            log.debug('Skipping %s: %s', post.post_id, e)
+            return
+        except ImageConversionException as e:
+            log.warning('Failed to fetch image for %s: %s', post.post_id, e)
+            if proxy:
+                proxy_failures.append(proxy)
+            return
+        if proxy:
+            proxy_successes.append(proxy)
+
+        try:
+            hashes = await loop.run_in_executor(executor, hash_image_bytes, data, hash_size)
+        except (ImageConversionException, OSError) as e:
+            log.warning('Problem hashing image for %s: %s', post.post_id, e)
+            return
+        post.hashes.append(PostHash(hash=hashes['dhash_h'], hash_type_id=1, post_created_at=post.created_at))
+        post.hashes.append(PostHash(hash=hashes['dhash_v'], hash_type_id=2, post_created_at=post.created_at))
+        return post
+
+    async with ClientSession(connector=TCPConnector(limit=max_connections)) as session:
+        results = await asyncio.gather(*[process(session, post) for post in posts])
+
+    if proxy_manager:
+        proxy_manager.report_proxy_failures(proxy_failures)
+        proxy_manager.report_proxy_successes(proxy_successes)
+
+    return [post for post in results if post]
+
+
 def process_gallery(post: Post, submission_data: dict) -> Optional[Post]:
 
     if 'media_metadata' not in submission_data or submission_data['media_metadata'] is None:
@@ -4,6 +4,7 @@ import time
 from praw.exceptions import APIException, RedditAPIException
 from prawcore import TooManyRequests
 
+from redditrepostsleuth.core.db.reference_cache import ReferenceDataCache
 from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
 from redditrepostsleuth.core.exception import RateLimitException, NoIndexException, UtilApiException
 from redditrepostsleuth.core.util.onlyfans_handling import check_user_for_only_fans
@@ -11,7 +12,20 @@ from redditrepostsleuth.submonitorsvc.monitored_sub_service import MonitoredSubS
 
 log = logging.getLogger(__name__)
 
-def process_monitored_subreddit_submission(post_id: str, monitored_sub_svc: MonitoredSubService, uow: UnitOfWork) -> None:
+def process_monitored_subreddit_submission(
+        post_id: str,
+        monitored_sub_svc: MonitoredSubService,
+        uow: UnitOfWork,
+        reference_cache: ReferenceDataCache = None
+) -> bool:
+    """
+    Run all monitored sub checks against a submission
+    :param post_id: Reddit post ID
+    :param monitored_sub_svc: Monitored sub service
+    :param uow: Unit of work
+    :param reference_cache: Optional cache for the monitored sub and whitelist lookups
+    :return: True if the post was loaded and evaluated.  False if it needs to be checked again later
+    """
 
     start = time.perf_counter()
 
@@ -19,13 +33,16 @@ def process_monitored_subreddit_submission(post_id: str, monitored_sub_svc: Moni
 
     if not post:
         log.warning('Post %s does exist', post_id)
-        return
+        return False
 
     if not post.post_type:
         log.warning('Unknown post type for %s - https://redd.it/%s', post.post_id, post.post_id)
-        return
+        return True
 
-    monitored_sub = uow.monitored_sub.get_by_sub(post.subreddit)
+    if reference_cache:
+        monitored_sub = reference_cache.get_monitored_sub(uow, post.subreddit)
+    else:
+        monitored_sub = uow.monitored_sub.get_by_sub(post.subreddit)
 
     if monitored_sub.adult_promoter_remove_post or monitored_sub.adult_promoter_ban_user or monitored_sub.adult_promoter_notify_mod_mail:
         try:
@@ -33,7 +50,10 @@ def process_monitored_subreddit_submission(post_id: str, monitored_sub_svc: Moni
         except (UtilApiException, ConnectionError, TooManyRequests) as e:
             log.warning('Failed to do onlyfans check for user %s', post.author)
 
-    whitelisted_user = uow.user_whitelist.get_by_username_and_subreddit(post.author, monitored_sub.id)
+    if reference_cache:
+        whitelisted_user = reference_cache.get_user_whitelist(uow, post.author, monitored_sub.id)
+    else:
+        whitelisted_user = uow.user_whitelist.get_by_username_and_subreddit(post.author, monitored_sub.id)
 
     monitored_sub_svc.handle_only_fans_check(post, uow, monitored_sub, whitelisted_user=whitelisted_user)
     monitored_sub_svc.handle_high_volume_reposter_check(post, uow, monitored_sub, whitelisted_user=whitelisted_user)
@@ -48,7 +68,7 @@ def process_monitored_subreddit_submission(post_id: str, monitored_sub_svc: Moni
             title_keyword_filter=title_keywords,
             whitelisted_user=whitelisted_user
     ):
-        return
+        return True
 
     try:
         results = monitored_sub_svc.check_submission(monitored_sub, post)
@@ -66,7 +86,7 @@ def process_monitored_subreddit_submission(post_id: str, monitored_sub_svc: Moni
         raise
     except Exception as e:
         log.exception('')
-        return
+        return False
 
     if results:
         monitored_sub_svc.create_checked_post(results, monitored_sub)
@@ -74,4 +94,6 @@ def process_monitored_subreddit_submission(post_id: str, monitored_sub_svc: Moni
     total_check_time = round(time.perf_counter() - start, 5)
 
     if total_check_time > 20:
-        log.warning('Long Check.  Time: %s | Subreddit: %s | Post ID: %s | Type: %s', total_check_time, monitored_sub.name, post.post_id, post.post_type)
\ No newline at end of file
+        log.warning('Long Check.  Time: %s | Subreddit: %s | Post ID: %s | Type: %s', total_check_time, monitored_sub.name, post.post_id, post.post_type)
+
+    return True
@@ -1,11 +1,10 @@
 import logging
 from typing import List
 
-from redditrepostsleuth.core.db.databasemodels import Post, RepostWatch
+from redditrepostsleuth.core.db.databasemodels import Post
 from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
-from redditrepostsleuth.core.model.search.search_match import SearchMatch
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.util.replytemplates import WATCH_NOTIFY_OF_MATCH
@@ -24,14 +23,21 @@ def check_for_post_watch(matches: list[ImageSearchMatch], uow: UnitOfWork) -> li
     return results
 
 
-def repost_watch_notify(watches: List[dict[SearchMatch, RepostWatch]], reddit: RedditManager, response_handler: ResponseHandler, repost: Post):
+def repost_watch_notify(watches: List[dict], reddit: RedditManager, response_handler: ResponseHandler, repost: Post):
+    """
+    PM the owner of each watch about the repost
+    :param watches: Dicts with the RepostWatch and the match percent from hydrate_repost_watches
+    :param reddit: Reddit manager
+    :param response_handler: Response handler
+    :param repost: The post that matched the watches
+    """
     for watch in watches:
         # TODO - What happens if we don't get redditor back?
         redditor = reddit.redditor(watch['watch'].user)
         msg = WATCH_NOTIFY_OF_MATCH.format(
             watch_shortlink=f"https://redd.it/{watch['watch'].post_id}",
             repost_shortlink=f"https://redd.it/{repost.post_id}",
-            percent_match=watch['match'].hamming_match_percent
+            percent_match=watch['match_percent']
         )
         log.info('Sending repost watch PM to %s', redditor.name)
         response_handler.send_private_message(
@@ -0,0 +1,51 @@
+import logging
+from typing import Callable
+
+from redditrepostsleuth.core.db.databasemodels import Post
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
+from redditrepostsleuth.core.model.image_search_settings import ImageSearchSettings
+from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
+from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
+from redditrepostsleuth.core.util.repost.repost_search import image_search_by_post
+
+log = logging.getLogger(__name__)
+
+# Called with the finished search results after the repost has been saved
+PostSearchHook = Callable[[ImageSearchResults, UnitOfWork], None]
+
+
+def check_image_repost(
+        post: Post,
+        uow: UnitOfWork,
+        dup_service: DuplicateImageService,
+        search_settings: ImageSearchSettings,
+        source: str,
+        post_search_hooks: list[PostSearchHook] = None
+) -> ImageSearchResults:
+    """
+    Run a single search for an ingested image post, save the repost and hand the results to each hook.
+    Steps that need the search results must be a hook so the index is only searched once per post
+    :param post: Post to check
+    :param uow: Unit of work to use for the search and hooks
+    :param dup_service: Image search service
+    :param search_settings: Settings to search with
+    :param source: Source that triggered this search.  Used for logging
+    :param post_search_hooks: Functions to run with the search results
+    :return: Search results
+    """
+    search_results = image_search_by_post(
+        post,
+        uow,
+        dup_service,
+        search_settings,
+        source,
+        high_match_meme_check=True
+    )
+
+    for hook in post_search_hooks or []:
+        try:
+            hook(search_results, uow)
+        except Exception as e:
+            log.exception('Post search hook %s failed for post %s', getattr(hook, '__name__', hook), post.post_id)
+
+    return search_results
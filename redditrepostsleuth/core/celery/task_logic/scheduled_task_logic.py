@@ -4,7 +4,8 @@ import logging
 import os
 import sys
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, date
+from typing import Optional
 
 import jwt
 import redis
@@ -12,12 +13,13 @@ import requests
 from praw import Reddit
 from praw.exceptions import PRAWException
 from prawcore import NotFound, Forbidden, Redirect
-from sqlalchemy import text, func
+from sqlalchemy import delete, insert
 
 from redditrepostsleuth.core.celery.tasks.reddit_action_tasks import send_modmail_task
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import HttpProxy, StatsTopRepost, StatsTopReposter
 from redditrepostsleuth.core.db.db_utils import get_db_engine
+from redditrepostsleuth.core.db.repository.stat_repost_rollup_repo import REPOST_ROLLUP
 from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import get_configured_logger
@@ -60,73 +62,107 @@ def update_proxies(uowm: UnitOfWorkManager) -> None:
             )
         uow.commit()
 
-def update_top_reposts(uow: UnitOfWork, post_type_id: int, day_range: int = None):
-    # reddit.info(reddit_ids_to_lookup):
-    log.info('Getting top repostors for post type %s with range %s', post_type_id, day_range)
-    range_query = "SELECT repost_of_id, COUNT(*) c FROM repost WHERE detected_at > NOW() - INTERVAL :days DAY AND post_type_id=:posttype GROUP BY repost_of_id HAVING c > 5 ORDER BY c DESC LIMIT 100000"
-    all_time_query = "SELECT repost_of_id, COUNT(*) c FROM repost WHERE post_type_id=:posttype GROUP BY repost_of_id HAVING c > 5 ORDER BY c DESC LIMIT 100000"
-    if day_range:
-        query = range_query
-        log.debug('Deleting top reposts for day range %s', day_range)
-        uow.session.execute(text('DELETE FROM stat_top_repost WHERE post_type_id=:posttype AND day_range=:days'),
-                            {'posttype': post_type_id, 'days': day_range})
-    else:
-        query = all_time_query
-        log.debug('Deleting all top reposts for all time')
-        uow.session.execute(text('DELETE FROM stat_top_repost WHERE post_type_id=:posttype AND day_range IS NULL'),
-                            {'posttype': post_type_id})
+def update_repost_rollups(uow: UnitOfWork, batch_size: int = 50000, settle_seconds: int = 60) -> int:
+    """
+    Add reposts detected since the last run to the daily rollups.  Each batch and the new high water mark are
+    committed together so a failed run picks up where it left off.  The high water mark is locked for the batch so
+    the stat tasks calling this at the same time wait for each other instead of counting the same reposts twice
+    :param uow: Unit of work
+    :param batch_size: Reposts per batch
+    :param settle_seconds: Skip reposts newer than this so IDs from uncommitted inserts aren't passed over
+    :return: Number of reposts added
+    """
+    added = 0
+    detected_before = datetime.utcnow() - timedelta(seconds=settle_seconds)
+    while True:
+        last_id = uow.stat_repost_rollup.get_last_id(REPOST_ROLLUP, lock=True)
+        to_id = uow.stat_repost_rollup.get_last_settled_repost_id(last_id, detected_before, batch_size)
+        if not to_id:
+            # Release the lock
+            uow.commit()
+            break
+        added += uow.stat_repost_rollup.add_reposts(last_id, to_id)
+        uow.stat_repost_rollup.set_last_id(REPOST_ROLLUP, to_id)
+        uow.commit()
+    log.info('Added %s reposts to rollups', added)
+    return added
 
+
+def rebuild_repost_rollups(uow: UnitOfWork) -> int:
+    """
+    Rebuild the rollups from the full repost table.  Only needed if they're suspected to be wrong
+    """
+    uow.stat_repost_rollup.clear()
+    uow.stat_repost_rollup.set_last_id(REPOST_ROLLUP, 0)
     uow.commit()
+    return update_repost_rollups(uow)
 
 
-    log.debug('Executing query for day range %s', day_range)
-    result = uow.session.execute(text(query), {'posttype': post_type_id, 'days': day_range})
-    log.debug('Finished executing query for day range %s', day_range)
-    for row in result:
-        stat = StatsTopRepost()
-        stat.post_id = row[0]
-        stat.post_type_id = post_type_id
-        stat.day_range = day_range
-        stat.repost_count = row[1]
-        stat.updated_at = func.utc_timestamp()
-        stat.nsfw = False
-        uow.stat_top_repost.add(stat)
-        uow.commit()
+def rollup_window_start(day_range: Optional[int]) -> Optional[date]:
+    """
+    Rollups are per UTC day so a range covers the current day plus the previous day_range days
+    """
+    if not day_range:
+        return None
+    return datetime.utcnow().date() - timedelta(days=day_range)
+
+
+def update_top_reposts(uow: UnitOfWork, post_type_id: int, day_range: int = None):
+    log.info('Getting top reposts for post type %s with range %s', post_type_id, day_range)
+    result = uow.stat_repost_rollup.get_top_reposts(post_type_id, rollup_window_start(day_range), min_count=5)
+    uow.session.execute(
+        delete(StatsTopRepost).where(
+            StatsTopRepost.post_type_id == post_type_id,
+            StatsTopRepost.day_range == day_range if day_range else StatsTopRepost.day_range.is_(None)
+        )
+    )
+    now = datetime.utcnow()
+    rows = [
+        {
+            'post_id': row.repost_of_id,
+            'post_type_id': post_type_id,
+            'day_range': day_range,
+            'repost_count': row.repost_count,
+            'nsfw': False,
+            'updated_at': now
+        }
+        for row in result
+    ]
+    if rows:
+        uow.session.execute(insert(StatsTopRepost), rows)
+    uow.commit()
 
 def run_update_top_reposts(uow: UnitOfWork) -> None:
     post_types = [2, 3]
     day_ranges = [1, 7, 14, 30, None]
+    update_repost_rollups(uow)
     for post_type_id in post_types:
         for days in day_ranges:
             update_top_reposts(uow, post_type_id, days)
 
 def update_top_reposters(uow: UnitOfWork, post_type_id: int, day_range: int = None) -> None:
     log.info('Getting top repostors for post type %s with range %s', post_type_id, day_range)
-    range_query = "SELECT author, COUNT(*) c FROM repost WHERE detected_at > NOW() - INTERVAL :days DAY  AND post_type_id=:posttype AND author is not NULL AND author!= '[deleted]' GROUP BY author HAVING c > 10 ORDER BY c DESC LIMIT 100000"
-    all_time_query = "SELECT author, COUNT(*) c FROM repost WHERE post_type_id=:posttype AND author is not NULL AND author!= '[deleted]' GROUP BY author HAVING c > 10 ORDER BY c DESC LIMIT 100000"
-    if day_range:
-        query = range_query
-    else:
-        query = all_time_query
-
-    if day_range:
-        uow.session.execute(text('DELETE FROM stat_top_reposters WHERE post_type_id=:posttype AND day_range=:days'),
-                            {'posttype': post_type_id, 'days': day_range})
-    else:
-        uow.session.execute(text('DELETE FROM stat_top_reposters WHERE post_type_id=:posttype AND day_range IS NULL'),
-                            {'posttype': post_type_id})
-    uow.commit()
-    result = uow.session.execute(text(query), {'posttype': post_type_id, 'days': day_range})
-    for row in result:
-        if row[0] in EXCLUDE_FROM_TOP_REPOSTERS:
-            continue
-        stat = StatsTopReposter()
-        stat.author = row[0]
-        stat.post_type_id = post_type_id
-        stat.day_range = day_range
-        stat.repost_count = row[1]
-        stat.updated_at = func.utc_timestamp()
-        uow.stat_top_reposter.add(stat)
+    result = uow.stat_repost_rollup.get_top_reposters(post_type_id, rollup_window_start(day_range), min_count=10)
+    uow.session.execute(
+        delete(StatsTopReposter).where(
+            StatsTopReposter.post_type_id == post_type_id,
+            StatsTopReposter.day_range == day_range if day_range else StatsTopReposter.day_range.is_(None)
+        )
+    )
+    now = datetime.utcnow()
+    rows = [
+        {
+            'author': row.author,
+            'post_type_id': post_type_id,
+            'day_range': day_range,
+            'repost_count': row.repost_count,
+            'updated_at': now
+        }
+        for row in result
+        if row.author not in EXCLUDE_FROM_TOP_REPOSTERS
+    ]
+    if rows:
+        uow.session.execute(insert(StatsTopReposter), rows)
     uow.commit()
 
     log.info('finished')
@@ -136,6 +172,7 @@ def run_update_top_reposters(uow: UnitOfWork):
     day_ranges = [1, 7, 14, 30, None]
     log.warning('Starting update to reposters task')
     start_time = datetime.utcnow()
+    update_repost_rollups(uow)
     for post_type_id in post_types:
         for days in day_ranges:
             update_top_reposters(uow, post_type_id, days)
@@ -0,0 +1,79 @@
+import logging
+from typing import Optional, Union
+
+from redditrepostsleuth.core.db.databasemodels import Post, MonitoredSub
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
+from redditrepostsleuth.core.exception import UnsupportedTaskPayloadException
+
+log = logging.getLogger(__name__)
+
+# Tasks are sent these instead of pickled ORM objects.  ORM objects are still accepted from messages queued before a
+# deploy
+PAYLOAD_VERSION = 1
+
+
+def post_payload(post: Post) -> dict:
+    return {'v': PAYLOAD_VERSION, 'id': post.id, 'post_id': post.post_id}
+
+
+def monitored_sub_payload(monitored_sub: Union[MonitoredSub, dict]) -> dict:
+    if isinstance(monitored_sub, dict):
+        return monitored_sub
+    return {'v': PAYLOAD_VERSION, 'id': monitored_sub.id, 'name': monitored_sub.name}
+
+
+def repost_watch_payload(watches: list[dict], repost: Post) -> dict:
+    """
+    Payload for notify_watch
+    :param watches: Dicts of the matching SearchMatch and RepostWatch from check_for_post_watch
+    :param repost: The post that matched the watches
+    """
+    return {
+        'v': PAYLOAD_VERSION,
+        'repost': post_payload(repost),
+        'watches': [
+            {'id': w['watch'].id, 'match_percent': w['match'].hamming_match_percent} for w in watches
+        ]
+    }
+
+
+def check_payload_version(payload: dict) -> None:
+    version = payload.get('v')
+    if version != PAYLOAD_VERSION:
+        raise UnsupportedTaskPayloadException(f'Unsupported task payload version {version}')
+
+
+def hydrate_post(uow: UnitOfWork, payload: Union[Post, dict]) -> Optional[Post]:
+    """
+    Load the post for a payload, with hashes and post type
+    :param uow: Unit of work
+    :param payload: Post payload.  Post objects from legacy messages are returned as is
+    """
+    if isinstance(payload, Post):
+        return payload
+    check_payload_version(payload)
+    post = uow.posts.get_by_id(payload['id'])
+    if not post:
+        log.warning('Post %s from task payload no longer exists', payload['post_id'])
+    return post
+
+
+def hydrate_monitored_sub(uow: UnitOfWork, payload: Union[MonitoredSub, dict]) -> Optional[MonitoredSub]:
+    if isinstance(payload, MonitoredSub):
+        return payload
+    check_payload_version(payload)
+    return uow.monitored_sub.get_by_id(payload['id'])
+
+
+def hydrate_repost_watches(uow: UnitOfWork, payload: dict) -> tuple[Optional[Post], list[dict]]:
+    """
+    Load the repost and watches for a notify_watch payload with one query per table
+    :param uow: Unit of work
+    :param payload: Payload from repost_watch_payload
+    :return: The repost and a list of dicts with the RepostWatch and the match percent
+    """
+    check_payload_version(payload)
+    repost = hydrate_post(uow, payload['repost'])
+    match_percents = {w['id']: w['match_percent'] for w in payload['watches']}
+    watches = uow.repostwatch.get_all_by_ids(list(match_percents)) if match_percents else []
+    return repost, [{'watch': watch, 'match_percent': match_percents[watch.id]} for watch in watches]
@@ -1,30 +1,37 @@
+import asyncio
 import json
 import random
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from hashlib import md5
 from time import perf_counter
 from typing import Optional
 from urllib.parse import urlparse
 
 import requests
 from celery import Task
+from redis import Redis
 from redgifs import HTTPException
 from sqlalchemy.exc import IntegrityError
 
 from redditrepostsleuth.core.celery import celery
 from redditrepostsleuth.core.celery.basetasks import SqlAlchemyTask
-from redditrepostsleuth.core.celery.task_logic.ingest_task_logic import pre_process_post, get_redgif_image_url
+from redditrepostsleuth.core.celery.task_logic.ingest_task_logic import pre_process_post, get_redgif_image_url, \
+    hash_image_posts
+from redditrepostsleuth.core.celery.task_payloads import post_payload, monitored_sub_payload
 from redditrepostsleuth.core.config import Config
-from redditrepostsleuth.core.db.databasemodels import Subreddit
-from redditrepostsleuth.core.db.db_utils import get_db_engine
-from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.db.databasemodels import Subreddit, Post, MonitoredSub
+from redditrepostsleuth.core.db.reference_cache import ReferenceDataCache, get_reference_cache
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
 from redditrepostsleuth.core.exception import InvalidImageUrlException, GalleryNotProcessed, ImageConversionException, \
     ImageRemovedException, RedGifsTokenException
 from redditrepostsleuth.core.logging import get_configured_logger
 from redditrepostsleuth.core.proxy_manager import ProxyManager
-from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.image_hash_cache import ImageHashCacheService
 from redditrepostsleuth.core.services.redgifs_token_manager import RedGifsTokenManager
-from redditrepostsleuth.core.util.constants import GENERIC_USER_AGENT
+from redditrepostsleuth.core.services.service_registry import get_service_registry
+from redditrepostsleuth.core.util.constants import GENERIC_USER_AGENT, IMAGE_REPOST_BATCH_QUEUE
 from redditrepostsleuth.core.util.objectmapping import reddit_submission_to_post
 
 log = get_configured_logger('redditrepostsleuth')
@@ -37,12 +44,40 @@ class RedGifsToken:
 
 class IngestTask(Task):
     def __init__(self):
-        self.config = Config()
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        self.event_logger = EventLogging()
+        services = get_service_registry()
+        self.config = services.config
+        self.uowm = services.uowm
+        self.event_logger = services.event_logger
         self._redgifs_token_manager = RedGifsTokenManager()
         self._proxy_manager = ProxyManager(self.uowm, 1000)
         self.domains_to_proxy = []
+        self.redis_client = services.redis_client
+        self.hash_executor = None
+        if self.config.ingest_hash_processes:
+            # Prefork pool workers are daemonic and can't start child processes.  Only set this on solo/thread workers
+            self.hash_executor = ProcessPoolExecutor(max_workers=int(self.config.ingest_hash_processes))
+        self.reference_cache = get_reference_cache() if self.config.reference_cache_enabled else None
+        self._monitored_subs: dict[str, MonitoredSub] = {}
+        self._monitored_subs_loaded_at = None
+        self.hash_cache = None
+        if self.config.image_hash_cache_enabled:
+            self.hash_cache = ImageHashCacheService(
+                self.uowm,
+                event_logger=self.event_logger,
+                redis_client=self.redis_client,
+                redis_ttl=int(self.config.image_hash_cache_ttl or 604800)
+            )
+
+    def get_active_monitored_subs(self, max_age: int = 60) -> dict[str, MonitoredSub]:
+        """
+        Active monitored subs by lowercase name.  Reloaded from the database every max_age seconds
+        :param max_age: Seconds before reloading
+        """
+        if not self._monitored_subs_loaded_at or (datetime.utcnow() - self._monitored_subs_loaded_at).total_seconds() > max_age:
+            with self.uowm.start() as uow:
+                self._monitored_subs = {sub.name.lower(): sub for sub in uow.monitored_sub.get_all_active()}
+            self._monitored_subs_loaded_at = datetime.utcnow()
+        return self._monitored_subs
 
 @celery.task(bind=True, base=IngestTask, ignore_reseults=True, serializer='pickle')
 def save_subreddit(self, subreddit_name: str):
@@ -92,7 +127,13 @@ def save_new_post(self, submission: dict, repost_check: bool = True):
             return
 
         try:
-            post = pre_process_post(submission, self._proxy_manager, self._redgifs_token_manager, [])
+            post = pre_process_post(
+                submission,
+                self._proxy_manager,
+                self._redgifs_token_manager,
+                [],
+                hash_cache=self.hash_cache
+            )
         except (ImageRemovedException, InvalidImageUrlException) as e:
             return
         except GalleryNotProcessed as e:
@@ -105,12 +146,7 @@ def save_new_post(self, submission: dict, repost_check: bool = True):
         if not post:
             return
 
-        monitored_sub = uow.monitored_sub.get_by_sub(post.subreddit)
-        if monitored_sub and monitored_sub.active:
-            log.info('Sending ingested post to monitored sub queue for %s', monitored_sub.name)
-            celery.send_task('redditrepostsleuth.core.celery.tasks.monitored_sub_tasks.sub_monitor_check_post',
-                             args=[post.post_id, monitored_sub],
-                             queue='submonitor', countdown=20)
+        queue_monitored_sub_check(post, uow, reference_cache=self.reference_cache)
 
         try:
             uow.posts.add(post)
@@ -127,22 +163,129 @@ def save_new_post(self, submission: dict, repost_check: bool = True):
     self.event_logger.write_raw_points([save_event])
 
     if repost_check:
-        if post.post_type_id == 1:
-            pass
-            #celery.send_task('redditrepostsleuth.core.celery.tasks.repost_tasks.check_for_text_repost_task', args=[post])
-        elif post.post_type_id == 2:
-            celery.send_task('redditrepostsleuth.core.celery.tasks.repost_tasks.check_image_repost_save', args=[post])
-        elif post.post_type_id == 3:
-            celery.send_task('redditrepostsleuth.core.celery.tasks.repost_tasks.link_repost_check', args=[post])
+        queue_repost_check(post, self.config, self.redis_client)
 
     celery.send_task('redditrepostsleuth.core.celery.tasks.maintenance_tasks.save_subreddit', args=[post.subreddit])
 
 
+def queue_monitored_sub_check(post: Post, uow: UnitOfWork, reference_cache: ReferenceDataCache = None) -> None:
+    if reference_cache:
+        monitored_sub = reference_cache.get_monitored_sub(uow, post.subreddit)
+    else:
+        monitored_sub = uow.monitored_sub.get_by_sub(post.subreddit)
+    if monitored_sub and monitored_sub.active:
+        log.info('Sending ingested post to monitored sub queue for %s', monitored_sub.name)
+        celery.send_task('redditrepostsleuth.core.celery.tasks.monitored_sub_tasks.sub_monitor_check_post',
+                         args=[post.post_id, monitored_sub_payload(monitored_sub)],
+                         queue='submonitor', countdown=20, serializer='json')
+
+
+def queue_repost_check(post: Post, config: Config, redis_client: Redis) -> None:
+    if post.post_type_id == 1:
+        pass
+        #celery.send_task('redditrepostsleuth.core.celery.tasks.repost_tasks.check_for_text_repost_task', args=[post])
+    elif post.post_type_id == 2:
+        if config.repost_image_check_batched:
+            # Buffered and checked in micro-batches by queue_image_repost_batches
+            redis_client.rpush(IMAGE_REPOST_BATCH_QUEUE, post.id)
+        else:
+            celery.send_task('redditrepostsleuth.core.celery.tasks.repost_tasks.check_image_repost_save',
+                             args=[post_payload(post)], serializer='json')
+    elif post.post_type_id == 3:
+        celery.send_task('redditrepostsleuth.core.celery.tasks.repost_tasks.link_repost_check',
+                         args=[post_payload(post)], serializer='json')
+
+
+@celery.task(bind=True, base=IngestTask, ignore_results=True, serializer='pickle')
+def save_new_posts(self, posts: list[dict], repost_check: bool = True) -> None:
+    """
+    Save a batch of submissions with a handful of queries for the whole batch.  Posts that need network work during
+    pre-processing are sent to save_new_post unless they can go through the async image hashing stage
+    :param posts: Submissions from Reddit's API
+    :param repost_check: Queue repost checks for saved posts
+    """
+    start_time = perf_counter()
+    submissions = {}
+    for submission in posts:
+        if not submission.get('url'):
+            continue
+        # TODO: temp fix until I can fix imgur gifs
+        if 'imgur' in submission['url'] and 'gifv' in submission['url']:
+            continue
+        submissions[submission['id']] = submission
+
+    if not submissions:
+        return
+
+    with self.uowm.start() as uow:
+        existing = uow.posts.get_existing_post_ids(list(submissions.keys()))
+
+    to_save = []
+    to_hash = []
+    for submission in submissions.values():
+        if submission['id'] in existing:
+            continue
+        post = reddit_submission_to_post(submission)
+        if post.post_type_id == 6 or (post.post_type_id == 2 and (not self.config.ingest_async_image_hashing or 'redgif' in post.url)):
+            save_new_post.apply_async((submission, repost_check))
+            continue
+        post.url_hash = md5(post.url.encode('utf-8')).hexdigest()
+        if post.post_type_id == 2:
+            to_hash.append(post)
+        else:
+            to_save.append(post)
+
+    if to_hash:
+        hashed = asyncio.run(
+            hash_image_posts(
+                to_hash,
+                proxy_manager=self._proxy_manager,
+                domains_to_proxy=self.domains_to_proxy,
+                executor=self.hash_executor
+            )
+        )
+        log.info('Hashed %s of %s image posts', len(hashed), len(to_hash))
+        to_save += hashed
+
+    if not to_save:
+        return
+
+    with self.uowm.start() as uow:
+        saved = uow.posts.bulk_insert_ignore(to_save)
+        uow.commit()
+        new_subreddits = {post.subreddit for post in saved}
+        new_subreddits -= uow.subreddit.get_existing_names(list(new_subreddits))
+
+    monitored_subs = self.get_active_monitored_subs()
+    for post in saved:
+        monitored_sub = monitored_subs.get(post.subreddit.lower())
+        if monitored_sub:
+            log.info('Sending ingested post to monitored sub queue for %s', monitored_sub.name)
+            celery.send_task('redditrepostsleuth.core.celery.tasks.monitored_sub_tasks.sub_monitor_check_post',
+                             args=[post.post_id, monitored_sub_payload(monitored_sub)],
+                             queue='submonitor', countdown=20, serializer='json')
+        if repost_check:
+            queue_repost_check(post, self.config, self.redis_client)
 
-@celery.task
-def save_new_posts(posts: list[dict], repost_check: bool = True) -> None:
-    for post in posts:
-        save_new_post.apply_async((post, repost_check))
+    for subreddit in new_subreddits:
+        celery.send_task('redditrepostsleuth.core.celery.tasks.maintenance_tasks.save_subreddit', args=[subreddit])
+
+    run_time = perf_counter() - start_time
+    log.info('Saved %s of %s posts in %s', len(saved), len(posts), round(run_time, 2))
+    self.event_logger.write_raw_points([
+        {
+            'measurement': 'Post_Ingest',
+            'fields': {
+                'run_time': run_time / len(saved) if saved else 0,
+                'post_id': post.post_id
+            },
+            'tags': {
+                'post_type': post.post_type_id,
+                'domain': urlparse(post.url).netloc
+            }
+        }
+        for post in saved
+    ])
 
 
 @celery.task(bind=True, base=SqlAlchemyTask, ignore_results=True)
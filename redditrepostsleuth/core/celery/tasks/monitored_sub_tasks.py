@@ -1,6 +1,7 @@
 import json
 import time
 from random import randint
+from typing import Union
 
 import requests
 from celery import Task
@@ -10,21 +11,20 @@ from requests import ConnectionError
 
 from redditrepostsleuth.core.celery import celery
 from redditrepostsleuth.core.celery.task_logic.monitored_sub_task_logic import process_monitored_subreddit_submission
-from redditrepostsleuth.core.config import Config
+from redditrepostsleuth.core.celery.task_payloads import monitored_sub_payload, hydrate_monitored_sub
 from redditrepostsleuth.core.db.databasemodels import MonitoredSub
-from redditrepostsleuth.core.db.db_utils import get_db_engine
-from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.db.reference_cache import get_reference_cache
 from redditrepostsleuth.core.exception import NoIndexException, RateLimitException, LoadSubredditException
 from redditrepostsleuth.core.logfilters import ContextFilter
 from redditrepostsleuth.core.logging import configure_logger
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
-from redditrepostsleuth.core.services.eventlogging import EventLogging
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.services.responsebuilder import ResponseBuilder
+from redditrepostsleuth.core.services.service_registry import get_service_registry
 from redditrepostsleuth.core.util.helpers import update_log_context_data
-from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
 from redditrepostsleuth.submonitorsvc.monitored_sub_service import MonitoredSubService
+from redditrepostsleuth.submonitorsvc.seen_submission_tracker import SeenSubmissionTracker
 
 log = configure_logger(
     name='redditrepostsleuth',
@@ -36,32 +36,40 @@ log = configure_logger(
 class SubMonitorTask(Task):
 
     def __init__(self):
-        self.config = Config()
-        self.reddit = get_reddit_instance(self.config)
+        services = get_service_registry()
+        self.config = services.config
+        self.reddit = services.reddit
         self.reddit_manager = RedditManager(self.reddit)
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        event_logger = EventLogging(config=self.config)
+        self.uowm = services.uowm
+        event_logger = services.event_logger
         response_handler = ResponseHandler(self.reddit, self.uowm, event_logger, source='submonitor', live_response=self.config.live_responses)
         dup_image_svc = DuplicateImageService(self.uowm, event_logger, self.reddit, config=self.config)
         response_builder = ResponseBuilder(self.uowm)
         self.monitored_sub_svc = MonitoredSubService(dup_image_svc, self.uowm, self.reddit, response_builder, event_logger=event_logger, config=self.config)
+        self.seen_tracker = SeenSubmissionTracker(services.redis_client, uowm=self.uowm)
+        self.reference_cache = get_reference_cache() if self.config.reference_cache_enabled else None
 
 
 
 @celery.task(
     bind=True,
     base=SubMonitorTask,
-    serializer='pickle',
+    serializer='json',
     autoretry_for=(TooManyRequests, RedditAPIException, NoIndexException, RateLimitException),
     retry_kwards={'max_retries': 3}
 )
-def sub_monitor_check_post(self, post_id: str, monitored_sub: MonitoredSub):
+def sub_monitor_check_post(self, post_id: str, monitored_sub: Union[dict, MonitoredSub]):
+    monitored_sub = monitored_sub_payload(monitored_sub)
     try:
         update_log_context_data(log, {'trace_id': str(randint(100000, 999999)), 'post_id': post_id,
-                                      'subreddit': monitored_sub.name, 'service': 'Subreddit_Monitor'})
+                                      'subreddit': monitored_sub['name'], 'service': 'Subreddit_Monitor'})
 
         with self.uowm.start() as uow:
-            process_monitored_subreddit_submission(post_id, self.monitored_sub_svc, uow)
+            processed = process_monitored_subreddit_submission(
+                post_id, self.monitored_sub_svc, uow, reference_cache=self.reference_cache
+            )
+        if processed:
+            self.seen_tracker.mark_seen(monitored_sub['name'], post_id)
     except Exception as e:
         log.exception('General failure')
         pass
@@ -70,12 +78,16 @@ def sub_monitor_check_post(self, post_id: str, monitored_sub: MonitoredSub):
 @celery.task(
     bind=True,
     base=SubMonitorTask,
-    serializer='pickle',
+    serializer='json',
     ignore_results=True,
     autoretry_for=(LoadSubredditException,),
     retry_kwards={'max_retries': 3}
 )
-def process_monitored_sub(self, monitored_sub):
+def process_monitored_sub(self, monitored_sub: Union[dict, MonitoredSub]):
+    with self.uowm.start() as uow:
+        monitored_sub = hydrate_monitored_sub(uow, monitored_sub)
+    if not monitored_sub:
+        return
 
     submission_ids_to_check = []
 
@@ -106,7 +118,10 @@ def process_monitored_sub(self, monitored_sub):
 
         submission_ids_to_check += [submission['id'] for submission in response_data]
 
-    for submission_id in submission_ids_to_check:
-        sub_monitor_check_post.apply_async((submission_id, monitored_sub), queue='submonitor_private')
+    unseen_ids = self.seen_tracker.filter_unseen(monitored_sub.name, submission_ids_to_check, monitored_sub_id=monitored_sub.id)
+    for submission_id in unseen_ids:
+        sub_monitor_check_post.apply_async(
+            (submission_id, monitored_sub_payload(monitored_sub)), queue='submonitor_private'
+        )
 
-    log.info('All submissions from %s sent to queue', monitored_sub.name)
+    log.info('%s of %s submissions from %s sent to queue', len(unseen_ids), len(submission_ids_to_check), monitored_sub.name)
@@ -1,31 +1,41 @@
 from celery import Task
+from celery.exceptions import Retry
 from praw.exceptions import RedditAPIException
 from praw.models import Comment, Submission
 from prawcore import Forbidden, TooManyRequests
 
 from redditrepostsleuth.core.celery import celery
-from redditrepostsleuth.core.config import Config
-from redditrepostsleuth.core.db.db_utils import get_db_engine
-from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import get_configured_logger
 from redditrepostsleuth.core.model.events.RedditAdminActionEvent import RedditAdminActionEvent
-from redditrepostsleuth.core.notification.notification_service import NotificationService
-from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter, SUB_MONITOR_LANE
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
+from redditrepostsleuth.core.services.service_registry import get_service_registry
 from redditrepostsleuth.core.util.helpers import get_removal_reason_id
-from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
 from redditrepostsleuth.core.util.replytemplates import NO_BAN_PERMISSIONS
 
 log = get_configured_logger(name='redditrepostsleuth')
 
 class RedditActionTask(Task):
     def __init__(self):
-        self.config = Config()
-        self.reddit = get_reddit_instance(self.config)
-        self.uowm = UnitOfWorkManager(get_db_engine(self.config))
-        self.event_logger = EventLogging(config=self.config)
-        self.notification_svc = NotificationService(self.config)
+        services = get_service_registry()
+        self.config = services.config
+        self.reddit = services.reddit
+        self.uowm = services.uowm
+        self.event_logger = services.event_logger
+        self.notification_svc = services.notification_svc
+        # Every task runs behind the rate limiter in __call__ so the response handler doesn't take its own tokens
         self.response_handler = ResponseHandler(self.reddit, self.uowm, self.event_logger, live_response=self.config.live_responses)
+        self.rate_limiter = get_reddit_rate_limiter()
+
+    def __call__(self, *args, **kwargs):
+        with self.rate_limiter.request(self.reddit, SUB_MONITOR_LANE):
+            try:
+                return super().__call__(*args, **kwargs)
+            except Retry as e:
+                # autoretry_for turns TooManyRequests into a Retry before it gets here
+                if isinstance(e.exc, TooManyRequests):
+                    self.rate_limiter.penalize()
+                raise
 
 @celery.task(
     bind=True,
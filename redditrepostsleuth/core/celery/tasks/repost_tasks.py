@@ -1,23 +1,26 @@
-from typing import NoReturn
+from typing import NoReturn, Union
 
-import requests
 from redlock import RedLockError
 from requests.exceptions import ConnectTimeout
 from sqlalchemy import func
 
 from redditrepostsleuth.core.celery import celery
-from redditrepostsleuth.core.celery.basetasks import AnnoyTask, RedditTask, RepostTask
+from redditrepostsleuth.core.celery.basetasks import AnnoyTask, RedditTask, RepostTask, SqlAlchemyTask
 from redditrepostsleuth.core.celery.task_logic.repost_image import repost_watch_notify, check_for_post_watch
-from redditrepostsleuth.core.db.databasemodels import Post, RepostWatch
+from redditrepostsleuth.core.celery.task_logic.repost_task_logic import check_image_repost
+from redditrepostsleuth.core.celery.task_payloads import post_payload, repost_watch_payload, hydrate_post, \
+    hydrate_repost_watches
+from redditrepostsleuth.core.db.databasemodels import Post
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
 from redditrepostsleuth.core.exception import NoIndexException, IngestHighMatchMeme, IndexApiException
 from redditrepostsleuth.core.logfilters import ContextFilter
 from redditrepostsleuth.core.logging import log, configure_logger
-from redditrepostsleuth.core.model.search.search_match import SearchMatch
+from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
+from redditrepostsleuth.core.util.constants import IMAGE_REPOST_BATCH_QUEUE
 from redditrepostsleuth.core.util.helpers import get_default_link_search_settings, get_default_image_search_settings, \
-    get_default_text_search_settings
-from redditrepostsleuth.core.util.repost.repost_helpers import filter_search_results
-from redditrepostsleuth.core.util.repost.repost_search import text_search_by_post, image_search_by_post, \
-    link_search
+    get_default_text_search_settings, get_redis_client, chunk_list
+from redditrepostsleuth.core.util.repost.repost_helpers import filter_search_results, save_image_repost_results
+from redditrepostsleuth.core.util.repost.repost_search import text_search_by_post, link_search
 
 log = configure_logger(
     name='redditrepostsleuth',
@@ -26,11 +29,23 @@ log = configure_logger(
 )
 
 
-@celery.task(bind=True, base=AnnoyTask, serializer='pickle', ignore_results=True, autoretry_for=(RedLockError, NoIndexException, IngestHighMatchMeme), retry_kwargs={'max_retries': 20, 'countdown': 300})
-def check_image_repost_save(self, post: Post) -> NoReturn:
+def queue_repost_watch_notifications(search_results: ImageSearchResults, uow: UnitOfWork) -> None:
+    if not search_results.matches:
+        return
+    watches = check_for_post_watch(search_results.matches, uow)
+    if watches:
+        notify_watch.apply_async((repost_watch_payload(watches, search_results.checked_post),), queue='watch_notify')
+
+
+@celery.task(bind=True, base=AnnoyTask, serializer='json', ignore_results=True, autoretry_for=(RedLockError, NoIndexException, IngestHighMatchMeme), retry_kwargs={'max_retries': 20, 'countdown': 300})
+def check_image_repost_save(self, post: Union[dict, Post]) -> NoReturn:
+    with self.uowm.start() as uow:
+        post = hydrate_post(uow, post)
+    if not post:
+        return
 
     try:
-        r = requests.head(post.url)
+        r = self.http_session.head(post.url)
         if r.status_code != 200:
             log.info('Skipping image that is deleted %s', post.url)
             celery.send_task('redditrepostsleuth.core.celery.admin_tasks.delete_post_task', args=[post.post_id])
@@ -38,27 +53,20 @@ def check_image_repost_save(self, post: Post) -> NoReturn:
 
         search_settings = get_default_image_search_settings(self.config)
         search_settings.max_matches = 75
-        search_results = self.dup_service.check_image(
-            post.url,
-            post=post,
-            search_settings=search_settings,
-            source='ingest'
-        )
+        post_search_hooks = []
+        if self.config.enable_repost_watch:
+            post_search_hooks.append(queue_repost_watch_notifications)
+
         with self.uowm.start() as uow:
-            search_results = image_search_by_post(
+            check_image_repost(
                 post,
                 uow,
                 self.dup_service,
                 search_settings,
                 'ingest',
-                high_match_meme_check=True
+                post_search_hooks=post_search_hooks
             )
 
-            if search_results.matches:
-                watches = check_for_post_watch(search_results.matches, uow)
-                if watches and self.config.enable_repost_watch:
-                    notify_watch.apply_async((watches, post), queue='watch_notify')
-
     except (RedLockError, NoIndexException, IngestHighMatchMeme):
         raise
     except (ConnectTimeout):
@@ -67,11 +75,64 @@ def check_image_repost_save(self, post: Post) -> NoReturn:
         log.exception('')
 
 
-@celery.task(bind=True, base=RepostTask, ignore_results=True, serializer='pickle')
-def link_repost_check(self, post):
+@celery.task(bind=True, base=AnnoyTask, ignore_results=True, autoretry_for=(RedLockError, NoIndexException), retry_kwargs={'max_retries': 20, 'countdown': 300})
+def check_image_reposts_batch(self, post_ids: list[int]) -> NoReturn:
+    """
+    Repost check a micro-batch of ingested image posts with a single index search
+    :param post_ids: DB IDs of the posts to check
+    """
+    with self.uowm.start() as uow:
+        posts = uow.posts.get_all_by_ids_with_hashes(post_ids)
+
+    if not posts:
+        return
+
+    search_settings = get_default_image_search_settings(self.config)
+    search_settings.max_matches = 75
+    all_search_results = self.dup_service.check_images(posts, search_settings=search_settings, source='ingest')
+
+    with self.uowm.start() as uow:
+        save_result = save_image_repost_results(all_search_results, uow, 'ingest', high_match_check=True)
+        for search_results in save_result.needs_recheck:
+            log.info('Post %s created a meme template, rechecking', search_results.checked_post.post_id)
+            check_image_repost_save.apply_async((post_payload(search_results.checked_post),))
+
+        if not self.config.enable_repost_watch:
+            return
+
+        for search_results in all_search_results:
+            if search_results not in save_result.needs_recheck and search_results not in save_result.failed:
+                queue_repost_watch_notifications(search_results, uow)
+
+
+@celery.task(bind=True, base=SqlAlchemyTask, ignore_results=True)
+def queue_image_repost_batches(self, batch_size: int = 50, max_batches: int = 200) -> NoReturn:
+    """
+    Drain the image posts buffered by ingest and send them to the batch repost check
+    :param batch_size: Posts per batch
+    :param max_batches: Max batches to send per run
+    """
+    redis_client = get_redis_client(self.config)
+    pipe = redis_client.pipeline()
+    pipe.lrange(IMAGE_REPOST_BATCH_QUEUE, 0, batch_size * max_batches - 1)
+    pipe.ltrim(IMAGE_REPOST_BATCH_QUEUE, batch_size * max_batches, -1)
+    post_ids, _ = pipe.execute()
+    if not post_ids:
+        return
+
+    for batch in chunk_list([int(post_id) for post_id in post_ids], batch_size):
+        check_image_reposts_batch.apply_async((batch,))
+    log.info('Queued %s posts for batch image repost check', len(post_ids))
+
+
+@celery.task(bind=True, base=RepostTask, ignore_results=True, serializer='json')
+def link_repost_check(self, post: Union[dict, Post]):
 
     try:
         with self.uowm.start() as uow:
+            post = hydrate_post(uow, post)
+            if not post:
+                return
 
             log.debug('Checking URL for repost: %s', post.url)
             search_results = link_search(post.url, uow,
@@ -110,8 +171,15 @@ def check_for_text_repost_task(self, post: Post) -> None:
         log.exception('Unknown exception during test repost check')
 
 
-@celery.task(bind=True, base=RedditTask, ignore_results=True)
-def notify_watch(self, watches: list[dict[SearchMatch, RepostWatch]], repost: Post):
+@celery.task(bind=True, base=RedditTask, ignore_results=True, serializer='json')
+def notify_watch(self, payload: Union[dict, list[dict]], repost: Post = None):
+    if repost is not None:
+        # Queued before payloads were used.  payload is the list of SearchMatch and RepostWatch dicts
+        payload = repost_watch_payload(payload, repost)
+    with self.uowm.start() as uow:
+        repost, watches = hydrate_repost_watches(uow, payload)
+    if not repost or not watches:
+        return
     repost_watch_notify(watches, self.reddit, self.response_handler, repost)
     with self.uowm.start() as uow:
         for w in watches:
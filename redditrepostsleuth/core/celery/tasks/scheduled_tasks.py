@@ -13,11 +13,14 @@ from redditrepostsleuth.adminsvc.new_activation_monitor import NewActivationMoni
 from redditrepostsleuth.core.celery import celery
 from redditrepostsleuth.core.celery.basetasks import RedditTask, SqlAlchemyTask, AdminTask
 from redditrepostsleuth.core.celery.task_logic.scheduled_task_logic import update_proxies, token_checker, \
-    run_update_top_reposters, update_top_reposters, update_monitored_sub_data, run_update_top_reposts
+    run_update_top_reposters, update_top_reposters, update_monitored_sub_data, run_update_top_reposts, \
+    update_repost_rollups
 from redditrepostsleuth.core.db.databasemodels import StatsDailyCount
+from redditrepostsleuth.core.db.purge_engine import PurgeEngine
+from redditrepostsleuth.core.db.retention import RetentionManager, get_retention_policies
 from redditrepostsleuth.core.exception import UtilApiException
 from redditrepostsleuth.core.logging import configure_logger
-from redditrepostsleuth.core.util.helpers import chunk_list
+from redditrepostsleuth.core.services.service_registry import get_service_registry
 
 log = configure_logger(
     name='redditrepostsleuth',
@@ -231,6 +234,7 @@ def update_daily_stats(self):
             daily_stats.monitored_subreddit_count = uow.monitored_sub.get_count()
             uow.stat_daily_count.add(daily_stats)
             uow.commit()
+            get_service_registry().stats_cache.refresh_daily_stats(uow)
             log.info('[Daily Stat Update] Finished')
     except Exception as e:
         log.exception('Problem updating stats')
@@ -242,6 +246,7 @@ def update_all_top_reposts_task(self):
     try:
         with self.uowm.start() as uow:
             run_update_top_reposts(uow)
+            get_service_registry().stats_cache.refresh_top_image_reposts(uow)
     except Exception as e:
         log.exception('Unknown task error')
 
@@ -251,6 +256,7 @@ def update_all_top_reposters_task(self):
     try:
         with self.uowm.start() as uow:
             run_update_top_reposters(uow)
+            get_service_registry().stats_cache.refresh_top_reposters(uow)
     except Exception as e:
         log.exception('Unknown task error')
 
@@ -260,8 +266,10 @@ def update_daily_top_reposters_task(self):
     post_types = [1, 2, 3]
     try:
         with self.uowm.start() as uow:
+            update_repost_rollups(uow)
             for post_type_id in post_types:
                 update_top_reposters(uow, post_type_id, 1)
+            get_service_registry().stats_cache.refresh_top_reposters(uow, day_ranges=[1])
     except Exception as e:
         log.exception('Unknown task error')
 
@@ -300,30 +308,23 @@ def update_proxies_task(self) -> None:
 @record_task_status
 def delete_search_batch(self, ids: list[int]):
     try:
-        with self.uowm.start() as uow:
-            log.info('Starting range %s:%s', ids[0], ids[-1])
-            for id in ids:
-                search = uow.repost_search.get_by_id(id)
-                if search:
-                    log.debug('Deleting search %s', search.id)
-                    uow.repost_search.remove(search)
-            uow.commit()
-            log.info('Finished range %s:%s', ids[0], ids[-1])
+        log.info('Starting range %s:%s', ids[0], ids[-1])
+        PurgeEngine(self.uowm, chunk_size=int(self.config.purge_chunk_size or 1000)).purge_searches(ids)
+        log.info('Finished range %s:%s', ids[0], ids[-1])
     except Exception as e:
         log.exception('')
 
 @celery.task(bind=True, base=SqlAlchemyTask)
 @record_task_status
 def queue_search_history_cleanup(self):
-    with self.uowm.start() as uow:
-        searches = uow.repost_search.get_all_ids_older_than_days(120, limit=100000000)
-        if not searches:
-            log.info('No search history to cleanup')
-            return
-        log.info('Queuing Search History Cleanup.  Range: ID Range: %s:%s', searches[0].id, searches[-1].id)
-        ids = [x[0] for x in searches]
-        for chunk in chunk_list(ids, 5000):
-            delete_search_batch.apply_async((chunk,))
+    retention = RetentionManager(
+        self.uowm,
+        get_retention_policies(self.config),
+        batch_size=int(self.config.purge_chunk_size or 5000),
+        months_ahead=int(self.config.retention_partition_months_ahead or 3)
+    )
+    results = retention.run()
+    log.info('Search history cleanup complete: %s', results)
 
 @celery.task(bind=True, base=RedditTask, autoretry_for=(UtilApiException,), retry_kwards={'max_retries': 5})
 @record_task_status
@@ -137,6 +137,13 @@ class Config:
             'db_user',
             'db_password',
             'db_name',
+            'db_pool_size',
+            'db_max_overflow',
+            'purge_chunk_size',
+            'search_history_retention_days',
+            'monitored_sub_checked_retention_days',
+            'retention_partition_months_ahead',
+            'stats_cache_ttl',
             'reddit_client_id',
             'reddit_client_secret',
             'reddit_useragent',
@@ -147,6 +154,9 @@ class Config:
             'influx_token',
             'influx_org',
             'influx_bucket',
+            'influx_buffer_size',
+            'influx_batch_size',
+            'influx_flush_interval',
             'log_level',
             'index_current_max_age',
             'index_current_skip_load_age',
@@ -159,6 +169,7 @@ class Config:
             'index_historical_max_age',
             'default_hamming_distance',
             'repost_image_check_on_ingest',
+            'repost_image_check_batched',
             'repost_link_check_on_ingest',
             'enable_repost_watch',
             'image_hash_api',
@@ -175,7 +186,24 @@ class Config:
             'sub_monitor_exposed_config_options',
             'wiki_config_name',
             'index_api',
+            'image_search_backend',
+            'local_index_max_age_days',
+            'local_index_refresh_interval',
             'util_api',
+            'url_liveness_cache_ttl',
+            'image_hash_cache_enabled',
+            'image_hash_cache_ttl',
+            'search_result_cache_enabled',
+            'search_result_cache_ttl',
+            'summons_workers',
+            'reddit_rate_limit_capacity',
+            'reddit_rate_limit_reserve',
+            'summons_queue_size',
+            'reference_cache_enabled',
+            'reference_cache_ttl',
+            'reference_cache_max_size',
+            'ingest_async_image_hashing',
+            'ingest_hash_processes',
             'embedding_api',
             'live_responses',
             'top_post_offer_watch',
@@ -185,6 +213,8 @@ class Config:
             'ocr_image_width',
             'ocr_image_height',
             'default_meme_filter_hash_size',
+            'upload_max_bytes',
+            'upload_max_pixels',
             'default_image_target_match',
             'default_image_target_meme_match',
             'default_image_target_title_match',
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, func, Boolean, Text, ForeignKey, Float, Index, Integer
+from sqlalchemy import Column, String, DateTime, func, Boolean, Text, ForeignKey, Float, Index, Integer, Date
 from sqlalchemy.dialects.mysql import TINYINT
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -18,6 +18,7 @@ class Post(Base):
         Index('idx_post_type_created_at', 'post_type_id', 'created_at'),
         #Index('idx_post_type_timestamp', 'created_at_timestamp', 'post_type_int'),
         Index('idx_last_delete_check', 'last_deleted_check', 'post_type_id'),
+        Index('idx_delete_check_keyset', 'last_deleted_check', 'id'),
         Index('idx_ingested_at_by_type', 'ingested_at', 'post_type_id'),
         Index('idx_url_hash', 'url_hash'),
 
@@ -43,7 +44,7 @@ class Post(Base):
     bot_comments = relationship('BotComment', back_populates='post')
     repost_watch = relationship('RepostWatch', back_populates='post')
     reposts = relationship('Repost', back_populates='repost_of', primaryjoin="Post.id==Repost.repost_of_id")
-    searches = relationship('RepostSearch', back_populates='post')
+    searches = relationship('RepostSearch', back_populates='post', primaryjoin="Post.id==foreign(RepostSearch.post_id)")
     reports = relationship('UserReport', back_populates='post')
     hashes = relationship('PostHash', back_populates='post')
     post_type = relationship('PostType') # lazy has to be set to JSON encoders don't fail for unbound session
@@ -200,12 +201,14 @@ class RepostSearch(Base):
         Index('idx_post_type_searched_at', 'post_type_id', 'searched_at'),
         Index('idx_by_subreddit_and_type', 'subreddit', 'source', 'post_type_id', 'matches_found'),
         Index('idx_source', 'source'),
-        Index('idx_matches_found', 'searched_at', 'source', 'matches_found')
+        Index('idx_matches_found', 'searched_at', 'source', 'matches_found'),
+        Index('idx_subreddit_source_id', 'subreddit', 'source', 'id')
     )
-    id = Column(Integer, primary_key=True)
-    post_id = Column(Integer, ForeignKey('post.id'))
+    # Partitioned by searched_at so there are no foreign keys and it's part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    post_id = Column(Integer)
     source = Column(String(20), nullable=False)
-    post_type_id = Column(TINYINT(), ForeignKey('post_type.id'))
+    post_type_id = Column(TINYINT())
     search_time = Column(Float, nullable=False)
     matches_found = Column(Integer, nullable=False)
     target_title_match = Column(Integer)
@@ -223,12 +226,16 @@ class RepostSearch(Base):
     meme_filter = Column(Boolean, default=False)
     max_depth = Column(Integer)
     subreddit = Column(String(100), nullable=True)
-    searched_at = Column(DateTime, default=func.utc_timestamp(), nullable=False)
+    searched_at = Column(DateTime, default=func.utc_timestamp(), primary_key=True)
 
-    post = relationship("Post", back_populates='searches')
-    monitored_sub_checked = relationship("MonitoredSubChecks", back_populates="search")
-    repost = relationship("Repost", back_populates="search")
-    post_type = relationship('PostType')
+    post = relationship("Post", back_populates='searches', primaryjoin="foreign(RepostSearch.post_id)==Post.id")
+    monitored_sub_checked = relationship(
+        "MonitoredSubChecks",
+        back_populates="search",
+        primaryjoin="RepostSearch.id==foreign(MonitoredSubChecks.search_id)"
+    )
+    repost = relationship("Repost", back_populates="search", primaryjoin="RepostSearch.id==foreign(Repost.search_id)")
+    post_type = relationship('PostType', primaryjoin="foreign(RepostSearch.post_type_id)==PostType.id")
 
     def __repr__(self):
         return f'Post ID: {self.post_id} - Source: {self.source}'
@@ -268,7 +275,7 @@ class Repost(Base):
     post_id = Column(Integer, ForeignKey('post.id'))
     repost_of_id = Column(Integer, ForeignKey('post.id'))
     post_type_id = Column(TINYINT(), ForeignKey('post_type.id'))
-    search_id = Column(Integer, ForeignKey('repost_search.id'))
+    search_id = Column(Integer)
     detected_at = Column(DateTime, default=func.utc_timestamp())
     source = Column(String(25))
     author = Column(String(25))
@@ -277,7 +284,7 @@ class Repost(Base):
 
     post = relationship("Post", back_populates='reposts', foreign_keys=[post_id])
     repost_of = relationship("Post", foreign_keys=[repost_of_id])
-    search = relationship("RepostSearch")
+    search = relationship("RepostSearch", primaryjoin="foreign(Repost.search_id)==RepostSearch.id")
     post_type = relationship('PostType')
 
     def to_dict(self):
@@ -365,7 +372,12 @@ class MonitoredSub(Base):
     high_volume_reposter_removal_reason = Column(String(300))
     high_volume_reposter_ban_reason = Column(String(300))
 
-    post_checks = relationship("MonitoredSubChecks", back_populates='monitored_sub', cascade='all, delete', )
+    post_checks = relationship(
+        "MonitoredSubChecks",
+        back_populates='monitored_sub',
+        cascade='all, delete',
+        primaryjoin="MonitoredSub.id==foreign(MonitoredSubChecks.monitored_sub_id)"
+    )
     config_revisions = relationship("MonitoredSubConfigRevision", back_populates='monitored_sub', cascade='all, delete')
     config_changes = relationship('MonitoredSubConfigChange', back_populates='monitored_sub', cascade='all, delete')
     user_whitelist = relationship('UserWhitelist', back_populates='monitored_sub', cascade='all, delete')
@@ -466,17 +478,23 @@ class UserWhitelist(Base):
 class MonitoredSubChecks(Base):
     __tablename__ = 'monitored_sub_checked'
 
-    id = Column(Integer, primary_key=True)
-    post_id = Column(Integer, ForeignKey('post.id'))
-    post_type_id = Column(TINYINT(), ForeignKey('post_type.id'))
-    checked_at = Column(DateTime, default=func.utc_timestamp())
-    monitored_sub_id = Column(Integer, ForeignKey('monitored_sub.id'))
-    search_id = Column(Integer, ForeignKey('repost_search.id'))
-
-    monitored_sub = relationship("MonitoredSub", back_populates='post_checks', cascade='all, delete')
-    search = relationship("RepostSearch")
-    post_type = relationship('PostType')
-    post = relationship("Post", foreign_keys=[post_id])
+    # Partitioned by checked_at so there are no foreign keys and it's part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    post_id = Column(Integer)
+    post_type_id = Column(TINYINT())
+    checked_at = Column(DateTime, default=func.utc_timestamp(), primary_key=True)
+    monitored_sub_id = Column(Integer)
+    search_id = Column(Integer)
+
+    monitored_sub = relationship(
+        "MonitoredSub",
+        back_populates='post_checks',
+        cascade='all, delete',
+        primaryjoin="foreign(MonitoredSubChecks.monitored_sub_id)==MonitoredSub.id"
+    )
+    search = relationship("RepostSearch", primaryjoin="foreign(MonitoredSubChecks.search_id)==RepostSearch.id")
+    post_type = relationship('PostType', primaryjoin="foreign(MonitoredSubChecks.post_type_id)==PostType.id")
+    post = relationship("Post", primaryjoin="foreign(MonitoredSubChecks.post_id)==Post.id")
 
 
 
@@ -696,6 +714,30 @@ class MemeHash(Base):
     post_id = Column(String(9), nullable=False, unique=True)
     hash = Column(String(256), nullable=False)
 
+class ImageHashCache(Base):
+    __tablename__ = 'image_hash_cache'
+    __table_args__ = (
+        Index('idx_image_hash_cache_url', 'url_hash', unique=True),
+        Index('idx_image_hash_cache_content', 'content_hash'),
+    )
+    id = Column(Integer, primary_key=True)
+    url_hash = Column(String(64), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    dhash_h = Column(String(64))
+    dhash_v = Column(String(64))
+    ahash = Column(String(64))
+    meme_dhash = Column(String(256))
+    created_at = Column(DateTime, default=func.utc_timestamp(), nullable=False)
+
+    def to_dict(self):
+        return {
+            'content_hash': self.content_hash,
+            'dhash_h': self.dhash_h,
+            'dhash_v': self.dhash_v,
+            'ahash': self.ahash,
+            'meme_dhash': self.meme_dhash
+        }
+
 class StatsDailyCount(Base):
     __tablename__ = 'stat_daily_count'
     id = Column(Integer, primary_key=True)
@@ -740,6 +782,39 @@ class StatsTopRepost(Base):
     nsfw = Column(Boolean, nullable=False)
     updated_at = Column(DateTime, default=func.utc_timestamp(), nullable=False)
 
+class StatRepostDailyAuthor(Base):
+    __tablename__ = 'stat_repost_daily_author'
+    __table_args__ = (
+        Index('idx_author_type_day', 'author', 'post_type_id', 'day', unique=True),
+        Index('idx_author_rollup_type_day', 'post_type_id', 'day'),
+    )
+    id = Column(Integer, primary_key=True)
+    author = Column(String(25), nullable=False)
+    post_type_id = Column(TINYINT(), ForeignKey('post_type.id'), nullable=False)
+    day = Column(Date, nullable=False)
+    repost_count = Column(Integer, nullable=False)
+
+
+class StatRepostDailyPost(Base):
+    __tablename__ = 'stat_repost_daily_post'
+    __table_args__ = (
+        Index('idx_repost_of_type_day', 'repost_of_id', 'post_type_id', 'day', unique=True),
+        Index('idx_post_rollup_type_day', 'post_type_id', 'day'),
+    )
+    id = Column(Integer, primary_key=True)
+    repost_of_id = Column(Integer, ForeignKey('post.id'), nullable=False)
+    post_type_id = Column(TINYINT(), ForeignKey('post_type.id'), nullable=False)
+    day = Column(Date, nullable=False)
+    repost_count = Column(Integer, nullable=False)
+
+
+class StatRollupState(Base):
+    __tablename__ = 'stat_rollup_state'
+    name = Column(String(50), primary_key=True)
+    last_id = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=func.utc_timestamp(), nullable=False)
+
+
 class HttpProxy(Base):
     __tablename__ = 'http_proxy'
     id = Column(Integer, primary_key=True)
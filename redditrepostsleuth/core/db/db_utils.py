@@ -5,7 +5,7 @@ from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.logging import log
 
 
-def get_db_engine(config: Config):
+def get_db_engine(config: Config, pool_size: int = 50, max_overflow: int = 10):
     connection_uri = URL.create(
         "mysql+pymysql",
         username=config.db_user,
@@ -13,5 +13,5 @@ def get_db_engine(config: Config):
         host=config.db_host,
         database=config.db_name,
     )
-    return create_engine(connection_uri, echo=False, pool_size=50, pool_pre_ping=True)
+    return create_engine(connection_uri, echo=False, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
 
@@ -0,0 +1,183 @@
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import delete, update, select, or_
+from sqlalchemy.sql import Executable
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash, Repost, RepostSearch, MonitoredSubChecks, \
+    Summons, BotComment, RepostWatch, InvestigatePost, UserReport, ImageIndexMap, StatsTopRepost, \
+    MemeTemplatePotential, MemeTemplatePotentialVote, MemeTemplate, MemeHash, StatRepostDailyPost
+from redditrepostsleuth.core.db.repository.stat_repost_rollup_repo import REPOST_ROLLUP
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.util.helpers import chunk_list
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PurgeResult:
+    rows: Counter = field(default_factory=Counter)
+    elapsed: float = 0
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows.values())
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.total_rows / self.elapsed, 2) if self.elapsed else 0
+
+    def add(self, table: str, count: int) -> None:
+        if count and count > 0:
+            self.rows[table] += count
+
+
+class PurgeEngine:
+    """
+    Deletes posts and searches, along with the rows that reference them, with chunked set based statements
+    """
+    def __init__(self, uowm: UnitOfWorkManager, chunk_size: int = 1000):
+        self.uowm = uowm
+        self.chunk_size = chunk_size
+
+    def purge_posts(self, post_ids: list[str]) -> PurgeResult:
+        """
+        Delete posts and all rows that reference them
+        :param post_ids: Reddit post IDs
+        :return: Rows deleted per table
+        """
+        return self._run(post_ids, self._purge_post_chunk, 'posts')
+
+    def purge_searches(self, search_ids: list[int]) -> PurgeResult:
+        """
+        Delete repost searches.  Reposts and monitored sub checks that point at them are kept
+        :param search_ids: RepostSearch IDs
+        :return: Rows deleted or updated per table
+        """
+        return self._run(search_ids, self._purge_search_chunk, 'searches')
+
+    def clear_search_references(self, search_ids: list[int]) -> PurgeResult:
+        """
+        Clear references to repost searches that are about to be removed some other way, like dropping a partition
+        :param search_ids: RepostSearch IDs
+        :return: Rows updated per table
+        """
+        return self._run(search_ids, self._clear_search_reference_chunk, 'search references')
+
+    def update_last_deleted_check(self, ids: list[int], checked_at: Optional[datetime] = None) -> PurgeResult:
+        """
+        Set last_deleted_check on posts
+        :param ids: Post IDs
+        :param checked_at: Timestamp to set.  Defaults to now
+        :return: Rows updated
+        """
+        checked_at = checked_at or datetime.utcnow()
+
+        def update_chunk(uow: UnitOfWork, chunk: list[int], result: PurgeResult) -> None:
+            self._execute(
+                uow, result, 'post',
+                update(Post).where(Post.id.in_(chunk)).values(last_deleted_check=checked_at)
+            )
+
+        return self._run(ids, update_chunk, 'last delete checks')
+
+    def _run(self, ids: list, chunk_handler, label: str) -> PurgeResult:
+        result = PurgeResult()
+        if not ids:
+            return result
+        start = perf_counter()
+        for chunk in chunk_list(list(ids), self.chunk_size):
+            with self.uowm.start() as uow:
+                try:
+                    chunk_handler(uow, chunk, result)
+                    uow.commit()
+                except Exception:
+                    uow.rollback()
+                    raise
+        result.elapsed = perf_counter() - start
+        log.info(
+            'Processed %s %s.  %s rows in %ss (%s rows/s) - %s',
+            len(ids), label, result.total_rows, round(result.elapsed, 3), result.rows_per_second, dict(result.rows)
+        )
+        return result
+
+    def _purge_post_chunk(self, uow: UnitOfWork, chunk: list[str], result: PurgeResult) -> None:
+        rows = uow.session.execute(select(Post.id, Post.post_id).where(Post.post_id.in_(chunk))).all()
+        # Some tables are keyed on the Reddit ID and may have rows for posts we never saved
+        self._execute(uow, result, 'meme_hash', delete(MemeHash).where(MemeHash.post_id.in_(chunk)))
+        if not rows:
+            return
+        ids = [row.id for row in rows]
+        reddit_ids = [row.post_id for row in rows]
+
+        search_ids = select(RepostSearch.id).where(RepostSearch.post_id.in_(ids)).scalar_subquery()
+        potential_ids = select(MemeTemplatePotential.id).where(
+            MemeTemplatePotential.post_id.in_(ids)
+        ).scalar_subquery()
+
+        # Keep the daily repost stats in line with the reposts we're about to remove
+        uow.stat_repost_rollup.remove_reposts(
+            or_(Repost.post_id.in_(ids), Repost.repost_of_id.in_(ids)),
+            uow.stat_repost_rollup.get_last_id(REPOST_ROLLUP, lock=True)
+        )
+
+        statements = [
+            ('repost', delete(Repost).where(Repost.post_id.in_(ids))),
+            ('repost', delete(Repost).where(Repost.repost_of_id.in_(ids))),
+            ('repost', update(Repost).where(Repost.search_id.in_(search_ids)).values(search_id=None)),
+            ('monitored_sub_checked', delete(MonitoredSubChecks).where(MonitoredSubChecks.post_id.in_(ids))),
+            (
+                'monitored_sub_checked',
+                update(MonitoredSubChecks).where(MonitoredSubChecks.search_id.in_(search_ids)).values(search_id=None)
+            ),
+            ('repost_search', delete(RepostSearch).where(RepostSearch.post_id.in_(ids))),
+            ('summons', delete(Summons).where(Summons.post_id.in_(ids))),
+            ('bot_comment', delete(BotComment).where(BotComment.reddit_post_id.in_(reddit_ids))),
+            ('repost_watch', delete(RepostWatch).where(RepostWatch.post_id.in_(ids))),
+            ('investigate_post', delete(InvestigatePost).where(InvestigatePost.post_id.in_(ids))),
+            ('user_report', delete(UserReport).where(UserReport.post_id.in_(ids))),
+            ('image_index_map', delete(ImageIndexMap).where(ImageIndexMap.post_id.in_(ids))),
+            ('stat_top_repost', delete(StatsTopRepost).where(StatsTopRepost.post_id.in_(ids))),
+            ('stat_repost_daily_post', delete(StatRepostDailyPost).where(StatRepostDailyPost.repost_of_id.in_(ids))),
+            (
+                'meme_template_potential_votes',
+                delete(MemeTemplatePotentialVote).where(MemeTemplatePotentialVote.post_id.in_(ids))
+            ),
+            (
+                'meme_template_potential_votes',
+                delete(MemeTemplatePotentialVote).where(
+                    MemeTemplatePotentialVote.meme_template_potential_id.in_(potential_ids)
+                )
+            ),
+            ('meme_template_potential', delete(MemeTemplatePotential).where(MemeTemplatePotential.post_id.in_(ids))),
+            # Templates outlive the post they were created from
+            ('meme_template', update(MemeTemplate).where(MemeTemplate.post_id.in_(ids)).values(post_id=None)),
+            ('post_hash', delete(PostHash).where(PostHash.post_id.in_(ids))),
+            ('post', delete(Post).where(Post.id.in_(ids))),
+        ]
+        for table, statement in statements:
+            self._execute(uow, result, table, statement)
+
+    def _purge_search_chunk(self, uow: UnitOfWork, chunk: list[int], result: PurgeResult) -> None:
+        self._clear_search_reference_chunk(uow, chunk, result)
+        self._execute(uow, result, 'repost_search', delete(RepostSearch).where(RepostSearch.id.in_(chunk)))
+
+    def _clear_search_reference_chunk(self, uow: UnitOfWork, chunk: list[int], result: PurgeResult) -> None:
+        statements = [
+            ('repost', update(Repost).where(Repost.search_id.in_(chunk)).values(search_id=None)),
+            (
+                'monitored_sub_checked',
+                update(MonitoredSubChecks).where(MonitoredSubChecks.search_id.in_(chunk)).values(search_id=None)
+            ),
+        ]
+        for table, statement in statements:
+            self._execute(uow, result, table, statement)
+
+    def _execute(self, uow: UnitOfWork, result: PurgeResult, table: str, statement: Executable) -> None:
+        res = uow.session.execute(statement.execution_options(synchronize_session=False))
+        result.add(table, res.rowcount)
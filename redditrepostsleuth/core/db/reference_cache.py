@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+from time import monotonic, perf_counter
+from typing import Optional, Callable, Any
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from redditrepostsleuth.core.db.databasemodels import MonitoredSub, UserWhitelist, BannedSubreddit
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
+from redditrepostsleuth.core.model.events.cache_event import CacheEvent
+from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.service_registry import get_service_registry
+
+log = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'reference-cache:invalidate'
+MONITORED_SUB = 'monitored_sub'
+USER_WHITELIST = 'user_whitelist'
+BANNED_SUBREDDIT = 'banned_subreddit'
+NAMESPACES = (MONITORED_SUB, USER_WHITELIST, BANNED_SUBREDDIT)
+
+_MISSING = object()
+
+
+def user_whitelist_key(monitored_sub_id: int, username: str) -> str:
+    return f'{monitored_sub_id}:{username.lower()}'
+
+
+class TtlLruCache:
+    """
+    Size bounded LRU where every entry also expires after ttl seconds.  The generation counter is bumped on every
+    invalidation so a load that raced an invalidation doesn't put the stale row back
+    """
+    def __init__(self, max_size: int = 10000, ttl: int = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self._items: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """
+        Get a cached value
+        :param key: Cache key
+        :return: The cached value or _MISSING.  None is a valid cached value
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at < monotonic():
+                del self._items[key]
+                return _MISSING
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, generation: Optional[int] = None) -> bool:
+        """
+        Cache a value, evicting the least recently used entries when full
+        :param key: Cache key
+        :param value: Value to cache
+        :param generation: Generation read before the value was loaded.  The value is dropped if it changed since
+        :return: True if the value was cached
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._items[key] = (monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self.generation += 1
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ReferenceDataCache:
+    """
+    Per worker read through cache of MonitoredSub, UserWhitelist and BannedSubreddit rows.  Cached rows are detached
+    from their session so don't modify them
+    """
+    def __init__(
+            self,
+            redis_client: Optional[Redis] = None,
+            event_logger: Optional[EventLogging] = None,
+            ttl: int = 300,
+            max_size: int = 10000,
+            stats_interval: int = 60
+    ):
+        self.redis = redis_client
+        self.event_logger = event_logger
+        self.stats_interval = stats_interval
+        self.stats = Counter()
+        self._caches = {namespace: TtlLruCache(max_size=max_size, ttl=ttl) for namespace in NAMESPACES}
+        self._last_stats_flush = perf_counter()
+        self._pubsub_thread = None
+        self._subscribed_pid = None
+        self._subscribe_lock = threading.Lock()
+
+    def get_monitored_sub(self, uow: UnitOfWork, subreddit: str) -> Optional[MonitoredSub]:
+        return self._get(uow, MONITORED_SUB, subreddit.lower(), lambda: uow.monitored_sub.get_by_sub(subreddit))
+
+    def get_user_whitelist(self, uow: UnitOfWork, username: str, monitored_sub_id: int) -> Optional[UserWhitelist]:
+        return self._get(
+            uow,
+            USER_WHITELIST,
+            user_whitelist_key(monitored_sub_id, username),
+            lambda: uow.user_whitelist.get_by_username_and_subreddit(username, monitored_sub_id)
+        )
+
+    def get_banned_subreddit(self, uow: UnitOfWork, subreddit: str) -> Optional[BannedSubreddit]:
+        return self._get(uow, BANNED_SUBREDDIT, subreddit.lower(), lambda: uow.banned_subreddit.get_by_subreddit(subreddit))
+
+    def _get(self, uow: UnitOfWork, namespace: str, key: str, loader: Callable[[], Any]) -> Any:
+        self._ensure_subscribed()
+        cache = self._caches[namespace]
+        value = cache.get(key)
+        if value is not _MISSING:
+            self._record(namespace, 'hit')
+            return value
+
+        self._record(namespace, 'miss')
+        generation = cache.generation
+        value = loader()
+        if value is not None:
+            uow.session.expunge(value)
+        cache.set(key, value, generation=generation)
+        return value
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        """
+        Drop an entry on this worker and publish the invalidation to every other worker
+        :param namespace: One of NAMESPACES
+        :param key: Cache key.  Subreddit name or user_whitelist_key().  Drops the whole namespace if not provided
+        """
+        self._invalidate_local(namespace, key)
+        if not self.redis:
+            return
+        try:
+            self.redis.publish(INVALIDATION_CHANNEL, json.dumps({'namespace': namespace, 'key': key}))
+        except RedisError as e:
+            log.warning('Failed to publish cache invalidation for %s %s: %s', namespace, key, e)
+
+    def _invalidate_local(self, namespace: str, key: Optional[str]) -> None:
+        cache = self._caches.get(namespace)
+        if not cache:
+            log.warning('Unknown reference cache namespace %s', namespace)
+            return
+        if key is None:
+            cache.clear()
+        else:
+            cache.delete(key.lower())
+
+    def _handle_message(self, message: dict) -> None:
+        try:
+            data = json.loads(message['data'])
+            self._invalidate_local(data['namespace'], data.get('key'))
+        except (ValueError, KeyError, TypeError) as e:
+            log.warning('Bad cache invalidation message %s: %s', message, e)
+
+    def _ensure_subscribed(self) -> None:
+        """
+        Start listening for invalidations.  Done lazily and per PID since Celery creates task instances before
+        forking the pool and the listener thread doesn't survive the fork
+        """
+        if not self.redis or self._subscribed_pid == os.getpid():
+            return
+        with self._subscribe_lock:
+            if self._subscribed_pid == os.getpid():
+                return
+            self._subscribed_pid = os.getpid()
+            # Anything cached before the fork may have missed invalidations
+            for cache in self._caches.values():
+                cache.clear()
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATION_CHANNEL: self._handle_message})
+                self._pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+            except RedisError as e:
+                log.warning('Failed to subscribe to cache invalidations.  Relying on TTL: %s', e)
+
+    def get_hit_rates(self) -> dict[str, float]:
+        rates = {}
+        for namespace in NAMESPACES:
+            total = self.stats[f'{namespace}_hit'] + self.stats[f'{namespace}_miss']
+            if total:
+                rates[f'{namespace}_hit_rate'] = round(self.stats[f'{namespace}_hit'] / total, 4)
+        return rates
+
+    def _record(self, namespace: str, result: str) -> None:
+        self.stats[f'{namespace}_{result}'] += 1
+        if not self.event_logger or perf_counter() - self._last_stats_flush < self.stats_interval:
+            return
+        self.event_logger.save_event(CacheEvent('reference_cache', {**self.stats, **self.get_hit_rates()}))
+        self.stats.clear()
+        self._last_stats_flush = perf_counter()
+
+
+_reference_cache: Optional[ReferenceDataCache] = None
+
+
+def get_reference_cache() -> ReferenceDataCache:
+    """
+    Get the shared cache for this process, creating it on first use
+    :rtype: ReferenceDataCache
+    """
+    global _reference_cache
+    if not _reference_cache:
+        services = get_service_registry()
+        config = services.config
+        _reference_cache = ReferenceDataCache(
+            redis_client=services.redis_client,
+            event_logger=services.event_logger,
+            ttl=int(config.reference_cache_ttl or 300),
+            max_size=int(config.reference_cache_max_size or 10000)
+        )
+    return _reference_cache
+
+
+def invalidate_reference_cache(namespace: str, key: Optional[str] = None) -> None:
+    """
+    Invalidate an entry on every worker.  Failures are logged and never raised to the writer
+    :param namespace: One of NAMESPACES
+    :param key: Cache key.  Drops the whole namespace if not provided
+    """
+    try:
+        get_reference_cache().invalidate(namespace, key)
+    except Exception as e:
+        log.warning('Failed to invalidate reference cache for %s %s: %s', namespace, key, e)
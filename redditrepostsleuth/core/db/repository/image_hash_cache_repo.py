@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert
+
+from redditrepostsleuth.core.db.databasemodels import ImageHashCache
+
+
+class ImageHashCacheRepo:
+    def __init__(self, db_session):
+        self.db_session = db_session
+
+    def add(self, item: ImageHashCache) -> None:
+        self.db_session.add(item)
+
+    def insert_ignore(self, item: ImageHashCache) -> None:
+        """
+        Insert an entry unless another worker already saved one for the same URL
+        :param item: Entry to insert
+        """
+        self.db_session.execute(
+            insert(ImageHashCache).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite'),
+            {
+                'url_hash': item.url_hash,
+                'content_hash': item.content_hash,
+                'dhash_h': item.dhash_h,
+                'dhash_v': item.dhash_v,
+                'ahash': item.ahash,
+                'meme_dhash': item.meme_dhash,
+                'created_at': item.created_at or datetime.utcnow()
+            }
+        )
+
+    def get_by_url_hash(self, url_hash: str) -> Optional[ImageHashCache]:
+        return self.db_session.query(ImageHashCache).filter(ImageHashCache.url_hash == url_hash).first()
+
+    def get_by_content_hash(self, content_hash: str) -> Optional[ImageHashCache]:
+        return self.db_session.query(ImageHashCache).filter(ImageHashCache.content_hash == content_hash).first()
@@ -1,6 +1,9 @@
 from typing import Text
 
-from redditrepostsleuth.core.db.databasemodels import ImageIndexMap
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from redditrepostsleuth.core.db.databasemodels import ImageIndexMap, Post
 
 
 class ImageIndexMapRepo:
@@ -12,5 +15,15 @@ class ImageIndexMapRepo:
 
     def get_all_in_by_ids_and_index(self, ids: list[int], index: str) -> list[ImageIndexMap]:
         return self.db_session.query(ImageIndexMap).filter(ImageIndexMap.annoy_index_id.in_(ids), ImageIndexMap.index_name == index).all()
+
+    def get_all_in_by_index_ids(self, ids_by_index: dict[str, list[int]]) -> list[ImageIndexMap]:
+        clauses = [
+            and_(ImageIndexMap.index_name == index, ImageIndexMap.annoy_index_id.in_(ids))
+            for index, ids in ids_by_index.items()
+        ]
+        return self.db_session.query(ImageIndexMap).options(
+            joinedload(ImageIndexMap.post).joinedload(Post.hashes)
+        ).filter(or_(*clauses)).all()
+
     def add(self, item):
-        self.db_session.add(item)
\ No newline at end of file
+        self.db_session.add(item)
@@ -3,7 +3,7 @@ from typing import Text
 
 from sqlalchemy import func
 
-from redditrepostsleuth.core.db.databasemodels import MonitoredSubChecks
+from redditrepostsleuth.core.db.databasemodels import MonitoredSubChecks, Post
 
 
 class MonitoredSubCheckRepository:
@@ -19,6 +19,20 @@ class MonitoredSubCheckRepository:
     def get_by_subreddit(self, monitored_sub_id: int, limit: int = 20, offset: int = None):
         return self.db_session.query(MonitoredSubChecks).filter(MonitoredSubChecks.monitored_sub_id == monitored_sub_id).order_by(MonitoredSubChecks.checked_at.desc()).limit(limit).offset(offset).all()
 
+    def get_checked_post_ids(self, monitored_sub_id: int, limit: int = None) -> list[str]:
+        """
+        Get the Reddit post IDs of the most recent checks for a sub
+        :param monitored_sub_id: ID of monitored sub
+        :param limit: Max IDs to return
+        """
+        rows = self.db_session.query(Post.post_id)\
+            .join(MonitoredSubChecks, MonitoredSubChecks.post_id == Post.id)\
+            .filter(MonitoredSubChecks.monitored_sub_id == monitored_sub_id)\
+            .order_by(MonitoredSubChecks.id.desc())\
+            .limit(limit)\
+            .all()
+        return [row.post_id for row in rows]
+
     def remove(self, item: MonitoredSubChecks):
         self.db_session.delete(item)
 
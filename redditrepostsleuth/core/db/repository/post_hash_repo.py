@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from redditrepostsleuth.core.db.databasemodels import PostHash
 
 
@@ -9,4 +11,12 @@ class PostHashRepo:
         return self.db_session.query(PostHash).filter(PostHash.hash_type_id == hash_type_id, PostHash.hash == hash).all()
 
     def find_first_hash_by_post_and_type(self, post_id: int, hash_type_id: int):
-        return self.db_session.query(PostHash).filter(PostHash.post_id == post_id, PostHash.hash_type_id == hash_type_id).first()
\ No newline at end of file
+        return self.db_session.query(PostHash).filter(PostHash.post_id == post_id, PostHash.hash_type_id == hash_type_id).first()
+
+    def get_by_type_after_id(self, hash_type_id: int, id: int, limit: int = None, created_after: datetime = None):
+        query = self.db_session.query(PostHash).filter(PostHash.hash_type_id == hash_type_id, PostHash.id > id)
+        if created_after:
+            query = query.filter(PostHash.post_created_at > created_after)
+        return query.with_entities(
+            PostHash.id, PostHash.post_id, PostHash.hash, PostHash.post_created_at
+        ).order_by(PostHash.id).limit(limit).all()
@@ -1,12 +1,12 @@
-from typing import List
+from typing import List, Optional
 
-from sqlalchemy import func
+from sqlalchemy import func, insert, or_, and_
 from datetime import datetime, timedelta
 
 from sqlalchemy.orm import joinedload
 
 from redditrepostsleuth.core.logging import log
-from redditrepostsleuth.core.db.databasemodels import Post
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash
 
 
 class PostRepository:
@@ -20,6 +20,53 @@ class PostRepository:
         #log.debug('Inserting: %s', item)
         self.db_session.add(item)
 
+    def bulk_insert_ignore(self, items: List[Post]) -> List[Post]:
+        """
+        Insert posts and their hashes with multi-row INSERT IGNORE statements.  Posts that already exist, including
+        ones another worker inserts first, are left alone
+        :param items: Posts to insert
+        :return: Posts created by this insert, with their IDs set
+        """
+        if not items:
+            return []
+        existing = self.get_existing_post_ids([post.post_id for post in items])
+        new_items = [post for post in items if post.post_id not in existing]
+        if not new_items:
+            return []
+        now = datetime.utcnow()
+        self.db_session.execute(
+            insert(Post).prefix_with('IGNORE', dialect='mysql'),
+            [post_insert_row(post, now) for post in new_items]
+        )
+        saved = {
+            row.post_id: row
+            for row in self.db_session.query(Post.id, Post.post_id, func.count(PostHash.id).label('hash_count'))
+            .outerjoin(PostHash, PostHash.post_id == Post.id)
+            .filter(Post.post_id.in_([post.post_id for post in new_items]))
+            .group_by(Post.id)
+            .all()
+        }
+
+        created = []
+        hash_rows = []
+        for post in new_items:
+            row = saved.get(post.post_id)
+            # Hashes already saved means another worker inserted the post between our check and insert
+            if not row or row.hash_count:
+                continue
+            post.id = row.id
+            created.append(post)
+            for post_hash in post.hashes:
+                hash_rows.append({
+                    'hash': post_hash.hash,
+                    'post_id': row.id,
+                    'hash_type_id': post_hash.hash_type_id,
+                    'post_created_at': post_hash.post_created_at
+                })
+        if hash_rows:
+            self.db_session.execute(insert(PostHash), hash_rows)
+        return created
+
     def bulk_save(self, items: List[Post]):
         self.db_session.bulk_save_objects(items)
 
@@ -65,6 +112,36 @@ class PostRepository:
         create_delta = datetime.now() - timedelta(days=90)
         return self.db_session.query(Post).filter(Post.created_at > create_delta, Post.last_deleted_check < delte_check_delta).offset(offset).limit(limit).all()
 
+    def find_keyset_page_for_delete_check(
+            self,
+            checked_before: datetime,
+            created_after: datetime,
+            after: Optional[tuple[datetime, int]] = None,
+            limit: int = 5000
+    ) -> list:
+        """
+        Get the next page of posts due a delete check ordered by (last_deleted_check, id).  Only id, post_id and
+        last_deleted_check are loaded
+        :param checked_before: Only include posts last checked before this
+        :param created_after: Only include posts created after this
+        :param after: (last_deleted_check, id) of the last row from the previous page
+        :param limit: Page size
+        :return: Rows with id, post_id and last_deleted_check
+        """
+        query = self.db_session.query(Post.id, Post.post_id, Post.last_deleted_check).filter(
+            Post.last_deleted_check < checked_before,
+            Post.created_at > created_after
+        )
+        if after:
+            last_checked, last_id = after
+            query = query.filter(
+                or_(
+                    Post.last_deleted_check > last_checked,
+                    and_(Post.last_deleted_check == last_checked, Post.id > last_id)
+                )
+            )
+        return query.order_by(Post.last_deleted_check, Post.id).limit(limit).all()
+
     def find_all_by_id_for_delete_check(self, id: int, limit: int = None, offset: int = None) -> List[Post]:
         return self.db_session.query(Post).filter(Post.id > id).offset(offset).limit(limit).all()
 
@@ -90,9 +167,18 @@ class PostRepository:
     def get_all_by_ids(self, ids: list[int]) -> list[Post]:
         return self.db_session.query(Post).filter(Post.id.in_(ids)).all()
 
+    def get_all_by_ids_with_hashes(self, ids: list[int]) -> list[Post]:
+        return self.db_session.query(Post).options(joinedload(Post.hashes)).filter(Post.id.in_(ids)).all()
+
     def get_all_by_post_ids(self, ids: list[int]) -> list[Post]:
         return self.db_session.query(Post).filter(Post.post_id.in_(ids)).all()
 
+    def get_existing_post_ids(self, post_ids: list[str]) -> set[str]:
+        return {row.post_id for row in self.db_session.query(Post.post_id).filter(Post.post_id.in_(post_ids)).all()}
+
+    def get_existing_ids(self, ids: list[int]) -> set[int]:
+        return {row.id for row in self.db_session.query(Post.id).filter(Post.id.in_(ids)).all()}
+
     def remove_by_post_id(self, post_id: str) -> None:
         self.db_session.query(Post).filter(Post.post_id == post_id).delete()
 
@@ -101,4 +187,21 @@ class PostRepository:
 
     def remove(self, item: Post):
         log.debug('Deleting post %s', item.id)
-        self.db_session.delete(item)
\ No newline at end of file
+        self.db_session.delete(item)
+
+
+def post_insert_row(post: Post, now: datetime) -> dict:
+    """
+    Build an insert row with a value for every column so all rows in a multi-row insert share the same keys
+    :param post: Post to insert
+    :param now: Value used for columns that default to the current time
+    """
+    row = {}
+    for column in Post.__table__.columns:
+        if column.primary_key:
+            continue
+        value = getattr(post, column.key)
+        if value is None and column.default is not None:
+            value = column.default.arg if column.default.is_scalar else now
+        row[column.key] = value
+    return row
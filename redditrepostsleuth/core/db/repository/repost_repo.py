@@ -1,9 +1,12 @@
-from typing import List, Text
+from typing import List, Text, Optional
 
 from sqlalchemy import func
 from datetime import timedelta, datetime
 
-from redditrepostsleuth.core.db.databasemodels import Repost
+from sqlalchemy.orm import joinedload
+
+from redditrepostsleuth.core.db.databasemodels import Repost, RepostSearch, Post
+from redditrepostsleuth.core.db.repository.repost_search_repo import POST_DICT_COLUMNS, POST_HASH_DICT_COLUMNS
 from redditrepostsleuth.core.logging import log
 
 
@@ -19,6 +22,27 @@ class RepostRepo:
     def get_all_by_type(self, post_type_id: int, limit: None, offset: None) -> list[Repost]:
         return self.db_session.query(Repost).filter(Repost.post_type_id == post_type_id).order_by(Repost.id.desc()).offset(offset).limit(limit).all()
 
+    def get_page_by_type(self, post_type_id: int, limit: int = 20, before_id: Optional[int] = None) -> list[Repost]:
+        """
+        Newest first page of reposts with the posts, search and post types to_dict() needs loaded up front
+        :param post_type_id: Post type
+        :param limit: Max rows to return
+        :param before_id: Return reposts with a lower ID than this
+        """
+        def load_post(loader):
+            return loader.load_only(*POST_DICT_COLUMNS), loader.selectinload(Post.hashes).load_only(*POST_HASH_DICT_COLUMNS)
+
+        query = self.db_session.query(Repost).filter(Repost.post_type_id == post_type_id).options(
+            *load_post(joinedload(Repost.post)),
+            *load_post(joinedload(Repost.repost_of)),
+            *load_post(joinedload(Repost.search).joinedload(RepostSearch.post)),
+            joinedload(Repost.search).joinedload(RepostSearch.post_type),
+            joinedload(Repost.post_type)
+        )
+        if before_id:
+            query = query.filter(Repost.id < before_id)
+        return query.order_by(Repost.id.desc()).limit(limit).all()
+
     def get_by_author(self, author: str) -> List[Repost]:
         return self.db_session.query(Repost).filter(Repost.author == author).all()
 
@@ -55,6 +79,9 @@ class RepostRepo:
     def add(self, item):
         self.db_session.add(item)
 
+    def add_all(self, items: List[Repost]):
+        self.db_session.add_all(items)
+
     def bulk_save(self, items: List[Repost]):
         self.db_session.bulk_save_objects(items)
 
@@ -1,6 +1,16 @@
 from datetime import datetime, timedelta
+from typing import Optional
 
-from redditrepostsleuth.core.db.databasemodels import RepostSearch
+from sqlalchemy.orm import joinedload, selectinload, load_only
+
+from redditrepostsleuth.core.db.databasemodels import RepostSearch, Post, PostHash
+
+# Only the columns Post.to_dict() serializes
+POST_DICT_COLUMNS = (
+    Post.id, Post.post_id, Post.url, Post.perma_link, Post.post_type_id, Post.title, Post.created_at, Post.author,
+    Post.subreddit
+)
+POST_HASH_DICT_COLUMNS = (PostHash.id, PostHash.hash, PostHash.post_id, PostHash.hash_type_id)
 
 
 class RepostSearchRepo:
@@ -16,6 +26,9 @@ class RepostSearchRepo:
     def add(self, search: RepostSearch):
         self.db_session.add(search)
 
+    def add_all(self, searches: list[RepostSearch]):
+        self.db_session.add_all(searches)
+
     def update(self, revision: RepostSearch):
         self.db_session.update(revision)
 
@@ -47,6 +60,36 @@ class RepostSearchRepo:
             query = query.filter(RepostSearch.matches_found > 0)
         return query.order_by(RepostSearch.id.desc()).limit(limit).offset(offset).all()
 
+    def get_page_by_subreddit(
+            self,
+            subreddit: str,
+            source: str = 'sub_monitor',
+            only_reposts: bool = False,
+            limit: int = 20,
+            before_id: Optional[int] = None
+    ) -> list[RepostSearch]:
+        """
+        Newest first page of searches for a subreddit with everything to_dict() needs loaded up front
+        :param subreddit: Subreddit name
+        :param source: Search source
+        :param only_reposts: Only include searches that found matches
+        :param limit: Max rows to return
+        :param before_id: Return searches with a lower ID than this
+        """
+        query = self.db_session.query(RepostSearch).filter(
+            RepostSearch.subreddit == subreddit,
+            RepostSearch.source == source
+        ).options(
+            joinedload(RepostSearch.post, innerjoin=True).load_only(*POST_DICT_COLUMNS),
+            joinedload(RepostSearch.post, innerjoin=True).selectinload(Post.hashes).load_only(*POST_HASH_DICT_COLUMNS),
+            joinedload(RepostSearch.post_type)
+        )
+        if only_reposts:
+            query = query.filter(RepostSearch.matches_found > 0)
+        if before_id:
+            query = query.filter(RepostSearch.id < before_id)
+        return query.order_by(RepostSearch.id.desc()).limit(limit).all()
+
     def get_all_reposts_by_subreddit(self, subreddit: str, source: str = 'sub_monitor', limit: int = None, offset: int = None):
         return self.db_session.query(RepostSearch).filter(RepostSearch.subreddit == subreddit, RepostSearch.source == source, RepostSearch.matches_found > 0).order_by(
             RepostSearch.id.desc()).limit(limit).offset(offset).all()
@@ -21,6 +21,9 @@ class RepostWatchRepo:
     def get_by_id(self, id: Text) -> RepostWatch:
         return self.db_session.query(RepostWatch).filter(RepostWatch.id == id).first()
 
+    def get_all_by_ids(self, ids: list[int]) -> list[RepostWatch]:
+        return self.db_session.query(RepostWatch).filter(RepostWatch.id.in_(ids)).all()
+
     def get_all_by_post_id(self, id: str) -> RepostWatch:
         return self.db_session.query(RepostWatch).filter(RepostWatch.post_id == id).all()
 
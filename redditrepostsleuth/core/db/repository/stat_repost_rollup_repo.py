@@ -0,0 +1,156 @@
+from collections import Counter
+from datetime import datetime, date
+from typing import Optional
+
+from sqlalchemy import func, delete, update, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import ColumnElement
+
+from redditrepostsleuth.core.db.databasemodels import Repost, StatRepostDailyAuthor, StatRepostDailyPost, \
+    StatRollupState
+
+REPOST_ROLLUP = 'repost'
+
+
+def _as_date(value) -> date:
+    # SQLite returns DATE() as a string
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+class StatRepostRollupRepo:
+    """
+    Per day repost counts by author and by reposted post.  Kept up to date from new repost rows so the top repost
+    stats can be built by summing a window of days instead of grouping the whole repost table
+    """
+    def __init__(self, db_session):
+        self.db_session = db_session
+
+    def get_last_id(self, name: str, lock: bool = False) -> int:
+        """
+        :param name: Rollup name
+        :param lock: Lock the state row until the transaction ends so concurrent runs can't roll up the same reposts.
+            The row is created if it doesn't exist yet so there is something to lock
+        :return: Highest repost ID already rolled up
+        """
+        query = self.db_session.query(StatRollupState).filter(StatRollupState.name == name)
+        if not lock:
+            state = query.first()
+            return state.last_id if state else 0
+        state = query.with_for_update().first()
+        if not state:
+            state = StatRollupState(name=name, last_id=0, updated_at=datetime.utcnow())
+            self.db_session.add(state)
+            self.db_session.flush()
+        return state.last_id
+
+    def set_last_id(self, name: str, last_id: int) -> None:
+        state = self.db_session.query(StatRollupState).filter(StatRollupState.name == name).first()
+        if not state:
+            state = StatRollupState(name=name)
+            self.db_session.add(state)
+        state.last_id = last_id
+        state.updated_at = datetime.utcnow()
+
+    def get_last_settled_repost_id(self, after_id: int, detected_before: datetime, limit: int) -> Optional[int]:
+        """
+        Highest repost ID in the next batch after after_id.  Only reposts detected before detected_before are
+        included so rows from transactions that haven't committed yet aren't skipped
+        """
+        ids = self.db_session.query(Repost.id).filter(
+            Repost.id > after_id,
+            Repost.detected_at < detected_before
+        ).order_by(Repost.id).limit(limit).subquery()
+        return self.db_session.query(func.max(ids.c.id)).scalar()
+
+    def add_reposts(self, from_id: int, to_id: int) -> int:
+        """
+        Add reposts with IDs in (from_id, to_id] to the rollups
+        :return: Number of reposts added
+        """
+        condition = Repost.id > from_id, Repost.id <= to_id
+        author_counts, post_counts = self._count_reposts(*condition)
+        self._increment(StatRepostDailyAuthor, 'author', author_counts)
+        self._increment(StatRepostDailyPost, 'repost_of_id', post_counts)
+        return sum(post_counts.values())
+
+    def remove_reposts(self, condition: ColumnElement, up_to_id: int) -> None:
+        """
+        Take reposts that are about to be deleted back out of the rollups.  Reposts after up_to_id haven't been
+        rolled up yet
+        """
+        author_counts, post_counts = self._count_reposts(condition, Repost.id <= up_to_id)
+        self._decrement(StatRepostDailyAuthor, StatRepostDailyAuthor.author, author_counts)
+        self._decrement(StatRepostDailyPost, StatRepostDailyPost.repost_of_id, post_counts)
+
+    def clear(self) -> None:
+        self.db_session.execute(delete(StatRepostDailyAuthor))
+        self.db_session.execute(delete(StatRepostDailyPost))
+
+    def get_top_reposters(self, post_type_id: int, since: Optional[date], min_count: int, limit: int = 100000):
+        total = func.sum(StatRepostDailyAuthor.repost_count).label('repost_count')
+        query = self.db_session.query(StatRepostDailyAuthor.author, total).filter(
+            StatRepostDailyAuthor.post_type_id == post_type_id,
+            StatRepostDailyAuthor.author != '[deleted]'
+        )
+        if since:
+            query = query.filter(StatRepostDailyAuthor.day >= since)
+        return query.group_by(StatRepostDailyAuthor.author).having(total > min_count).order_by(total.desc()).limit(limit).all()
+
+    def get_top_reposts(self, post_type_id: int, since: Optional[date], min_count: int, limit: int = 100000):
+        total = func.sum(StatRepostDailyPost.repost_count).label('repost_count')
+        query = self.db_session.query(StatRepostDailyPost.repost_of_id, total).filter(
+            StatRepostDailyPost.post_type_id == post_type_id
+        )
+        if since:
+            query = query.filter(StatRepostDailyPost.day >= since)
+        return query.group_by(StatRepostDailyPost.repost_of_id).having(total > min_count).order_by(total.desc()).limit(limit).all()
+
+    def _count_reposts(self, *conditions) -> tuple[Counter, Counter]:
+        day = func.date(Repost.detected_at)
+        rows = self.db_session.execute(
+            select(Repost.author, Repost.repost_of_id, Repost.post_type_id, day, func.count())
+            .where(*conditions)
+            .group_by(Repost.author, Repost.repost_of_id, Repost.post_type_id, day)
+        ).all()
+        author_counts = Counter()
+        post_counts = Counter()
+        for author, repost_of_id, post_type_id, repost_day, count in rows:
+            if not repost_day or not post_type_id:
+                continue
+            repost_day = _as_date(repost_day)
+            if author:
+                author_counts[(author, post_type_id, repost_day)] += count
+            if repost_of_id:
+                post_counts[(repost_of_id, post_type_id, repost_day)] += count
+        return author_counts, post_counts
+
+    def _increment(self, model, key_column: str, counts: Counter) -> None:
+        rows = [
+            {key_column: key, 'post_type_id': post_type_id, 'day': day, 'repost_count': count}
+            for (key, post_type_id, day), count in counts.items()
+        ]
+        is_mysql = self.db_session.get_bind().dialect.name == 'mysql'
+        for start in range(0, len(rows), 5000):
+            chunk = rows[start:start + 5000]
+            if is_mysql:
+                statement = mysql_insert(model).values(chunk)
+                statement = statement.on_duplicate_key_update(
+                    repost_count=model.repost_count + statement.inserted.repost_count
+                )
+            else:
+                statement = sqlite_insert(model).values(chunk)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[key_column, 'post_type_id', 'day'],
+                    set_={'repost_count': model.repost_count + statement.excluded.repost_count}
+                )
+            self.db_session.execute(statement)
+
+    def _decrement(self, model, key_column, counts: Counter) -> None:
+        for (key, post_type_id, day), count in counts.items():
+            self.db_session.execute(
+                update(model)
+                .where(key_column == key, model.post_type_id == post_type_id, model.day == day)
+                .values(repost_count=model.repost_count - count)
+                .execution_options(synchronize_session=False)
+            )
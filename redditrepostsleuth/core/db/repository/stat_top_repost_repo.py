@@ -1,6 +1,6 @@
 from typing import List
 
-from redditrepostsleuth.core.db.databasemodels import StatsTopRepost
+from redditrepostsleuth.core.db.databasemodels import StatsTopRepost, Post
 
 
 class StatTopRepostRepo:
@@ -10,4 +10,17 @@ class StatTopRepostRepo:
         self.db_session.add(item)
 
     def get_all(self, day_range: int, nsfw: bool = False) -> list[StatsTopRepost]:
-        return self.db_session.query(StatsTopRepost).filter(StatsTopRepost.post_type_id == 2, StatsTopRepost.day_range == day_range, StatsTopRepost.nsfw == nsfw).all()
\ No newline at end of file
+        return self.db_session.query(StatsTopRepost).filter(StatsTopRepost.post_type_id == 2, StatsTopRepost.day_range == day_range, StatsTopRepost.nsfw == nsfw).all()
+
+    def get_all_with_posts(self, day_range: int, nsfw: bool = False) -> list[tuple[StatsTopRepost, Post]]:
+        """
+        Top image reposts along with the post each one is for, in a single query
+        :param day_range: Day range of the stats
+        :param nsfw: Include NSFW or SFW posts
+        :return: List of (StatsTopRepost, Post)
+        """
+        return self.db_session.query(StatsTopRepost, Post).join(Post, Post.id == StatsTopRepost.post_id).filter(
+            StatsTopRepost.post_type_id == 2,
+            StatsTopRepost.day_range == day_range,
+            StatsTopRepost.nsfw == nsfw
+        ).order_by(StatsTopRepost.repost_count.desc()).all()
@@ -15,6 +15,9 @@ class SubredditRepo:
     def get_by_name(self, name: str):
         return self.db_session.query(Subreddit).filter(Subreddit.name == name).first()
 
+    def get_existing_names(self, names: list[str]) -> set[str]:
+        return {row.name for row in self.db_session.query(Subreddit.name).filter(Subreddit.name.in_(names)).all()}
+
     def get_subreddits_to_update(self, limit: int = None, offset: int = None) -> list[Subreddit]:
         delta = datetime.datetime.now(datetime.UTC) - datetime.timedelta(days=3)
         return self.db_session.query(Subreddit).filter(or_(Subreddit.added_at < delta, Subreddit.last_checked == None)).limit(limit).offset(offset).all()
\ No newline at end of file
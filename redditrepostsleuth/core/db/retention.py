@@ -0,0 +1,240 @@
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, time
+from typing import Optional, Iterator
+
+from sqlalchemy import text, select, delete
+from sqlalchemy.exc import SQLAlchemyError
+
+from redditrepostsleuth.core.db.databasemodels import Base
+from redditrepostsleuth.core.db.purge_engine import PurgeEngine
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+
+log = logging.getLogger(__name__)
+
+FUTURE_PARTITION = 'p_future'
+PARTITION_NAME_PATTERN = re.compile(r'^p_(\d{4})(\d{2})$')
+
+
+@dataclass
+class RetentionPolicy:
+    table: str
+    column: str
+    days: Optional[int] = None  # None only maintains partitions and never removes rows
+
+
+def get_retention_policies(config) -> list[RetentionPolicy]:
+    """
+    Build the retention policies from config.  monitored_sub_checked comes before repost_search since it references it
+    :param config: Config
+    """
+    def days(value, default=None) -> Optional[int]:
+        return int(value) if value else default
+
+    return [
+        RetentionPolicy(
+            'monitored_sub_checked', 'checked_at', days(config.monitored_sub_checked_retention_days)
+        ),
+        RetentionPolicy('repost_search', 'searched_at', days(config.search_history_retention_days, 120)),
+    ]
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'p_{month:%Y%m}'
+
+
+def partition_upper_bound(name: str) -> Optional[date]:
+    """
+    Monthly partitions hold rows from before the start of the next month
+    :param name: Partition name
+    :return: Exclusive upper bound or None if this isn't a monthly partition
+    """
+    match = PARTITION_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    return add_months(date(int(match.group(1)), int(match.group(2)), 1), 1)
+
+
+def partition_definitions(months: list[date]) -> str:
+    partitions = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1).isoformat()}'))"
+        for month in months
+    ]
+    partitions.append(f'PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE')
+    return ', '.join(partitions)
+
+
+def build_partition_by_sql(table: str, column: str, months: list[date]) -> str:
+    return f'ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS({column})) ({partition_definitions(months)})'
+
+
+def build_add_partitions_sql(table: str, months: list[date]) -> str:
+    return f'ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({partition_definitions(months)})'
+
+
+def missing_partitions(existing: list[str], through: date) -> list[date]:
+    """
+    Monthly partitions that need to be added so there is a partition for every month up to and including through
+    :param existing: Current partition names
+    :param through: Last month that needs a partition
+    """
+    bounds = [bound for bound in map(partition_upper_bound, existing) if bound]
+    if not bounds:
+        return []
+    months = []
+    month = max(bounds)
+    while month <= through:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def expired_partitions(existing: list[str], cutoff: datetime) -> list[str]:
+    """
+    Partitions that only hold rows older than the cutoff
+    :param existing: Current partition names
+    :param cutoff: Rows older than this can be removed
+    """
+    return [
+        name for name in existing
+        if (bound := partition_upper_bound(name)) and bound <= cutoff.date()
+    ]
+
+
+class RetentionManager:
+    """
+    Drops expired partitions of the partitioned history tables and deletes expired rows in chunks from the rest
+    """
+    def __init__(
+            self,
+            uowm: UnitOfWorkManager,
+            policies: list[RetentionPolicy],
+            batch_size: int = 5000,
+            months_ahead: int = 3
+    ):
+        self.uowm = uowm
+        self.policies = policies
+        self.batch_size = batch_size
+        self.months_ahead = months_ahead
+
+    def run(self) -> dict[str, int]:
+        """
+        Apply every policy.  A failure on one table doesn't stop the others
+        :return: Partitions dropped or rows deleted per table
+        """
+        results = {}
+        for policy in self.policies:
+            try:
+                results[policy.table] = self.apply(policy)
+            except Exception as e:
+                log.exception('Failed to apply retention to %s', policy.table)
+        return results
+
+    def apply(self, policy: RetentionPolicy) -> int:
+        partitions = self.get_partitions(policy.table)
+        cutoff = datetime.utcnow() - timedelta(days=policy.days) if policy.days else None
+        if partitions:
+            self.add_future_partitions(policy.table, partitions)
+            if not cutoff:
+                return 0
+            return self.drop_expired_partitions(policy.table, partitions, cutoff)
+        if not cutoff:
+            return 0
+        return self.delete_older_than(policy, cutoff)
+
+    def get_partitions(self, table: str) -> list[str]:
+        """
+        :param table: Table name
+        :return: Partition names in order.  Empty if the table isn't partitioned or partitions aren't supported
+        """
+        try:
+            with self.uowm.start() as uow:
+                rows = uow.session.execute(
+                    text(
+                        'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+                        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL '
+                        'ORDER BY PARTITION_ORDINAL_POSITION'
+                    ),
+                    {'table': table}
+                ).scalars().all()
+        except SQLAlchemyError as e:
+            log.debug('Unable to read partitions for %s: %s', table, e)
+            return []
+        return list(rows)
+
+    def add_future_partitions(self, table: str, partitions: list[str]) -> None:
+        months = missing_partitions(partitions, add_months(date.today().replace(day=1), self.months_ahead))
+        if not months or FUTURE_PARTITION not in partitions:
+            return
+        log.info('Adding partitions %s to %s', [partition_name(m) for m in months], table)
+        self._execute_ddl(build_add_partitions_sql(table, months))
+
+    def drop_expired_partitions(self, table: str, partitions: list[str], cutoff: datetime) -> int:
+        """
+        Drop partitions past the cutoff one at a time, oldest first.  There are no foreign keys on partitioned tables
+        so references to repost searches are cleared before their partition goes, the same as the chunked deletes do
+        """
+        expired = expired_partitions(partitions, cutoff)
+        if not expired:
+            log.info('No partitions to drop from %s', table)
+            return 0
+        purge_engine = PurgeEngine(self.uowm, chunk_size=self.batch_size)
+        for name in expired:
+            if table == 'repost_search':
+                # Older partitions are already gone so this only finds rows in this one
+                before = datetime.combine(partition_upper_bound(name), time())
+                for ids in self._iter_ids(table, 'searched_at', before):
+                    purge_engine.clear_search_references(ids)
+            log.info('Dropping partition %s from %s', name, table)
+            self._execute_ddl(f'ALTER TABLE {table} DROP PARTITION {name}')
+        return len(expired)
+
+    def delete_older_than(self, policy: RetentionPolicy, cutoff: datetime) -> int:
+        """
+        Delete rows older than the cutoff in batches
+        :return: Rows deleted
+        """
+        table = Base.metadata.tables[policy.table]
+        purge_engine = PurgeEngine(self.uowm, chunk_size=self.batch_size)
+        deleted = 0
+        for ids in self._iter_ids(policy.table, policy.column, cutoff):
+            if policy.table == 'repost_search':
+                # Clears references from reposts and monitored sub checks
+                deleted += purge_engine.purge_searches(ids).rows['repost_search']
+                continue
+            with self.uowm.start() as uow:
+                deleted += uow.session.execute(delete(table).where(table.c.id.in_(ids))).rowcount
+                uow.commit()
+        log.info('Deleted %s rows from %s older than %s', deleted, policy.table, cutoff)
+        return deleted
+
+    def _iter_ids(self, table_name: str, column: str, before: datetime) -> Iterator[list[int]]:
+        """
+        Batches of IDs of rows older than before, walking the primary key so each batch starts where the last one
+        ended
+        """
+        table = Base.metadata.tables[table_name]
+        last_id = 0
+        while True:
+            with self.uowm.start() as uow:
+                ids = uow.session.execute(
+                    select(table.c.id)
+                    .where(table.c[column] < before, table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(self.batch_size)
+                ).scalars().all()
+            if not ids:
+                return
+            last_id = ids[-1]
+            yield ids
+
+    def _execute_ddl(self, sql: str) -> None:
+        with self.uowm.start() as uow:
+            uow.session.execute(text(sql))
+            uow.commit()
@@ -7,6 +7,7 @@ from redditrepostsleuth.core.db.repository.bot_private_message_repo import BotPr
 from redditrepostsleuth.core.db.repository.botcommentrepo import BotCommentRepo
 from redditrepostsleuth.core.db.repository.config_message_template_repo import ConfigMessageTemplateRepo
 from redditrepostsleuth.core.db.repository.http_proxy_repo import HttpProxyRepo
+from redditrepostsleuth.core.db.repository.image_hash_cache_repo import ImageHashCacheRepo
 from redditrepostsleuth.core.db.repository.image_index_map_rep import ImageIndexMapRepo
 from redditrepostsleuth.core.db.repository.indexbuildtimesrepository import IndexBuildTimesRepository
 from redditrepostsleuth.core.db.repository.investigatepostrepo import InvestigatePostRepo
@@ -26,6 +27,7 @@ from redditrepostsleuth.core.db.repository.repost_search_repo import RepostSearc
 from redditrepostsleuth.core.db.repository.repost_watch_repo import RepostWatchRepo
 from redditrepostsleuth.core.db.repository.site_admin_repo import SiteAdminRepo
 from redditrepostsleuth.core.db.repository.stat_daily_count_repo import StatDailyCountRepo
+from redditrepostsleuth.core.db.repository.stat_repost_rollup_repo import StatRepostRollupRepo
 from redditrepostsleuth.core.db.repository.stat_top_repost_repo import StatTopRepostRepo
 from redditrepostsleuth.core.db.repository.stats_top_reposter_repo import StatTopReposterRepo
 from redditrepostsleuth.core.db.repository.subreddit_repo import SubredditRepo
@@ -139,6 +141,10 @@ class UnitOfWork:
     def meme_hash(self) -> MemeHashRepo:
         return MemeHashRepo(self.session)
 
+    @property
+    def image_hash_cache(self) -> ImageHashCacheRepo:
+        return ImageHashCacheRepo(self.session)
+
     @property
     def http_proxy(self) -> HttpProxyRepo:
         return HttpProxyRepo(self.session)
@@ -155,6 +161,10 @@ class UnitOfWork:
     def stat_daily_count(self) -> StatDailyCountRepo:
         return StatDailyCountRepo(self.session)
 
+    @property
+    def stat_repost_rollup(self) -> StatRepostRollupRepo:
+        return StatRepostRollupRepo(self.session)
+
     @property
     def stat_top_repost(self) -> StatTopRepostRepo:
         return StatTopRepostRepo(self.session)
@@ -7,6 +7,10 @@ class ImageConversionException(RepostSleuthException):
     def __init__(self, message):
         super(ImageConversionException, self).__init__(message)
 
+class ImageTooLargeException(ImageConversionException):
+    def __init__(self, message):
+        super(ImageTooLargeException, self).__init__(message)
+
 class FutureDataRepostCheckException(RepostSleuthException):
     def __init__(self, message):
         super(FutureDataRepostCheckException, self).__init__(message)
@@ -78,4 +82,7 @@ class RedGifsTokenException(RepostSleuthException):
 
 class RedditTokenExpiredException(RepostSleuthException):
     def __init__(self, message):
-        super(RedditTokenExpiredException, self).__init__(message)
\ No newline at end of file
+        super(RedditTokenExpiredException, self).__init__(message)
+class UnsupportedTaskPayloadException(RepostSleuthException):
+    def __init__(self, message):
+        super(UnsupportedTaskPayloadException, self).__init__(message)
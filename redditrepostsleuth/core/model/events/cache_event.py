@@ -0,0 +1,19 @@
+import platform
+
+from redditrepostsleuth.core.model.events.influxevent import InfluxEvent
+
+
+class CacheEvent(InfluxEvent):
+    def __init__(self, cache_name: str, stats: dict[str, float], event_type='cache'):
+        super().__init__(event_type=event_type)
+        self.cache_name = cache_name
+        self.stats = stats
+        self.hostname = platform.node()
+
+    def get_influx_event(self):
+        event = super().get_influx_event()
+        for k, v in self.stats.items():
+            event[0]['fields'][k] = v
+        event[0]['tags']['cache_name'] = self.cache_name
+        event[0]['tags']['hostname'] = self.hostname
+        return event
@@ -0,0 +1,18 @@
+import platform
+
+from redditrepostsleuth.core.model.events.influxevent import InfluxEvent
+
+
+class SummonsLatencyEvent(InfluxEvent):
+    def __init__(self, stage: str, duration: float, event_type='summons_latency'):
+        super().__init__(event_type=event_type)
+        self.stage = stage
+        self.duration = duration
+        self.hostname = platform.node()
+
+    def get_influx_event(self):
+        event = super().get_influx_event()
+        event[0]['fields']['duration'] = self.duration
+        event[0]['tags']['stage'] = self.stage
+        event[0]['tags']['hostname'] = self.hostname
+        return event
@@ -41,6 +41,10 @@ class ImageSearchResults(SearchResults):
         self._target_hash = hashes['dhash_h']
         return self._target_hash
 
+    @target_hash.setter
+    def target_hash(self, image_hash: Text) -> None:
+        self._target_hash = image_hash
+
     @property
     def target_hamming_distance(self):
         return get_hamming_from_percent(self.search_settings.target_match_percent, len(self.target_hash))
@@ -0,0 +1,85 @@
+from typing import Iterable, Iterator, Optional, Callable, Union
+
+from redditrepostsleuth.core.model.search.search_match import SearchMatch
+
+
+class SearchMatchCollection:
+    """
+    Ordered collection of search matches keyed by the match's post.id with a secondary index on post.post_id.
+    Adding a match for a post that is already in the collection is ignored, so de-duplication, membership checks and
+    removal are all O(1)
+    """
+    def __init__(self, matches: Iterable[SearchMatch] = None):
+        self._matches: dict[Union[int, str], SearchMatch] = {}
+        self._keys_by_post_id: dict[str, Union[int, str]] = {}
+        for match in matches or []:
+            self.add(match)
+
+    @staticmethod
+    def _key(match: SearchMatch) -> Union[int, str]:
+        # Posts built outside of the DB don't have an ID yet
+        return match.post.id if match.post.id is not None else match.post.post_id
+
+    def add(self, match: SearchMatch) -> bool:
+        """
+        Add a match if its post is not already in the collection
+        :param match: Match to add
+        :return: True if the match was added
+        """
+        key = self._key(match)
+        if key in self._matches:
+            return False
+        self._matches[key] = match
+        if match.post.post_id is not None:
+            self._keys_by_post_id[match.post.post_id] = key
+        return True
+
+    def remove(self, match: SearchMatch) -> None:
+        key = self._key(match)
+        removed = self._matches.pop(key, None)
+        if removed and removed.post.post_id is not None:
+            self._keys_by_post_id.pop(removed.post.post_id, None)
+
+    def get_by_post_id(self, post_id: str) -> Optional[SearchMatch]:
+        key = self._keys_by_post_id.get(post_id)
+        return self._matches.get(key) if key is not None else None
+
+    def remove_by_post_id(self, post_id: str) -> Optional[SearchMatch]:
+        match = self.get_by_post_id(post_id)
+        if match:
+            self.remove(match)
+        return match
+
+    def has_post_id(self, post_id: str) -> bool:
+        return post_id in self._keys_by_post_id
+
+    def filter(self, predicate: Callable[[SearchMatch], bool]) -> 'SearchMatchCollection':
+        """
+        Remove every match that fails the predicate.  Works with all filters in repost_filters
+        :param predicate: Returns True for matches to keep
+        :return: This collection
+        """
+        for match in [m for m in self._matches.values() if not predicate(m)]:
+            self.remove(match)
+        return self
+
+    def keep_post_ids(self, post_ids: Iterable[str]) -> 'SearchMatchCollection':
+        """
+        Remove every match whose post_id is not in the provided IDs
+        :param post_ids: Reddit post IDs to keep
+        :return: This collection
+        """
+        post_ids = set(post_ids)
+        return self.filter(lambda m: m.post.post_id in post_ids)
+
+    def to_list(self) -> list[SearchMatch]:
+        return list(self._matches.values())
+
+    def __contains__(self, match: SearchMatch) -> bool:
+        return self._key(match) in self._matches
+
+    def __iter__(self) -> Iterator[SearchMatch]:
+        return iter(self.to_list())
+
+    def __len__(self) -> int:
+        return len(self._matches)
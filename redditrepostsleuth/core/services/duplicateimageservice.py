@@ -1,12 +1,14 @@
 import json
 import logging
+from collections import defaultdict
+from copy import copy
 from time import perf_counter
 from typing import List, Text, Optional
 
 import requests
 from distance import hamming
 from praw import Reddit
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 from sqlalchemy.exc import IntegrityError
 
 from redditrepostsleuth.core.config import Config
@@ -18,15 +20,23 @@ from redditrepostsleuth.core.model.image_index_api_result import APISearchResult
 from redditrepostsleuth.core.model.image_search_settings import ImageSearchSettings
 from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
 from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
+from redditrepostsleuth.core.model.search.search_match_collection import SearchMatchCollection
 from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.image_hash_cache import ImageHashCacheService
+from redditrepostsleuth.core.services.search_result_cache import SearchResultCache
+from redditrepostsleuth.core.services.hamming_search_index import HammingSearchIndex, LOCAL_INDEX_NAME, \
+    hex_hamming_distances, get_hamming_search_index
 from redditrepostsleuth.core.util.helpers import get_default_image_search_settings
 from redditrepostsleuth.core.util.imagehashing import get_image_hashes
 from redditrepostsleuth.core.util.repost_filters import annoy_distance_filter, hamming_distance_filter
 from redditrepostsleuth.core.util.repost.repost_helpers import sort_reposts, get_closest_image_match, set_all_title_similarity, \
-    filter_search_results, log_search
+    filter_search_results, log_search, log_searches
 
 log = logging.getLogger(__name__)
 
+# Seconds to wait on the index API.  A search that takes longer than this has failed
+INDEX_API_TIMEOUT = 30
+
 class DuplicateImageService:
     def __init__(
             self,
@@ -34,6 +44,9 @@ class DuplicateImageService:
             event_logger: EventLogging,
             reddit: Reddit,
             config: Config = None,
+            search_index: HammingSearchIndex = None,
+            hash_cache: ImageHashCacheService = None,
+            result_cache: SearchResultCache = None
             ):
         self.reddit = reddit
         self.uowm = uowm
@@ -42,8 +55,21 @@ class DuplicateImageService:
             self.config = config
         else:
             self.config = Config()
+        self.search_index = search_index
+        if not self.search_index and self.config.image_search_backend == 'local':
+            log.info('Using local hamming index for image searches')
+            self.search_index = get_hamming_search_index()
+        self.hash_cache = hash_cache
+        self.result_cache = result_cache
+        # Set once the index API 404s a batch search so we don't retry it for every batch
+        self.batch_search_supported = True
         log.info('Created dup image service')
 
+    def _get_image_hashes(self, url: str, hash_size: int) -> dict:
+        if self.hash_cache:
+            return self.hash_cache.get_image_hashes(url, hash_size=hash_size)
+        return get_image_hashes(url, hash_size=hash_size)
+
     def _filter_results_for_reposts(
             self,
             search_results: ImageSearchResults,
@@ -83,8 +109,11 @@ class DuplicateImageService:
 
         # Has to be after closest match so we don't drop closest
         search_results.search_times.start_timer('distance_filter_time')
-        search_results.matches = list(filter(annoy_distance_filter(search_results.search_settings.target_annoy_distance), search_results.matches))
-        search_results.matches = list(filter(hamming_distance_filter(search_results.target_hamming_distance), search_results.matches))
+        search_results.matches = SearchMatchCollection(search_results.matches).filter(
+            annoy_distance_filter(search_results.search_settings.target_annoy_distance)
+        ).filter(
+            hamming_distance_filter(search_results.target_hamming_distance)
+        ).to_list()
         search_results.search_times.stop_timer('distance_filter_time')
 
         if search_results.meme_template:
@@ -131,23 +160,64 @@ class DuplicateImageService:
             checked_post=post,
             search_settings=search_settings
         )
+        return self._search(search_results, source, sort_by, cache_post_id=post.post_id if post else None)
 
-        search_results.search_times.start_timer('total_search_time')
+    def check_image_hash(
+            self,
+            image_hash: str,
+            meme_hash: str = None,
+            url: str = None,
+            post: Post = None,
+            source='unknown',
+            sort_by='created',
+            search_settings: ImageSearchSettings = None,
+    ) -> ImageSearchResults:
+        """
+        Execute a search for an image that has already been hashed.  Nothing is downloaded for the searched image
+        :param image_hash: dhash_h of the image
+        :param meme_hash: dhash_h of the image at the meme filter hash size.  Required for the meme filter
+        :param url: URL of the image if it has one.  Only used in the results
+        :param post: Database post object
+        :param source: Source that triggered this search.  Used for logging
+        :param sort_by: Sort results by
+        :param search_settings: Search settings to use when searching
+        :return: Search Results
+        :rtype: ImageSearchResults
+        """
+        if not search_settings:
+            log.info('No search settings provided, using default')
+            search_settings = get_default_image_search_settings(self.config)
+
+        search_results = ImageSearchResults(url, checked_post=post, search_settings=search_settings)
+        search_results.target_hash = image_hash
+        if search_settings.meme_filter and not meme_hash and not url:
+            log.warning('No meme hash provided, disabled meme filter')
+            search_settings.meme_filter = False
+        return self._search(search_results, source, sort_by, meme_hash=meme_hash, cache_image_hash=image_hash)
 
-        if search_settings.meme_filter:
-            search_results.search_times.start_timer('meme_detection_time')
-            search_results.meme_template = self._get_meme_template(search_results.target_hash)
-            search_results.search_times.stop_timer('meme_detection_time')
-            if search_results.meme_template:
-                search_settings.target_match_percent = 100  # Keep only 100% matches on default hash size
-                search_results.search_times.start_timer('set_meme_hash_time')
-                search_results.meme_hash = self._get_meme_hash(url, post_id=post.post_id if post else None)
-                search_results.search_times.stop_timer('set_meme_hash_time')
-                if not search_results.meme_hash:
-                    log.warning('No meme hash, disabled meme filter')
-                    search_results.meme_template = None
-                else:
-                    log.info('Using meme filter %s', search_results.meme_template.id)
+    def _search(
+            self,
+            search_results: ImageSearchResults,
+            source: str,
+            sort_by: str,
+            meme_hash: str = None,
+            cache_post_id: str = None,
+            cache_image_hash: str = None
+    ) -> ImageSearchResults:
+        search_settings = search_results.search_settings
+        search_results.search_times.start_timer('total_search_time')
+        cache_key = None
+        if self.result_cache:
+            cache_key = self.result_cache.key(search_settings, post_id=cache_post_id, image_hash=cache_image_hash)
+        if cache_key:
+            with self.uowm.start() as uow:
+                if self.result_cache.load(cache_key, search_results, uow):
+                    search_results.search_times.stop_timer('total_search_time')
+                    log_search(uow, search_results, source, 'image')
+                    log.info('Using cached search results with %s matches', len(search_results.matches))
+                    return search_results
+
+        self._set_meme_filter(search_results, meme_hash=meme_hash)
 
         log.debug('Search Settings: %s', search_settings)
 
@@ -161,19 +231,130 @@ class DuplicateImageService:
         )
         search_results.search_times.stop_timer('image_search_api_time')
 
+        self._process_api_search_results(search_results, api_search_results, source, sort_by=sort_by)
+        if cache_key:
+            self.result_cache.save(cache_key, search_results)
+
+        with self.uowm.start() as uow:
+            log_search(uow, search_results, source, 'image')
+
+        log.info('Searched %s items and found %s matches', search_results.total_searched, len(search_results.matches))
+        return search_results
+
+    def check_images(
+            self,
+            posts: list[Post],
+            source='unknown',
+            sort_by='created',
+            search_settings: ImageSearchSettings = None,
+    ) -> list[ImageSearchResults]:
+        """
+        Execute a search for a batch of posts.  The index is queried once for all posts, matches are resolved with a
+        single query and the searches are logged in one transaction
+        :param posts: Database post objects.  Each post must have its hashes loaded
+        :param source: Source that triggered this search.  Used for logging
+        :param sort_by: Sort results by
+        :param search_settings: Search settings to use for every post in the batch
+        :return: Search results in the same order as the provided posts
+        :rtype: list[ImageSearchResults]
+        """
+        if not posts:
+            return []
+
+        if not search_settings:
+            log.info('No search settings provided, using default')
+            search_settings = get_default_image_search_settings(self.config)
+
+        all_search_results = []
+        for post in posts:
+            # The meme filter adjusts the settings per search so each post gets its own copy
+            search_results = ImageSearchResults(post.url, checked_post=post, search_settings=copy(search_settings))
+            search_results.search_times.start_timer('total_search_time')
+            self._set_meme_filter(search_results)
+            all_search_results.append(search_results)
+
+        api_start = perf_counter()
+        all_api_search_results = self._get_matches_batch(all_search_results)
+        api_time = round(perf_counter() - api_start, 5)
+
+        match_posts = self._get_match_posts(all_api_search_results)
+        for search_results, api_search_results in zip(all_search_results, all_api_search_results):
+            search_results.search_times.image_search_api_time = api_time
+            self._process_api_search_results(
+                search_results,
+                api_search_results,
+                source,
+                sort_by=sort_by,
+                match_posts=match_posts
+            )
+
+        with self.uowm.start() as uow:
+            log_searches(uow, all_search_results, source, 'image')
+
+        log.info('Batch searched %s posts', len(all_search_results))
+        return all_search_results
+
+    def _set_meme_filter(self, search_results: ImageSearchResults, meme_hash: str = None) -> None:
+        """
+        Check if the searched image is a known meme template and set the meme hash if it is
+        :param search_results: Search results to set the meme template and hash on
+        :param meme_hash: Meme hash of the searched image if it's already known
+        """
+        search_settings = search_results.search_settings
+        if not search_settings.meme_filter:
+            return
+
+        post = search_results.checked_post
+        search_results.search_times.start_timer('meme_detection_time')
+        search_results.meme_template = self._get_meme_template(search_results.target_hash)
+        search_results.search_times.stop_timer('meme_detection_time')
+        if search_results.meme_template:
+            search_settings.target_match_percent = 100  # Keep only 100% matches on default hash size
+            search_results.search_times.start_timer('set_meme_hash_time')
+            search_results.meme_hash = meme_hash or self._get_meme_hash(
+                search_results.checked_url,
+                post_id=post.post_id if post else None
+            )
+            search_results.search_times.stop_timer('set_meme_hash_time')
+            if not search_results.meme_hash:
+                log.warning('No meme hash, disabled meme filter')
+                search_results.meme_template = None
+            else:
+                log.info('Using meme filter %s', search_results.meme_template.id)
+
+    def _process_api_search_results(
+            self,
+            search_results: ImageSearchResults,
+            api_search_results: APISearchResults,
+            source: str,
+            sort_by='created',
+            match_posts: dict[tuple[str, int], Post] = None
+    ) -> ImageSearchResults:
+        """
+        Take the raw results from the index, build the matches and run them through the filters
+        :param search_results: Search results to populate
+        :param api_search_results: Raw results from the index
+        :param source: Source that triggered this search.  Used for logging
+        :param sort_by: Sort results by
+        :param match_posts: Optional pre-loaded posts keyed by index name and index ID
+        """
         search_results.search_times.index_search_time = float(api_search_results.total_search_time)
         search_results.total_searched = api_search_results.total_searched
 
         search_results.search_times.start_timer('set_match_post_time')
-        search_results.matches = self._build_search_results(api_search_results, url, search_results.target_hash)
-
+        search_results.matches = self._build_search_results(
+            api_search_results,
+            search_results.checked_url,
+            search_results.target_hash,
+            match_posts=match_posts
+        )
         search_results.search_times.stop_timer('set_match_post_time')
 
         search_results.search_times.start_timer('remove_duplicate_time')
         search_results.matches = self._remove_duplicates(search_results.matches)
         search_results.search_times.stop_timer('remove_duplicate_time')
 
-        if post and search_results.search_settings.check_title:
+        if search_results.checked_post and search_results.search_settings.check_title:
             search_results.search_times.start_timer('set_title_similarity_time')
             search_results.matches = set_all_title_similarity(search_results.checked_post.title, search_results.matches)
             search_results.search_times.stop_timer('set_title_similarity_time')
@@ -185,10 +366,6 @@ class DuplicateImageService:
             )
         search_results.search_times.stop_timer('total_search_time')
         self._log_search_time(search_results, source)
-        with self.uowm.start() as uow:
-            log_search(uow, search_results, source, 'image')
-
-        log.info('Searched %s items and found %s matches', search_results.total_searched, len(search_results.matches))
         return search_results
 
     def check_gallery(
@@ -220,7 +397,7 @@ class DuplicateImageService:
                     return meme_hash.hash
 
             try:
-                meme_hashes = get_image_hashes(url, hash_size=self.config.default_meme_filter_hash_size)
+                meme_hashes = self._get_image_hashes(url, hash_size=self.config.default_meme_filter_hash_size)
                 meme_hash = meme_hashes['dhash_h']
             except ImageConversionException:
                 log.warning('Failed to get meme hash. ')
@@ -262,6 +439,14 @@ class DuplicateImageService:
         :param max_depth: Max depth to search index
         :rtype: ImageIndexApiResult
         """
+        if self.search_index:
+            return self.search_index.search(
+                hash,
+                target_hamming_distance,
+                target_annoy_distance,
+                max_matches=max_matches
+            )
+
         try:
 
             params = {
@@ -271,8 +456,8 @@ class DuplicateImageService:
                 'a_filter': target_annoy_distance,
                 'h_filter': target_hamming_distance
             }
-            r = requests.get(f'{self.config.index_api}/image', params=params)
-        except ConnectionError:
+            r = requests.get(f'{self.config.index_api}/image', params=params, timeout=INDEX_API_TIMEOUT)
+        except (ConnectionError, Timeout):
             log.error('Failed to connect to Index API')
             raise NoIndexException('Failed to connect to Index API')
         except Exception as e:
@@ -290,38 +475,136 @@ class DuplicateImageService:
         except TypeError as e:
             raise NoIndexException(f'Failed to convert API result: {str(e)}')
 
+    def _get_matches_single(self, searches: list[dict]) -> list[APISearchResults]:
+        return [
+            self._get_matches(s['hash'], s['h_filter'], s['a_filter'], max_matches=s['max_results'], max_depth=s['max_depth'])
+            for s in searches
+        ]
+
+    def _get_matches_batch(self, all_search_results: list[ImageSearchResults]) -> list[APISearchResults]:
+        """
+        Search the index for every provided search in a single request
+        Falls back to individual searches if the index API does not support batch searches
+        :param all_search_results: Searches to run
+        :return: Index results in the same order as the provided searches
+        """
+        searches = [
+            {
+                'hash': search_results.target_hash,
+                'max_results': search_results.search_settings.max_matches,
+                'max_depth': search_results.search_settings.max_depth,
+                'a_filter': search_results.search_settings.target_annoy_distance,
+                'h_filter': search_results.target_hamming_distance
+            }
+            for search_results in all_search_results
+        ]
+
+        if self.search_index:
+            return [
+                self.search_index.search(s['hash'], s['h_filter'], s['a_filter'], max_matches=s['max_results'])
+                for s in searches
+            ]
+
+        if not self.batch_search_supported:
+            return self._get_matches_single(searches)
+
+        try:
+            r = requests.post(
+                f'{self.config.index_api}/image/batch',
+                json={'searches': searches},
+                timeout=INDEX_API_TIMEOUT
+            )
+        except (ConnectionError, Timeout):
+            log.error('Failed to connect to Index API')
+            raise NoIndexException('Failed to connect to Index API')
+        except Exception as e:
+            log.exception('Problem with image index api', exc_info=True)
+            raise
+
+        if r.status_code == 404:
+            log.warning('Index API does not support batch search.  Using single searches from now on')
+            self.batch_search_supported = False
+            return self._get_matches_single(searches)
+
+        if r.status_code != 200:
+            log.error('Unexpected status from index API: %s | %s', r.status_code, r.text)
+            raise NoIndexException(f'Unexpected status {r.status_code}')
+
+        res_data = json.loads(r.text)
+
+        try:
+            return [APISearchResults(**result) for result in res_data['results']]
+        except (TypeError, KeyError) as e:
+            raise NoIndexException(f'Failed to convert API result: {str(e)}')
+
+    def _get_match_posts(self, all_api_search_results: list[APISearchResults]) -> dict[tuple[str, int], tuple[Post, str]]:
+        """
+        Load the posts for every match in the provided index results with a single query per lookup type.
+        Hashes are eager loaded and the dhash_h is projected out while the session is open
+        :param all_api_search_results: Raw results from the index
+        :return: Dict of post and dhash_h pairs keyed by index name and index ID
+        """
+        ids_by_index = defaultdict(set)
+        for api_search_results in all_api_search_results:
+            for r in api_search_results.results:
+                ids_by_index[r.index_name].update(m.id for m in r.matches)
+
+        loaded = []
+        with self.uowm.start() as uow:
+            # Local index returns post IDs directly so there is no index map to resolve
+            local_ids = ids_by_index.pop(LOCAL_INDEX_NAME, None)
+            if local_ids:
+                loaded += [((LOCAL_INDEX_NAME, post.id), post) for post in uow.posts.get_all_by_ids_with_hashes(list(local_ids))]
+
+            ids_by_index = {index_name: list(ids) for index_name, ids in ids_by_index.items() if ids}
+            if ids_by_index:
+                loaded += [((im.index_name, im.annoy_index_id), im.post) for im in uow.image_index_map.get_all_in_by_index_ids(ids_by_index)]
+
+        match_posts = {}
+        for key, post in loaded:
+            dhash_h = next((i.hash for i in post.hashes if i.hash_type_id == 1), None)
+            if dhash_h:
+                match_posts[key] = (post, dhash_h)
+        return match_posts
+
     def _build_search_results(
             self,
             api_search_results: APISearchResults,
             url: Text,
             searched_hash: Text,
+            match_posts: dict[tuple[str, int], tuple[Post, str]] = None
     ) -> List[ImageSearchMatch]:
         """
         Take a list of index matches and convert them to ImageSearchMatches
-        :param index_matches: Dict of raw matches from index search
+        :param api_search_results: Raw results from the index
         :param url: URL of the image we searched
+        :param searched_hash: Hash of the image we searched
+        :param match_posts: Optional pre-loaded post and dhash_h pairs keyed by index name and index ID
         :return:
         """
-        results = []
         log.debug('Building search results from index matches')
-        with self.uowm.start() as uow:
-            result_map = {}
-            for r in api_search_results.results:
-                index_matches = uow.image_index_map.get_all_in_by_ids_and_index([m.id for m in r.matches], r.index_name)
-
-                for im in index_matches:
-                    search_result = next((x for x in r.matches if x.id == im.annoy_index_id), None)
-                    image_match_hash = next((i for i in im.post.hashes if i.hash_type_id == 1), None) # get dhash_h
-                    results.append(
-                        ImageSearchMatch(
-                            url,
-                            im.post_id,
-                            im.post,
-                            hamming(searched_hash, image_match_hash.hash),
-                            search_result.distance,
-                            len(image_match_hash.hash)
-                        )
-                    )
+        if match_posts is None:
+            match_posts = self._get_match_posts([api_search_results])
+
+        found = []
+        for r in api_search_results.results:
+            for search_result in r.matches:
+                match_post = match_posts.get((r.index_name, search_result.id))
+                if match_post:
+                    found.append((search_result, *match_post))
+
+        distances = hex_hamming_distances(searched_hash, [match_hash for _, _, match_hash in found])
+        results = [
+            ImageSearchMatch(
+                url,
+                post.id,
+                post,
+                h_distance,
+                search_result.distance,
+                len(match_hash)
+            )
+            for (search_result, post, match_hash), h_distance in zip(found, distances)
+        ]
 
         log.debug('%s results built', len(results))
         return results
@@ -338,12 +621,7 @@ class DuplicateImageService:
 
     def _remove_duplicates(self, matches: List[ImageSearchMatch]) -> List[ImageSearchMatch]:
         log.debug('Remove duplicates from %s matches', len(matches))
-        results = []
-        for a in matches:
-            match = next((x for x in results if x.post.id == a.post.id), None)
-            if match:
-                continue
-            results.append(a)
+        results = SearchMatchCollection(matches).to_list()
         log.debug('%s matches after duplicate removal', len(results))
         return results
 
@@ -390,7 +668,7 @@ class DuplicateImageService:
             match_hash = cached_meme_hashes.get(match.post.post_id)
             if not match_hash:
                 try:
-                    meme_hashes = get_image_hashes(match.post.url, hash_size=self.config.default_meme_filter_hash_size)
+                    meme_hashes = self._get_image_hashes(match.post.url, hash_size=self.config.default_meme_filter_hash_size)
                     match_hash = meme_hashes['dhash_h']
                 except ImageConversionException:
                     log.warning('Failed to get meme hash for %s.  Sending to delete queue', match.post.post_id)
@@ -1,19 +1,32 @@
+import atexit
+import os
+import threading
+import time
+from collections import Counter, deque
 from datetime import datetime, timedelta
-from time import sleep
-from typing import NoReturn
+from typing import Optional
 
-from influxdb_client import InfluxDBClient
+from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
 
-from requests.exceptions import ConnectionError, ReadTimeout
-
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.model.events.influxevent import InfluxEvent
 
+_writer_start_lock = threading.Lock()
+
 
 class EventLogging:
-    def __init__(self, config: Config = None):
+    """
+    Buffers events and writes them to Influx in batches from a background thread
+    """
+    def __init__(
+            self,
+            config: Config = None,
+            max_buffer_size: int = None,
+            batch_size: int = None,
+            flush_interval: float = None
+    ):
         if config:
             self._config = config
         else:
@@ -25,11 +38,24 @@ class EventLogging:
             org=self._config.influx_org
         )
 
+        # Only used from the writer thread
         self._influx_client = client.write_api(write_options=SYNCHRONOUS)
 
+        self.max_buffer_size = max_buffer_size or int(self._config.influx_buffer_size or 10000)
+        self.batch_size = batch_size or int(self._config.influx_batch_size or 500)
+        self.flush_interval = flush_interval or float(self._config.influx_flush_interval or 5)
+        self.stats = Counter()
+
         self._retry_time = None
         self._successive_failures = 0
-        self._unsaved_events = []
+        self._last_write_failed = False
+        self._buffer: deque[dict] = deque()
+        self._last_point_time = 0
+        self._condition = threading.Condition()
+        self._writer_thread: Optional[threading.Thread] = None
+        self._writer_pid = None
+        self._closed = False
+        atexit.register(self.close)
 
     def can_save(self) -> bool:
         if not self._retry_time:
@@ -40,54 +66,137 @@ class EventLogging:
         if self._retry_time > datetime.now():
             return False
         self._retry_time = None
+        self._successive_failures = 0
         return True
 
-    def save_event(self, event: InfluxEvent):
-
-        log.debug('Unsaved events %s', len(self._unsaved_events))
-        if not self.can_save():
-            log.info('Event logging disabled until %s', self._retry_time)
-            self._unsaved_events.append(event)
+    def save_event(self, event: InfluxEvent) -> None:
+        self._enqueue(event.get_influx_event())
+
+    def write_raw_points(self, points: list[dict]) -> None:
+        self._enqueue(points)
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Counters for queued, flushed, dropped and failed_writes plus the current buffer size
+        """
+        return {**{k: 0 for k in ('queued', 'flushed', 'dropped', 'failed_writes')}, **self.stats, 'buffered': len(self._buffer)}
+
+    def _enqueue(self, points: list[dict]) -> None:
+        self._ensure_writer()
+        with self._condition:
+            for point in points:
+                if point.get('time') is None:
+                    # Influx stamps untimed points on arrival, so same series points in a batch would overwrite
+                    self._last_point_time = max(time.time_ns(), self._last_point_time + 1)
+                    point = {**point, 'time': self._last_point_time}
+                if len(self._buffer) >= self.max_buffer_size:
+                    self._buffer.popleft()
+                    self.stats['dropped'] += 1
+                self._buffer.append(point)
+                self.stats['queued'] += 1
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+
+    def _ensure_writer(self) -> None:
+        """
+        Start the writer thread.  Done lazily and per PID since Celery creates task instances, and this with them,
+        before forking the pool and threads don't survive the fork
+        """
+        if self._writer_pid == os.getpid():
             return
-        self._write_to_influx(event)
-        self._flush_unsaved()
-
-    def _flush_unsaved(self) -> NoReturn:
-        unsaved = []
-        for event in self._unsaved_events.copy():
-            if not self.can_save():
-                unsaved.append(event)
+        with _writer_start_lock:
+            if self._writer_pid == os.getpid():
+                return
+            # The lock may have been held by a parent thread when we forked
+            self._condition = threading.Condition()
+            self._buffer.clear()
+            self._closed = False
+            self._writer_thread = threading.Thread(target=self._run, name='EventLoggingWriter', daemon=True)
+            self._writer_thread.start()
+            self._writer_pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                # Don't spin on a full buffer while Influx is failing
+                if not self._closed and (len(self._buffer) < self.batch_size or self._last_write_failed):
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self) -> int:
+        """
+        Write everything that's buffered in batches.  Stops at the first failed write
+        :return: Number of points written
+        """
+        flushed = 0
+        while self.can_save():
+            with self._condition:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                break
+            written = self._write_batch(batch)
+            if written is None:
+                break
+            flushed += written
+        return flushed
+
+    def _write_batch(self, batch: list[dict]) -> Optional[int]:
+        """
+        Write a batch as one line protocol request.  Failed batches go back to the front of the buffer
+        :param batch: Points to write
+        :return: Number of points written or None if the write failed
+        """
+        points = []
+        lines = []
+        for point in batch:
+            try:
+                line = Point.from_dict(point).to_line_protocol()
+            except Exception as e:
+                log.warning('Dropping invalid Influx point %s: %s', point, e)
+                line = None
+            if not line:
+                self.stats['dropped'] += 1
                 continue
-            if not self._write_to_influx(event):
-                unsaved.append(event)
-        self._unsaved_events = unsaved
+            points.append(point)
+            lines.append(line)
 
+        if not lines:
+            return 0
 
-    def _write_to_influx(self, event: InfluxEvent) -> bool:
         try:
-            self._influx_client.write(bucket=self._config.influx_bucket, record=event.get_influx_event())
-            log.debug('Wrote to Influx: %s', event.get_influx_event())
-            self._successive_failures = 0
-            return True
+            self._influx_client.write(bucket=self._config.influx_bucket, record='\n'.join(lines))
         except Exception as e:
-            log.error(e, exc_info=False)
-            if hasattr(e, 'code') and e.code == 404:
-                #log.error('Database %s Does Not Exist.  Attempting To Create', config.influx_database)
-                self._influx_client.create_database(self._config.influx_database)
-                self._influx_client.write_points(event.get_influx_event())
-                return
-
+            log.error('Failed to write %s points to Influx: %s', len(lines), e)
             self._successive_failures += 1
-            if len(self._unsaved_events) < 3000:
-                self._unsaved_events.append(event)
-            log.error('Failed To Write To InfluxDB', exc_info=True)
-            log.error(event.get_influx_event())
-            return False
-
-    def write_raw_points(self, points: list[dict]):
-        try:
-            self._influx_client.write(bucket=self._config.influx_bucket, record=points)
-        except Exception as e:
-            log.exception('Failed to write to Influx')
+            self._last_write_failed = True
+            self.stats['failed_writes'] += 1
+            self._requeue(points)
+            return
 
-        #log.info('Wrote Influx: %s', points)
\ No newline at end of file
+        self._successive_failures = 0
+        self._last_write_failed = False
+        self.stats['flushed'] += len(lines)
+        return len(lines)
+
+    def _requeue(self, points: list[dict]) -> None:
+        with self._condition:
+            room = self.max_buffer_size - len(self._buffer)
+            if room < len(points):
+                self.stats['dropped'] += len(points) - room
+                points = points[len(points) - room:] if room > 0 else []
+            self._buffer.extendleft(reversed(points))
+
+    def close(self, timeout: float = 5) -> None:
+        """
+        Stop the writer after it flushes what's buffered
+        :param timeout: Max seconds to wait for the final flush
+        """
+        if self._writer_pid != os.getpid() or not self._writer_thread:
+            return
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer_thread.join(timeout)
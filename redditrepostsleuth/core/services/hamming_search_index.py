@@ -0,0 +1,332 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Optional, Iterable
+
+import numpy as np
+from distance import hamming
+
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.model.image_index_api_result import APISearchResults, IndexSearchResult, ImageMatch
+from redditrepostsleuth.core.services.service_registry import get_service_registry
+
+log = logging.getLogger(__name__)
+
+LOCAL_INDEX_NAME = 'local'
+DHASH_H_TYPE_ID = 1
+DEFAULT_MAX_AGE_DAYS = 365
+
+# Mask of the low bit in every nibble.  Used to count differing hex characters
+NIBBLE_MASK = np.uint64(0x1111111111111111)
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        counts = _POPCOUNT_TABLE[values.view(np.uint8)]
+        return counts.reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def hex_hashes_to_matrix(hashes: list[str]) -> np.ndarray:
+    """
+    Pack a list of equal length hex hashes into a (n, words) uint64 matrix
+    :param hashes: Hex encoded hashes.  Length must be a multiple of 16
+    :return: uint64 bit matrix
+    """
+    if not hashes:
+        return np.empty((0, 0), dtype=np.uint64)
+    words = len(hashes[0]) // 16
+    raw = np.frombuffer(bytes.fromhex(''.join(hashes)), dtype='>u8')
+    return raw.astype(np.uint64).reshape(len(hashes), words)
+
+
+def hamming_distances(bits: np.ndarray, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute bit and hex character distances between every row of bits and the query
+    The hex distance matches what distance.hamming returns when comparing the hex strings
+    :param bits: (n, words) uint64 matrix
+    :param query: (words,) uint64 vector
+    :return: Tuple of bit distances and hex character distances
+    """
+    xored = np.bitwise_xor(bits, query)
+    bit_distance = popcount(xored).sum(axis=1, dtype=np.int32)
+    nibbles = (xored | (xored >> np.uint64(1)) | (xored >> np.uint64(2)) | (xored >> np.uint64(3))) & NIBBLE_MASK
+    hex_distance = popcount(nibbles).sum(axis=1, dtype=np.int32)
+    return bit_distance, hex_distance
+
+
+def hex_hamming_distances(searched_hash: str, hashes: list[str]) -> list[int]:
+    """
+    Compute distance.hamming between the searched hash and every provided hash in a single vectorized pass.
+    Falls back to distance.hamming when the hashes can't be packed into uint64 words
+    :param searched_hash: Hex encoded hash
+    :param hashes: Hex encoded hashes to compare against
+    :return: Number of differing hex characters for each hash
+    """
+    if not hashes:
+        return []
+    hash_length = len(searched_hash)
+    if hash_length % 16 or any(len(h) != hash_length for h in hashes):
+        return [hamming(searched_hash, h) for h in hashes]
+    try:
+        bits = hex_hashes_to_matrix([h.lower() for h in hashes])
+        query = hex_hashes_to_matrix([searched_hash.lower()])[0]
+    except ValueError:
+        return [hamming(searched_hash, h) for h in hashes]
+    _, hex_distance = hamming_distances(bits, query)
+    return hex_distance.tolist()
+
+
+class HammingIndexShard:
+    """
+    Holds the packed hashes for a single post_created_at window.  New hashes are buffered and only packed into the
+    matrix on the next search so appends stay cheap
+    """
+    def __init__(self, key: int):
+        self.key = key
+        self.ids = np.empty(0, dtype=np.int64)
+        self.bits: Optional[np.ndarray] = None
+        self._pending_ids: list[int] = []
+        self._pending_hashes: list[str] = []
+
+    def __len__(self):
+        return len(self.ids) + len(self._pending_ids)
+
+    def add(self, post_id: int, hash: str) -> None:
+        self._pending_ids.append(post_id)
+        self._pending_hashes.append(hash)
+
+    def remove(self, post_ids: set[int]) -> None:
+        self.compact()
+        keep = ~np.isin(self.ids, list(post_ids))
+        if keep.all():
+            return
+        self.ids = self.ids[keep]
+        self.bits = self.bits[keep]
+
+    def compact(self) -> None:
+        if not self._pending_ids:
+            return
+        new_bits = hex_hashes_to_matrix(self._pending_hashes)
+        self.bits = new_bits if self.bits is None else np.vstack((self.bits, new_bits))
+        self.ids = np.concatenate((self.ids, np.array(self._pending_ids, dtype=np.int64)))
+        self._pending_ids = []
+        self._pending_hashes = []
+
+
+class HammingSearchIndex:
+    """
+    In process alternative to the image index API.  Keeps the dhash_h of every post in memory as a packed uint64
+    bit matrix and answers top k queries with a vectorized XOR and popcount.
+
+    Results are returned in the same shape as the index API.  Match IDs are Post IDs rather than Annoy IDs and are
+    flagged with the LOCAL_INDEX_NAME index name.  Matches whose post has since been deleted are evicted when found
+    """
+    def __init__(
+            self,
+            uowm: UnitOfWorkManager,
+            max_age_days: int,
+            hash_size: int = 16,
+            shard_days: int = 30,
+            refresh_interval: int = 60,
+            load_batch_size: int = 100000
+    ):
+        """
+        :param uowm: UnitOfWorkManager
+        :param max_age_days: Only posts created within this many days are kept in memory
+        """
+        if not max_age_days or max_age_days <= 0:
+            raise ValueError('The local index requires a max age')
+        self.uowm = uowm
+        self.hash_length = (hash_size * hash_size) // 4
+        self.shard_days = shard_days
+        self.max_age_days = max_age_days
+        self.refresh_interval = refresh_interval
+        self.load_batch_size = load_batch_size
+        self._shards: dict[int, HammingIndexShard] = {}
+        self._last_hash_id = 0
+        self._last_refresh = None
+        # Summons workers search from several threads.  Refreshes and compaction swap the shard arrays under this lock
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards.values())
+
+    def _shard_key(self, created_at: datetime) -> int:
+        return int(created_at.timestamp() // (self.shard_days * 86400))
+
+    def add(self, post_id: int, hash: str, created_at: datetime) -> None:
+        if not hash or len(hash) != self.hash_length:
+            log.debug('Skipping hash with unexpected length for post %s', post_id)
+            return
+        if created_at < datetime.utcnow() - timedelta(days=self.max_age_days):
+            return
+        key = self._shard_key(created_at)
+        shard = self._shards.get(key)
+        if not shard:
+            shard = HammingIndexShard(key)
+            self._shards[key] = shard
+        shard.add(post_id, hash.lower())
+
+    def refresh(self) -> int:
+        """
+        Load any dhash_h rows added since the last refresh
+        :return: Number of hashes loaded
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        start = perf_counter()
+        loaded = 0
+        created_after = datetime.utcnow() - timedelta(days=self.max_age_days)
+        self._drop_expired_shards(created_after)
+
+        with self.uowm.start() as uow:
+            while True:
+                rows = uow.post_hash.get_by_type_after_id(
+                    DHASH_H_TYPE_ID,
+                    self._last_hash_id,
+                    limit=self.load_batch_size,
+                    created_after=created_after
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    self.add(row.post_id, row.hash, row.post_created_at)
+                self._last_hash_id = rows[-1].id
+                loaded += len(rows)
+                if len(rows) < self.load_batch_size:
+                    break
+
+        for shard in self._shards.values():
+            shard.compact()
+        self._last_refresh = datetime.utcnow()
+        log.info('Loaded %s hashes into local index in %s. Total size: %s', loaded, round(perf_counter() - start, 3), len(self))
+        return loaded
+
+    def _drop_expired_shards(self, cutoff: datetime) -> None:
+        cutoff_key = self._shard_key(cutoff)
+        for key in [k for k in self._shards if k < cutoff_key]:
+            log.info('Dropping expired local index shard %s', key)
+            del self._shards[key]
+
+    def remove(self, post_ids: Iterable[int]) -> None:
+        """
+        Evict posts from the index
+        :param post_ids: Post IDs
+        """
+        post_ids = set(post_ids)
+        if not post_ids:
+            return
+        with self._lock:
+            for shard in self._shards.values():
+                shard.remove(post_ids)
+
+    def _get_live_matches(self, ids: np.ndarray, distances: np.ndarray, max_matches: int) -> list[ImageMatch]:
+        """
+        Take the closest matches whose post still exists.  Posts purged since they were loaded are evicted
+        :param ids: Candidate post IDs sorted by distance
+        :param distances: Distance of each candidate
+        :param max_matches: Max matches to return
+        """
+        matches = []
+        step = max_matches or len(ids)
+        for start in range(0, len(ids), step):
+            chunk = ids[start:start + step].tolist()
+            with self.uowm.start() as uow:
+                existing = uow.posts.get_existing_ids(chunk)
+            missing = [post_id for post_id in chunk if post_id not in existing]
+            if missing:
+                log.debug('Evicting %s deleted posts from local index', len(missing))
+                self.remove(missing)
+            for i, post_id in enumerate(chunk, start=start):
+                if post_id in existing:
+                    matches.append(ImageMatch(id=post_id, distance=float(distances[i])))
+            if max_matches and len(matches) >= max_matches:
+                return matches[:max_matches]
+        return matches
+
+    def _refresh_if_stale(self) -> None:
+        with self._lock:
+            if self._last_refresh and datetime.utcnow() - self._last_refresh < timedelta(seconds=self.refresh_interval):
+                return
+            self._refresh()
+
+    def _snapshot(self) -> list[tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            for shard in self._shards.values():
+                shard.compact()
+            return [(shard.ids, shard.bits) for shard in self._shards.values() if len(shard.ids)]
+
+    def search(
+            self,
+            hash: str,
+            target_hamming_distance: float,
+            target_annoy_distance: float,
+            max_matches: int = 50,
+    ) -> APISearchResults:
+        """
+        Find the closest hashes to the provided hash.  The search is exact so there is no equivalent to max depth
+        :param hash: Hash to search
+        :param target_hamming_distance: Max number of differing hex characters.  Matches distance.hamming
+        :param target_annoy_distance: Max number of differing bits.  Matches Annoy's hamming metric
+        :param max_matches: Max matches to return
+        :rtype: APISearchResults
+        """
+        start = perf_counter()
+        self._refresh_if_stale()
+        index_result = IndexSearchResult(index_name=LOCAL_INDEX_NAME, hamming_filtered=True, annoy_filtered=True)
+
+        if not hash or len(hash) != self.hash_length:
+            log.warning('Hash length %s does not match local index length %s', len(hash or ''), self.hash_length)
+            return APISearchResults(results=[index_result])
+
+        query = hex_hashes_to_matrix([hash.lower()])[0]
+        candidate_ids = []
+        candidate_distances = []
+        search_start = perf_counter()
+        for shard_ids, shard_bits in self._snapshot():
+            bit_distance, hex_distance = hamming_distances(shard_bits, query)
+            keep = (bit_distance <= target_annoy_distance) & (hex_distance <= target_hamming_distance)
+            candidate_ids.append(shard_ids[keep])
+            candidate_distances.append(bit_distance[keep])
+            index_result.total_searched += len(shard_ids)
+
+        if candidate_ids:
+            ids = np.concatenate(candidate_ids)
+            distances = np.concatenate(candidate_distances)
+            order = np.argsort(distances, kind='stable')
+            index_result.matches = self._get_live_matches(ids[order], distances[order], max_matches)
+
+        index_result.index_search_time = round(perf_counter() - search_start, 5)
+        index_result.total_time = round(perf_counter() - start, 5)
+        return APISearchResults(
+            total_searched=index_result.total_searched,
+            total_search_time=index_result.total_time,
+            results=[index_result]
+        )
+
+
+_hamming_search_index: Optional[HammingSearchIndex] = None
+
+
+def get_hamming_search_index() -> HammingSearchIndex:
+    """
+    Get the shared index for this process, creating it on first use
+    :rtype: HammingSearchIndex
+    """
+    global _hamming_search_index
+    if not _hamming_search_index:
+        services = get_service_registry()
+        config = services.config
+        _hamming_search_index = HammingSearchIndex(
+            services.uowm,
+            int(config.local_index_max_age_days or DEFAULT_MAX_AGE_DAYS),
+            refresh_interval=int(config.local_index_refresh_interval or 60)
+        )
+    return _hamming_search_index
@@ -0,0 +1,162 @@
+import json
+import logging
+from collections import Counter
+from hashlib import sha256
+from time import perf_counter
+from typing import Optional
+
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from redditrepostsleuth.core.db.databasemodels import ImageHashCache
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.model.events.cache_event import CacheEvent
+from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.util.imagehashing import get_image_bytes_by_url_requests, image_from_bytes, \
+    get_all_image_hashes, get_image_hashes
+
+log = logging.getLogger(__name__)
+
+
+class ImageHashCacheService:
+    """
+    Caches image hashes by URL and content digest so each image is only downloaded and decoded once
+    """
+    def __init__(
+            self,
+            uowm: UnitOfWorkManager,
+            event_logger: Optional[EventLogging] = None,
+            redis_client: Optional[Redis] = None,
+            redis_ttl: int = 604800,
+            hash_size: int = 16,
+            meme_hash_size: int = 32,
+            stats_interval: int = 60
+    ):
+        self.uowm = uowm
+        self.event_logger = event_logger
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.hash_size = hash_size
+        self.meme_hash_size = meme_hash_size
+        self.stats_interval = stats_interval
+        self.stats = Counter()
+        self._last_stats_flush = perf_counter()
+
+    @staticmethod
+    def _sha256(value: bytes) -> str:
+        return sha256(value).hexdigest()
+
+    def _get_redis(self, key: str) -> Optional[dict]:
+        if not self.redis:
+            return
+        try:
+            cached = self.redis.get(key)
+        except RedisError as e:
+            log.warning('Failed to get cached hashes: %s', e)
+            return
+        return json.loads(cached) if cached else None
+
+    def _set_redis(self, hashes: dict, *keys: str) -> None:
+        if not self.redis:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for key in keys:
+                pipe.set(key, json.dumps(hashes), ex=self.redis_ttl)
+            pipe.execute()
+        except RedisError as e:
+            log.warning('Failed to cache hashes: %s', e)
+
+    def _save(self, url_hash: str, hashes: dict) -> None:
+        try:
+            with self.uowm.start() as uow:
+                uow.image_hash_cache.insert_ignore(
+                    ImageHashCache(
+                        url_hash=url_hash,
+                        content_hash=hashes['content_hash'],
+                        dhash_h=hashes['dhash_h'],
+                        dhash_v=hashes['dhash_v'],
+                        ahash=hashes['ahash'],
+                        meme_dhash=hashes['meme_dhash']
+                    )
+                )
+                uow.commit()
+        except SQLAlchemyError as e:
+            log.warning('Failed to save cached hashes: %s', e)
+        self._set_redis(
+            hashes,
+            f'image-hashes:url:{url_hash}',
+            f'image-hashes:content:{hashes["content_hash"]}'
+        )
+
+    def _record(self, result: str) -> None:
+        self.stats[result] += 1
+        if not self.event_logger or perf_counter() - self._last_stats_flush < self.stats_interval:
+            return
+        self.event_logger.save_event(CacheEvent('image_hash_cache', dict(self.stats)))
+        self.stats.clear()
+        self._last_stats_flush = perf_counter()
+
+    def get_hashes(self, url: str, proxy: str = None) -> dict:
+        """
+        Get every stored hash for the image at the given URL, downloading and hashing it only when not cached
+        :param url: Image URL
+        :param proxy: Optional proxy to download the image through
+        :return: dict with content_hash, dhash_h, dhash_v, ahash and meme_dhash
+        """
+        url_hash = self._sha256(url.encode('utf-8'))
+        hashes = self._get_redis(f'image-hashes:url:{url_hash}')
+        if hashes:
+            self._record('url_redis_hit')
+            return hashes
+
+        with self.uowm.start() as uow:
+            entry = uow.image_hash_cache.get_by_url_hash(url_hash)
+            if entry:
+                hashes = entry.to_dict()
+        if hashes:
+            self._record('url_db_hit')
+            self._set_redis(hashes, f'image-hashes:url:{url_hash}')
+            return hashes
+
+        data = get_image_bytes_by_url_requests(url, proxy=proxy)
+        content_hash = self._sha256(data)
+        hashes = self._get_redis(f'image-hashes:content:{content_hash}')
+        if hashes:
+            self._record('content_redis_hit')
+        else:
+            with self.uowm.start() as uow:
+                entry = uow.image_hash_cache.get_by_content_hash(content_hash)
+                if entry:
+                    hashes = entry.to_dict()
+            if hashes:
+                self._record('content_db_hit')
+
+        if not hashes:
+            self._record('miss')
+            hashes = get_all_image_hashes(
+                image_from_bytes(data, url),
+                hash_size=self.hash_size,
+                meme_hash_size=self.meme_hash_size
+            )
+            hashes['content_hash'] = content_hash
+
+        self._save(url_hash, hashes)
+        return hashes
+
+    def get_image_hashes(self, url: str, hash_size: int = 16, proxy: str = None) -> dict:
+        """
+        Drop in replacement for imagehashing.get_image_hashes.  Sizes that are not cached are passed through
+        :param url: Image URL
+        :param hash_size: Size of hash
+        :param proxy: Optional proxy
+        :return: dict of dhash_h, dhash_v and ahash
+        """
+        if hash_size == self.hash_size:
+            hashes = self.get_hashes(url, proxy=proxy)
+            return {'dhash_h': hashes['dhash_h'], 'dhash_v': hashes['dhash_v'], 'ahash': hashes['ahash']}
+        if hash_size == self.meme_hash_size:
+            hashes = self.get_hashes(url, proxy=proxy)
+            return {'dhash_h': hashes['meme_dhash'], 'dhash_v': None, 'ahash': None}
+        return get_image_hashes(url, hash_size=hash_size)
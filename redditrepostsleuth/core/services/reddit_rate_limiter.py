@@ -0,0 +1,262 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Optional, Callable, Any
+
+from prawcore import TooManyRequests
+from redis import Redis
+from redis.exceptions import RedisError
+
+from redditrepostsleuth.core.services.service_registry import get_service_registry
+
+log = logging.getLogger(__name__)
+
+SUMMONS_LANE = 'summons'
+SUB_MONITOR_LANE = 'sub_monitor'
+# Wiki config sync and the top post monitor
+BACKGROUND_LANE = 'background'
+
+# Share of the bucket each lane has to leave for the lanes above it
+LANE_RESERVES = {
+    SUMMONS_LANE: 0.0,
+    SUB_MONITOR_LANE: 0.25,
+    BACKGROUND_LANE: 0.5,
+}
+
+RATE_LIMIT_PENALTY = 30
+MAX_WAIT_STEP = 5
+CACHE_PREFIX = 'reddit-rate-limit'
+
+
+def get_reddit_limits(reddit) -> Optional[dict]:
+    """
+    :param reddit: Reddit or RedditManager instance
+    :return: Rate limit headers from the last response
+    """
+    reddit = getattr(reddit, 'reddit', reddit)
+    auth = getattr(reddit, 'auth', None)
+    return getattr(auth, 'limits', None)
+
+
+@dataclass
+class BucketState:
+    tokens: float
+    updated_at: float
+    refill_rate: float
+    blocked_until: float = 0
+
+    def refill(self, now: float, capacity: int) -> None:
+        self.tokens = min(capacity, self.tokens + max(now - self.updated_at, 0) * self.refill_rate)
+        self.updated_at = max(now, self.updated_at)
+
+    def take(self, now: float, capacity: int, tokens: float, floor: float) -> float:
+        """
+        :return: 0 if the tokens were taken, otherwise seconds until they might be available
+        """
+        self.refill(now, capacity)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens - tokens >= floor:
+            self.tokens -= tokens
+            return 0
+        return (tokens + floor - self.tokens) / self.refill_rate
+
+    def apply_limits(self, now: float, remaining: float, reset_timestamp: float, reserve: int, capacity: int) -> None:
+        self.refill(now, capacity)
+        available = remaining - reserve
+        seconds_to_reset = max(reset_timestamp - now, 1)
+        if available <= 0:
+            log.warning('Reddit rate limit used up, blocking for %s seconds', round(seconds_to_reset))
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, now + seconds_to_reset)
+        else:
+            self.tokens = min(self.tokens, available)
+            self.refill_rate = available / seconds_to_reset
+
+    def penalize(self, now: float, seconds: float) -> None:
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RedditRateLimiter(ABC):
+    """
+    Token bucket for the Reddit API, corrected from the rate limit headers praw exposes.  Lower priority lanes leave
+    part of the bucket for the lanes above them
+    """
+    def __init__(
+            self,
+            capacity: int = 20,
+            refill_rate: float = 1000 / 600,
+            reserve: int = 5,
+            clock: Callable[[], float] = time.time,
+            sleep: Callable[[float], Any] = time.sleep
+    ):
+        """
+        :param capacity: Largest burst allowed
+        :param refill_rate: Tokens added per second until Reddit tells us otherwise
+        :param reserve: Requests left unused in each window as a safety margin
+        :param clock: Epoch clock.  Compared against Reddit's reset timestamp
+        :param sleep: Used to wait for tokens
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.reserve = reserve
+        self._clock = clock
+        self._sleep = sleep
+
+    def _new_state(self) -> BucketState:
+        return BucketState(tokens=self.capacity, updated_at=self._clock(), refill_rate=self.refill_rate)
+
+    @abstractmethod
+    def _modify(self, func: Callable[[BucketState], Any]) -> Any:
+        """
+        Atomically apply func to the bucket
+        :return: Return value of func or None if the bucket couldn't be updated
+        """
+
+    @property
+    def tokens(self) -> Optional[float]:
+        def get_tokens(state: BucketState) -> float:
+            state.refill(self._clock(), self.capacity)
+            return state.tokens
+        return self._modify(get_tokens)
+
+    def _take(self, lane: str, tokens: float) -> float:
+        floor = self.capacity * LANE_RESERVES[lane]
+        # A bucket we can't reach shouldn't stop the bot, so treat it as having tokens
+        return self._modify(lambda state: state.take(self._clock(), self.capacity, tokens, floor)) or 0
+
+    def try_acquire(self, lane: str = SUB_MONITOR_LANE, tokens: float = 1) -> bool:
+        return not self._take(lane, tokens)
+
+    def acquire(self, lane: str = SUB_MONITOR_LANE, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Block until tokens are available in the given lane
+        :param lane: Priority lane of the caller
+        :param tokens: Number of API calls about to be made
+        :param timeout: Max seconds to wait.  None waits forever
+        :return: False if the timeout passed first
+        """
+        deadline = self._clock() + timeout if timeout is not None else None
+        while True:
+            wait = self._take(lane, tokens)
+            if not wait:
+                return True
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            self._sleep(min(wait, MAX_WAIT_STEP))
+
+    def update_from_limits(self, limits: Optional[dict]) -> None:
+        """
+        Correct the bucket from the rate limit headers of the last response
+        :param limits: reddit.auth.limits
+        """
+        if not isinstance(limits, dict) or limits.get('remaining') is None or not limits.get('reset_timestamp'):
+            return
+        self._modify(lambda state: state.apply_limits(
+            self._clock(), limits['remaining'], limits['reset_timestamp'], self.reserve, self.capacity
+        ))
+
+    def penalize(self, seconds: float = RATE_LIMIT_PENALTY) -> None:
+        """
+        Block every caller after Reddit returned a 429
+        :param seconds: How long to back off
+        """
+        self._modify(lambda state: state.penalize(self._clock(), seconds))
+
+    @contextmanager
+    def request(self, reddit, lane: str = SUB_MONITOR_LANE, tokens: float = 1):
+        """
+        Wrap calls to Reddit.  Waits for tokens, backs everyone off on a 429 and feeds the response headers back
+        into the bucket
+        :param reddit: Reddit or RedditManager instance making the calls
+        :param lane: Priority lane of the caller
+        :param tokens: Number of API calls about to be made
+        """
+        self.acquire(lane, tokens)
+        try:
+            yield
+        except TooManyRequests as e:
+            retry_after = getattr(e, 'retry_after', None)
+            self.penalize(float(retry_after) if retry_after else RATE_LIMIT_PENALTY)
+            raise
+        finally:
+            self.update_from_limits(get_reddit_limits(reddit))
+
+
+class TokenBucketRateLimiter(RedditRateLimiter):
+    """
+    Bucket shared by the threads of a single process
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._state = self._new_state()
+        self._lock = threading.Lock()
+
+    def _modify(self, func: Callable[[BucketState], Any]) -> Any:
+        with self._lock:
+            return func(self._state)
+
+
+class RedisTokenBucketRateLimiter(RedditRateLimiter):
+    """
+    Bucket shared by every process using the same Reddit account.  The state lives in a Redis hash and is updated
+    in a WATCH/MULTI transaction so concurrent callers can't spend the same tokens
+    """
+    def __init__(self, redis_client: Redis, identity: str, *args, ttl: int = 3600, **kwargs):
+        """
+        :param redis_client: Redis client
+        :param identity: Reddit account or OAuth client ID the bucket belongs to
+        :param ttl: Seconds an idle bucket is kept
+        """
+        super().__init__(*args, **kwargs)
+        self.redis = redis_client
+        self.key = f'{CACHE_PREFIX}:{identity}'
+        self.ttl = ttl
+
+    def _load(self, raw: dict) -> BucketState:
+        if not raw:
+            return self._new_state()
+        return BucketState(**{k.decode(): float(v) for k, v in raw.items()})
+
+    def _modify(self, func: Callable[[BucketState], Any]) -> Any:
+        def update(pipe) -> Any:
+            state = self._load(pipe.hgetall(self.key))
+            result = func(state)
+            pipe.multi()
+            pipe.hset(self.key, mapping=asdict(state))
+            pipe.expire(self.key, self.ttl)
+            return result
+
+        try:
+            return self.redis.transaction(update, self.key, value_from_callable=True)
+        except RedisError as e:
+            log.warning('Failed to update Reddit rate limit bucket: %s', e)
+            return None
+
+
+_reddit_rate_limiter: Optional[RedditRateLimiter] = None
+
+
+def get_reddit_rate_limiter() -> RedditRateLimiter:
+    """
+    Get the limiter for this process's Reddit account, creating it on first use
+    :rtype: RedditRateLimiter
+    """
+    global _reddit_rate_limiter
+    if not _reddit_rate_limiter:
+        services = get_service_registry()
+        config = services.config
+        _reddit_rate_limiter = RedisTokenBucketRateLimiter(
+            services.redis_client,
+            config.reddit_username or config.reddit_client_id,
+            capacity=int(config.reddit_rate_limit_capacity or 20),
+            reserve=int(config.reddit_rate_limit_reserve or 5)
+        )
+    return _reddit_rate_limiter
@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import nullcontext
 from time import perf_counter
 from typing import Text, NoReturn, Optional, Union
 
@@ -10,6 +11,7 @@ from prawcore import Forbidden, TooManyRequests
 from sqlalchemy import func
 
 from redditrepostsleuth.core.db.databasemodels import BotComment, BannedSubreddit, BotPrivateMessage
+from redditrepostsleuth.core.db.reference_cache import invalidate_reference_cache, BANNED_SUBREDDIT
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.exception import RateLimitException
 from redditrepostsleuth.core.model.dummy_comment import DummyComment
@@ -17,6 +19,7 @@ from redditrepostsleuth.core.model.events.reddit_api_event import RedditApiEvent
 from redditrepostsleuth.core.model.events.response_event import ResponseEvent
 from redditrepostsleuth.core.notification.notification_service import NotificationService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.reddit_rate_limiter import RedditRateLimiter, SUB_MONITOR_LANE
 from redditrepostsleuth.core.util.replytemplates import REPLY_TEST_MODE
 
 log = logging.getLogger(__name__)
@@ -31,9 +34,13 @@ class ResponseHandler:
             notification_svc: NotificationService = None,
             live_response: bool = False,
             log_response: bool = True,
-            source='unknown'
+            source='unknown',
+            rate_limiter: RedditRateLimiter = None,
+            rate_limit_lane: str = SUB_MONITOR_LANE
     ):
         self.notification_svc = notification_svc
+        self.rate_limiter = rate_limiter
+        self.rate_limit_lane = rate_limit_lane
         self.live_response = live_response
         self.uowm = uowm
         self.reddit = reddit
@@ -57,10 +64,11 @@ class ResponseHandler:
 
         try:
             start_time = perf_counter()
-            if self.live_response:
-                comment = submission.reply(comment_body)
-            else:
-                comment = DummyComment(comment_body, submission.subreddit.display_name, submission_id)
+            with self._rate_limited():
+                if self.live_response:
+                    comment = submission.reply(comment_body)
+                else:
+                    comment = DummyComment(comment_body, submission.subreddit.display_name, submission_id)
             self._record_api_event(
                 float(round(perf_counter() - start_time, 2)),
                 'reply_to_submission',
@@ -101,10 +109,11 @@ class ResponseHandler:
             return
         try:
             start_time = perf_counter()
-            if self.live_response:
-                reply_comment = comment.reply(comment_body)
-            else:
-                reply_comment = DummyComment(comment_body, comment.submission.subreddit.display_name, comment.submission.id)
+            with self._rate_limited():
+                if self.live_response:
+                    reply_comment = comment.reply(comment_body)
+                else:
+                    reply_comment = DummyComment(comment_body, comment.submission.subreddit.display_name, comment.submission.id)
             self._record_api_event(
                 float(round(perf_counter() - start_time, 2)),
                 'reply_to_comment',
@@ -140,7 +149,8 @@ class ResponseHandler:
         try:
             start_time = perf_counter()
             if self.live_response:
-                user.message(subject, message_body)
+                with self._rate_limited():
+                    user.message(subject, message_body)
             self._record_api_event(
                 float(round(perf_counter() - start_time, 2)),
                 'private_message',
@@ -169,7 +179,8 @@ class ResponseHandler:
         log.debug('Replying to private message from %s with subject %s', message.dest.name, message.subject)
         try:
             if self.live_response:
-                message.reply(body)
+                with self._rate_limited():
+                    message.reply(body)
             self._save_private_message(
                 BotPrivateMessage(
                     subject=message.subject,
@@ -199,7 +210,8 @@ class ResponseHandler:
 
 
         if self.live_response:
-            subreddit.message(subject, message_body)
+            with self._rate_limited():
+                subreddit.message(subject, message_body)
         self._save_private_message(
             BotPrivateMessage(
                 subject=subject,
@@ -225,6 +237,11 @@ class ResponseHandler:
 
 
 
+    def _rate_limited(self):
+        if not self.rate_limiter:
+            return nullcontext()
+        return self.rate_limiter.request(self.reddit, self.rate_limit_lane)
+
     def _record_api_event(self, response_time, request_type, remaining_limit):
         api_event = RedditApiEvent(request_type, response_time, remaining_limit, event_type='api_response')
         self.event_logger.save_event(api_event)
@@ -276,6 +293,7 @@ class ResponseHandler:
                     )
                 )
             uow.commit()
+        invalidate_reference_cache(BANNED_SUBREDDIT, subreddit)
 
         if self.notification_svc:
             self.notification_svc.send_notification(f'Subreddit https://reddit.com/r/{subreddit} added to ban list', subject='Added Banned Sub')
\ No newline at end of file
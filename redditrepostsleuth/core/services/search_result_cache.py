@@ -0,0 +1,148 @@
+import json
+import logging
+from hashlib import sha1
+from typing import Optional, Iterable
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
+from redditrepostsleuth.core.model.image_search_settings import ImageSearchSettings
+from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
+from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
+from redditrepostsleuth.core.services.service_registry import get_service_registry
+
+log = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'search-results'
+
+
+def settings_digest(search_settings: ImageSearchSettings) -> str:
+    return sha1(json.dumps(search_settings.to_dict(), sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _compact_match(match: ImageSearchMatch) -> list:
+    return [
+        match.post.id, match.match_id, match.hamming_distance, match.annoy_distance, match.hash_size,
+        match.title_similarity
+    ]
+
+
+class SearchResultCache:
+    """
+    Short lived cache of image search results keyed by post or hash and the search settings
+    """
+    def __init__(self, redis_client: Redis, ttl: int = 300):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def key(
+            self,
+            search_settings: ImageSearchSettings,
+            post_id: Optional[str] = None,
+            image_hash: Optional[str] = None
+    ) -> Optional[tuple[str, str]]:
+        """
+        Must be called before searching since the meme filter changes the settings
+        :return: Redis key and field or None if there is nothing to key the search on
+        """
+        if post_id:
+            return f'{CACHE_PREFIX}:post:{post_id}', settings_digest(search_settings)
+        if image_hash:
+            return f'{CACHE_PREFIX}:hash:{image_hash}', settings_digest(search_settings)
+        return None
+
+    def load(self, cache_key: tuple[str, str], search_results: ImageSearchResults, uow: UnitOfWork) -> bool:
+        """
+        Populate search results from the cache
+        :param cache_key: Key from key()
+        :param search_results: Search results to populate
+        :param uow: Unit of work to load the matched posts with
+        :return: True on a hit
+        """
+        try:
+            cached = self.redis.hget(*cache_key)
+        except RedisError as e:
+            log.warning('Failed to read search result cache: %s', e)
+            return False
+        if not cached:
+            return False
+
+        data = json.loads(cached)
+        rows = data['matches'] + ([data['closest_match']] if data['closest_match'] else [])
+        posts = {post.id: post for post in uow.posts.get_all_by_ids_with_hashes(list({row[0] for row in rows}))}
+        if len(posts) < len({row[0] for row in rows}):
+            # A match has been deleted since the search ran
+            return False
+
+        def rehydrate(row: list) -> ImageSearchMatch:
+            post_id, match_id, hamming_distance, annoy_distance, hash_size, title_similarity = row
+            return ImageSearchMatch(
+                search_results.checked_url, match_id, posts[post_id], hamming_distance, annoy_distance, hash_size,
+                title_similarity=title_similarity
+            )
+
+        search_results.total_searched = data['total_searched']
+        search_results.search_settings.target_match_percent = data['target_match_percent']
+        search_results.meme_hash = data['meme_hash']
+        if data['meme_template_id']:
+            search_results.meme_template = uow.meme_template.get_by_id(data['meme_template_id'])
+        search_results.matches = [rehydrate(row) for row in data['matches']]
+        search_results.closest_match = rehydrate(data['closest_match']) if data['closest_match'] else None
+        return True
+
+    def save(self, cache_key: tuple[str, str], search_results: ImageSearchResults) -> None:
+        data = {
+            'total_searched': search_results.total_searched,
+            'target_match_percent': search_results.search_settings.target_match_percent,
+            'meme_template_id': search_results.meme_template.id if search_results.meme_template else None,
+            'meme_hash': search_results.meme_hash,
+            'closest_match': _compact_match(search_results.closest_match) if search_results.closest_match else None,
+            'matches': [_compact_match(match) for match in search_results.matches],
+        }
+        key, field = cache_key
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, field, json.dumps(data))
+            pipe.expire(key, self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            log.warning('Failed to write search result cache: %s', e)
+
+    def invalidate(self, post_ids: Iterable[str] = (), image_hashes: Iterable[str] = ()) -> None:
+        keys = [f'{CACHE_PREFIX}:post:{post_id}' for post_id in post_ids if post_id]
+        keys += [f'{CACHE_PREFIX}:hash:{image_hash}' for image_hash in image_hashes if image_hash]
+        if keys:
+            self.redis.delete(*keys)
+
+
+_search_result_cache: Optional[SearchResultCache] = None
+
+
+def get_search_result_cache() -> SearchResultCache:
+    """
+    Get the shared cache for this process, creating it on first use
+    :rtype: SearchResultCache
+    """
+    global _search_result_cache
+    if not _search_result_cache:
+        services = get_service_registry()
+        _search_result_cache = SearchResultCache(
+            services.redis_client,
+            ttl=int(services.config.search_result_cache_ttl or 300)
+        )
+    return _search_result_cache
+
+
+def invalidate_search_results(post_ids: Iterable[str] = (), image_hashes: Iterable[str] = ()) -> None:
+    """
+    Drop cached searches for posts that just got a new repost.  Failures are logged and never raised to the writer
+    :param post_ids: Reddit post IDs
+    :param image_hashes: Searched hashes
+    """
+    try:
+        if not get_service_registry().config.search_result_cache_enabled:
+            return
+        get_search_result_cache().invalidate(post_ids, image_hashes)
+    except Exception as e:
+        log.warning('Failed to invalidate search results for %s: %s', post_ids, e)
@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+from typing import Optional, Callable, Any
+
+import requests
+from praw import Reddit
+from redis import Redis
+from requests.adapters import HTTPAdapter
+from sqlalchemy.engine import Engine
+
+from redditrepostsleuth.core.config import Config
+from redditrepostsleuth.core.db.db_utils import get_db_engine
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.notification.notification_service import NotificationService
+from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.stats_response_cache import StatsResponseCache
+from redditrepostsleuth.core.util.helpers import get_redis_client
+from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
+
+log = logging.getLogger(__name__)
+
+# Pools where each process only runs one task at a time
+SINGLE_TASK_POOLS = ('prefork', 'processes', 'solo')
+
+_worker_options: dict = {}
+
+
+def set_worker_options(pool: Optional[str], concurrency: Optional[int]) -> None:
+    """
+    Record how the Celery worker was started so pool sizes can be derived from it.  Called from celeryd_init
+    :param pool: Worker pool type
+    :param concurrency: Worker concurrency
+    """
+    _worker_options['pool'] = pool
+    _worker_options['concurrency'] = concurrency
+
+
+def get_worker_concurrency() -> int:
+    """
+    Number of tasks a single process can run at the same time
+    :return: 1 for prefork and solo pools, worker concurrency for thread pools.  10 outside of a worker
+    """
+    if not _worker_options:
+        return 10
+    pool = _worker_options.get('pool') or 'prefork'
+    if not isinstance(pool, str):
+        pool = getattr(pool, '__module__', '')
+    if any(name in pool for name in SINGLE_TASK_POOLS):
+        return 1
+    return int(_worker_options.get('concurrency') or 10)
+
+
+class ServiceRegistry:
+    """
+    DB engine, Redis, Influx and Reddit clients shared by every task in a process.  Each is created on first use
+    """
+    def __init__(self, config: Optional[Config] = None):
+        self._services: dict[str, Any] = {}
+        if config:
+            self._services['config'] = config
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        service = self._services.get(name)
+        if service is not None:
+            return service
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = factory()
+            return self._services[name]
+
+    @property
+    def config(self) -> Config:
+        return self._get('config', Config)
+
+    def get_db_pool_size(self) -> tuple[int, int]:
+        """
+        :return: Tuple of pool size and max overflow
+        """
+        if self.config.db_pool_size:
+            return int(self.config.db_pool_size), int(self.config.db_max_overflow or 10)
+        concurrency = get_worker_concurrency()
+        # Tasks occasionally open a second unit of work while the first is still open
+        return concurrency + 1, concurrency + 1
+
+    @property
+    def db_engine(self) -> Engine:
+        def create():
+            pool_size, max_overflow = self.get_db_pool_size()
+            log.info('Creating DB engine with pool size %s and max overflow %s', pool_size, max_overflow)
+            return get_db_engine(self.config, pool_size=pool_size, max_overflow=max_overflow)
+        return self._get('db_engine', create)
+
+    @property
+    def uowm(self) -> UnitOfWorkManager:
+        return self._get('uowm', lambda: UnitOfWorkManager(self.db_engine))
+
+    @property
+    def redis_client(self) -> Redis:
+        return self._get('redis_client', lambda: get_redis_client(self.config))
+
+    @property
+    def stats_cache(self) -> StatsResponseCache:
+        return self._get(
+            'stats_cache',
+            lambda: StatsResponseCache(self.redis_client, ttl=int(self.config.stats_cache_ttl or 300))
+        )
+
+    @property
+    def event_logger(self) -> EventLogging:
+        return self._get('event_logger', lambda: EventLogging(config=self.config))
+
+    @property
+    def reddit(self) -> Reddit:
+        return self._get('reddit', lambda: get_reddit_instance(self.config))
+
+    @property
+    def notification_svc(self) -> NotificationService:
+        return self._get('notification_svc', lambda: NotificationService(self.config))
+
+    @property
+    def http_session(self) -> requests.Session:
+        def create():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max(get_worker_concurrency(), 10))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            return session
+        return self._get('http_session', create)
+
+    def after_fork(self) -> None:
+        """
+        Drop connections inherited from the parent.  The objects themselves stay valid so tasks created before the
+        fork keep working
+        """
+        engine = self._services.get('db_engine')
+        if engine:
+            engine.dispose(close=False)
+        session = self._services.get('http_session')
+        if session:
+            session.close()
+        self._lock = threading.RLock()
+
+
+_service_registry: Optional[ServiceRegistry] = None
+
+
+def get_service_registry() -> ServiceRegistry:
+    """
+    Get the shared registry for this process, creating it on first use
+    :rtype: ServiceRegistry
+    """
+    global _service_registry
+    if not _service_registry:
+        _service_registry = ServiceRegistry()
+    return _service_registry
+
+
+def _after_fork_in_child() -> None:
+    if _service_registry:
+        _service_registry.after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Optional, Callable
+from urllib.parse import urlencode
+
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+
+from redditrepostsleuth.core.db.uow.unitofwork import UnitOfWork
+
+log = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'stats-cache'
+DAILY_STATS = 'daily'
+HOME_STATS = 'home'
+TOP_REPOSTERS = 'top-reposters'
+TOP_IMAGE_REPOSTS = 'top-image-reposts'
+BANNED_SUBS = 'banned-subreddits'
+SUBREDDIT_STATS = 'subreddit'
+
+DAY_RANGES = [1, 7, 14, 30]
+REPOSTER_POST_TYPES = [1, 2, 3]
+
+
+@dataclass
+class CachedResponse:
+    body: str
+    etag: str
+
+    def matches(self, if_none_match: Optional[list]) -> bool:
+        """
+        :param if_none_match: Parsed If-None-Match header
+        :return: True if the client already has this response
+        """
+        if not if_none_match:
+            return False
+        return any(tag == '*' or tag == self.etag for tag in if_none_match)
+
+
+def make_etag(body: str) -> str:
+    return hashlib.sha1(body.encode()).hexdigest()
+
+
+def build_daily_stats(uow: UnitOfWork) -> str:
+    results = {
+        'summons_per_day': [],
+        'comments_per_day': [],
+        'karma_per_day': [],
+        'image_reposts_per_day': [],
+        'link_reposts_per_day': [],
+        'top_reposters': [],
+        'top_summoners': [],
+        'top_subs': []
+    }
+    for daily in uow.stat_daily_count.get_all(limit=14):
+        # TODO - Temp solution to stay compatible with frontend
+        results['summons_per_day'].append({'date': daily.date, 'count': daily.summons})
+        results['comments_per_day'].append({'date': daily.date, 'count': daily.comments})
+        results['karma_per_day'].append({'date': daily.date, 'count': 0})
+        results['image_reposts_per_day'].append({'date': daily.date, 'count': daily.image_reposts})
+        results['link_reposts_per_day'].append({'date': daily.date, 'count': daily.link_reposts})
+    return json.dumps(results, default=str)
+
+
+def build_home_stats(uow: UnitOfWork) -> Optional[dict[str, str]]:
+    """
+    :return: Response body for every home page stat name or None if no stats have been recorded
+    """
+    stats = uow.stat_daily_count.get_latest()
+    if not stats:
+        return None
+    counts = {
+        'summons_all': stats.summons_total,
+        'summons_today': stats.summons_24h,
+        'reposts_all': stats.image_reposts_total,
+        'reposts_today': stats.image_reposts_24h,
+        'subreddit_count': uow.monitored_sub.get_count(),
+    }
+    return {name: json.dumps({'count': count, 'stat_name': name}) for name, count in counts.items()}
+
+
+def build_top_reposters(uow: UnitOfWork, post_type: int, days: int) -> str:
+    result = uow.stat_top_reposter.get_by_post_type_and_range(post_type, days)
+    # TODO: This is temp to stay compatible with frontend
+    return json.dumps([{'user': r.author, 'repost_count': r.repost_count} for r in result])
+
+
+def build_top_image_reposts(uow: UnitOfWork, days: int, nsfw: bool) -> str:
+    results = []
+    for repost, post in uow.stat_top_repost.get_all_with_posts(days, nsfw=nsfw):
+        results.append({
+            'post_id': post.post_id,
+            'url': post.url,
+            'nsfw': repost.nsfw,
+            'author': post.author,
+            'shortlink': f'https://redd.it/{post.post_id}',
+            'created_at': post.created_at.timestamp(),
+            'title': post.title,
+            'repost_count': repost.repost_count,
+            'subreddit': post.subreddit
+        })
+    return json.dumps(results)
+
+
+def build_banned_subs(uow: UnitOfWork) -> str:
+    results = []
+    for r in uow.session.execute(text('SELECT * FROM banned_subreddit')):
+        results.append({
+            'subreddit': r[1],
+            'banned_at': r[2].timestamp() if r[2] else None,
+            'last_checked': r[3].timestamp() if r[3] else None
+        })
+    return json.dumps(results)
+
+
+class StatsResponseCache:
+    """
+    Redis cache of the site's stats responses with ETags.  The stats tasks rebuild their entries when they finish
+    """
+    def __init__(self, redis_client: Optional[Redis], ttl: int = 300, precomputed_ttl: int = 90000):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.precomputed_ttl = precomputed_ttl
+
+    def key(self, route: str, **params) -> str:
+        query = urlencode(sorted((name, str(value).lower()) for name, value in params.items()))
+        return f'{CACHE_PREFIX}:{route}:{query}'
+
+    def get(self, route: str, **params) -> Optional[CachedResponse]:
+        if not self.redis:
+            return None
+        try:
+            cached = self.redis.hgetall(self.key(route, **params))
+        except RedisError as e:
+            log.warning('Failed to read stats cache: %s', e)
+            return None
+        if not cached:
+            return None
+        return CachedResponse(body=cached[b'body'].decode(), etag=cached[b'etag'].decode())
+
+    def set(self, route: str, body: str, ttl: Optional[int] = None, **params) -> CachedResponse:
+        response = CachedResponse(body=body, etag=make_etag(body))
+        if not self.redis:
+            return response
+        key = self.key(route, **params)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.hset(key, mapping={'body': response.body, 'etag': response.etag})
+            pipe.expire(key, ttl or self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            log.warning('Failed to write stats cache: %s', e)
+        return response
+
+    def get_or_build(
+            self,
+            route: str,
+            builder: Callable[[], Optional[str]],
+            ttl: Optional[int] = None,
+            **params
+    ) -> Optional[CachedResponse]:
+        """
+        Get a cached response, building and caching it on a miss
+        :param route: Route name
+        :param builder: Returns the response body or None if there is nothing to return
+        :param ttl: Seconds to cache a built response for
+        :return: Cached response or None if the builder returned None
+        """
+        cached = self.get(route, **params)
+        if cached:
+            return cached
+        body = builder()
+        if body is None:
+            return None
+        return self.set(route, body, ttl=ttl, **params)
+
+    def refresh_daily_stats(self, uow: UnitOfWork) -> None:
+        self.set(DAILY_STATS, build_daily_stats(uow), ttl=self.precomputed_ttl)
+        self.refresh_home_stats(uow)
+
+    def refresh_home_stats(self, uow: UnitOfWork) -> Optional[dict[str, CachedResponse]]:
+        bodies = build_home_stats(uow)
+        if not bodies:
+            return None
+        return {
+            name: self.set(HOME_STATS, body, ttl=self.precomputed_ttl, stat_name=name)
+            for name, body in bodies.items()
+        }
+
+    def refresh_top_reposters(self, uow: UnitOfWork, day_ranges: list[int] = None) -> None:
+        for post_type in REPOSTER_POST_TYPES:
+            for days in day_ranges or DAY_RANGES:
+                self.set(
+                    TOP_REPOSTERS,
+                    build_top_reposters(uow, post_type, days),
+                    ttl=self.precomputed_ttl,
+                    post_type=post_type,
+                    days=days
+                )
+
+    def refresh_top_image_reposts(self, uow: UnitOfWork) -> None:
+        for days in DAY_RANGES:
+            for nsfw in (False, True):
+                self.set(
+                    TOP_IMAGE_REPOSTS,
+                    build_top_image_reposts(uow, days, nsfw),
+                    ttl=self.precomputed_ttl,
+                    days=days,
+                    nsfw=nsfw
+                )
@@ -1,5 +1,6 @@
 import json
 import time
+from contextlib import nullcontext
 from json import JSONDecodeError
 from typing import Text, List, NoReturn
 
@@ -14,11 +15,14 @@ from redditrepostsleuth.core.celery.tasks.reddit_action_tasks import send_modmai
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import MonitoredSub, MonitoredSubConfigRevision
 from redditrepostsleuth.core.db.db_utils import get_db_engine
+from redditrepostsleuth.core.db.reference_cache import invalidate_reference_cache, MONITORED_SUB
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.notification.notification_service import NotificationService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
+from redditrepostsleuth.core.services.reddit_rate_limiter import RedditRateLimiter, BACKGROUND_LANE, \
+    get_reddit_rate_limiter
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.util.default_bot_config import DEFAULT_CONFIG_VALUES
 from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
@@ -32,9 +36,11 @@ class SubredditConfigUpdater:
             reddit: Reddit,
             response_handler: ResponseHandler,
             config: Config,
-            notification_svc: NotificationService = None
+            notification_svc: NotificationService = None,
+            rate_limiter: RedditRateLimiter = None
     ):
         self.notification_svc = notification_svc
+        self.rate_limiter = rate_limiter
         self.uowm = uowm
         self.reddit = reddit
         self.response_handler = response_handler
@@ -72,7 +78,8 @@ class SubredditConfigUpdater:
         wiki_page = subreddit.wiki[self.config.wiki_config_name]
 
         try:
-            wiki_page.content_md
+            with self._rate_limited():
+                wiki_page.content_md
         except NotFound:
             self.create_initial_wiki_config(subreddit, wiki_page, monitored_sub)
             return
@@ -134,7 +141,10 @@ class SubredditConfigUpdater:
         except ResponseException as e:
             if e.response.status_code == 429:
                 log.error('IP Rate limit.  Waiting')
-                time.sleep(240)
+                if self.rate_limiter:
+                    self.rate_limiter.penalize(240)
+                else:
+                    time.sleep(240)
             return {}
 
         try:
@@ -187,6 +197,7 @@ class SubredditConfigUpdater:
                 uow.commit()
             except Exception as e:
                 pass
+        invalidate_reference_cache(MONITORED_SUB, monitored_sub.name)
 
     def compare_configs(self, config_one: dict, config_two: dict) -> List[dict]:
         results = []
@@ -244,7 +255,8 @@ class SubredditConfigUpdater:
         log.info('Writing new config to %s', wiki_page.subreddit.display_name)
         log.debug('New Config For %s: %s', wiki_page.subreddit.display_name, new_config)
         # TODO - Check what exceptions can be thrown here
-        wiki_page.edit(json.dumps(new_config))
+        with self._rate_limited():
+            wiki_page.edit(json.dumps(new_config))
 
     def _create_wiki_config_from_database(self, monitored_sub: MonitoredSub) -> dict:
         """
@@ -344,6 +356,7 @@ class SubredditConfigUpdater:
         with self.uowm.start() as uow:
             uow.monitored_sub.update(monitored_sub)
             uow.commit()
+        invalidate_reference_cache(MONITORED_SUB, monitored_sub.name)
         self._set_config_validity(wiki_page.revision_id, True)
         self._notify_successful_load(wiki_page.subreddit)
         self._set_config_notified(wiki_page.revision_id)
@@ -464,6 +477,11 @@ class SubredditConfigUpdater:
     def _get_current_revision_id(self, revisons: List):
         pass
 
+    def _rate_limited(self):
+        if not self.rate_limiter:
+            return nullcontext()
+        return self.rate_limiter.request(self.reddit, BACKGROUND_LANE)
+
 if __name__ == '__main__':
     config = Config('/home/barry/PycharmProjects/RedditRepostSleuth/sleuth_config_dev.json')
     notification_svc = NotificationService(config)
@@ -471,6 +489,9 @@ if __name__ == '__main__':
     uowm = UnitOfWorkManager(get_db_engine(config))
     reddit_manager = RedditManager(reddit)
     event_logger = EventLogging(config=config)
-    response_handler = ResponseHandler(reddit_manager, uowm, event_logger, live_response=config.live_responses)
-    updater = SubredditConfigUpdater(uowm, reddit, response_handler, config, notification_svc=notification_svc)
+    rate_limiter = get_reddit_rate_limiter()
+    response_handler = ResponseHandler(reddit_manager, uowm, event_logger, live_response=config.live_responses,
+                                       rate_limiter=rate_limiter, rate_limit_lane=BACKGROUND_LANE)
+    updater = SubredditConfigUpdater(uowm, reddit, response_handler, config, notification_svc=notification_svc,
+                                     rate_limiter=rate_limiter)
     updater.update_configs(notify_missing_keys=False)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import asyncio
+import atexit
+import hashlib
+import logging
+import os
+import random
+import threading
+from typing import Optional, Iterable
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientError
+from redis import Redis
+from redis.exceptions import RedisError
+
+from redditrepostsleuth.core.services.service_registry import get_service_registry
+from redditrepostsleuth.core.util.constants import USER_AGENTS
+
+log = logging.getLogger(__name__)
+
+_loop_start_lock = threading.Lock()
+
+
+class UrlLivenessChecker:
+    """
+    Checks URLs with concurrent HEAD requests over one session per process.  Results are cached in Redis for
+    cache_ttl seconds
+    """
+    def __init__(
+            self,
+            redis_client: Optional[Redis] = None,
+            cache_ttl: int = 300,
+            timeout: int = 3,
+            max_connections: int = 50,
+            per_domain_limit: int = 4
+    ):
+        self.redis = redis_client
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.per_domain_limit = per_domain_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid = None
+        self._session: Optional[ClientSession] = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def _cache_key(url: str) -> str:
+        return f'url-alive:{hashlib.sha1(url.encode()).hexdigest()}'
+
+    def _get_cached(self, urls: list[str]) -> dict[str, bool]:
+        if not self.redis or not urls:
+            return {}
+        try:
+            values = self.redis.mget([self._cache_key(url) for url in urls])
+        except RedisError as e:
+            log.warning('Failed to load cached URL status: %s', e)
+            return {}
+        return {url: value in (b'1', '1') for url, value in zip(urls, values) if value is not None}
+
+    def _set_cached(self, results: dict[str, bool]) -> None:
+        if not self.redis or not results:
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for url, alive in results.items():
+                pipe.set(self._cache_key(url), '1' if alive else '0', ex=self.cache_ttl)
+            pipe.execute()
+        except RedisError as e:
+            log.warning('Failed to cache URL status: %s', e)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Start the event loop the checks run on.  Done lazily and per PID since Celery creates this before forking the
+        pool and threads don't survive the fork
+        """
+        if self._loop_pid == os.getpid():
+            return self._loop
+        with _loop_start_lock:
+            if self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._session = None
+                threading.Thread(target=self._loop.run_forever, name='UrlLivenessChecker', daemon=True).start()
+                self._loop_pid = os.getpid()
+        return self._loop
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def _get_session(self) -> ClientSession:
+        """
+        Session shared by every check in this process so connections and the per host limit carry across calls.
+        Only called from the checker's event loop
+        """
+        if not self._session or self._session.closed:
+            self._session = ClientSession(
+                connector=TCPConnector(limit=self.max_connections, limit_per_host=self.per_domain_limit),
+                timeout=ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _check_url(self, session: ClientSession, url: str) -> bool:
+        try:
+            async with session.head(url, headers={'User-Agent': random.choice(USER_AGENTS)}) as resp:
+                return resp.status == 200
+        except (ClientError, asyncio.TimeoutError, ValueError) as e:
+            log.debug('URL check failed for %s: %s', url, e)
+            return False
+
+    async def _check_urls(self, urls: list[str], stop_on_first_alive: bool) -> dict[str, bool]:
+        """
+        Check URLs concurrently.  When stop_on_first_alive is set the remaining checks are cancelled once every URL
+        ranked before the first alive URL has resolved
+        :param urls: URLs in rank order
+        :param stop_on_first_alive: Stop once the first alive URL in rank order is known
+        :return: dict of URL to alive status for every URL that was resolved
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        results = self._get_cached(unique_urls)
+        fresh = {}
+
+        def first_alive_resolved() -> bool:
+            for url in unique_urls:
+                if url not in results:
+                    return False
+                if results[url]:
+                    return True
+            return True
+
+        to_check = [url for url in unique_urls if url not in results]
+        if to_check and not (stop_on_first_alive and first_alive_resolved()):
+            session = self._get_session()
+            tasks = {asyncio.ensure_future(self._check_url(session, url)): url for url in to_check}
+            pending = set(tasks)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        results[tasks[task]] = fresh[tasks[task]] = task.result()
+                    if stop_on_first_alive and first_alive_resolved():
+                        break
+            finally:
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+        self._set_cached(fresh)
+        return results
+
+    def check_urls(self, urls: Iterable[str]) -> dict[str, bool]:
+        """
+        Check if each URL is alive
+        :param urls: URLs to check
+        :return: dict of URL to alive status
+        """
+        return self._run(self._check_urls(list(urls), False))
+
+    def get_first_alive_index(self, urls: Iterable[str]) -> Optional[int]:
+        """
+        Find the first alive URL in rank order.  Lower ranked URLs are checked concurrently but a faster lower ranked
+        result never wins over a higher ranked one
+        :param urls: URLs in rank order
+        :return: Index of the first alive URL
+        """
+        urls = list(urls)
+        if not urls:
+            return
+        results = self._run(self._check_urls(urls, True))
+        for i, url in enumerate(urls):
+            if results.get(url):
+                return i
+
+    def close(self) -> None:
+        """
+        Close the session and stop the event loop
+        """
+        if self._loop_pid != os.getpid():
+            return
+        if self._session:
+            self._run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_pid = None
+
+
+_liveness_checker: Optional[UrlLivenessChecker] = None
+
+
+def get_url_liveness_checker() -> UrlLivenessChecker:
+    """
+    Get the shared checker for this process, creating it on first use
+    :rtype: UrlLivenessChecker
+    """
+    global _liveness_checker
+    if not _liveness_checker:
+        services = get_service_registry()
+        config = services.config
+        _liveness_checker = UrlLivenessChecker(
+            redis_client=services.redis_client,
+            cache_ttl=int(config.url_liveness_cache_ttl or 300)
+        )
+    return _liveness_checker
@@ -22,4 +22,6 @@ REDDIT_REMOVAL_REASONS = ['deleted', 'author', 'reddit', 'copyright_takedown', '
 EXCLUDE_FROM_TOP_REPOSTERS = [
     'AutoModerator',
     'AutoNewspaperAdmin',
-]
\ No newline at end of file
+]
+# Redis list ingest pushes image post IDs onto when batched repost checks are enabled
+IMAGE_REPOST_BATCH_QUEUE = 'image_repost_batch'
@@ -1,17 +1,19 @@
 import logging
 from io import BytesIO
-from typing import Text, Optional
+from typing import Text, Optional, BinaryIO
 from urllib import request
 from urllib.error import HTTPError
 
 import imagehash
+import numpy as np
 import requests
 from PIL import Image, UnidentifiedImageError
 from PIL.Image import DecompressionBombError
 from requests.exceptions import ConnectionError, Timeout
 
 from redditrepostsleuth.core.db.databasemodels import Post
-from redditrepostsleuth.core.exception import ImageConversionException, ImageRemovedException, InvalidImageUrlException
+from redditrepostsleuth.core.exception import ImageConversionException, ImageRemovedException, InvalidImageUrlException, \
+    ImageTooLargeException
 from redditrepostsleuth.core.util.constants import GENERIC_USER_AGENT
 
 log = logging.getLogger(__name__)
@@ -30,7 +32,15 @@ def generate_img_by_post(post: Post) -> Image:
     return img if img else None
 
 def generate_img_by_url(url: str) -> Image:
+    return image_from_bytes(get_image_bytes_by_url(url), url)
 
+
+def get_image_bytes_by_url(url: str) -> bytes:
+    """
+    Download the raw bytes of an image with urllib
+    :param url: URL to get
+    :return: Image bytes
+    """
     try:
         req = request.Request(
             url,
@@ -45,12 +55,25 @@ def generate_img_by_url(url: str) -> Image:
 
     try:
         response = request.urlopen(req, timeout=10)
-        img = Image.open(BytesIO(response.read()))
-    except (HTTPError, ConnectionError, OSError, DecompressionBombError, UnicodeEncodeError) as e:
+        return response.read()
+    except (HTTPError, ConnectionError, OSError, UnicodeEncodeError) as e:
+        log.warning('Failed to convert image %s. Error: %s ', url, str(e), exc_info=False)
+        raise ImageConversionException(str(e))
+
+
+def image_from_bytes(data: bytes, url: str = None) -> Image:
+    """
+    Open downloaded image bytes with PIL
+    :param data: Image bytes
+    :param url: URL the bytes came from.  Only used for logging
+    :return: PIL image
+    """
+    try:
+        return Image.open(BytesIO(data))
+    except (UnidentifiedImageError, DecompressionBombError, OSError) as e:
         log.warning('Failed to convert image %s. Error: %s ', url, str(e), exc_info=False)
         raise ImageConversionException(str(e))
 
-    return img if img else None
 
 def generate_img_by_url_requests(url: str, proxy: str = None) -> Optional[Image]:
     """
@@ -59,14 +82,25 @@ def generate_img_by_url_requests(url: str, proxy: str = None) -> Optional[Image]
     :param url: URL to get
     :return: PIL image
     """
+    return image_from_bytes(get_image_bytes_by_url_requests(url, proxy=proxy), url)
+
+
+def get_image_request_headers(url: str) -> dict:
     if 'redd.it' in url:
         useragent = 'repostsleuthbot:v1.0.3 Image Hasher (by /u/barrycarey)'
     else:
         useragent = GENERIC_USER_AGENT
+    return {'User-Agent': useragent}
 
-    headers = {
-        'User-Agent': useragent
-    }
+
+def get_image_bytes_by_url_requests(url: str, proxy: str = None) -> bytes:
+    """
+    Download the raw bytes of an image with requests
+    :param proxy: Optional proxy to use with request
+    :param url: URL to get
+    :return: Image bytes
+    """
+    headers = get_image_request_headers(url)
 
     proxies = None
     if proxy:
@@ -86,11 +120,55 @@ def generate_img_by_url_requests(url: str, proxy: str = None) -> Optional[Image]
             raise InvalidImageUrlException(f'Unauthorized on {url}')
         raise ImageConversionException(f'Status {res.status_code}')
 
+    return res.content
+
+
+def read_image_stream(stream: BinaryIO, max_bytes: int, chunk_size: int = 65536) -> bytes:
+    """
+    Read an uploaded image into memory, stopping as soon as it goes over the size limit
+    :param stream: File like object to read
+    :param max_bytes: Largest image we'll accept
+    :param chunk_size: Bytes to read at a time
+    :return: Image bytes
+    """
+    buffer = BytesIO()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer.write(chunk)
+        if buffer.tell() > max_bytes:
+            raise ImageTooLargeException(f'Image is larger than {max_bytes} bytes')
+    return buffer.getvalue()
+
+
+def get_image_hashes_from_stream(
+        stream: BinaryIO,
+        max_bytes: int,
+        max_pixels: int,
+        hash_size: int = 16,
+        meme_hash_size: int = None
+) -> dict:
+    """
+    Hash an uploaded image without writing it to disk.  The dimensions are checked from the image header before
+    anything is decoded so oversized images are rejected without decompressing them
+    :param stream: File like object to read
+    :param max_bytes: Largest file we'll accept
+    :param max_pixels: Largest width * height we'll decode
+    :param hash_size: Size of the dhash
+    :param meme_hash_size: Also generate a dhash of this size for the meme filter, returned as meme_dhash
+    :return: dict of hex hashes
+    """
+    img = image_from_bytes(read_image_stream(stream, max_bytes))
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLargeException(f'Image is {width}x{height}.  Max is {max_pixels} pixels')
     try:
-        return Image.open(BytesIO(res.content))
-    except (UnidentifiedImageError, DecompressionBombError) as e:
-        log.warning('Failed to hash image %s: %s', url, e)
-        raise ImageConversionException(e)
+        return compute_image_hashes(img, hash_size=hash_size, hash_types=('dhash_h',), meme_hash_size=meme_hash_size)
+    except (OSError, ValueError) as e:
+        # Truncated or corrupt data only shows up once the pixels are decoded
+        log.warning('Failed to hash uploaded image. Error: %s', str(e))
+        raise ImageConversionException(str(e))
 
 
 def generate_img_by_file(path: str) -> Image:
@@ -106,23 +184,84 @@ def generate_img_by_file(path: str) -> Image:
 
 
 def get_image_hashes(url: Text, hash_size: int = 16) -> dict:
-    result = {
-        'dhash_h': None,
-        'dhash_v': None,
-        'ahash': None,
-    }
     log.debug('Hashing image %s', url)
     img = generate_img_by_url(url)
     try:
-        dhash_h = imagehash.dhash(img, hash_size=hash_size)
-        dhash_v = imagehash.dhash_vertical(img, hash_size=hash_size)
-        ahash = imagehash.average_hash(img, hash_size=hash_size)
-        result['dhash_h'] = str(dhash_h)
-        result['dhash_v'] = str(dhash_v)
-        result['ahash'] = str(ahash)
+        return compute_image_hashes(img, hash_size=hash_size)
     except Exception as e:
         # TODO: Specific exception
         log.exception('Error creating hash', exc_info=True)
         raise
 
+
+def _bits_to_hex(bits: np.ndarray) -> str:
+    """
+    Same output as str(ImageHash(bits))
+    """
+    bits = bits.flatten()
+    if len(bits) % 8:
+        return str(imagehash.ImageHash(bits))
+    return np.packbits(bits).tobytes().hex()
+
+
+def compute_image_hashes(
+        img: Image,
+        hash_size: int = 16,
+        hash_types: tuple[str, ...] = ('dhash_h', 'dhash_v', 'ahash'),
+        meme_hash_size: int = None,
+        draft: bool = False
+) -> dict:
+    """
+    Generate several hashes from one image.  The image is converted to grayscale once and resized once per target
+    shape instead of once per hash.
+
+    Output is bit exact with imagehash.dhash, dhash_vertical and average_hash unless draft is set.  Draft lets the JPEG
+    decoder scale the image down during decode, which is much faster on large images but changes the pixels the hash is
+    built from, so those hashes won't always match the ones already in the database
+    :param img: PIL image
+    :param hash_size: Size of the dhash_h, dhash_v and ahash hashes
+    :param hash_types: Hashes to generate
+    :param meme_hash_size: Also generate a dhash of this size for the meme filter, returned as meme_dhash
+    :param draft: Use JPEG draft mode
+    :return: dict of hex hashes
+    """
+    if hash_size < 2:
+        raise ValueError('Hash size must be greater than or equal to 2')
+
+    if draft and img.format == 'JPEG':
+        min_size = max(hash_size, meme_hash_size or 0) * 8
+        img.draft('RGB', (min_size, min_size))
+
+    gray = img.convert('L')
+    resized = {}
+
+    def pixels(size: tuple[int, int]) -> np.ndarray:
+        if size not in resized:
+            resized[size] = np.asarray(gray.resize(size, imagehash.ANTIALIAS))
+        return resized[size]
+
+    result = {}
+    if 'dhash_h' in hash_types:
+        px = pixels((hash_size + 1, hash_size))
+        result['dhash_h'] = _bits_to_hex(px[:, 1:] > px[:, :-1])
+    if 'dhash_v' in hash_types:
+        px = pixels((hash_size, hash_size + 1))
+        result['dhash_v'] = _bits_to_hex(px[1:, :] > px[:-1, :])
+    if 'ahash' in hash_types:
+        px = pixels((hash_size, hash_size))
+        result['ahash'] = _bits_to_hex(px > np.mean(px))
+    if meme_hash_size:
+        px = pixels((meme_hash_size + 1, meme_hash_size))
+        result['meme_dhash'] = _bits_to_hex(px[:, 1:] > px[:, :-1])
     return result
+
+
+def get_all_image_hashes(img: Image, hash_size: int = 16, meme_hash_size: int = 32) -> dict:
+    """
+    Generate every hash we store for an image from a single decode
+    :param img: PIL image
+    :param hash_size: Size of dhash_h, dhash_v and ahash
+    :param meme_hash_size: Size of the dhash used by the meme filter
+    :return: dict of hashes
+    """
+    return compute_image_hashes(img, hash_size=hash_size, meme_hash_size=meme_hash_size)
@@ -1,9 +1,8 @@
 import logging
-import random
+from dataclasses import dataclass, field
 from typing import List, Text, Optional
 
 import Levenshtein
-import requests
 from praw import Reddit
 from sqlalchemy.exc import IntegrityError
 
@@ -18,8 +17,10 @@ from redditrepostsleuth.core.model.repostmatch import RepostMatch
 from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
 from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
 from redditrepostsleuth.core.model.search.search_match import SearchMatch
+from redditrepostsleuth.core.model.search.search_match_collection import SearchMatchCollection
 from redditrepostsleuth.core.model.search.search_results import SearchResults
-from redditrepostsleuth.core.util.constants import USER_AGENTS
+from redditrepostsleuth.core.services.search_result_cache import invalidate_search_results
+from redditrepostsleuth.core.services.url_liveness_checker import UrlLivenessChecker, get_url_liveness_checker
 from redditrepostsleuth.core.util.helpers import set_repost_search_params_from_search_settings
 from redditrepostsleuth.core.util.imagehashing import get_image_hashes
 from redditrepostsleuth.core.util.repost_filters import filter_same_post, filter_same_author, cross_post_filter, \
@@ -82,6 +83,45 @@ def log_search(
         log.exception('Failed to save repost search')
 
 
+def log_searches(
+        uow: UnitOfWork,
+        all_search_results: list[SearchResults],
+        source: str,
+        post_type_name: str
+) -> None:
+    """
+    Save a batch of searches in a single transaction
+    :param uow: Unit of work to save with
+    :param all_search_results: Completed searches
+    :param source: Source that triggered the searches
+    :param post_type_name: Post type that was searched
+    """
+    if not all_search_results:
+        return
+    try:
+        post_type = uow.post_type.get_by_name(post_type_name)
+        if not post_type:
+            log.warning('Failed to find post_type %s for search from source %s', post_type_name, source)
+        logged_searches = []
+        for search_results in all_search_results:
+            logged_search = RepostSearch(
+                post_id=search_results.checked_post.id if search_results.checked_post else None,
+                subreddit=search_results.checked_post.subreddit if search_results.checked_post else None,
+                source=source,
+                matches_found=len(search_results.matches),
+                search_time=search_results.search_times.total_search_time,
+                post_type=post_type
+            )
+            set_repost_search_params_from_search_settings(search_results.search_settings, logged_search)
+            logged_searches.append(logged_search)
+        uow.repost_search.add_all(logged_searches)
+        uow.commit()
+        for search_results, logged_search in zip(all_search_results, logged_searches):
+            search_results.logged_search = logged_search
+    except Exception as e:
+        log.exception('Failed to save repost searches')
+
+
 # TODO - 1/12/2021 - Possibly make the generic. It's messing with auto complete when used for image searches
 def filter_search_results(search_results: SearchResults) -> SearchResults:
     """
@@ -94,46 +134,56 @@ def filter_search_results(search_results: SearchResults) -> SearchResults:
     search_results.search_times.start_timer('total_filter_time')
     # Only run these if we are search for an existing post
     if search_results.checked_post:
-        search_results.matches = list(filter(filter_same_post(search_results.checked_post.post_id), search_results.matches))
+        matches = SearchMatchCollection(search_results.matches)
+        matches.filter(filter_same_post(search_results.checked_post.post_id))
 
         if search_results.search_settings.filter_same_author:
-            search_results.matches = list(filter(filter_same_author(search_results.checked_post.author), search_results.matches))
+            matches.filter(filter_same_author(search_results.checked_post.author))
 
         if search_results.search_settings.filter_crossposts:
-            search_results.matches = list(filter(cross_post_filter, search_results.matches))
+            matches.filter(cross_post_filter)
 
         if search_results.search_settings.only_older_matches:
-            search_results.matches = list(filter(filter_newer_matches(search_results.checked_post.created_at), search_results.matches))
+            matches.filter(filter_newer_matches(search_results.checked_post.created_at))
 
         if search_results.search_settings.same_sub:
-            search_results.matches = list(filter(same_sub_filter(search_results.checked_post.subreddit), search_results.matches))
+            matches.filter(same_sub_filter(search_results.checked_post.subreddit))
 
         if search_results.search_settings.target_title_match:
-            search_results.matches = list(filter(filter_title_distance(search_results.search_settings.target_title_match), search_results.matches))
+            matches.filter(filter_title_distance(search_results.search_settings.target_title_match))
 
         if search_results.search_settings.max_days_old:
-            search_results.matches = list(filter(filter_days_old_matches(search_results.search_settings.max_days_old), search_results.matches))
+            matches.filter(filter_days_old_matches(search_results.search_settings.max_days_old))
 
         if search_results.search_settings.filter_dead_matches:
             search_results.search_times.start_timer('filter_deleted_posts_time')
-            search_results.matches = filter_removed_posts_util_api(search_results.matches)
+            search_results.matches = filter_removed_posts_util_api(matches)
             search_results.search_times.stop_timer('filter_deleted_posts_time')
-            print(f'Filter dead time: {search_results.search_times.filter_deleted_posts_time}')
+            log.debug('Filter dead time: %s', search_results.search_times.filter_deleted_posts_time)
+        else:
+            search_results.matches = matches.to_list()
 
     search_results.search_times.stop_timer('total_filter_time')
     log.debug('%s results post-filter', len(search_results.matches))
     return search_results
 
 
-def get_first_active_match(matches: List[ImageSearchMatch]) -> ImageSearchMatch:
-    for match in matches:
-        try:
-            headers = {'User-Agent': random.choice(USER_AGENTS)}
-            r = requests.head(match.post.url, timeout=3, headers=headers)
-            if r.status_code == 200:
-                return match
-        except Exception as e:
-            continue
+def get_first_active_match(
+        matches: List[ImageSearchMatch],
+        liveness_checker: UrlLivenessChecker = None
+) -> Optional[ImageSearchMatch]:
+    """
+    Return the highest ranked match with a URL that is still alive.  URLs are checked concurrently
+    :param matches: Matches in rank order
+    :param liveness_checker: Checker to use.  Defaults to the shared checker
+    :return: First active match
+    """
+    if not matches:
+        return
+    liveness_checker = liveness_checker or get_url_liveness_checker()
+    index = liveness_checker.get_first_alive_index([match.post.url for match in matches])
+    if index is not None:
+        return matches[index]
 
 
 def get_title_similarity(title1: Text, title2: Text) -> float:
@@ -208,7 +258,22 @@ def save_image_repost_result(
     log.info('Creating repost. Post %s is a repost of %s', search_results.checked_post.url,
              search_results.matches[0].post.url)
 
-    new_repost = Repost(
+    uow.repost.add(_image_repost(search_results, source))
+
+    try:
+        uow.commit()
+    except Exception as e:
+        log.exception('Failed to save image repost', exc_info=True)
+        return
+
+    invalidate_search_results(
+        post_ids=[search_results.checked_post.post_id, search_results.matches[0].post.post_id],
+        image_hashes=[search_results.target_hash]
+    )
+
+
+def _image_repost(search_results: ImageSearchResults, source: str) -> Repost:
+    return Repost(
         post_id=search_results.checked_post.id,
         repost_of_id=search_results.matches[0].post.id,
         author=search_results.checked_post.author,
@@ -219,12 +284,76 @@ def save_image_repost_result(
         hamming_distance=search_results.closest_match.hamming_distance if search_results.closest_match else None
     )
 
-    uow.repost.add(new_repost)
 
+@dataclass
+class ImageRepostSaveResult:
+    saved: list[ImageSearchResults] = field(default_factory=list)
+    failed: list[ImageSearchResults] = field(default_factory=list)
+    # Searches that created a meme template and need to be rechecked
+    needs_recheck: list[ImageSearchResults] = field(default_factory=list)
+
+
+def save_image_repost_results(
+        all_search_results: list[ImageSearchResults],
+        uow: UnitOfWork,
+        source: str,
+        high_match_check: bool = False,
+) -> ImageRepostSaveResult:
+    """
+    Save the reposts from a batch of searches in a single transaction.  If that fails the reposts are saved one at a
+    time so one bad row doesn't lose the rest of the batch
+    :param all_search_results: Completed searches
+    :param uow: Unit of work to save with
+    :param source: Source that triggered the searches
+    :param high_match_check: Check each search for a high match meme
+    :return: Searches whose repost was saved, failed to save or need to be rechecked
+    """
+    result = ImageRepostSaveResult()
+    to_save = {}
+    for search_results in all_search_results:
+        if not search_results.matches:
+            continue
+
+        if search_results.checked_post.id in to_save:
+            log.info('Post %s is in the batch more than once', search_results.checked_post.post_id)
+            continue
+
+        if high_match_check:
+            try:
+                check_for_high_match_meme(search_results, uow)
+            except IngestHighMatchMeme:
+                result.needs_recheck.append(search_results)
+                continue
+
+        log.info('Creating repost. Post %s is a repost of %s', search_results.checked_post.url,
+                 search_results.matches[0].post.url)
+        to_save[search_results.checked_post.id] = search_results
+
+    if not to_save:
+        return result
+
+    uow.repost.add_all([_image_repost(search_results, source) for search_results in to_save.values()])
     try:
         uow.commit()
+        result.saved = list(to_save.values())
     except Exception as e:
-        log.exception('Failed to save image repost', exc_info=True)
+        log.warning('Failed to save %s image reposts together, saving one at a time: %s', len(to_save), e)
+        uow.rollback()
+        for search_results in to_save.values():
+            uow.repost.add(_image_repost(search_results, source))
+            try:
+                uow.commit()
+                result.saved.append(search_results)
+            except Exception:
+                log.exception('Failed to save image repost for post %s', search_results.checked_post.post_id)
+                uow.rollback()
+                result.failed.append(search_results)
+
+    invalidate_search_results(
+        post_ids=[post_id for s in result.saved for post_id in (s.checked_post.post_id, s.matches[0].post.post_id)],
+        image_hashes=[s.target_hash for s in result.saved]
+    )
+    return result
 
 
 def save_repost(search_results: SearchResults, uow: UnitOfWork, source: str) -> None:
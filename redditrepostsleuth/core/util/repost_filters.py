@@ -1,19 +1,19 @@
 import json
 import logging
 from datetime import datetime
-from typing import Text, List
-import random
+from typing import Text, List, Iterable
 
 import requests
 from praw import Reddit
-from requests.exceptions import SSLError, ConnectionError, ReadTimeout
 
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.model.search.text_search_match import TextSearchMatch
 from redditrepostsleuth.core.util.utils import build_reddit_query_string
 from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
 from redditrepostsleuth.core.model.search.search_match import SearchMatch
-from redditrepostsleuth.core.util.constants import USER_AGENTS, REDDIT_REMOVAL_REASONS
+from redditrepostsleuth.core.model.search.search_match_collection import SearchMatchCollection
+from redditrepostsleuth.core.services.url_liveness_checker import get_url_liveness_checker
+from redditrepostsleuth.core.util.constants import REDDIT_REMOVAL_REASONS
 from redditrepostsleuth.core.util.helpers import batch_check_urls, chunk_list
 
 log = logging.getLogger(__name__)
@@ -138,40 +138,35 @@ def filter_no_dhash(match: ImageSearchMatch):
 
 
 def filter_dead_urls(match: SearchMatch) -> bool:
-    try:
-        headers = {'User-Agent': random.choice(USER_AGENTS)}
-        r = requests.head(match.post.url, timeout=3, headers=headers)
-    except (ConnectionError, SSLError, ReadTimeout):
-        return False
-    if r.status_code == 200:
+    if get_url_liveness_checker().check_urls([match.post.url]).get(match.post.url):
         return True
-    else:
-        log.debug('Active URL Reject:  https://redd.it/%s', match.post.post_id)
-        return False
+    log.debug('Active URL Reject:  https://redd.it/%s', match.post.post_id)
+    return False
 
 
-def filter_removed_posts(reddit: Reddit, matches: List[SearchMatch]) -> List[SearchMatch]:
+def filter_removed_posts(reddit: Reddit, matches: Iterable[SearchMatch]) -> List[SearchMatch]:
     """
     Take a list of SearchMatches, get the submission from Reddit and see if they have been removed
     :param reddit: Praw Reddit instance
     :param matches: List of matches
     :return: List of filtered matches
     """
-    if not matches:
-        return matches
-    if len(matches) > 100:
-        log.info('Skipping removed post check due to > 100 matches (%s)', len(matches))
-        return matches
-    post_ids = [f't3_{match.post.post_id}' for match in matches]
+    collection = SearchMatchCollection(matches)
+    if not collection:
+        return collection.to_list()
+    if len(collection) > 100:
+        log.info('Skipping removed post check due to > 100 matches (%s)', len(collection))
+        return collection.to_list()
+    post_ids = [f't3_{match.post.post_id}' for match in collection]
     submissions = reddit.info(post_ids)
     for sub in submissions:
         if sub.__dict__.get('removed', None):
             log.debug('Removed Post Filter Reject - %s', sub.id)
-            del matches[next(i for i, x in enumerate(matches) if x.post.post_id == sub.id)]
-    return matches
+            collection.remove_by_post_id(sub.id)
+    return collection.to_list()
 
 
-def filter_dead_urls_remote(util_api: Text, matches: List[SearchMatch]) -> List[SearchMatch]:
+def filter_dead_urls_remote(util_api: Text, matches: Iterable[SearchMatch]) -> List[SearchMatch]:
     """
     Batch checking a list of matches to see if the associated links have been removed.
     This function is using our utility API that runs on a Pool of VMs so we can check matches at high volume
@@ -191,38 +186,35 @@ def filter_dead_urls_remote(util_api: Text, matches: List[SearchMatch]) -> List[
     :param matches: List of matches
     :return: List of filtered matches
     """
-    results = []
-    match_urls = [{'id': match.post.post_id, 'url': match.post.url} for match in matches]
+    collection = SearchMatchCollection(matches)
+    match_urls = [{'id': match.post.post_id, 'url': match.post.url} for match in collection]
     alive_urls = batch_check_urls(match_urls, util_api)
-    for url in alive_urls:
-        match = next((x for x in matches if x.post.post_id == url['id']), None)
-        if match:
-            results.append(match)
-    return results
+    return collection.keep_post_ids(url['id'] for url in alive_urls).to_list()
 
 
-def filter_removed_posts_util_api(matches: list[SearchMatch]) -> list[SearchMatch]:
-    results = []
-    log.debug('Starting filter remove post with %s matches', len(matches))
-    for chunk in chunk_list(matches, 100):
+def filter_removed_posts_util_api(matches: Iterable[SearchMatch]) -> list[SearchMatch]:
+    collection = SearchMatchCollection(matches)
+    log.debug('Starting filter remove post with %s matches', len(collection))
+    for chunk in chunk_list(collection.to_list(), 100):
         url = f'{config.util_api}/reddit/info?submission_ids={build_reddit_query_string([p.post.post_id for p in chunk])}'
         try:
             response = requests.get(url)
             if response.status_code != 200:
                 log.error('Bad status %s from util API.  Skipping check on this batch', response.status_code)
-                results += chunk
                 continue
         except Exception as e:
             log.exception('Problem reaching util API')
-            results += chunk
             continue
 
         res_data = json.loads(response.text)
-        for post in res_data['data']['children']:
-            if post['data']['removed_by_category'] in REDDIT_REMOVAL_REASONS:
-                continue
-            match_to_keep = next((m for m in chunk if m.post.post_id == post['data']['id']), None)
-            results.append(match_to_keep)
-
-    log.debug('Finished filter removed posts with %s results', len(results))
-    return results
\ No newline at end of file
+        # Posts missing from the response no longer exist on Reddit so only the returned, non-removed posts are kept
+        alive = {
+            post['data']['id'] for post in res_data['data']['children']
+            if post['data']['removed_by_category'] not in REDDIT_REMOVAL_REASONS
+        }
+        for match in chunk:
+            if match.post.post_id not in alive:
+                collection.remove(match)
+
+    log.debug('Finished filter removed posts with %s results', len(collection))
+    return collection.to_list()
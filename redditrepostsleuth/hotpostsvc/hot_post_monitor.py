@@ -1,4 +1,5 @@
 import time
+from contextlib import nullcontext
 from typing import Text, NoReturn, Optional
 
 from praw.exceptions import APIException
@@ -14,8 +15,11 @@ from redditrepostsleuth.core.model.search.search_results import SearchResults
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
+from redditrepostsleuth.core.services.reddit_rate_limiter import RedditRateLimiter, BACKGROUND_LANE, \
+    get_reddit_rate_limiter
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.services.responsebuilder import ResponseBuilder
+from redditrepostsleuth.core.services.search_result_cache import get_search_result_cache
 from redditrepostsleuth.core.util.helpers import get_default_link_search_settings
 from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
 from redditrepostsleuth.core.util.replytemplates import TOP_POST_WATCH_BODY, \
@@ -34,9 +38,11 @@ class TopPostMonitor:
             response_builder: ResponseBuilder,
             response_handler: ResponseHandler,
             config: Config = None,
+            rate_limiter: RedditRateLimiter = None
     ):
 
         self.reddit = reddit
+        self.rate_limiter = rate_limiter
         self.uowm = uowm
         self.image_service = image_service
         self.response_builder = response_builder
@@ -50,10 +56,7 @@ class TopPostMonitor:
     def monitor(self):
         while True:
             with self.uowm.start() as uow:
-                submissions = [sub for sub in self.reddit.subreddit('all').top('day')]
-                submissions = submissions + [sub for sub in self.reddit.subreddit('all').rising()]
-                submissions = submissions + [sub for sub in self.reddit.subreddit('all').controversial('day')]
-                submissions = submissions + [sub for sub in self.reddit.subreddit('all').hot()]
+                submissions = self._get_submissions()
                 for sub in submissions:
                     post = uow.posts.get_by_post_id(sub.id)
                     if not post:
@@ -81,6 +84,15 @@ class TopPostMonitor:
             log.info('Processed all top posts.  Sleeping')
             time.sleep(3600)
 
+    def _get_submissions(self) -> list[Submission]:
+        # One request per listing
+        with self.rate_limiter.request(self.reddit, BACKGROUND_LANE, tokens=4) if self.rate_limiter else nullcontext():
+            submissions = [sub for sub in self.reddit.subreddit('all').top('day')]
+            submissions = submissions + [sub for sub in self.reddit.subreddit('all').rising()]
+            submissions = submissions + [sub for sub in self.reddit.subreddit('all').controversial('day')]
+            submissions = submissions + [sub for sub in self.reddit.subreddit('all').hot()]
+        return submissions
+
     def _is_banned_sub(self, subreddit: Text) -> bool:
         with self.uowm.start() as uow:
             banned = uow.banned_subreddit.get_by_subreddit(subreddit)
@@ -231,15 +243,25 @@ if __name__ == '__main__':
     config = Config()
     uowm = UnitOfWorkManager(get_db_engine(config))
     event_logger = EventLogging(config=config)
-    dup = DuplicateImageService(uowm, event_logger, config=config)
+    reddit = get_reddit_instance(config)
+    dup = DuplicateImageService(
+        uowm,
+        event_logger,
+        reddit,
+        config=config,
+        result_cache=get_search_result_cache() if config.search_result_cache_enabled else None
+    )
     response_builder = ResponseBuilder(uowm)
-    reddit_manager = RedditManager(get_reddit_instance(config))
+    reddit_manager = RedditManager(reddit)
+    rate_limiter = get_reddit_rate_limiter()
     top = TopPostMonitor(
         reddit_manager,
         uowm,
         dup,
         response_builder,
-        ResponseHandler(reddit_manager, uowm, event_logger, source='toppost', live_response=config.live_responses),
-        config=config
+        ResponseHandler(reddit_manager, uowm, event_logger, source='toppost', live_response=config.live_responses,
+                        rate_limiter=rate_limiter, rate_limit_lane=BACKGROUND_LANE),
+        config=config,
+        rate_limiter=rate_limiter
     )
     top.monitor()
\ No newline at end of file
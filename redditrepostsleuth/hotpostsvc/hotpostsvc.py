@@ -9,8 +9,10 @@ from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter, BACKGROUND_LANE
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.services.responsebuilder import ResponseBuilder
+from redditrepostsleuth.core.services.search_result_cache import get_search_result_cache
 from redditrepostsleuth.core.util.helpers import get_reddit_instance
 from redditrepostsleuth.hotpostsvc.hot_post_monitor import TopPostMonitor
 
@@ -21,16 +23,25 @@ if __name__ == '__main__':
         event_logger = EventLogging(config=config)
         reddit = get_reddit_instance(config)
         reddit_manager = RedditManager(reddit)
-        dup = DuplicateImageService(uowm, event_logger, reddit, config=config)
+        dup = DuplicateImageService(
+            uowm,
+            event_logger,
+            reddit,
+            config=config,
+            result_cache=get_search_result_cache() if config.search_result_cache_enabled else None
+        )
         response_builder = ResponseBuilder(uowm)
+        rate_limiter = get_reddit_rate_limiter()
 
         top = TopPostMonitor(
             reddit_manager,
             uowm,
             dup,
             response_builder,
-            ResponseHandler(reddit_manager, uowm, event_logger, source='toppost', live_response=config.live_responses),
-            config=config
+            ResponseHandler(reddit_manager, uowm, event_logger, source='toppost', live_response=config.live_responses,
+                            rate_limiter=rate_limiter, rate_limit_lane=BACKGROUND_LANE),
+            config=config,
+            rate_limiter=rate_limiter
         )
         try:
             top.monitor()
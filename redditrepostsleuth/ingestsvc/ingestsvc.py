@@ -11,7 +11,7 @@ from aiohttp import ClientSession, ClientTimeout, ClientConnectorError, TCPConne
     ServerDisconnectedError, ClientOSError
 from praw import Reddit
 
-from redditrepostsleuth.core.celery.tasks.ingest_tasks import save_new_post, save_new_posts
+from redditrepostsleuth.core.celery.tasks.ingest_tasks import save_new_posts
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import Post
 from redditrepostsleuth.core.db.db_utils import get_db_engine
@@ -202,8 +202,7 @@ def queue_posts_for_ingest(posts: List[Post]):
     :param posts: List of Posts to save
     """
     log.info('Sending batch of %s posts to ingest queue', len(posts))
-    for post in posts:
-        save_new_post.apply_async((post,))
+    save_new_posts.apply_async((posts, True))
 
 def get_request_delay(submissions: list[dict], current_req_delay: int, target_ingest_delay: int = 30) -> int:
     ingest_delay = datetime.utcnow() - datetime.utcfromtimestamp(
@@ -12,14 +12,18 @@ from redditrepostsleuth.core.notification.notification_service import Notificati
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter, BACKGROUND_LANE
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
+from redditrepostsleuth.core.services.search_result_cache import get_search_result_cache
+from redditrepostsleuth.core.services.stats_response_cache import StatsResponseCache
 from redditrepostsleuth.core.services.subreddit_config_updater import SubredditConfigUpdater
+from redditrepostsleuth.core.util.helpers import get_redis_client
 from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.admin.general_admin import GeneralAdmin
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.admin.message_template import MessageTemplate
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.bot_stats import BotStats
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.image_repost_endpoint import ImageRepostEndpoint
-from redditrepostsleuth.repostsleuthsiteapi.endpoints.image_search import ImageSearch, ImageServe
+from redditrepostsleuth.repostsleuthsiteapi.endpoints.image_search import ImageSearch
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.image_search_history import ImageSearchHistory
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.meme_template import MemeTemplateEndpoint
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.monitored_sub import MonitoredSub
@@ -28,21 +32,32 @@ from redditrepostsleuth.repostsleuthsiteapi.endpoints.posts import PostsEndpoint
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.repost_history import RepostHistoryEndpoint
 from redditrepostsleuth.repostsleuthsiteapi.endpoints.user_whitelist_endpoint import UserWhitelistEndpoint
 from redditrepostsleuth.repostsleuthsiteapi.util.image_store import ImageStore
+from redditrepostsleuth.repostsleuthsiteapi.util.pagination import NEXT_CURSOR_HEADER
 
 config = Config()
 event_logger = EventLogging(config=config)
 uowm = UnitOfWorkManager(get_db_engine(config))
 reddit = get_reddit_instance(config)
 reddit_manager = RedditManager(reddit)
-dup = DuplicateImageService(uowm, event_logger, reddit, config=config)
-response_handler = ResponseHandler(reddit, uowm, event_logger, live_response=config.live_responses)
+dup = DuplicateImageService(
+    uowm,
+    event_logger,
+    reddit,
+    config=config,
+    result_cache=get_search_result_cache() if config.search_result_cache_enabled else None
+)
+rate_limiter = get_reddit_rate_limiter()
+response_handler = ResponseHandler(reddit, uowm, event_logger, live_response=config.live_responses,
+                                   rate_limiter=rate_limiter, rate_limit_lane=BACKGROUND_LANE)
 notification_svc = NotificationService(config)
+stats_cache = StatsResponseCache(get_redis_client(config), ttl=int(config.stats_cache_ttl or 300))
 config_updater = SubredditConfigUpdater(
     uowm,
     reddit,
     response_handler,
     config,
-    notification_svc=notification_svc
+    notification_svc=notification_svc,
+    rate_limiter=rate_limiter
 )
 
 if os.getenv('SENTRY_DNS', None):
@@ -54,14 +69,16 @@ if os.getenv('SENTRY_DNS', None):
 
 api = application = falcon.App(
     middleware=[
-        CORSMiddleware(allow_origins=['http://localhost:8080', 'https://repostsleuth.com', 'https://www.repostsleuth.com'])
+        CORSMiddleware(
+            allow_origins=['http://localhost:8080', 'https://repostsleuth.com', 'https://www.repostsleuth.com'],
+            expose_headers=[NEXT_CURSOR_HEADER]
+        )
     ]
 )
 api.req_options.auto_parse_form_urlencoded = True
 image_store = ImageStore('/opt/imageuploads')
 
 api.add_route('/image', ImageSearch(dup, uowm, config, image_store))
-api.add_route('/imageserve/{name}', ImageServe())
 #api.add_route('/image/ocr', ImageSearch(dup, uowm, config), suffix='compare_image_text')
 api.add_route('/watch', PostWatch(uowm))
 api.add_route('/watch/{user}', PostWatch(uowm), suffix='user')
@@ -82,12 +99,12 @@ api.add_route('/subreddit/{subreddit}/reposts', ImageRepostEndpoint(uowm))
 api.add_route('/meme-template/', MemeTemplateEndpoint(uowm))
 api.add_route('/meme-template/potential', MemeTemplateEndpoint(uowm), suffix='potential')
 api.add_route('/meme-template/potential/{id:int}', MemeTemplateEndpoint(uowm), suffix='potential')
-api.add_route('/stats', BotStats(uowm, reddit))
-api.add_route('/stats/home', BotStats(uowm, reddit), suffix='home')
-api.add_route('/stats/subreddit/{subreddit}', BotStats(uowm, reddit), suffix='subreddit')
-api.add_route('/stats/top-reposters', BotStats(uowm, reddit), suffix='reposters')
-api.add_route('/stats/banned-subreddits', BotStats(uowm, reddit), suffix='banned_subs')
-api.add_route('/stats/top-image-reposts', BotStats(uowm, reddit), suffix='top_image_reposts')
+api.add_route('/stats', BotStats(uowm, reddit, stats_cache))
+api.add_route('/stats/home', BotStats(uowm, reddit, stats_cache), suffix='home')
+api.add_route('/stats/subreddit/{subreddit}', BotStats(uowm, reddit, stats_cache), suffix='subreddit')
+api.add_route('/stats/top-reposters', BotStats(uowm, reddit, stats_cache), suffix='reposters')
+api.add_route('/stats/banned-subreddits', BotStats(uowm, reddit, stats_cache), suffix='banned_subs')
+api.add_route('/stats/top-image-reposts', BotStats(uowm, reddit, stats_cache), suffix='top_image_reposts')
 api.add_route('/admin/message-templates', MessageTemplate(uowm))
 api.add_route('/admin/message-templates/{id:int}', MessageTemplate(uowm))
 api.add_route('/admin/message-templates/all', MessageTemplate(uowm), suffix='all')
@@ -1,38 +1,22 @@
 import json
 import mimetypes
-import os
-import re
-import uuid
 from typing import Text
 
-from falcon import Response, Request, HTTPBadRequest, HTTPServiceUnavailable
+from falcon import Response, Request, HTTPBadRequest, HTTPServiceUnavailable, HTTPPayloadTooLarge
 
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
-from redditrepostsleuth.core.exception import NoIndexException
+from redditrepostsleuth.core.exception import NoIndexException, ImageTooLargeException, ImageConversionException
 from redditrepostsleuth.core.jsonencoders import ImageRepostWrapperEncoder
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
 from redditrepostsleuth.core.util.helpers import get_image_search_settings_from_request, reddit_post_id_from_url, \
     is_image_url
-from redditrepostsleuth.repostsleuthsiteapi.util.helpers import check_image
+from redditrepostsleuth.core.util.imagehashing import get_image_hashes_from_stream
+from redditrepostsleuth.repostsleuthsiteapi.util.helpers import check_image, check_image_hash
 from redditrepostsleuth.repostsleuthsiteapi.util.image_store import ImageStore
 
 
-class ImageServe:
-    _IMAGE_NAME_PATTERN = re.compile(
-        '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[a-z]{2,4}$'
-    )
-
-    def on_get(self, req: Request, resp: Response, name):
-        if not self._IMAGE_NAME_PATTERN.match(name):
-            raise IOError('File not found')
-
-        image_path = os.path.join('/opt/imageuploads', name)
-        resp.content_type = mimetypes.guess_type(name)[0]
-        resp.content_length = os.path.getsize(image_path)
-        resp.stream = open(image_path, 'rb')
-
 class ImageSearch:
     def __init__(self, image_svc: DuplicateImageService, uowm: UnitOfWorkManager, config: Config, image_store: ImageStore):
         self._image_store = image_store
@@ -64,18 +48,31 @@ class ImageSearch:
         allowed_img_ext = ['jpg', 'jpeg', 'png', 'gif']
         form = req.get_media()
         file = next((x for x in form if x.name == 'image'), None)
-        file_ext = file.secure_filename.split('.')[-1]
+        if not file:
+            raise HTTPBadRequest(title='No image', description='Please provide an image to search')
+        file_ext = file.secure_filename.split('.')[-1].lower()
         if file_ext not in allowed_img_ext:
             raise HTTPBadRequest(title='Invalid file type', description=f'File type {file_ext} is not allowed')
 
-        saved_file_name = f'{uuid.uuid4()}.{file_ext}'
-        with open(os.path.join('/opt/imageuploads', saved_file_name), 'wb') as f:
-            file.stream.pipe(f)
+        try:
+            hashes = get_image_hashes_from_stream(
+                file.stream,
+                int(self.config.upload_max_bytes or 20 * 1024 * 1024),
+                int(self.config.upload_max_pixels or 50_000_000),
+                meme_hash_size=self.config.default_meme_filter_hash_size
+            )
+        except ImageTooLargeException as e:
+            raise HTTPPayloadTooLarge(title='Image too large', description=str(e))
+        except ImageConversionException:
+            raise HTTPBadRequest(title='Invalid image', description='The provided file is not a valid image')
 
         search_settings = get_image_search_settings_from_request(req, self.config)
-        # TODO - This is hacky as fuck.  Dup image service needs to be rewritten to take hash and search
-        search_results = check_image(search_settings, self.uowm, self.image_svc, url=f'http://localhost:8443/imageserve/{saved_file_name}')
-        os.remove(os.path.join('/opt/imageuploads', saved_file_name))
+        search_results = check_image_hash(
+            search_settings,
+            self.image_svc,
+            hashes['dhash_h'],
+            meme_hash=hashes.get('meme_dhash')
+        )
         resp.body = json.dumps(search_results, cls=ImageRepostWrapperEncoder)
 
     def on_get_search_by_url(self, req: Request, resp: Response):
@@ -4,6 +4,7 @@ from falcon import Request, Response, HTTPBadRequest
 
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import log
+from redditrepostsleuth.repostsleuthsiteapi.util.pagination import get_page_params, send_page
 
 
 class ImageSearchHistory:
@@ -19,29 +20,16 @@ class ImageSearchHistory:
             resp.body = json.dumps([r.to_dict() for r in results])
 
     def on_get_monitored_sub_with_history(self, req: Request, resp: Response):
-        results = []
-        limit = req.get_param_as_int('limit', required=False, default=20)
-        if limit == -1:
-            limit = 1000
+        limit, before_id = get_page_params(req)
         with self.uowm.start() as uow:
-            checked = uow.repost_search.get_by_subreddit(
+            searches = uow.repost_search.get_page_by_subreddit(
                 req.get_param('subreddit', required=True),
-                limit=limit,
-                offset=req.get_param_as_int('offset', required=False, default=None),
-                only_reposts=req.get_param_as_bool('repost_only', required=False, default=False)
+                only_reposts=req.get_param_as_bool('repost_only', required=False, default=False),
+                limit=limit + 1,
+                before_id=before_id
             )
-            for search in checked:
-                r = {
-                    'checked_post': None,
-                    'search': search.to_dict(),
-                }
-                post = uow.posts.get_by_id(search.post_id)
-
-                results.append({
-                    'checked_post': post.to_dict(),
-                    'search': search.to_dict(),
-                })
-        resp.body = json.dumps(results)
+            results = [{'checked_post': search.post.to_dict(), 'search': search.to_dict()} for search in searches]
+        send_page(resp, results, [search.id for search in searches], limit)
 
     def on_get_monitored_sub_checked(self, req: Request, resp: Response):
         with self.uowm.start() as uow:
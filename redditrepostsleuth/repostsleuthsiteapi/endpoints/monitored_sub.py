@@ -8,6 +8,7 @@ from praw.exceptions import APIException
 from redditrepostsleuth.core.celery import celery
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import MonitoredSubConfigChange
+from redditrepostsleuth.core.db.reference_cache import invalidate_reference_cache, MONITORED_SUB
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.services.managed_subreddit import create_monitored_sub_in_db
@@ -75,6 +76,7 @@ class MonitoredSub:
             sub.post_permission = True if 'all' in perms or 'posts' in perms else None
             sub.wiki_permission = True if 'all' in perms or 'wiki' in perms else None
             uow.commit()
+        invalidate_reference_cache(MONITORED_SUB, subreddit)
         resp.body = json.dumps(sub.to_dict())
 
     def on_post(self, req: Request, resp: Response, subreddit: str):
@@ -103,6 +105,7 @@ class MonitoredSub:
                 resp.body = json.dumps(existing.to_dict())
                 return
             monitored_sub = create_monitored_sub_in_db(subreddit, uow)
+            invalidate_reference_cache(MONITORED_SUB, subreddit)
             resp.body = json.dumps(monitored_sub.to_dict())
 
 
@@ -144,6 +147,7 @@ class MonitoredSub:
             except Exception as e:
                 log.exception('Problem saving config', exc_info=True)
                 raise HTTPInternalServerError(title='Problem Saving Config', description='Something went tits up when saving the config')
+        invalidate_reference_cache(MONITORED_SUB, subreddit)
 
         celery.send_task('redditrepostsleuth.core.celery.admin_tasks.update_subreddit_config_from_database', args=[monitored_sub, user_data],
                          queue='update_wiki_from_database')
@@ -160,4 +164,5 @@ class MonitoredSub:
                 raise HTTPNotFound(title=f'Subreddit {subreddit} Not Found',
                                    description=f'Subreddit {subreddit} Not Found')
             uow.monitored_sub.remove(sub)
-            uow.commit()
\ No newline at end of file
+            uow.commit()
+        invalidate_reference_cache(MONITORED_SUB, subreddit)
\ No newline at end of file
@@ -3,6 +3,7 @@ import json
 from falcon import Request, Response
 
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.repostsleuthsiteapi.util.pagination import get_page_params, send_page
 
 
 class RepostHistoryEndpoint:
@@ -30,32 +31,31 @@ class RepostHistoryEndpoint:
             resp.body = json.dumps(results)
 
     def on_get_image_with_search(self, req: Request, resp: Response):
-        results = []
+        limit, before_id = get_page_params(req, default_limit=10)
         with self.uowm.start() as uow:
-            searches = uow.image_search.get_all_reposts_by_subreddit(
+            searches = uow.repost_search.get_page_by_subreddit(
                 req.get_param('subreddit', required=True),
-                limit=req.get_param_as_int('limit', required=False, default=10),
-                offset=req.get_param_as_int('offset', required=False)
+                only_reposts=True,
+                limit=limit + 1,
+                before_id=before_id
             )
-            for search in searches:
-                post = uow.posts.get_by_post_id(search.post_id)
-                results.append({'checked_post': post.to_dict(), 'search': search.to_dict()})
-
-        resp.body = json.dumps(results)
+            results = [{'checked_post': search.post.to_dict(), 'search': search.to_dict()} for search in searches]
+        send_page(resp, results, [search.id for search in searches], limit)
 
     def on_get_repost_image_feed(self, res: Request, resp: Response):
-        results = []
-        limit = res.get_param_as_int('limit', required=False, default=20)
-        offset = res.get_param_as_int('offset', required=False)
+        limit, before_id = get_page_params(res)
         with self.uowm.start() as uow:
-            reposts = uow.repost.get_all_by_type(2, limit=limit, offset=offset)
-            for rp in reposts:
-                results.append({
+            reposts = uow.repost.get_page_by_type(2, limit=limit + 1, before_id=before_id)
+            results = [
+                {
                     'repost_data': rp.to_dict(),
                     'post': rp.post.to_dict(),
                     'repost_of': rp.repost_of.to_dict(),
-                    'search_data': rp.search.to_dict() if rp.search else None})
-        resp.body = json.dumps(results)
+                    'search_data': rp.search.to_dict() if rp.search else None
+                }
+                for rp in reposts
+            ]
+        send_page(resp, results, [rp.id for rp in reposts], limit)
 
     def on_get_count(self, res: Request, resp: Response):
         subreddit = res.get_param('subreddit', required=False)
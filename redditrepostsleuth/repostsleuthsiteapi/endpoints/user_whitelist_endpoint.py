@@ -6,6 +6,8 @@ from praw import Reddit
 
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import UserWhitelist
+from redditrepostsleuth.core.db.reference_cache import invalidate_reference_cache, USER_WHITELIST, \
+    user_whitelist_key
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.util.reddithelpers import is_sub_mod_token
 
@@ -65,6 +67,7 @@ class UserWhitelistEndpoint:
 
             monitored_sub.user_whitelist.append(user_whitelist)
             uow.commit()
+            invalidate_reference_cache(USER_WHITELIST, user_whitelist_key(monitored_sub.id, user_whitelist.username))
 
             resp.text = json.dumps(user_whitelist.to_dict())
 
@@ -93,6 +96,7 @@ class UserWhitelistEndpoint:
                     setattr(existing_whitelist, k, v)
 
             uow.commit()
+            invalidate_reference_cache(USER_WHITELIST, user_whitelist_key(monitored_sub.id, existing_whitelist.username))
 
             resp.text = json.dumps(existing_whitelist.to_dict())
 
@@ -115,4 +119,5 @@ class UserWhitelistEndpoint:
                                    description=f'Cannot find whitelist with ID {id_to_delete}')
 
             uow.user_whitelist.remove(existing_whitelist)
-            uow.commit()
\ No newline at end of file
+            uow.commit()
+            invalidate_reference_cache(USER_WHITELIST, user_whitelist_key(monitored_sub.id, existing_whitelist.username))
\ No newline at end of file
@@ -50,4 +50,23 @@ def check_image(
         raise HTTPServiceUnavailable('Search API is not available.', 'The search API is not currently available')
     except ImageConversionException as e:
         log.warning('Problem hashing the provided url: %s', str(e))
-        raise HTTPBadRequest('Invalid URL', 'The provided URL is not a valid image')
\ No newline at end of file
+        raise HTTPBadRequest('Invalid URL', 'The provided URL is not a valid image')
+
+
+def check_image_hash(
+        search_settings: ImageSearchSettings,
+        image_svc: DuplicateImageService,
+        image_hash: Text,
+        meme_hash: Text = None
+) -> ImageSearchResults:
+    search_settings.max_matches = 500
+    try:
+        return image_svc.check_image_hash(
+            image_hash,
+            meme_hash=meme_hash,
+            search_settings=search_settings,
+            source='api'
+        )
+    except NoIndexException:
+        log.error('No available index for image repost check.  Trying again later')
+        raise HTTPServiceUnavailable('Search API is not available.', 'The search API is not currently available')
@@ -0,0 +1,70 @@
+import base64
+import binascii
+import json
+from typing import Optional, Iterable, Iterator
+
+from falcon import Request, Response, HTTPBadRequest
+
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """
+    :param cursor: Cursor returned with the previous page
+    :return: ID to continue after or None to start from the newest row
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))['id']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPBadRequest(title='Invalid cursor', description='The provided cursor is not valid')
+    if not isinstance(last_id, int):
+        raise HTTPBadRequest(title='Invalid cursor', description='The provided cursor is not valid')
+    return last_id
+
+
+def get_page_params(req: Request, default_limit: int = 20) -> tuple[int, Optional[int]]:
+    """
+    Read limit and cursor from the request.  limit=-1 returns the largest page allowed
+    :return: Tuple of limit and the ID to continue after
+    """
+    if req.get_param('offset', required=False) is not None:
+        raise HTTPBadRequest(
+            title='Offset is no longer supported',
+            description=f'Page with the cursor param.  The cursor for the next page is in the {NEXT_CURSOR_HEADER} header'
+        )
+    limit = req.get_param_as_int('limit', required=False, default=default_limit)
+    if limit == -1 or limit > MAX_PAGE_SIZE:
+        limit = MAX_PAGE_SIZE
+    if limit < 1:
+        raise HTTPBadRequest(title='Invalid limit', description=f'Limit must be between 1 and {MAX_PAGE_SIZE}')
+    return limit, decode_cursor(req.get_param('cursor', required=False))
+
+
+def stream_json_list(items: Iterable[dict]) -> Iterator[bytes]:
+    yield b'['
+    for i, item in enumerate(items):
+        yield (',' if i else '').encode() + json.dumps(item).encode()
+    yield b']'
+
+
+def send_page(resp: Response, items: list[dict], ids: list[int], limit: int) -> None:
+    """
+    Stream a page of results.  Repositories return one row more than the limit so we know if there's another page
+    :param resp: Response
+    :param items: Serialized rows
+    :param ids: ID of each row, used to build the next cursor
+    :param limit: Page size
+    """
+    if len(items) > limit:
+        items = items[:limit]
+        resp.set_header(NEXT_CURSOR_HEADER, encode_cursor(ids[limit - 1]))
+    resp.content_type = 'application/json'
+    resp.stream = stream_json_list(items)
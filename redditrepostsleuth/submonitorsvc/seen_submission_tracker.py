@@ -0,0 +1,99 @@
+import logging
+from typing import Optional
+
+from redis import Redis
+
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.util.helpers import base36decode, base36encode
+
+log = logging.getLogger(__name__)
+
+
+class SeenSubmissionTracker:
+    """
+    Tracks which submissions in a monitored sub have been checked so process_monitored_sub only queues new ones
+    """
+    def __init__(
+            self,
+            redis_client: Redis,
+            uowm: UnitOfWorkManager = None,
+            max_seen: int = 2000,
+            ttl: int = 604800
+    ):
+        self.redis = redis_client
+        self.uowm = uowm
+        self.max_seen = max_seen
+        self.ttl = ttl
+
+    @staticmethod
+    def _seen_key(subreddit: str) -> str:
+        return f'submonitor:seen:{subreddit.lower()}'
+
+    @staticmethod
+    def _mark_key(subreddit: str) -> str:
+        return f'submonitor:high-water-mark:{subreddit.lower()}'
+
+    def _get_mark(self, subreddit: str) -> Optional[int]:
+        mark = self.redis.get(self._mark_key(subreddit))
+        return base36decode(mark.decode() if isinstance(mark, bytes) else mark) if mark else None
+
+    def _seed_from_db(self, subreddit: str, monitored_sub_id: int) -> None:
+        """
+        Load post IDs that already have a MonitoredSubChecks row so a cold Redis doesn't requeue them all
+        """
+        if not self.uowm or monitored_sub_id is None or self.redis.exists(self._seen_key(subreddit)):
+            return
+        with self.uowm.start() as uow:
+            post_ids = uow.monitored_sub_checked.get_checked_post_ids(monitored_sub_id, limit=self.max_seen)
+        if post_ids:
+            log.info('Seeding %s seen submissions for %s', len(post_ids), subreddit)
+            self.mark_seen(subreddit, *post_ids)
+
+    def filter_unseen(self, subreddit: str, post_ids: list[str], monitored_sub_id: int = None) -> list[str]:
+        """
+        Take the IDs fetched from a subreddit and return the ones that haven't been checked.  Moves the high water mark
+        up as far as every fetched ID allows
+        :param subreddit: Subreddit name
+        :param post_ids: Fetched submission IDs
+        :param monitored_sub_id: Used to seed the seen set from the DB when it doesn't exist
+        :return: Unseen IDs in the order provided
+        """
+        if not post_ids:
+            return []
+        self._seed_from_db(subreddit, monitored_sub_id)
+        mark = self._get_mark(subreddit)
+        decoded = {post_id: base36decode(post_id) for post_id in post_ids}
+        candidates = [post_id for post_id in post_ids if mark is None or decoded[post_id] > mark]
+        seen = set()
+        if candidates:
+            scores = self.redis.zmscore(self._seen_key(subreddit), candidates)
+            seen = {post_id for post_id, score in zip(candidates, scores) if score is not None}
+
+        new_mark = mark
+        for post_id in sorted(decoded, key=decoded.get):
+            if mark is not None and decoded[post_id] <= mark:
+                continue
+            if post_id not in seen:
+                break
+            new_mark = decoded[post_id]
+        if new_mark is not None and new_mark != mark:
+            self.redis.set(self._mark_key(subreddit), base36encode(new_mark), ex=self.ttl)
+
+        unseen = [post_id for post_id in candidates if post_id not in seen]
+        log.debug('%s: %s fetched, %s unseen', subreddit, len(post_ids), len(unseen))
+        return unseen
+
+    def mark_seen(self, subreddit: str, *post_ids: str) -> None:
+        """
+        Record that submissions have been checked.  Only the newest max_seen IDs are kept per subreddit
+        :param subreddit: Subreddit name
+        :param post_ids: Submission IDs
+        """
+        if not post_ids:
+            return
+        key = self._seen_key(subreddit)
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {post_id: base36decode(post_id) for post_id in post_ids})
+        pipe.zremrangebyrank(key, 0, -(self.max_seen + 1))
+        pipe.expire(key, self.ttl)
+        pipe.execute()
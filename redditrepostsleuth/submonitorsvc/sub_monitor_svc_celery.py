@@ -7,9 +7,11 @@ from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 sys.path.append('./')
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.celery.tasks.monitored_sub_tasks import process_monitored_sub
+from redditrepostsleuth.core.celery.task_payloads import monitored_sub_payload
 from redditrepostsleuth.core.logging import log
 from redditrepostsleuth.core.services.eventlogging import EventLogging
 from redditrepostsleuth.core.services.reddit_manager import RedditManager
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.db.db_utils import get_db_engine
 from redditrepostsleuth.core.services.responsebuilder import ResponseBuilder
@@ -31,7 +33,8 @@ if __name__ == '__main__':
         uowm,
         reddit,
         response_builder,
-        ResponseHandler(reddit_manager, uowm, event_logger, source='submonitor', live_response=config.live_responses),
+        ResponseHandler(reddit_manager, uowm, event_logger, source='submonitor', live_response=config.live_responses,
+                        rate_limiter=get_reddit_rate_limiter()),
         event_logger=event_logger,
         config=config
     )
@@ -57,7 +60,7 @@ if __name__ == '__main__':
                     log.info('Sub %s does not have post checking enabled', monitored_sub.name)
                     continue
                 try:
-                    process_monitored_sub.apply_async((monitored_sub,), queue='submonitor_private')
+                    process_monitored_sub.apply_async((monitored_sub_payload(monitored_sub),), queue='submonitor_private')
                 except Exception:
                     log.error('Failed to submit job to Celery')
                 continue
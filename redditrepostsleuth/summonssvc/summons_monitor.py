@@ -1,23 +1,23 @@
 import os
 import time
-from datetime import datetime
 
-from praw import Reddit
-from praw.exceptions import APIException
-from prawcore import ResponseException, TooManyRequests
-from sqlalchemy.exc import DataError
+from prawcore import TooManyRequests
 
 from redditrepostsleuth.core.config import Config
-from redditrepostsleuth.core.db.databasemodels import Summons
 from redditrepostsleuth.core.db.db_utils import get_db_engine
+from redditrepostsleuth.core.db.reference_cache import get_reference_cache
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.logging import get_configured_logger
 from redditrepostsleuth.core.notification.notification_service import NotificationService
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
 from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.hamming_search_index import get_hamming_search_index
+from redditrepostsleuth.core.services.reddit_rate_limiter import get_reddit_rate_limiter, SUMMONS_LANE
 from redditrepostsleuth.core.services.response_handler import ResponseHandler
 from redditrepostsleuth.core.services.responsebuilder import ResponseBuilder
+from redditrepostsleuth.core.services.search_result_cache import get_search_result_cache
 from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
+from redditrepostsleuth.summonssvc.summons_pipeline import SummonsPipeline
 from redditrepostsleuth.summonssvc.summonshandler import SummonsHandler
 
 config = Config()
@@ -25,14 +25,40 @@ reddit = get_reddit_instance(config)
 uowm = UnitOfWorkManager(get_db_engine(config))
 event_logger = EventLogging(config=config)
 notification_svc = NotificationService(config)
-response_handler = ResponseHandler(reddit, uowm, event_logger, source='summons',
-                                   live_response=config.live_responses,
-                                   notification_svc=notification_svc)
-dup_image_svc = DuplicateImageService(uowm, event_logger, reddit, config=config)
-response_builder = ResponseBuilder(uowm)
-summons_handler = SummonsHandler(uowm, dup_image_svc, reddit, response_builder,
-                                 response_handler, event_logger=event_logger,
-                                 summons_disabled=False, notification_svc=notification_svc)
+rate_limiter = get_reddit_rate_limiter()
+result_cache = get_search_result_cache() if config.search_result_cache_enabled else None
+reference_cache = get_reference_cache() if config.reference_cache_enabled else None
+# The local index is large and locks around refreshes so every worker searches the same one
+search_index = get_hamming_search_index() if config.image_search_backend == 'local' else None
+
+
+def build_summons_handler() -> SummonsHandler:
+    """
+    Build a summons handler for one worker thread.  praw isn't thread safe so each worker gets its own Reddit
+    instance along with the services that use it
+    """
+    worker_reddit = get_reddit_instance(config)
+    response_handler = ResponseHandler(worker_reddit, uowm, event_logger, source='summons',
+                                       live_response=config.live_responses,
+                                       notification_svc=notification_svc,
+                                       rate_limiter=rate_limiter, rate_limit_lane=SUMMONS_LANE)
+    dup_image_svc = DuplicateImageService(
+        uowm,
+        event_logger,
+        worker_reddit,
+        config=config,
+        search_index=search_index,
+        result_cache=result_cache
+    )
+    return SummonsHandler(uowm, dup_image_svc, worker_reddit, ResponseBuilder(uowm),
+                          response_handler, event_logger=event_logger,
+                          summons_disabled=False, notification_svc=notification_svc,
+                          reference_cache=reference_cache)
+
+
+pipeline = SummonsPipeline(uowm, build_summons_handler, rate_limiter=rate_limiter, event_logger=event_logger,
+                           workers=int(config.summons_workers or 4),
+                           queue_size=int(config.summons_queue_size or 100))
 
 
 log = get_configured_logger(
@@ -50,92 +76,12 @@ if os.getenv('SENTRY_DNS', None):
 
 
 
-def handle_summons(summons: Summons) -> None:
-    log.info('Starting summons %s ', summons.id)
-    with uowm.start() as uow:
-
-        try:
-            summons_handler.process_summons(summons)
-        except ResponseException as e:
-            if e.response.status_code == 429:
-                log.warning('IP Rate limit hit.  Waiting', exc_info=False)
-                time.sleep(30)
-                return
-        except AssertionError as e:
-            if 'code: 429' in str(e):
-                log.warning('Too many requests from IP.  Waiting')
-                time.sleep(30)
-                return
-        except APIException as e:
-            if hasattr(e, 'error_type'):
-                if e.error_type == 'RATELIMIT':
-                    log.error('Hit API rate limit for summons %s on sub %s.', summons.id, summons.post.subreddit)
-                    return
-                elif e.error_type == 'SOMETHING_IS_BROKEN':
-                    summons.reply_failure_reason = 'SOMETHING_IS_BROKEN'
-                    uow.commit()
-                else:
-                    log.error('APIException with unknown error code: %s', e.error_type)
-            else:
-                log.error('APIException without error_type')
-        except Exception as e:
-            log.exception('Unknown error')
-
-        log.info('Finished summons %s', summons.id)
-
-
-def monitor_for_mentions(reddit: Reddit, uowm: UnitOfWorkManager):
-
-    for comment in reddit.inbox.mentions():
-        if not comment.author:
-            log.info('Skipping comment without author')
-            continue
-
-        if comment.created_utc < datetime.utcnow().timestamp() - 86400:
-            log.debug('Skipping old mention. Created at %s', datetime.fromtimestamp(comment.created_utc))
-            continue
-
-        if comment.author.name.lower() in ['sneakpeekbot', 'automoderator']:
-            continue
-
-        with uowm.start() as uow:
-            existing_summons = uow.summons.get_by_comment_id(comment.id)
-            if existing_summons:
-                if existing_summons.summons_replied_at:
-                    log.debug('Skipping existing mention %s', comment.id)
-                    continue
-                else:
-                    log.info('Summons %s was in database but never responded to.  Handling now', existing_summons.id)
-                    handle_summons(existing_summons)
-                    continue
-            post = uow.posts.get_by_post_id(comment.submission.id)
-            if not post:
-                log.warning('Failed to find post %s for summons', comment.submission.id)
-                continue
-
-            summons = Summons(
-                post=post,
-                comment_id=comment.id,
-                comment_body=comment.body.replace('\\', ''),
-                summons_received_at=datetime.fromtimestamp(comment.created_utc),
-                requestor=comment.author.name,
-                subreddit=comment.subreddit.display_name
-            )
-            uow.summons.add(summons)
-            try:
-                uow.commit()
-            except DataError as e:
-                log.warning('SQLAlchemy Data error saving comment %s: %s', comment.id, e)
-                continue
-
-        handle_summons(summons)
-
-
 if __name__ == '__main__':
-
+    pipeline.start()
+    pipeline.enqueue_unreplied()
     while True:
         try:
-            monitor_for_mentions(reddit, uowm)
+            pipeline.intake(reddit)
         except TooManyRequests:
             log.info('Out of API credits')
         time.sleep(int(os.getenv('DELAY', 5)))
@@ -0,0 +1,226 @@
+import logging
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from queue import Queue
+from time import perf_counter
+from typing import Optional, Callable
+
+from praw import Reddit
+from praw.exceptions import APIException
+from prawcore import ResponseException
+from sqlalchemy.exc import DataError
+
+from redditrepostsleuth.core.db.databasemodels import Summons
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.core.model.events.summons_latency_event import SummonsLatencyEvent
+from redditrepostsleuth.core.services.eventlogging import EventLogging
+from redditrepostsleuth.core.services.reddit_rate_limiter import RedditRateLimiter, SUMMONS_LANE
+from redditrepostsleuth.summonssvc.summonshandler import SummonsHandler
+
+log = logging.getLogger(__name__)
+
+IGNORED_AUTHORS = ['sneakpeekbot', 'automoderator']
+
+
+class SummonsPipeline:
+    """
+    Saves new mentions as summons and answers them from a pool of worker threads.  praw isn't thread safe so each
+    worker gets its own handler from handler_factory
+    """
+    def __init__(
+            self,
+            uowm: UnitOfWorkManager,
+            handler_factory: Callable[[], SummonsHandler],
+            rate_limiter: RedditRateLimiter = None,
+            event_logger: EventLogging = None,
+            workers: int = 4,
+            queue_size: int = 100
+    ):
+        self.uowm = uowm
+        self.handler_factory = handler_factory
+        self.rate_limiter = rate_limiter
+        self.event_logger = event_logger
+        self.workers = workers
+        self._queue: Queue = Queue(maxsize=queue_size)
+        self._in_flight: set[int] = set()
+        self._in_flight_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'summons-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        log.info('Started %s summons workers', self.workers)
+
+    def stop(self) -> None:
+        """
+        Let the workers finish what's queued and wait for them to exit
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def join(self) -> None:
+        self._queue.join()
+
+    def enqueue(self, summons_id: int) -> bool:
+        """
+        Queue a summons for processing.  Blocks while the queue is full
+        :param summons_id: ID of the Summons row
+        :return: False if the summons is already queued or being processed
+        """
+        with self._in_flight_lock:
+            if summons_id in self._in_flight:
+                return False
+            self._in_flight.add(summons_id)
+        self._queue.put((summons_id, perf_counter()))
+        return True
+
+    def enqueue_unreplied(self, limit: int = 100) -> int:
+        """
+        Queue summons that were saved but never answered, usually because the monitor restarted
+        :return: Number queued
+        """
+        with self.uowm.start() as uow:
+            unreplied = uow.summons.get_unreplied(limit=limit)
+        return len([s for s in unreplied if self.enqueue(s.id)])
+
+    def intake(self, reddit: Reddit) -> int:
+        """
+        Save new mentions and queue them
+        :param reddit: Reddit instance
+        :return: Number of summons queued
+        """
+        with self.rate_limiter.request(reddit, SUMMONS_LANE) if self.rate_limiter else nullcontext():
+            mentions = list(reddit.inbox.mentions())
+
+        queued = 0
+        for comment in mentions:
+            start_time = perf_counter()
+            summons_id = self._save_mention(comment)
+            if summons_id and self.enqueue(summons_id):
+                self._record_latency('intake', start_time)
+                queued += 1
+        return queued
+
+    def _save_mention(self, comment) -> Optional[int]:
+        """
+        Save a mention as a Summons row
+        :param comment: Comment the bot was mentioned in
+        :return: ID of the summons to process or None if there's nothing to do
+        """
+        if not comment.author:
+            log.info('Skipping comment without author')
+            return
+
+        if comment.created_utc < datetime.utcnow().timestamp() - 86400:
+            log.debug('Skipping old mention. Created at %s', datetime.fromtimestamp(comment.created_utc))
+            return
+
+        if comment.author.name.lower() in IGNORED_AUTHORS:
+            return
+
+        with self.uowm.start() as uow:
+            existing_summons = uow.summons.get_by_comment_id(comment.id)
+            if existing_summons:
+                if existing_summons.summons_replied_at:
+                    log.debug('Skipping existing mention %s', comment.id)
+                    return
+                log.info('Summons %s was in database but never responded to.  Queueing now', existing_summons.id)
+                return existing_summons.id
+
+            post = uow.posts.get_by_post_id(comment.submission.id)
+            if not post:
+                log.warning('Failed to find post %s for summons', comment.submission.id)
+                return
+
+            summons = Summons(
+                post=post,
+                comment_id=comment.id,
+                comment_body=comment.body.replace('\\', ''),
+                summons_received_at=datetime.fromtimestamp(comment.created_utc),
+                requestor=comment.author.name,
+                subreddit=comment.subreddit.display_name
+            )
+            uow.summons.add(summons)
+            try:
+                uow.commit()
+            except DataError as e:
+                log.warning('SQLAlchemy Data error saving comment %s: %s', comment.id, e)
+                return
+            return summons.id
+
+    def _work(self) -> None:
+        summons_handler = self.handler_factory()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            summons_id, queued_at = item
+            self._record_latency('queue_wait', queued_at)
+            try:
+                self.process(summons_id, summons_handler)
+            except Exception:
+                log.exception('Failed to process summons %s', summons_id)
+            finally:
+                self._record_latency('total', queued_at)
+                with self._in_flight_lock:
+                    self._in_flight.discard(summons_id)
+                self._queue.task_done()
+
+    def process(self, summons_id: int, summons_handler: SummonsHandler) -> None:
+        """
+        Search and reply to a summons
+        :param summons_id: ID of the Summons row
+        :param summons_handler: Handler owned by the calling worker
+        """
+        log.info('Starting summons %s ', summons_id)
+        with self.uowm.start() as uow:
+            summons = uow.summons.get_by_id(summons_id)
+            if not summons or summons.summons_replied_at:
+                log.debug('Summons %s already handled', summons_id)
+                return
+            try:
+                summons_handler.process_summons(summons)
+            except ResponseException as e:
+                if e.response.status_code == 429:
+                    log.warning('IP Rate limit hit.  Pausing workers', exc_info=False)
+                    self._penalize()
+                    return
+                log.exception('Unexpected response from Reddit')
+            except AssertionError as e:
+                if 'code: 429' in str(e):
+                    log.warning('Too many requests from IP.  Pausing workers')
+                    self._penalize()
+                    return
+                log.exception('Unknown error')
+            except APIException as e:
+                if hasattr(e, 'error_type'):
+                    if e.error_type == 'RATELIMIT':
+                        log.error('Hit API rate limit for summons %s on sub %s.', summons.id, summons.post.subreddit)
+                        self._penalize()
+                        return
+                    elif e.error_type == 'SOMETHING_IS_BROKEN':
+                        summons.reply_failure_reason = 'SOMETHING_IS_BROKEN'
+                        uow.commit()
+                    else:
+                        log.error('APIException with unknown error code: %s', e.error_type)
+                else:
+                    log.error('APIException without error_type')
+            except Exception:
+                log.exception('Unknown error')
+
+        log.info('Finished summons %s', summons_id)
+
+    def _penalize(self) -> None:
+        if self.rate_limiter:
+            self.rate_limiter.penalize()
+
+    def _record_latency(self, stage: str, start_time: float) -> None:
+        if self.event_logger:
+            self.event_logger.save_event(SummonsLatencyEvent(stage, round(perf_counter() - start_time, 3)))
@@ -1,6 +1,7 @@
 import logging
 import time
 from datetime import datetime, timedelta
+from time import perf_counter
 from typing import Tuple, Text, NoReturn, Optional
 
 from praw import Reddit
@@ -10,9 +11,11 @@ from sqlalchemy.exc import InternalError
 
 from redditrepostsleuth.core.config import Config
 from redditrepostsleuth.core.db.databasemodels import Summons, RepostWatch, BannedUser, MonitoredSub
+from redditrepostsleuth.core.db.reference_cache import ReferenceDataCache
 from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.exception import NoIndexException, InvalidCommandException
 from redditrepostsleuth.core.model.events.influxevent import InfluxEvent
+from redditrepostsleuth.core.model.events.summons_latency_event import SummonsLatencyEvent
 from redditrepostsleuth.core.model.repostresponse import SummonsResponse
 from redditrepostsleuth.core.notification.notification_service import NotificationService
 from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
@@ -42,9 +45,11 @@ class SummonsHandler:
             config: Config = None,
             event_logger: EventLogging = None,
             notification_svc: NotificationService = None,
-            summons_disabled=False
+            summons_disabled=False,
+            reference_cache: ReferenceDataCache = None
     ):
         self.notification_svc = notification_svc
+        self.reference_cache = reference_cache
         self.uowm = uowm
         self.image_service = image_service
         self.reddit = reddit
@@ -104,7 +109,10 @@ class SummonsHandler:
             return
 
         with self.uowm.start() as uow:
-            monitored_sub = uow.monitored_sub.get_by_sub(summons.post.subreddit)
+            if self.reference_cache:
+                monitored_sub = self.reference_cache.get_monitored_sub(uow, summons.post.subreddit)
+            else:
+                monitored_sub = uow.monitored_sub.get_by_sub(summons.post.subreddit)
             if monitored_sub:
                 if monitored_sub.disable_summons_after_auto_response:
                     log.info('Sub %s has summons disabled after auto response', summons.post.subreddit)
@@ -252,6 +260,7 @@ class SummonsHandler:
 
     def process_text_repost_request(self, summons: Summons, monitored_sub: MonitoredSub = None)  -> None:
         response = SummonsResponse(summons=summons)
+        start_time = perf_counter()
         with self.uowm.start() as uow:
             search_results = text_search_by_post(
                 summons.post,
@@ -260,6 +269,7 @@ class SummonsHandler:
                 'summons',
                 filter_function=filter_search_results
             )
+            self._record_latency('search', start_time)
 
             if not monitored_sub:
                 response.message = self.response_builder.build_default_comment(search_results, signature=False)
@@ -271,6 +281,7 @@ class SummonsHandler:
 
     def process_link_repost_request(self, summons: Summons, monitored_sub: MonitoredSub = None) -> None:
         response = SummonsResponse(summons=summons)
+        start_time = perf_counter()
         with self.uowm.start() as uow:
             search_results = link_search(
                 summons.post.url,
@@ -281,6 +292,7 @@ class SummonsHandler:
                 get_total=True,
                 filter_function=filter_search_results
             )
+            self._record_latency('search', start_time)
 
             if not monitored_sub:
                 response.message = self.response_builder.build_default_comment(search_results, signature=False)
@@ -300,6 +312,7 @@ class SummonsHandler:
         search_settings.target_match_percent = target_image_match
         search_settings.target_meme_match_percent = target_meme_match
 
+        start_time = perf_counter()
         try:
             with self.uowm.start() as uow:
                 search_results = image_search_by_post(
@@ -313,6 +326,7 @@ class SummonsHandler:
             log.error('No available index for image repost check.  Trying again later')
             time.sleep(10)
             return
+        self._record_latency('search', start_time)
 
         if monitored_sub:
             response.message = self.response_builder.build_sub_comment(monitored_sub, search_results, signature=False)
@@ -345,9 +359,18 @@ class SummonsHandler:
         Take a response object and send a response to the summons.  If we're banned on the sub send a PM instead
         :param response: SummonsResponse Object
         """
+        start_time = perf_counter()
+        try:
+            self._send_reply_or_message(response)
+        finally:
+            self._record_latency('reply', start_time)
 
+    def _send_reply_or_message(self, response: SummonsResponse) -> None:
         with self.uowm.start() as uow:
-            banned = uow.banned_subreddit.get_by_subreddit(response.summons.post.subreddit)
+            if self.reference_cache:
+                banned = self.reference_cache.get_banned_subreddit(uow, response.summons.post.subreddit)
+            else:
+                banned = uow.banned_subreddit.get_by_subreddit(response.summons.post.subreddit)
         if banned:
             try:
                 self._send_private_message(response)
@@ -439,6 +462,9 @@ class SummonsHandler:
         if self.event_logger:
             self.event_logger.save_event(event)
 
+    def _record_latency(self, stage: str, start_time: float) -> None:
+        self._send_event(SummonsLatencyEvent(stage, round(perf_counter() - start_time, 3)))
+
 
     def _send_ban_notification(self, summons: Summons) -> None:
         response = SummonsResponse(summons=summons)
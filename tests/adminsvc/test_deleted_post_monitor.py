@@ -1,6 +1,10 @@
+from datetime import datetime
+from types import SimpleNamespace
 from unittest import TestCase
+from unittest.mock import MagicMock
 
-from redditrepostsleuth.adminsvc.deleted_post_monitor import db_ids_from_post_ids, merge_results
+from redditrepostsleuth.adminsvc.deleted_post_monitor import db_ids_from_post_ids, merge_results, \
+    stream_posts_for_delete_check
 from redditrepostsleuth.core.db.databasemodels import Post
 from redditrepostsleuth.core.model.misc_models import DeleteCheckResult
 from redditrepostsleuth.core.util.utils import get_post_ids_from_reddit_req_url, build_reddit_req_url
@@ -55,3 +59,37 @@ class TestDeletedPostMonitor(TestCase):
         self.assertEqual(3, len(merged.to_delete))
         self.assertEqual(2, len(merged.to_recheck))
         self.assertEqual(10, merged.count)
+
+    def _get_uowm(self, pages):
+        uow = MagicMock()
+        uow.posts.find_keyset_page_for_delete_check.side_effect = pages
+        uowm = MagicMock()
+        uowm.start.return_value.__enter__.return_value = uow
+        return uowm, uow.posts.find_keyset_page_for_delete_check
+
+    def _row(self, id, checked_at):
+        return SimpleNamespace(id=id, post_id=f'abc{id}', last_deleted_check=checked_at)
+
+    def test_stream_posts_for_delete_check_continues_after_last_row(self):
+        checked_at = datetime(2024, 1, 1)
+        uowm, find_page = self._get_uowm([
+            [self._row(1, checked_at), self._row(2, checked_at)],
+            [self._row(3, checked_at)],
+        ])
+        pages = list(stream_posts_for_delete_check(uowm, 1, page_size=2))
+
+        self.assertEqual([[1, 2], [3]], [[r.id for r in page] for page in pages])
+        self.assertEqual(2, find_page.call_count)
+        self.assertIsNone(find_page.call_args_list[0].kwargs['after'])
+        self.assertEqual((checked_at, 2), find_page.call_args_list[1].kwargs['after'])
+
+    def test_stream_posts_for_delete_check_stops_at_max_rows(self):
+        checked_at = datetime(2024, 1, 1)
+        uowm, find_page = self._get_uowm([
+            [self._row(1, checked_at), self._row(2, checked_at)],
+            [self._row(3, checked_at)],
+        ])
+        pages = list(stream_posts_for_delete_check(uowm, 1, page_size=2, max_rows=3))
+
+        self.assertEqual(3, sum(len(page) for page in pages))
+        self.assertEqual(1, find_page.call_args_list[1].kwargs['limit'])
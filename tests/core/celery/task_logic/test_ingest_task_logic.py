@@ -1,9 +1,99 @@
+import asyncio
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from io import BytesIO
 from unittest import TestCase
+from unittest.mock import Mock
+from urllib.parse import urlparse
 
-from redditrepostsleuth.core.celery.task_logic.ingest_task_logic import image_links_from_gallery_meta_data
+import imagehash
+from PIL import Image
+
+from redditrepostsleuth.core.celery.task_logic.ingest_task_logic import image_links_from_gallery_meta_data, \
+    hash_image_posts
+from redditrepostsleuth.core.db.databasemodels import Post
 from redditrepostsleuth.core.exception import GalleryNotProcessed
 
 
+def _image_bytes() -> bytes:
+    img = Image.new('RGB', (100, 80), (20, 40, 60))
+    for x in range(80):
+        img.putpixel((x, x), (250, 250, 250))
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    image = _image_bytes()
+    paths_seen = []
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        _ImageHandler.paths_seen.append(self.path)
+        if path == '/missing.png':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = self.image if path == '/image.png' else b'not an image'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHashImagePosts(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+        cls.host = f'127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _post(self, post_id: str, path: str) -> Post:
+        return Post(post_id=post_id, url=f'http://{self.host}{path}', created_at=datetime.utcnow(), hashes=[])
+
+    def test_hash_image_posts_hashes_and_skips_failures(self):
+        posts = [
+            self._post('a', '/image.png'),
+            self._post('b', '/missing.png'),
+            self._post('c', '/garbage.png'),
+            self._post('d', '/image.png'),
+        ]
+        result = asyncio.run(hash_image_posts(posts))
+        self.assertEqual(['a', 'd'], [p.post_id for p in result])
+        img = Image.open(BytesIO(_ImageHandler.image))
+        self.assertEqual(str(imagehash.dhash(img, hash_size=16)), result[0].hashes[0].hash)
+        self.assertEqual(1, result[0].hashes[0].hash_type_id)
+        self.assertEqual(str(imagehash.dhash_vertical(img, hash_size=16)), result[0].hashes[1].hash)
+
+    def test_hash_image_posts_uses_and_reports_proxy(self):
+        _ImageHandler.paths_seen = []
+        proxy = Mock(address=f'http://{self.host}')
+        proxy_manager = Mock(get_proxy=Mock(return_value=proxy))
+        result = asyncio.run(
+            hash_image_posts(
+                [self._post('a', '/image.png')],
+                proxy_manager=proxy_manager,
+                domains_to_proxy=[self.host]
+            )
+        )
+        self.assertEqual(1, len(result))
+        self.assertTrue(_ImageHandler.paths_seen[0].startswith('http://'))
+        proxy_manager.report_proxy_successes.assert_called_once_with([proxy])
+        proxy_manager.report_proxy_failures.assert_called_once_with([])
+
+
+
 class TestIngestTasks(TestCase):
 
     def test_image_links_from_gallery_meta_data_return_jpg_links(self):
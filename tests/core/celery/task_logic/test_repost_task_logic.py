@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import TestCase, mock
+from unittest.mock import MagicMock, Mock
+
+from redditrepostsleuth.core.celery.task_logic.repost_task_logic import check_image_repost
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash
+from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
+from tests.core.helpers import get_image_search_settings
+
+
+def _get_post() -> Post:
+    return Post(
+        id=1,
+        post_id='abc123',
+        url='https://i.redd.it/abc123.jpg',
+        title='test',
+        subreddit='test',
+        author='test',
+        created_at=datetime.utcnow(),
+        hashes=[PostHash(hash='a' * 64, hash_type_id=1)]
+    )
+
+
+class TestRepostTaskLogic(TestCase):
+
+    def test_check_image_repost_one_index_call_per_post(self):
+        with mock.patch('redditrepostsleuth.core.services.duplicateimageservice.requests.get') as mock_get:
+            mock_get.return_value = SimpleNamespace(**{'status_code': 200, 'text': json.dumps({'total_searched': 100})})
+            dup_svc = DuplicateImageService(MagicMock(), Mock(), Mock(), config=MagicMock(index_api='http://test.com'))
+            search_settings = get_image_search_settings()
+            hook = MagicMock()
+
+            search_results = check_image_repost(_get_post(), MagicMock(), dup_svc, search_settings, 'ingest', post_search_hooks=[hook, hook])
+
+            index_calls = [c for c in mock_get.call_args_list if c.args[0] == 'http://test.com/image']
+            self.assertEqual(1, len(index_calls))
+            self.assertEqual(2, hook.call_count)
+            self.assertIs(search_results, hook.call_args.args[0])
+
+    def test_check_image_repost_failed_hook_does_not_stop_others(self):
+        with mock.patch('redditrepostsleuth.core.services.duplicateimageservice.requests.get') as mock_get:
+            mock_get.return_value = SimpleNamespace(**{'status_code': 200, 'text': json.dumps({'total_searched': 100})})
+            dup_svc = DuplicateImageService(MagicMock(), Mock(), Mock(), config=MagicMock(index_api='http://test.com'))
+            bad_hook = MagicMock(side_effect=Exception('Ouch'), __name__='bad_hook')
+            good_hook = MagicMock()
+
+            check_image_repost(_get_post(), MagicMock(), dup_svc, get_image_search_settings(), 'ingest', post_search_hooks=[bad_hook, good_hook])
+
+            good_hook.assert_called_once()
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from sqlalchemy import select
+
+from redditrepostsleuth.core.celery.task_logic.scheduled_task_logic import update_repost_rollups, \
+    update_top_reposters, update_top_reposts, rebuild_repost_rollups
+from redditrepostsleuth.core.db.databasemodels import Post, PostType, Repost, StatRepostDailyAuthor, \
+    StatsTopReposter, StatsTopRepost
+from redditrepostsleuth.core.db.purge_engine import PurgeEngine
+from redditrepostsleuth.core.db.repository.stat_repost_rollup_repo import REPOST_ROLLUP
+from tests.core.helpers import get_sqlite_uowm
+
+
+class TestRepostRollups(TestCase):
+
+    def setUp(self):
+        self.uowm = get_sqlite_uowm()
+        self.now = datetime.utcnow()
+        self.next_repost_id = 1
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.flush()
+            for i in range(1, 4):
+                uow.session.add(Post(
+                    id=i, post_id=f'post{i}', url='http://example.com', author='user', subreddit='sub',
+                    title='title', url_hash='hash', post_type_id=2, created_at=self.now, ingested_at=self.now,
+                    last_deleted_check=self.now
+                ))
+            uow.commit()
+
+    def _add_reposts(self, count: int, author: str, repost_of_id: int, days_ago: int = 0) -> None:
+        with self.uowm.start() as uow:
+            for _ in range(count):
+                uow.session.add(Repost(
+                    id=self.next_repost_id, post_id=3, repost_of_id=repost_of_id, post_type_id=2, source='test',
+                    author=author, subreddit='sub', detected_at=self.now - timedelta(days=days_ago, minutes=5)
+                ))
+                self.next_repost_id += 1
+            uow.commit()
+
+    def _author_total(self, uow, author: str) -> int:
+        return sum(uow.session.execute(
+            select(StatRepostDailyAuthor.repost_count).where(StatRepostDailyAuthor.author == author)
+        ).scalars().all())
+
+    def test_update_repost_rollups_is_incremental(self):
+        self._add_reposts(3, 'bob', 1)
+        with self.uowm.start() as uow:
+            self.assertEqual(3, update_repost_rollups(uow, batch_size=2))
+            self.assertEqual(0, update_repost_rollups(uow))
+
+        self._add_reposts(2, 'bob', 1)
+        with self.uowm.start() as uow:
+            self.assertEqual(2, update_repost_rollups(uow))
+            self.assertEqual(5, self._author_total(uow, 'bob'))
+
+    def test_update_repost_rollups_twice_over_same_range(self):
+        self._add_reposts(3, 'bob', 1)
+        with self.uowm.start() as first, self.uowm.start() as second:
+            self.assertEqual(3, update_repost_rollups(first))
+            self.assertEqual(0, update_repost_rollups(second))
+            self.assertEqual(3, self._author_total(second, 'bob'))
+
+    def test_update_repost_rollups_locks_high_water_mark(self):
+        uow = MagicMock()
+        uow.stat_repost_rollup.get_last_id.return_value = 0
+        uow.stat_repost_rollup.get_last_settled_repost_id.side_effect = [5, None]
+        uow.stat_repost_rollup.add_reposts.return_value = 5
+        self.assertEqual(5, update_repost_rollups(uow))
+        uow.stat_repost_rollup.get_last_id.assert_called_with(REPOST_ROLLUP, lock=True)
+        # Once per batch and once to release the lock when there's nothing left
+        self.assertEqual(2, uow.commit.call_count)
+
+    def test_rebuild_repost_rollups(self):
+        self._add_reposts(3, 'bob', 1)
+        with self.uowm.start() as uow:
+            update_repost_rollups(uow)
+            self.assertEqual(3, rebuild_repost_rollups(uow))
+            self.assertEqual(3, self._author_total(uow, 'bob'))
+
+    def test_top_stats_use_day_range(self):
+        self._add_reposts(11, 'bob', 1, days_ago=10)
+        self._add_reposts(11, 'alice', 2)
+        with self.uowm.start() as uow:
+            update_repost_rollups(uow)
+            update_top_reposters(uow, 2, 7)
+            update_top_reposters(uow, 2, None)
+            update_top_reposts(uow, 2, 7)
+
+            weekly = uow.session.execute(select(StatsTopReposter.author).where(StatsTopReposter.day_range == 7))
+            self.assertEqual(['alice'], weekly.scalars().all())
+            all_time = uow.session.execute(select(StatsTopReposter.author).where(StatsTopReposter.day_range.is_(None)))
+            self.assertEqual({'alice', 'bob'}, set(all_time.scalars().all()))
+            top_reposts = uow.session.execute(select(StatsTopRepost.post_id, StatsTopRepost.repost_count))
+            self.assertEqual([(2, 11)], [tuple(row) for row in top_reposts])
+
+    def test_purge_removes_reposts_from_rollups(self):
+        self._add_reposts(3, 'bob', 1)
+        self._add_reposts(2, 'bob', 2)
+        with self.uowm.start() as uow:
+            update_repost_rollups(uow)
+
+        PurgeEngine(self.uowm).purge_posts(['post1'])
+
+        with self.uowm.start() as uow:
+            self.assertEqual(2, self._author_total(uow, 'bob'))
@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from redditrepostsleuth.core.celery.tasks import ingest_tasks
+from redditrepostsleuth.core.celery.tasks.ingest_tasks import save_new_post, save_new_posts, IngestTask
+from redditrepostsleuth.core.db.databasemodels import PostType, HashType, ImageHashCache
+from redditrepostsleuth.core.services.image_hash_cache import ImageHashCacheService
+from tests.core.celery.task_logic.test_ingest_task_logic import _ImageHandler
+from tests.core.helpers import get_sqlite_uowm
+
+
+class TestIngestTasks(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+        cls.host = f'127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.uowm = get_sqlite_uowm()
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.add(HashType(id=1, name='dhash_h'))
+            uow.session.add(HashType(id=2, name='dhash_v'))
+            uow.commit()
+        self.config = MagicMock(ingest_async_image_hashing=False, repost_image_check_batched=True)
+        self.redis_client = MagicMock()
+        self.hash_cache = ImageHashCacheService(self.uowm)
+        patches = [
+            patch.object(ingest_tasks.celery, 'send_task'),
+            patch.object(save_new_post, 'apply_async', side_effect=lambda args: save_new_post.run(*args)),
+        ]
+        for task in (save_new_post, save_new_posts):
+            patches += [
+                patch.object(task, 'uowm', self.uowm),
+                patch.object(task, 'config', self.config),
+                patch.object(task, 'redis_client', self.redis_client),
+                patch.object(task, 'event_logger', MagicMock()),
+                patch.object(task, 'hash_cache', self.hash_cache),
+                patch.object(task, 'reference_cache', None),
+            ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _submission(self, post_id: str) -> dict:
+        return {
+            'id': post_id,
+            'url': f'http://{self.host}/image.png',
+            'permalink': f'/r/test/comments/{post_id}',
+            'author': 'test',
+            'subreddit': 'test',
+            'title': 'test',
+            'created_utc': datetime.utcnow().timestamp(),
+            'post_hint': 'image',
+        }
+
+    def _assert_saved(self, post_id: str) -> None:
+        with self.uowm.start() as uow:
+            post = uow.posts.get_by_post_id(post_id)
+            self.assertIsNotNone(post)
+            self.assertEqual(2, post.post_type_id)
+            self.assertEqual([1, 2], sorted(h.hash_type_id for h in post.hashes))
+            self.redis_client.rpush.assert_any_call(ingest_tasks.IMAGE_REPOST_BATCH_QUEUE, post.id)
+
+    def test_init_creates_hash_cache(self):
+        services = MagicMock()
+        services.config = MagicMock(
+            ingest_hash_processes=None, reference_cache_enabled=False, image_hash_cache_enabled=True,
+            image_hash_cache_ttl=None
+        )
+        with patch.object(ingest_tasks, 'get_service_registry', return_value=services):
+            task = IngestTask()
+        self.assertIsInstance(task.hash_cache, ImageHashCacheService)
+        self.assertEqual(604800, task.hash_cache.redis_ttl)
+
+    def test_save_new_post_image(self):
+        save_new_post.run(self._submission('abc'))
+        self._assert_saved('abc')
+        with self.uowm.start() as uow:
+            self.assertEqual(1, uow.session.query(ImageHashCache).count())
+
+    def test_save_new_posts_image(self):
+        save_new_posts.run([self._submission('abc')])
+        self._assert_saved('abc')
+
+    def test_save_new_posts_image_async_hashing(self):
+        self.config.ingest_async_image_hashing = True
+        save_new_posts.run([self._submission('abc'), self._submission('def')])
+        self._assert_saved('abc')
+        self._assert_saved('def')
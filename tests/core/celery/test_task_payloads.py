@@ -0,0 +1,59 @@
+import json
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redditrepostsleuth.core.celery.task_payloads import post_payload, monitored_sub_payload, repost_watch_payload, \
+    hydrate_post, hydrate_monitored_sub, hydrate_repost_watches, PAYLOAD_VERSION
+from redditrepostsleuth.core.db.databasemodels import Post, MonitoredSub, RepostWatch
+from redditrepostsleuth.core.exception import UnsupportedTaskPayloadException
+
+
+class TestTaskPayloads(TestCase):
+
+    def test_post_payload_is_json(self):
+        payload = post_payload(Post(id=1, post_id='abc', url='https://example.com/a.jpg'))
+        self.assertEqual({'v': PAYLOAD_VERSION, 'id': 1, 'post_id': 'abc'}, json.loads(json.dumps(payload)))
+
+    def test_monitored_sub_payload_passes_through_payload(self):
+        payload = monitored_sub_payload(MonitoredSub(id=2, name='test'))
+        self.assertEqual({'v': PAYLOAD_VERSION, 'id': 2, 'name': 'test'}, payload)
+        self.assertIs(payload, monitored_sub_payload(payload))
+
+    def test_hydrate_post_loads_by_id(self):
+        uow = MagicMock()
+        post = Post(id=1, post_id='abc')
+        uow.posts.get_by_id.return_value = post
+        self.assertEqual(post, hydrate_post(uow, post_payload(post)))
+        uow.posts.get_by_id.assert_called_once_with(1)
+
+    def test_hydrate_post_legacy_post(self):
+        uow = MagicMock()
+        post = Post(id=1, post_id='abc')
+        self.assertEqual(post, hydrate_post(uow, post))
+        uow.posts.get_by_id.assert_not_called()
+
+    def test_hydrate_post_bad_version(self):
+        with self.assertRaises(UnsupportedTaskPayloadException):
+            hydrate_post(MagicMock(), {'v': PAYLOAD_VERSION + 1, 'id': 1, 'post_id': 'abc'})
+
+    def test_hydrate_monitored_sub(self):
+        uow = MagicMock()
+        hydrate_monitored_sub(uow, monitored_sub_payload(MonitoredSub(id=2, name='test')))
+        uow.monitored_sub.get_by_id.assert_called_once_with(2)
+
+    def test_hydrate_repost_watches_single_query(self):
+        repost = Post(id=1, post_id='abc')
+        watches = [
+            {'watch': RepostWatch(id=10, user='a'), 'match': MagicMock(hamming_match_percent=95.5)},
+            {'watch': RepostWatch(id=11, user='b'), 'match': MagicMock(hamming_match_percent=90.0)},
+        ]
+        payload = json.loads(json.dumps(repost_watch_payload(watches, repost)))
+        uow = MagicMock()
+        uow.posts.get_by_id.return_value = repost
+        uow.repostwatch.get_all_by_ids.return_value = [w['watch'] for w in reversed(watches)]
+
+        loaded_repost, loaded_watches = hydrate_repost_watches(uow, payload)
+
+        self.assertEqual(repost, loaded_repost)
+        uow.repostwatch.get_all_by_ids.assert_called_once_with([10, 11])
+        self.assertEqual({10: 95.5, 11: 90.0}, {w['watch'].id: w['match_percent'] for w in loaded_watches})
@@ -0,0 +1,75 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash, Repost, RepostSearch, PostType, HashType
+from tests.core.helpers import get_sqlite_uowm
+
+
+class TestHistoryPages(TestCase):
+
+    def setUp(self):
+        self.uowm = get_sqlite_uowm()
+        self.now = datetime.utcnow()
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.add(HashType(id=1, name='dhash_h'))
+            uow.session.flush()
+            for i in range(1, 6):
+                uow.session.add(Post(
+                    id=i, post_id=f'post{i}', url='http://example.com', author='user', subreddit='sub',
+                    title='title', url_hash='hash', post_type_id=2, created_at=self.now, ingested_at=self.now,
+                    last_deleted_check=self.now
+                ))
+            uow.session.flush()
+            for i in range(1, 6):
+                uow.session.add(PostHash(hash=f'hash{i}', post_id=i, hash_type_id=1, post_created_at=self.now))
+                uow.session.add(RepostSearch(
+                    id=i, post_id=i, post_type_id=2, source='sub_monitor', search_time=1, matches_found=i % 2,
+                    subreddit='sub', searched_at=self.now
+                ))
+            uow.session.flush()
+            for i in range(2, 6):
+                uow.session.add(Repost(
+                    id=i, post_id=i, repost_of_id=1, search_id=i, post_type_id=2, source='test', author='user',
+                    subreddit='sub', detected_at=self.now
+                ))
+            uow.commit()
+        self.queries = []
+        event.listen(self.uowm.session_maker.kw['bind'], 'before_cursor_execute', self._count_query)
+
+    def tearDown(self):
+        event.remove(self.uowm.session_maker.kw['bind'], 'before_cursor_execute', self._count_query)
+
+    def _count_query(self, *args):
+        self.queries.append(args[2])
+
+    def test_get_page_by_subreddit(self):
+        with self.uowm.start() as uow:
+            first = uow.repost_search.get_page_by_subreddit('sub', limit=2)
+            second = uow.repost_search.get_page_by_subreddit('sub', limit=2, before_id=first[-1].id)
+            serialized = [s.to_dict() for s in first + second]
+
+        self.assertEqual([5, 4], [s.id for s in first])
+        self.assertEqual([3, 2], [s.id for s in second])
+        self.assertEqual('post5', serialized[0]['post']['post_id'])
+        self.assertEqual(['hash5'], [h['hash'] for h in serialized[0]['post']['hashes']])
+        # One query for the page and one for the hashes, no matter how many rows
+        self.assertEqual(4, len(self.queries))
+
+    def test_get_page_by_subreddit_only_reposts(self):
+        with self.uowm.start() as uow:
+            searches = uow.repost_search.get_page_by_subreddit('sub', only_reposts=True, limit=10)
+            self.assertEqual([5, 3, 1], [s.id for s in searches])
+
+    def test_get_page_by_type(self):
+        with self.uowm.start() as uow:
+            reposts = uow.repost.get_page_by_type(2, limit=3)
+            query_count = len(self.queries)
+            serialized = [r.to_dict() for r in reposts]
+
+        self.assertEqual([5, 4, 3], [r['id'] for r in serialized])
+        self.assertEqual('post1', serialized[0]['repost_of']['post_id'])
+        self.assertEqual('post5', serialized[0]['search']['post']['post_id'])
+        self.assertEqual(query_count, len(self.queries))
@@ -0,0 +1,68 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import mysql
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash
+from redditrepostsleuth.core.db.repository.postrepository import PostRepository, post_insert_row
+
+
+def _post(post_id: str, hashes: list[str] = None) -> Post:
+    created = datetime(2024, 1, 1)
+    return Post(
+        post_id=post_id,
+        url='https://i.redd.it/test.jpg',
+        author='test',
+        subreddit='test',
+        title='test',
+        url_hash='abc',
+        created_at=created,
+        hashes=[PostHash(hash=h, hash_type_id=1, post_created_at=created) for h in hashes or []]
+    )
+
+
+class TestPostRepository(TestCase):
+
+    def test_post_insert_row_fills_defaults(self):
+        now = datetime(2024, 2, 2)
+        row = post_insert_row(_post('abc'), now)
+        self.assertNotIn('id', row)
+        self.assertEqual(now, row['ingested_at'])
+        self.assertEqual(now, row['last_deleted_check'])
+        self.assertFalse(row['is_crosspost'])
+        self.assertFalse(row['nsfw'])
+        self.assertIsNone(row['selftext'])
+        self.assertEqual(set(post_insert_row(_post('def'), now).keys()), set(row.keys()))
+
+    def test_bulk_insert_ignore(self):
+        session = MagicMock()
+        session.query.return_value.filter.return_value.all.return_value = [SimpleNamespace(post_id='d')]
+        session.query.return_value.outerjoin.return_value.filter.return_value.group_by.return_value.all.return_value = [
+            SimpleNamespace(id=10, post_id='a', hash_count=0),
+            SimpleNamespace(id=11, post_id='b', hash_count=2),
+        ]
+        posts = [_post('a', ['h1']), _post('b', ['h2']), _post('c', ['h3']), _post('d', ['h4'])]
+        saved = PostRepository(session).bulk_insert_ignore(posts)
+
+        # b was saved by another worker, c wasn't saved and d already existed
+        self.assertEqual(['a'], [p.post_id for p in saved])
+        self.assertEqual(10, posts[0].id)
+        self.assertEqual(2, session.execute.call_count)
+        post_stmt, post_rows = session.execute.call_args_list[0][0]
+        self.assertTrue(str(post_stmt.compile(dialect=mysql.dialect())).startswith('INSERT IGNORE INTO post'))
+        self.assertEqual(['a', 'b', 'c'], [row['post_id'] for row in post_rows])
+        _, hash_rows = session.execute.call_args_list[1][0]
+        self.assertEqual([{'hash': 'h1', 'post_id': 10, 'hash_type_id': 1, 'post_created_at': datetime(2024, 1, 1)}], hash_rows)
+
+    def test_bulk_insert_ignore_all_existing(self):
+        session = MagicMock()
+        session.query.return_value.filter.return_value.all.return_value = [SimpleNamespace(post_id='a')]
+        self.assertEqual([], PostRepository(session).bulk_insert_ignore([_post('a')]))
+        session.execute.assert_not_called()
+
+    def test_bulk_insert_ignore_empty(self):
+        session = MagicMock()
+        self.assertEqual([], PostRepository(session).bulk_insert_ignore([]))
+        session.execute.assert_not_called()
@@ -0,0 +1,84 @@
+from datetime import datetime
+from unittest import TestCase
+
+from sqlalchemy import select, func
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash, Repost, RepostSearch, MemeHash, \
+    MemeTemplate, PostType, HashType
+from redditrepostsleuth.core.db.purge_engine import PurgeEngine
+from tests.core.helpers import get_sqlite_uowm
+
+
+class TestPurgeEngine(TestCase):
+
+    def setUp(self):
+        self.uowm = get_sqlite_uowm()
+        self.now = datetime.utcnow()
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=1, name='image'))
+            uow.session.add(HashType(id=1, name='dhash_h'))
+            uow.session.flush()
+            for i in range(1, 4):
+                uow.session.add(self._post(i))
+            uow.session.flush()
+            for i in range(1, 4):
+                uow.session.add(PostHash(hash=f'hash{i}', post_id=i, hash_type_id=1, post_created_at=self.now))
+                uow.session.add(RepostSearch(
+                    id=i, post_id=i, post_type_id=1, source='test', search_time=1, matches_found=0, subreddit='sub',
+                    searched_at=self.now
+                ))
+            uow.session.add(MemeTemplate(id=1, post_id=1))
+            uow.session.add(MemeHash(post_id='post1', hash='abc'))
+            uow.session.flush()
+            uow.session.add(self._repost(1, 2, 1, search_id=2))
+            uow.session.add(self._repost(2, 3, 2, search_id=1))
+            uow.commit()
+
+    def _post(self, id: int) -> Post:
+        return Post(
+            id=id, post_id=f'post{id}', url='http://example.com', author='user', subreddit='sub', title='title',
+            url_hash='hash', post_type_id=1, created_at=self.now, ingested_at=self.now, last_deleted_check=self.now
+        )
+
+    def _repost(self, id: int, post_id: int, repost_of_id: int, search_id: int) -> Repost:
+        return Repost(
+            id=id, post_id=post_id, repost_of_id=repost_of_id, search_id=search_id, post_type_id=1,
+            source='test', author='user', subreddit='sub', detected_at=self.now
+        )
+
+    def _count(self, model) -> int:
+        with self.uowm.start() as uow:
+            return uow.session.execute(select(func.count()).select_from(model)).scalar()
+
+    def test_purge_posts_removes_children_first(self):
+        result = PurgeEngine(self.uowm, chunk_size=1).purge_posts(['post1', 'missing'])
+
+        self.assertEqual(2, self._count(Post))
+        self.assertEqual(2, self._count(PostHash))
+        self.assertEqual(2, self._count(RepostSearch))
+        self.assertEqual(0, self._count(MemeHash))
+        self.assertEqual(1, self._count(MemeTemplate))
+        with self.uowm.start() as uow:
+            # Repost of the deleted post is gone, the other one keeps the post but loses the search
+            reposts = uow.session.execute(select(Repost.id, Repost.search_id)).all()
+            self.assertEqual([(2, None)], [tuple(r) for r in reposts])
+        self.assertEqual(1, result.rows['post'])
+        self.assertEqual(2, result.rows['repost'])
+
+    def test_purge_searches_keeps_reposts(self):
+        result = PurgeEngine(self.uowm).purge_searches([1, 2])
+
+        self.assertEqual(1, self._count(RepostSearch))
+        self.assertEqual(2, self._count(Repost))
+        self.assertEqual(2, result.rows['repost_search'])
+
+    def test_update_last_deleted_check(self):
+        checked_at = datetime(2030, 1, 1)
+        result = PurgeEngine(self.uowm, chunk_size=2).update_last_deleted_check([1, 2, 3], checked_at=checked_at)
+
+        self.assertEqual(3, result.rows['post'])
+        with self.uowm.start() as uow:
+            self.assertEqual(
+                {checked_at},
+                set(uow.session.execute(select(Post.last_deleted_check)).scalars().all())
+            )
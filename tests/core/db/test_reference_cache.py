@@ -0,0 +1,116 @@
+import json
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from redditrepostsleuth.core.db.databasemodels import MonitoredSub, UserWhitelist
+from redditrepostsleuth.core.db.reference_cache import TtlLruCache, ReferenceDataCache, _MISSING, \
+    INVALIDATION_CHANNEL, MONITORED_SUB, USER_WHITELIST, user_whitelist_key
+
+
+class TestTtlLruCache(TestCase):
+
+    def test_get_missing(self):
+        self.assertIs(_MISSING, TtlLruCache().get('foo'))
+
+    def test_caches_none(self):
+        cache = TtlLruCache()
+        cache.set('foo', None)
+        self.assertIsNone(cache.get('foo'))
+
+    def test_evicts_least_recently_used(self):
+        cache = TtlLruCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(1, cache.get('a'))
+        self.assertIs(_MISSING, cache.get('b'))
+        self.assertEqual(3, cache.get('c'))
+
+    def test_expires_after_ttl(self):
+        cache = TtlLruCache(ttl=10)
+        with patch('redditrepostsleuth.core.db.reference_cache.monotonic', return_value=100):
+            cache.set('foo', 1)
+        with patch('redditrepostsleuth.core.db.reference_cache.monotonic', return_value=105):
+            self.assertEqual(1, cache.get('foo'))
+        with patch('redditrepostsleuth.core.db.reference_cache.monotonic', return_value=111):
+            self.assertIs(_MISSING, cache.get('foo'))
+        self.assertEqual(0, len(cache))
+
+    def test_set_skipped_after_invalidation(self):
+        cache = TtlLruCache()
+        generation = cache.generation
+        cache.delete('foo')
+        self.assertFalse(cache.set('foo', 1, generation=generation))
+        self.assertIs(_MISSING, cache.get('foo'))
+
+
+class TestReferenceDataCache(TestCase):
+
+    def _get_uow(self, monitored_sub=None, whitelist=None):
+        uow = MagicMock()
+        uow.monitored_sub.get_by_sub.return_value = monitored_sub
+        uow.user_whitelist.get_by_username_and_subreddit.return_value = whitelist
+        return uow
+
+    def test_get_monitored_sub_loads_once(self):
+        monitored_sub = MonitoredSub(id=1, name='Test')
+        uow = self._get_uow(monitored_sub=monitored_sub)
+        cache = ReferenceDataCache()
+        self.assertEqual(monitored_sub, cache.get_monitored_sub(uow, 'Test'))
+        self.assertEqual(monitored_sub, cache.get_monitored_sub(uow, 'test'))
+        uow.monitored_sub.get_by_sub.assert_called_once_with('Test')
+        uow.session.expunge.assert_called_once_with(monitored_sub)
+        self.assertEqual({'monitored_sub_hit_rate': 0.5}, cache.get_hit_rates())
+
+    def test_get_monitored_sub_caches_missing_sub(self):
+        uow = self._get_uow()
+        cache = ReferenceDataCache()
+        self.assertIsNone(cache.get_monitored_sub(uow, 'test'))
+        self.assertIsNone(cache.get_monitored_sub(uow, 'test'))
+        uow.monitored_sub.get_by_sub.assert_called_once()
+        uow.session.expunge.assert_not_called()
+
+    def test_invalidate_reloads_and_publishes(self):
+        uow = self._get_uow(whitelist=UserWhitelist(id=1, username='Bob', monitored_sub_id=2))
+        redis = MagicMock()
+        cache = ReferenceDataCache(redis_client=redis)
+        cache.get_user_whitelist(uow, 'Bob', 2)
+        cache.invalidate(USER_WHITELIST, user_whitelist_key(2, 'Bob'))
+        cache.get_user_whitelist(uow, 'Bob', 2)
+        self.assertEqual(2, uow.user_whitelist.get_by_username_and_subreddit.call_count)
+        redis.publish.assert_called_once_with(
+            INVALIDATION_CHANNEL,
+            json.dumps({'namespace': USER_WHITELIST, 'key': '2:bob'})
+        )
+
+    def test_handle_message_invalidates_local(self):
+        uow = self._get_uow(monitored_sub=MonitoredSub(id=1, name='test'))
+        cache = ReferenceDataCache()
+        cache.get_monitored_sub(uow, 'test')
+        cache._handle_message({'data': json.dumps({'namespace': MONITORED_SUB, 'key': 'Test'})})
+        cache.get_monitored_sub(uow, 'test')
+        self.assertEqual(2, uow.monitored_sub.get_by_sub.call_count)
+
+    def test_handle_message_bad_data(self):
+        cache = ReferenceDataCache()
+        cache._handle_message({'data': 'not json'})
+
+    def test_subscribes_once_per_process(self):
+        redis = MagicMock()
+        cache = ReferenceDataCache(redis_client=redis)
+        uow = self._get_uow()
+        cache.get_monitored_sub(uow, 'test')
+        cache.get_monitored_sub(uow, 'test')
+        redis.pubsub.return_value.subscribe.assert_called_once()
+        redis.pubsub.return_value.run_in_thread.assert_called_once()
+
+    def test_stats_flushed_to_event_logger(self):
+        event_logger = MagicMock()
+        cache = ReferenceDataCache(event_logger=event_logger, stats_interval=0)
+        cache.get_monitored_sub(self._get_uow(), 'test')
+        event = event_logger.save_event.call_args[0][0]
+        self.assertEqual('cache', event.event_type)
+        self.assertEqual('reference_cache', event.get_influx_event()[0]['tags']['cache_name'])
+        self.assertEqual(1, event.stats['monitored_sub_miss'])
+        self.assertEqual(0.0, event.stats['monitored_sub_hit_rate'])
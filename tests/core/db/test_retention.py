@@ -0,0 +1,109 @@
+from datetime import date, datetime, timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import select
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostType, RepostSearch, Repost
+from redditrepostsleuth.core.db.retention import add_months, partition_upper_bound, missing_partitions, \
+    expired_partitions, build_add_partitions_sql, RetentionManager, RetentionPolicy
+from tests.core.helpers import get_sqlite_uowm
+
+
+class TestPartitionHelpers(TestCase):
+
+    def test_add_months_crosses_year(self):
+        self.assertEqual(date(2025, 2, 1), add_months(date(2024, 11, 1), 3))
+        self.assertEqual(date(2024, 12, 1), add_months(date(2025, 1, 1), -1))
+
+    def test_partition_upper_bound(self):
+        self.assertEqual(date(2025, 1, 1), partition_upper_bound('p_202412'))
+        self.assertIsNone(partition_upper_bound('p_future'))
+
+    def test_missing_partitions(self):
+        existing = ['p_202401', 'p_202402', 'p_future']
+        self.assertEqual([date(2024, 3, 1), date(2024, 4, 1)], missing_partitions(existing, date(2024, 4, 1)))
+        self.assertEqual([], missing_partitions(existing, date(2024, 2, 1)))
+
+    def test_expired_partitions_only_fully_past_cutoff(self):
+        existing = ['p_202401', 'p_202402', 'p_202403', 'p_future']
+        self.assertEqual(['p_202401'], expired_partitions(existing, datetime(2024, 2, 15)))
+        self.assertEqual(['p_202401', 'p_202402'], expired_partitions(existing, datetime(2024, 3, 1)))
+
+    def test_build_add_partitions_sql(self):
+        self.assertEqual(
+            "ALTER TABLE repost_search REORGANIZE PARTITION p_future INTO ("
+            "PARTITION p_202403 VALUES LESS THAN (TO_DAYS('2024-04-01')), "
+            "PARTITION p_future VALUES LESS THAN MAXVALUE)",
+            build_add_partitions_sql('repost_search', [date(2024, 3, 1)])
+        )
+
+
+class TestRetentionManager(TestCase):
+
+    def _add_searches(self, uowm, searched_at: list[datetime]) -> None:
+        now = datetime.utcnow()
+        with uowm.start() as uow:
+            uow.session.add(PostType(id=1, name='image'))
+            uow.session.add(Post(
+                id=1, post_id='abc', url='http://example.com', author='user', subreddit='sub', title='title',
+                url_hash='hash', post_type_id=1, created_at=now, ingested_at=now, last_deleted_check=now
+            ))
+            uow.session.flush()
+            for i, searched in enumerate(searched_at, start=1):
+                uow.session.add(RepostSearch(
+                    id=i, post_id=1, post_type_id=1, source='test', search_time=1, matches_found=0, subreddit='sub',
+                    searched_at=searched
+                ))
+                uow.session.add(Repost(
+                    id=i, post_id=1, repost_of_id=1, search_id=i, post_type_id=1, source='test', author='user',
+                    subreddit='sub', detected_at=now
+                ))
+            uow.commit()
+
+    def test_partitioned_table_drops_partitions(self):
+        uowm = get_sqlite_uowm()
+        self._add_searches(uowm, [datetime(2000, 1, 10), datetime(2000, 2, 10), datetime.utcnow()])
+        manager = RetentionManager(uowm, [])
+        policy = RetentionPolicy('repost_search', 'searched_at', days=30)
+        partitions = ['p_200001', 'p_200002', 'p_future']
+        with patch.object(manager, 'get_partitions', return_value=partitions), \
+                patch.object(manager, '_execute_ddl') as execute_ddl:
+            self.assertEqual(2, manager.apply(policy))
+        self.assertEqual(
+            ['ALTER TABLE repost_search DROP PARTITION p_200001', 'ALTER TABLE repost_search DROP PARTITION p_200002'],
+            [c[0][0] for c in execute_ddl.call_args_list[-2:]]
+        )
+        # Reposts found by searches in the dropped partitions no longer point at them
+        with uowm.start() as uow:
+            search_ids = uow.session.execute(select(Repost.search_id).order_by(Repost.id)).scalars().all()
+        self.assertEqual([None, None, 3], search_ids)
+
+    def test_unpartitioned_table_deletes_in_batches(self):
+        uowm = get_sqlite_uowm()
+        now = datetime.utcnow()
+        old = now - timedelta(days=200)
+        with uowm.start() as uow:
+            uow.session.add(PostType(id=1, name='image'))
+            uow.session.add(Post(
+                id=1, post_id='abc', url='http://example.com', author='user', subreddit='sub', title='title',
+                url_hash='hash', post_type_id=1, created_at=now, ingested_at=now, last_deleted_check=now
+            ))
+            uow.session.flush()
+            for i in range(1, 6):
+                uow.session.add(RepostSearch(
+                    id=i, post_id=1, post_type_id=1, source='test', search_time=1, matches_found=0, subreddit='sub',
+                    searched_at=old if i < 5 else now
+                ))
+            uow.session.flush()
+            uow.session.add(Repost(
+                id=1, post_id=1, repost_of_id=1, search_id=2, post_type_id=1, source='test', author='user',
+                subreddit='sub', detected_at=now
+            ))
+            uow.commit()
+
+        manager = RetentionManager(uowm, [RetentionPolicy('repost_search', 'searched_at', days=120)], batch_size=3)
+        self.assertEqual({'repost_search': 4}, manager.run())
+        with uowm.start() as uow:
+            self.assertEqual([5], uow.session.execute(select(RepostSearch.id)).scalars().all())
+            self.assertIsNone(uow.session.execute(select(Repost.search_id)).scalar())
@@ -1,6 +1,12 @@
 from datetime import datetime
 
-from redditrepostsleuth.core.db.databasemodels import Post
+from sqlalchemy import create_engine, event, PrimaryKeyConstraint
+from sqlalchemy.dialects.mysql import TINYINT
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateColumn
+
+from redditrepostsleuth.core.db.databasemodels import Post, Base
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
 from redditrepostsleuth.core.model.image_search_settings import ImageSearchSettings
 from redditrepostsleuth.core.model.image_search_times import ImageSearchTimes
 from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
@@ -135,3 +141,50 @@ def get_link_search_results_matches_match():
     )
 
     return search_results
+
+
+@compiles(TINYINT, 'sqlite')
+def _compile_tinyint(element, compiler, **kw):
+    return 'INTEGER'
+
+
+# SQLite only generates IDs for a single integer primary key.  Partitioned tables also have their date in it so key
+# them on the ID alone
+@compiles(PrimaryKeyConstraint, 'sqlite')
+def _compile_primary_key(constraint, compiler, **kw):
+    if 'id' in constraint.columns and len(constraint.columns) > 1:
+        return 'PRIMARY KEY (id)'
+    return compiler.visit_primary_key_constraint(constraint, **kw)
+
+
+@compiles(CreateColumn, 'sqlite')
+def _compile_column(element, compiler, **kw):
+    column = element.element
+    if column.autoincrement is True and len(column.table.primary_key.columns) > 1:
+        return f'{column.name} INTEGER NOT NULL'
+    return compiler.visit_create_column(element, **kw)
+
+
+def _on_sqlite_connect(conn, _):
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.create_function('utc_timestamp', 0, lambda: datetime.utcnow().isoformat(' '))
+    collations = {
+        column.type.collation
+        for table in Base.metadata.tables.values()
+        for column in table.columns
+        if getattr(column.type, 'collation', None)
+    }
+    for collation in collations:
+        conn.create_collation(collation, lambda a, b: (a > b) - (a < b))
+
+
+def get_sqlite_uowm() -> UnitOfWorkManager:
+    """
+    In memory SQLite database with the full schema and foreign keys enforced.  utc_timestamp() is added so MySQL
+    column defaults work
+    """
+    engine = create_engine('sqlite://')
+    event.listen(engine, 'connect', _on_sqlite_connect)
+    Base.metadata.create_all(engine)
+    return UnitOfWorkManager(engine)
+
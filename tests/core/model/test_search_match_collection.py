@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from redditrepostsleuth.core.db.databasemodels import Post
+from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
+from redditrepostsleuth.core.model.search.search_match_collection import SearchMatchCollection
+
+
+def _match(id: int, post_id: str) -> ImageSearchMatch:
+    return ImageSearchMatch('test.com', id, Post(id=id, post_id=post_id), 1, 1, 32)
+
+
+class TestSearchMatchCollection(TestCase):
+
+    def test_init_removes_duplicates_keeps_order(self):
+        matches = [_match(1, 'a'), _match(2, 'b'), _match(1, 'a'), _match(3, 'c')]
+        collection = SearchMatchCollection(matches)
+        self.assertEqual(3, len(collection))
+        self.assertEqual([1, 2, 3], [m.post.id for m in collection])
+        self.assertIs(matches[0], collection.to_list()[0])
+
+    def test_add_duplicate_returns_false(self):
+        collection = SearchMatchCollection([_match(1, 'a')])
+        self.assertFalse(collection.add(_match(1, 'a')))
+        self.assertTrue(collection.add(_match(2, 'b')))
+
+    def test_falls_back_to_post_id_without_id(self):
+        collection = SearchMatchCollection([_match(None, 'a'), _match(None, 'a'), _match(None, 'b')])
+        self.assertEqual(2, len(collection))
+
+    def test_remove_by_post_id(self):
+        collection = SearchMatchCollection([_match(1, 'a'), _match(2, 'b')])
+        removed = collection.remove_by_post_id('a')
+        self.assertEqual(1, removed.post.id)
+        self.assertFalse(collection.has_post_id('a'))
+        self.assertNotIn(removed, collection)
+        self.assertIsNone(collection.remove_by_post_id('a'))
+
+    def test_filter(self):
+        collection = SearchMatchCollection([_match(1, 'a'), _match(2, 'b'), _match(3, 'c')])
+        collection.filter(lambda m: m.post.id != 2)
+        self.assertEqual(['a', 'c'], [m.post.post_id for m in collection])
+        self.assertFalse(collection.has_post_id('b'))
+
+    def test_keep_post_ids(self):
+        collection = SearchMatchCollection([_match(1, 'a'), _match(2, 'b'), _match(3, 'c')])
+        collection.keep_post_ids(['c', 'a', 'z'])
+        self.assertEqual(['a', 'c'], [m.post.post_id for m in collection])
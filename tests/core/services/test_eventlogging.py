@@ -0,0 +1,135 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from types import SimpleNamespace
+from unittest import TestCase
+
+from redditrepostsleuth.core.model.events.influxevent import InfluxEvent
+from redditrepostsleuth.core.services.eventlogging import EventLogging
+
+
+class _InfluxStandInHandler(BaseHTTPRequestHandler):
+    writes = []
+    status = 204
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        _InfluxStandInHandler.writes.append(body)
+        self.send_response(_InfluxStandInHandler.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _point(value: int) -> dict:
+    return {'measurement': 'test', 'fields': {'value': value}, 'tags': {'source': 'test'}}
+
+
+class TestEventLogging(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _InfluxStandInHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _InfluxStandInHandler.writes = []
+        _InfluxStandInHandler.status = 204
+
+    def _get_event_logger(self, **kwargs) -> EventLogging:
+        config = SimpleNamespace(
+            influx_host='127.0.0.1',
+            influx_port=self.server.server_address[1],
+            influx_token='token',
+            influx_org='org',
+            influx_bucket='bucket',
+            influx_buffer_size=None,
+            influx_batch_size=None,
+            influx_flush_interval=None
+        )
+        event_logger = EventLogging(config=config, **kwargs)
+        self.addCleanup(event_logger.close)
+        return event_logger
+
+    def _wait_for(self, condition, timeout: float = 5) -> None:
+        end = time.time() + timeout
+        while not condition() and time.time() < end:
+            time.sleep(0.01)
+
+    def test_save_event_does_not_block(self):
+        event_logger = self._get_event_logger(flush_interval=60)
+        event_logger.save_event(InfluxEvent(event_type='test'))
+        self.assertEqual([], _InfluxStandInHandler.writes)
+        self.assertEqual(1, event_logger.get_stats()['buffered'])
+
+    def test_flushes_full_batch_as_one_request(self):
+        event_logger = self._get_event_logger(batch_size=10, flush_interval=60)
+        event_logger.write_raw_points([_point(i) for i in range(10)])
+        self._wait_for(lambda: event_logger.get_stats()['flushed'] == 10)
+        self.assertEqual(1, len(_InfluxStandInHandler.writes))
+        self.assertEqual(10, len(_InfluxStandInHandler.writes[0].split('\n')))
+        self.assertIn('test,source=test value=0i', _InfluxStandInHandler.writes[0])
+
+    def test_same_series_points_get_distinct_times(self):
+        event_logger = self._get_event_logger(batch_size=100, flush_interval=60)
+        event_logger.write_raw_points([_point(1), _point(1)])
+        self.assertEqual(2, event_logger.flush())
+        lines = _InfluxStandInHandler.writes[0].split('\n')
+        times = [int(line.rsplit(' ', 1)[1]) for line in lines]
+        self.assertEqual(2, len(set(times)))
+        self.assertLess(abs(times[0] - time.time_ns()), 60 * 10 ** 9)
+
+    def test_keeps_existing_time(self):
+        event_logger = self._get_event_logger(batch_size=100, flush_interval=60)
+        event_logger.write_raw_points([{**_point(1), 'time': 1000}])
+        self.assertEqual(1, event_logger.flush())
+        self.assertTrue(_InfluxStandInHandler.writes[0].endswith(' 1000'))
+
+    def test_flushes_on_interval(self):
+        event_logger = self._get_event_logger(batch_size=100, flush_interval=0.05)
+        event_logger.write_raw_points([_point(1)])
+        self._wait_for(lambda: event_logger.get_stats()['flushed'] == 1)
+        self.assertEqual(1, len(_InfluxStandInHandler.writes))
+
+    def test_close_flushes_buffer(self):
+        event_logger = self._get_event_logger(batch_size=100, flush_interval=60)
+        event_logger.write_raw_points([_point(i) for i in range(3)])
+        event_logger.close()
+        self.assertEqual(3, event_logger.get_stats()['flushed'])
+
+    def test_drops_oldest_when_full(self):
+        event_logger = self._get_event_logger(max_buffer_size=5, batch_size=100, flush_interval=60)
+        event_logger.write_raw_points([_point(i) for i in range(8)])
+        stats = event_logger.get_stats()
+        self.assertEqual(8, stats['queued'])
+        self.assertEqual(3, stats['dropped'])
+        self.assertEqual(5, stats['buffered'])
+        event_logger.close()
+        self.assertNotIn('value=2i', _InfluxStandInHandler.writes[0])
+        self.assertIn('value=3i', _InfluxStandInHandler.writes[0])
+
+    def test_failed_write_is_requeued(self):
+        _InfluxStandInHandler.status = 400
+        event_logger = self._get_event_logger(batch_size=100, flush_interval=60)
+        event_logger.write_raw_points([_point(1), _point(2)])
+        self.assertEqual(0, event_logger.flush())
+        stats = event_logger.get_stats()
+        self.assertEqual(1, stats['failed_writes'])
+        self.assertEqual(2, stats['buffered'])
+
+        _InfluxStandInHandler.status = 204
+        self.assertEqual(2, event_logger.flush())
+        self.assertEqual(0, event_logger.get_stats()['buffered'])
+
+    def test_invalid_points_dropped(self):
+        event_logger = self._get_event_logger(batch_size=100, flush_interval=60)
+        event_logger.write_raw_points([{'measurement': 'test', 'fields': {'value': None}, 'tags': {}}, _point(1)])
+        self.assertEqual(1, event_logger.flush())
+        self.assertEqual(1, event_logger.get_stats()['dropped'])
@@ -0,0 +1,123 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from distance import hamming
+
+from redditrepostsleuth.core.services.hamming_search_index import hex_hashes_to_matrix, hamming_distances, \
+    HammingSearchIndex, LOCAL_INDEX_NAME, hex_hamming_distances
+
+
+def _random_hash() -> str:
+    return ''.join(random.choice('0123456789abcdef') for _ in range(64))
+
+
+def _flip_chars(hash: str, count: int) -> str:
+    chars = list(hash)
+    for i in range(count):
+        chars[i] = '0' if chars[i] != '0' else 'f'
+    return ''.join(chars)
+
+
+def _get_index(rows: list) -> HammingSearchIndex:
+    uowm = MagicMock()
+    uow = uowm.start.return_value.__enter__.return_value
+    uow.post_hash.get_by_type_after_id.side_effect = [rows, []]
+    uow.posts.get_existing_ids.side_effect = set
+    return HammingSearchIndex(uowm, 365, refresh_interval=3600)
+
+
+class TestHammingSearchIndex(TestCase):
+
+    def test_hex_hashes_to_matrix_shape(self):
+        matrix = hex_hashes_to_matrix([_random_hash(), _random_hash()])
+        self.assertEqual((2, 4), matrix.shape)
+
+    def test_hamming_distances_matches_distance_lib(self):
+        random.seed(1)
+        hashes = [_random_hash() for _ in range(50)]
+        query = _random_hash()
+        bit_distance, hex_distance = hamming_distances(hex_hashes_to_matrix(hashes), hex_hashes_to_matrix([query])[0])
+        for i, h in enumerate(hashes):
+            self.assertEqual(hamming(query, h), hex_distance[i])
+            self.assertEqual(bin(int(query, 16) ^ int(h, 16)).count('1'), bit_distance[i])
+
+    def test_hex_hamming_distances_matches_distance_lib(self):
+        random.seed(4)
+        hashes = [_random_hash() for _ in range(20)]
+        query = _random_hash()
+        self.assertEqual([hamming(query, h) for h in hashes], hex_hamming_distances(query, hashes))
+
+    def test_hex_hamming_distances_odd_length_fallback(self):
+        self.assertEqual([1, 0], hex_hamming_distances('abc', ['abd', 'abc']))
+
+    def test_search_returns_closest_first(self):
+        random.seed(2)
+        query = _random_hash()
+        created = datetime.utcnow()
+        rows = [
+            SimpleNamespace(id=1, post_id=10, hash=_flip_chars(query, 5), post_created_at=created),
+            SimpleNamespace(id=2, post_id=20, hash=query, post_created_at=created - timedelta(days=90)),
+            SimpleNamespace(id=3, post_id=30, hash=_flip_chars(query, 2), post_created_at=created),
+        ]
+        index = _get_index(rows)
+        result = index.search(query, 64, 256, max_matches=2)
+        self.assertEqual(3, result.total_searched)
+        self.assertEqual(LOCAL_INDEX_NAME, result.results[0].index_name)
+        self.assertEqual([20, 30], [m.id for m in result.results[0].matches])
+        self.assertEqual(0, result.results[0].matches[0].distance)
+
+    def test_search_applies_hamming_filter(self):
+        random.seed(3)
+        query = _random_hash()
+        created = datetime.utcnow()
+        rows = [
+            SimpleNamespace(id=1, post_id=10, hash=_flip_chars(query, 10), post_created_at=created),
+            SimpleNamespace(id=2, post_id=20, hash=_flip_chars(query, 1), post_created_at=created),
+        ]
+        index = _get_index(rows)
+        result = index.search(query, 5, 256)
+        self.assertEqual([20], [m.id for m in result.results[0].matches])
+
+    def test_search_skips_bad_hash_length(self):
+        rows = [SimpleNamespace(id=1, post_id=10, hash='abc', post_created_at=datetime.utcnow())]
+        index = _get_index(rows)
+        result = index.search(_random_hash(), 64, 256)
+        self.assertEqual(0, result.total_searched)
+        self.assertEqual([], result.results[0].matches)
+
+    def test_requires_max_age(self):
+        with self.assertRaises(ValueError):
+            HammingSearchIndex(MagicMock(), None)
+
+    def test_refresh_skips_expired_rows(self):
+        query = _random_hash()
+        rows = [SimpleNamespace(id=1, post_id=10, hash=query, post_created_at=datetime.utcnow() - timedelta(days=400))]
+        index = _get_index(rows)
+        result = index.search(query, 64, 256)
+        self.assertEqual(0, result.total_searched)
+        post_hash = index.uowm.start.return_value.__enter__.return_value.post_hash
+        created_after = post_hash.get_by_type_after_id.call_args[1]['created_after']
+        self.assertLess(created_after, datetime.utcnow() - timedelta(days=364))
+
+    def test_search_evicts_deleted_posts(self):
+        random.seed(5)
+        query = _random_hash()
+        created = datetime.utcnow()
+        rows = [
+            SimpleNamespace(id=1, post_id=10, hash=query, post_created_at=created),
+            SimpleNamespace(id=2, post_id=20, hash=_flip_chars(query, 1), post_created_at=created),
+            SimpleNamespace(id=3, post_id=30, hash=_flip_chars(query, 2), post_created_at=created),
+        ]
+        index = _get_index(rows)
+        posts = index.uowm.start.return_value.__enter__.return_value.posts
+        posts.get_existing_ids.side_effect = lambda ids: set(ids) - {10}
+        result = index.search(query, 64, 256, max_matches=2)
+        self.assertEqual([20, 30], [m.id for m in result.results[0].matches])
+        self.assertEqual(2, len(index))
+        posts.get_existing_ids.side_effect = set
+        result = index.search(query, 64, 256, max_matches=2)
+        self.assertEqual(2, result.total_searched)
+        self.assertEqual([20, 30], [m.id for m in result.results[0].matches])
@@ -0,0 +1,131 @@
+import threading
+from http.server import ThreadingHTTPServer
+from io import BytesIO
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import imagehash
+from PIL import Image
+
+from redditrepostsleuth.core.db.databasemodels import ImageHashCache
+from redditrepostsleuth.core.exception import ImageRemovedException
+from redditrepostsleuth.core.services.image_hash_cache import ImageHashCacheService
+from tests.core.celery.task_logic.test_ingest_task_logic import _ImageHandler
+from tests.core.helpers import get_sqlite_uowm
+
+
+def _image_bytes(color: tuple) -> bytes:
+    img = Image.new('RGB', (64, 64), color)
+    for x in range(32):
+        img.putpixel((x, x), (255, 255, 255))
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class _DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def pipeline(self):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def execute(self):
+        pass
+
+
+def _get_service(redis=None, url_entry=None, content_entry=None) -> ImageHashCacheService:
+    uowm = MagicMock()
+    uow = uowm.start.return_value.__enter__.return_value
+    uow.image_hash_cache.get_by_url_hash.return_value = url_entry
+    uow.image_hash_cache.get_by_content_hash.return_value = content_entry
+    return ImageHashCacheService(uowm, redis_client=redis)
+
+
+class TestImageHashCacheService(TestCase):
+
+    def test_get_hashes_miss_matches_imagehash(self):
+        data = _image_bytes((10, 20, 30))
+        svc = _get_service()
+        with patch('redditrepostsleuth.core.services.image_hash_cache.get_image_bytes_by_url_requests', return_value=data):
+            hashes = svc.get_hashes('https://i.redd.it/test.png')
+        img = Image.open(BytesIO(data))
+        self.assertEqual(str(imagehash.dhash(img, hash_size=16)), hashes['dhash_h'])
+        self.assertEqual(str(imagehash.dhash_vertical(img, hash_size=16)), hashes['dhash_v'])
+        self.assertEqual(str(imagehash.average_hash(img, hash_size=16)), hashes['ahash'])
+        self.assertEqual(str(imagehash.dhash(img, hash_size=32)), hashes['meme_dhash'])
+        self.assertEqual(1, svc.stats['miss'])
+        svc.uowm.start.return_value.__enter__.return_value.image_hash_cache.insert_ignore.assert_called_once()
+
+    def test_get_hashes_redis_url_hit_skips_download(self):
+        redis = _DictRedis()
+        svc = _get_service(redis=redis)
+        with patch('redditrepostsleuth.core.services.image_hash_cache.get_image_bytes_by_url_requests', return_value=_image_bytes((1, 2, 3))) as mock_fetch:
+            first = svc.get_hashes('https://i.redd.it/test.png')
+            second = svc.get_hashes('https://i.redd.it/test.png')
+        self.assertEqual(1, mock_fetch.call_count)
+        self.assertEqual(first, second)
+        self.assertEqual(1, svc.stats['url_redis_hit'])
+
+    def test_get_hashes_content_hit_skips_decode(self):
+        redis = _DictRedis()
+        svc = _get_service(redis=redis)
+        data = _image_bytes((4, 5, 6))
+        with patch('redditrepostsleuth.core.services.image_hash_cache.get_image_bytes_by_url_requests', return_value=data):
+            svc.get_hashes('https://i.redd.it/one.png')
+            with patch('redditrepostsleuth.core.services.image_hash_cache.image_from_bytes') as mock_decode:
+                svc.get_hashes('https://i.imgur.com/two.png')
+        mock_decode.assert_not_called()
+        self.assertEqual(1, svc.stats['content_redis_hit'])
+
+    def test_get_hashes_db_url_hit(self):
+        entry = ImageHashCache(content_hash='abc', dhash_h='1', dhash_v='2', ahash='3', meme_dhash='4')
+        svc = _get_service(url_entry=entry)
+        with patch('redditrepostsleuth.core.services.image_hash_cache.get_image_bytes_by_url_requests') as mock_fetch:
+            hashes = svc.get_hashes('https://i.redd.it/test.png')
+        mock_fetch.assert_not_called()
+        self.assertEqual('1', hashes['dhash_h'])
+        self.assertEqual(1, svc.stats['url_db_hit'])
+
+    def test_get_hashes_removed_image(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        svc = _get_service()
+        with self.assertRaises(ImageRemovedException):
+            svc.get_hashes(f'http://127.0.0.1:{server.server_address[1]}/missing.png')
+
+    def test_get_image_hashes_meme_size(self):
+        entry = ImageHashCache(content_hash='abc', dhash_h='1', dhash_v='2', ahash='3', meme_dhash='4')
+        svc = _get_service(url_entry=entry)
+        self.assertEqual({'dhash_h': '4', 'dhash_v': None, 'ahash': None}, svc.get_image_hashes('test.com', hash_size=32))
+        self.assertEqual({'dhash_h': '1', 'dhash_v': '2', 'ahash': '3'}, svc.get_image_hashes('test.com', hash_size=16))
+
+    def test_stats_sent_to_event_logger(self):
+        entry = ImageHashCache(content_hash='abc', dhash_h='1', dhash_v='2', ahash='3', meme_dhash='4')
+        svc = _get_service(url_entry=entry)
+        svc.event_logger = MagicMock()
+        svc.stats_interval = 0
+        svc.get_hashes('test.com')
+        event = svc.event_logger.save_event.call_args[0][0]
+        influx_event = event.get_influx_event()[0]
+        self.assertEqual('image_hash_cache', influx_event['tags']['cache_name'])
+        self.assertEqual(1, influx_event['fields']['url_db_hit'])
+        self.assertEqual(0, len(svc.stats))
+
+    def test_save_same_url_twice_keeps_one_entry(self):
+        uowm = get_sqlite_uowm()
+        svc = ImageHashCacheService(uowm)
+        hashes = {'content_hash': 'abc', 'dhash_h': '1', 'dhash_v': '2', 'ahash': '3', 'meme_dhash': '4'}
+        svc._save('url', hashes)
+        svc._save('url', dict(hashes, dhash_h='5'))
+        with uowm.start() as uow:
+            entries = uow.session.query(ImageHashCache).all()
+            self.assertEqual(['1'], [entry.dhash_h for entry in entries])
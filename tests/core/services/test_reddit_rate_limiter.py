@@ -0,0 +1,124 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from prawcore import TooManyRequests
+from redis.exceptions import RedisError
+
+from redditrepostsleuth.core.services.reddit_rate_limiter import TokenBucketRateLimiter, \
+    RedisTokenBucketRateLimiter, SUMMONS_LANE, SUB_MONITOR_LANE, BACKGROUND_LANE
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def _get_redis() -> MagicMock:
+    store = {}
+    pipe = MagicMock()
+    pipe.hgetall.side_effect = lambda key: dict(store.get(key, {}))
+    pipe.hset.side_effect = lambda key, mapping: store.__setitem__(
+        key, {k.encode(): str(v).encode() for k, v in mapping.items()}
+    )
+    redis = MagicMock()
+    redis.transaction.side_effect = lambda func, *keys, value_from_callable: func(pipe)
+    redis.store = store
+    return redis
+
+
+class TestTokenBucketRateLimiter(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = TokenBucketRateLimiter(capacity=4, refill_rate=1, reserve=0, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_try_acquire_drains_and_refills(self):
+        for _ in range(4):
+            self.assertTrue(self.limiter.try_acquire(SUMMONS_LANE))
+        self.assertFalse(self.limiter.try_acquire(SUMMONS_LANE))
+        self.clock.now += 1
+        self.assertTrue(self.limiter.try_acquire(SUMMONS_LANE))
+
+    def test_refill_capped_at_capacity(self):
+        self.clock.now += 100
+        self.assertEqual(4, self.limiter.tokens)
+
+    def test_lower_lanes_leave_tokens_for_higher(self):
+        self.assertTrue(self.limiter.try_acquire(BACKGROUND_LANE, tokens=2))
+        self.assertFalse(self.limiter.try_acquire(BACKGROUND_LANE))
+        self.assertTrue(self.limiter.try_acquire(SUB_MONITOR_LANE))
+        self.assertFalse(self.limiter.try_acquire(SUB_MONITOR_LANE))
+        self.assertTrue(self.limiter.try_acquire(SUMMONS_LANE))
+
+    def test_acquire_waits_for_tokens(self):
+        self.limiter.try_acquire(SUMMONS_LANE, tokens=4)
+        self.assertTrue(self.limiter.acquire(SUMMONS_LANE))
+        self.assertEqual(1001, self.clock.now)
+
+    def test_acquire_timeout(self):
+        self.limiter.try_acquire(SUMMONS_LANE, tokens=4)
+        self.assertFalse(self.limiter.acquire(SUMMONS_LANE, timeout=0))
+
+    def test_update_from_limits_spreads_remaining_over_window(self):
+        self.limiter.update_from_limits({'remaining': 100, 'reset_timestamp': self.clock.now + 200, 'used': 500})
+        self.clock.now += 2
+        self.limiter.try_acquire(SUMMONS_LANE, tokens=4)
+        self.clock.now += 2
+        self.assertEqual(1, self.limiter.tokens)
+
+    def test_update_from_limits_exhausted_blocks_until_reset(self):
+        self.limiter.update_from_limits({'remaining': 0, 'reset_timestamp': self.clock.now + 60, 'used': 600})
+        self.clock.now += 59
+        self.assertFalse(self.limiter.try_acquire(SUMMONS_LANE))
+        self.clock.now += 2
+        self.assertTrue(self.limiter.try_acquire(SUMMONS_LANE))
+
+    def test_update_from_limits_ignores_missing_headers(self):
+        self.limiter.update_from_limits({'remaining': None, 'reset_timestamp': None, 'used': None})
+        self.assertEqual(4, self.limiter.tokens)
+
+    def test_request_penalizes_too_many_requests(self):
+        response = MagicMock(status_code=429, headers={'retry-after': '45'})
+        reddit = MagicMock()
+        reddit.auth.limits = {'remaining': None, 'reset_timestamp': None, 'used': None}
+        with self.assertRaises(TooManyRequests):
+            with self.limiter.request(reddit, SUMMONS_LANE):
+                raise TooManyRequests(response)
+        self.clock.now += 44
+        self.assertFalse(self.limiter.try_acquire(SUMMONS_LANE))
+        self.clock.now += 2
+        self.assertTrue(self.limiter.try_acquire(SUMMONS_LANE))
+
+
+class TestRedisTokenBucketRateLimiter(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.redis = _get_redis()
+
+    def _get_limiter(self) -> RedisTokenBucketRateLimiter:
+        return RedisTokenBucketRateLimiter(self.redis, 'sleuthbot', capacity=4, refill_rate=1, reserve=0, clock=self.clock)
+
+    def test_bucket_shared_between_limiters(self):
+        first, second = self._get_limiter(), self._get_limiter()
+        self.assertTrue(first.try_acquire(SUMMONS_LANE, tokens=3))
+        self.assertTrue(second.try_acquire(SUMMONS_LANE))
+        self.assertFalse(first.try_acquire(SUMMONS_LANE))
+        self.assertIn('reddit-rate-limit:sleuthbot', self.redis.store)
+
+    def test_penalize_shared_between_limiters(self):
+        self._get_limiter().penalize(10)
+        self.clock.now += 20
+        self.assertTrue(self._get_limiter().try_acquire(SUMMONS_LANE))
+        self._get_limiter().penalize(10)
+        self.assertFalse(self._get_limiter().try_acquire(SUMMONS_LANE))
+
+    def test_redis_down_does_not_block(self):
+        self.redis.transaction.side_effect = RedisError()
+        self.assertTrue(self._get_limiter().acquire(BACKGROUND_LANE))
@@ -0,0 +1,86 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash, PostType, HashType
+from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
+from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
+from redditrepostsleuth.core.services.search_result_cache import SearchResultCache
+from tests.core.helpers import get_sqlite_uowm, get_image_search_settings
+
+
+def _get_redis() -> MagicMock:
+    store = {}
+    redis = MagicMock()
+    redis.hget.side_effect = lambda key, field: store.get(key, {}).get(field)
+    redis.pipeline.return_value.hset.side_effect = lambda key, field, value: store.setdefault(key, {}).update({field: value})
+    redis.delete.side_effect = lambda *keys: [store.pop(key, None) for key in keys]
+    return redis
+
+
+class TestSearchResultCache(TestCase):
+
+    def setUp(self):
+        self.uowm = get_sqlite_uowm()
+        now = datetime.utcnow()
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.add(HashType(id=1, name='dhash_h'))
+            uow.session.flush()
+            for i in range(1, 4):
+                uow.session.add(Post(
+                    id=i, post_id=f'post{i}', url='http://example.com', author='user', subreddit='sub',
+                    title='title', url_hash='hash', post_type_id=2, created_at=now, ingested_at=now,
+                    last_deleted_check=now
+                ))
+            uow.session.flush()
+            uow.session.add(PostHash(hash='abc', post_id=2, hash_type_id=1, post_created_at=now))
+            uow.commit()
+        self.cache = SearchResultCache(_get_redis())
+
+    def _search_results(self) -> ImageSearchResults:
+        search_results = ImageSearchResults('http://example.com', get_image_search_settings())
+        search_results.total_searched = 100
+        search_results.matches = [
+            ImageSearchMatch('http://example.com', 10, Post(id=2), 3, 0.1, 256, title_similarity=50),
+            ImageSearchMatch('http://example.com', 11, Post(id=3), 5, 0.2, 256),
+        ]
+        search_results.closest_match = search_results.matches[0]
+        return search_results
+
+    def test_key_depends_on_settings(self):
+        settings = get_image_search_settings()
+        key = self.cache.key(settings, post_id='post1')
+        self.assertEqual(key, self.cache.key(get_image_search_settings(), post_id='post1'))
+        settings.same_sub = True
+        self.assertNotEqual(key, self.cache.key(settings, post_id='post1'))
+        self.assertIsNone(self.cache.key(settings))
+
+    def test_save_and_load(self):
+        key = self.cache.key(get_image_search_settings(), post_id='post1')
+        self.cache.save(key, self._search_results())
+
+        loaded = ImageSearchResults('http://example.com', get_image_search_settings())
+        with self.uowm.start() as uow:
+            self.assertTrue(self.cache.load(key, loaded, uow))
+
+        self.assertEqual(100, loaded.total_searched)
+        self.assertEqual([2, 3], [match.post.id for match in loaded.matches])
+        self.assertEqual(50, loaded.matches[0].title_similarity)
+        self.assertEqual(10, loaded.closest_match.match_id)
+        self.assertEqual('post2', loaded.closest_match.post.to_dict()['post_id'])
+
+    def test_load_miss_when_match_deleted(self):
+        key = self.cache.key(get_image_search_settings(), image_hash='abc')
+        search_results = self._search_results()
+        search_results.matches[1].post = Post(id=99)
+        self.cache.save(key, search_results)
+        with self.uowm.start() as uow:
+            self.assertFalse(self.cache.load(key, ImageSearchResults('url', get_image_search_settings()), uow))
+
+    def test_invalidate(self):
+        key = self.cache.key(get_image_search_settings(), post_id='post1')
+        self.cache.save(key, self._search_results())
+        self.cache.invalidate(post_ids=['post1'])
+        with self.uowm.start() as uow:
+            self.assertFalse(self.cache.load(key, ImageSearchResults('url', get_image_search_settings()), uow))
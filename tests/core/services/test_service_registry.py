@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from redditrepostsleuth.core.services import service_registry
+from redditrepostsleuth.core.services.service_registry import ServiceRegistry, set_worker_options, \
+    get_worker_concurrency
+
+
+class TestServiceRegistry(TestCase):
+
+    def setUp(self):
+        self._options = dict(service_registry._worker_options)
+        service_registry._worker_options.clear()
+
+    def tearDown(self):
+        service_registry._worker_options.clear()
+        service_registry._worker_options.update(self._options)
+
+    def _get_config(self, **kwargs):
+        return SimpleNamespace(**{'db_pool_size': None, 'db_max_overflow': None, **kwargs})
+
+    def test_get_worker_concurrency_outside_worker(self):
+        self.assertEqual(10, get_worker_concurrency())
+
+    def test_get_worker_concurrency_prefork(self):
+        set_worker_options('prefork', 16)
+        self.assertEqual(1, get_worker_concurrency())
+
+    def test_get_worker_concurrency_threads(self):
+        set_worker_options('threads', 16)
+        self.assertEqual(16, get_worker_concurrency())
+
+    def test_get_worker_concurrency_pool_class(self):
+        set_worker_options(type('TaskPool', (), {'__module__': 'celery.concurrency.prefork'}), 16)
+        self.assertEqual(1, get_worker_concurrency())
+
+    def test_get_db_pool_size_from_config(self):
+        registry = ServiceRegistry(config=self._get_config(db_pool_size='5', db_max_overflow='2'))
+        self.assertEqual((5, 2), registry.get_db_pool_size())
+
+    def test_get_db_pool_size_from_concurrency(self):
+        set_worker_options('threads', 8)
+        registry = ServiceRegistry(config=self._get_config())
+        self.assertEqual((9, 9), registry.get_db_pool_size())
+
+    def test_services_created_once(self):
+        registry = ServiceRegistry(config=self._get_config())
+        with patch.object(service_registry, 'get_db_engine') as get_db_engine:
+            self.assertIs(registry.uowm, registry.uowm)
+            get_db_engine.assert_called_once()
+
+    def test_after_fork_drops_inherited_connections(self):
+        registry = ServiceRegistry(config=self._get_config())
+        with patch.object(service_registry, 'get_db_engine', return_value=MagicMock()):
+            engine = registry.db_engine
+            session = MagicMock()
+            registry._services['http_session'] = session
+            registry.after_fork()
+        engine.dispose.assert_called_once_with(close=False)
+        session.close.assert_called_once()
+        self.assertIs(engine, registry.db_engine)
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redis.exceptions import RedisError
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostType, StatsTopRepost
+from redditrepostsleuth.core.services.stats_response_cache import StatsResponseCache, TOP_IMAGE_REPOSTS, \
+    build_top_image_reposts, make_etag
+from tests.core.helpers import get_sqlite_uowm
+
+
+class TestStatsResponseCache(TestCase):
+
+    def test_key_sorts_and_normalizes_params(self):
+        cache = StatsResponseCache(MagicMock())
+        self.assertEqual(
+            'stats-cache:top-image-reposts:days=7&nsfw=false',
+            cache.key(TOP_IMAGE_REPOSTS, nsfw=False, days=7)
+        )
+
+    def test_get_or_build_hit(self):
+        redis = MagicMock()
+        redis.hgetall.return_value = {b'body': b'[]', b'etag': b'abc'}
+        builder = MagicMock()
+        cached = StatsResponseCache(redis).get_or_build(TOP_IMAGE_REPOSTS, builder, days=7, nsfw=False)
+        self.assertEqual('[]', cached.body)
+        self.assertEqual('abc', cached.etag)
+        builder.assert_not_called()
+
+    def test_get_or_build_miss_stores_body_and_etag(self):
+        redis = MagicMock()
+        redis.hgetall.return_value = {}
+        pipe = redis.pipeline.return_value
+        cached = StatsResponseCache(redis, ttl=60).get_or_build(TOP_IMAGE_REPOSTS, lambda: '[1]', days=7, nsfw=False)
+        self.assertEqual(make_etag('[1]'), cached.etag)
+        pipe.hset.assert_called_once_with(
+            'stats-cache:top-image-reposts:days=7&nsfw=false', mapping={'body': '[1]', 'etag': cached.etag}
+        )
+        pipe.expire.assert_called_once_with('stats-cache:top-image-reposts:days=7&nsfw=false', 60)
+
+    def test_get_or_build_redis_down_builds(self):
+        redis = MagicMock()
+        redis.hgetall.side_effect = RedisError()
+        redis.pipeline.return_value.execute.side_effect = RedisError()
+        cached = StatsResponseCache(redis).get_or_build(TOP_IMAGE_REPOSTS, lambda: '[1]')
+        self.assertEqual('[1]', cached.body)
+
+    def test_get_or_build_nothing_to_cache(self):
+        redis = MagicMock()
+        redis.hgetall.return_value = {}
+        self.assertIsNone(StatsResponseCache(redis).get_or_build(TOP_IMAGE_REPOSTS, lambda: None))
+        redis.pipeline.assert_not_called()
+
+    def test_cached_response_matches(self):
+        cached = StatsResponseCache(None).set(TOP_IMAGE_REPOSTS, '[]')
+        self.assertTrue(cached.matches([cached.etag]))
+        self.assertTrue(cached.matches(['*']))
+        self.assertFalse(cached.matches(['other']))
+        self.assertFalse(cached.matches(None))
+
+
+class TestBuildTopImageReposts(TestCase):
+
+    def test_build_top_image_reposts(self):
+        uowm = get_sqlite_uowm()
+        now = datetime.utcnow()
+        with uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.flush()
+            for i in range(1, 3):
+                uow.session.add(Post(
+                    id=i, post_id=f'post{i}', url='http://example.com', author='user', subreddit='sub',
+                    title='title', url_hash='hash', post_type_id=2, created_at=now, ingested_at=now,
+                    last_deleted_check=now
+                ))
+            uow.session.flush()
+            uow.session.add(StatsTopRepost(post_id=1, post_type_id=2, day_range=7, repost_count=5, nsfw=False, updated_at=now))
+            uow.session.add(StatsTopRepost(post_id=2, post_type_id=2, day_range=7, repost_count=9, nsfw=False, updated_at=now))
+            uow.session.add(StatsTopRepost(post_id=2, post_type_id=2, day_range=30, repost_count=9, nsfw=False, updated_at=now))
+            uow.commit()
+
+        with uowm.start() as uow:
+            results = json.loads(build_top_image_reposts(uow, 7, False))
+
+        self.assertEqual(['post2', 'post1'], [r['post_id'] for r in results])
+        self.assertEqual('https://redd.it/post2', results[0]['shortlink'])
+        self.assertEqual(9, results[0]['repost_count'])
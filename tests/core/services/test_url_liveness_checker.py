@@ -0,0 +1,100 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest import TestCase
+
+from redditrepostsleuth.core.services.url_liveness_checker import UrlLivenessChecker
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_HEAD(self):
+        _StandInHandler.requests_seen.append(self.path)
+        if self.path.startswith('/slow'):
+            time.sleep(0.5)
+        self.send_response(200 if 'alive' in self.path else 404)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def execute(self):
+        pass
+
+
+class TestUrlLivenessChecker(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StandInHandler.requests_seen = []
+
+    def test_check_urls(self):
+        checker = UrlLivenessChecker()
+        urls = [f'{self.base_url}/alive1', f'{self.base_url}/dead1', 'not-a-url']
+        self.assertEqual({urls[0]: True, urls[1]: False, urls[2]: False}, checker.check_urls(urls))
+
+    def test_get_first_alive_index_skips_dead(self):
+        checker = UrlLivenessChecker()
+        urls = [f'{self.base_url}/dead1', f'{self.base_url}/dead2', f'{self.base_url}/alive1']
+        self.assertEqual(2, checker.get_first_alive_index(urls))
+
+    def test_get_first_alive_index_keeps_rank_order(self):
+        checker = UrlLivenessChecker()
+        urls = [f'{self.base_url}/slow-alive', f'{self.base_url}/alive1']
+        self.assertEqual(0, checker.get_first_alive_index(urls))
+
+    def test_get_first_alive_index_none_alive(self):
+        checker = UrlLivenessChecker()
+        self.assertIsNone(checker.get_first_alive_index([f'{self.base_url}/dead1']))
+        self.assertIsNone(checker.get_first_alive_index([]))
+
+    def test_checks_run_concurrently(self):
+        checker = UrlLivenessChecker(per_domain_limit=10)
+        urls = [f'{self.base_url}/slow-dead{i}' for i in range(5)]
+        start = time.perf_counter()
+        checker.check_urls(urls)
+        self.assertLess(time.perf_counter() - start, 2)
+
+    def test_session_shared_across_calls(self):
+        checker = UrlLivenessChecker()
+        self.addCleanup(checker.close)
+        checker.check_urls([f'{self.base_url}/alive1'])
+        session = checker._session
+        checker.get_first_alive_index([f'{self.base_url}/alive2'])
+        self.assertIs(session, checker._session)
+        self.assertFalse(session.closed)
+        checker.close()
+        self.assertTrue(session.closed)
+
+    def test_cached_results_skip_requests(self):
+        checker = UrlLivenessChecker(redis_client=_DictRedis())
+        urls = [f'{self.base_url}/dead1', f'{self.base_url}/alive1']
+        self.assertEqual(1, checker.get_first_alive_index(urls))
+        self.assertEqual(2, len(_StandInHandler.requests_seen))
+        self.assertEqual(1, checker.get_first_alive_index(urls))
+        self.assertEqual(2, len(_StandInHandler.requests_seen))
@@ -4,8 +4,9 @@ from unittest import TestCase, mock
 from unittest.mock import MagicMock, Mock
 from requests.exceptions import ConnectionError
 
-from redditrepostsleuth.core.db.databasemodels import Post
-from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash
+from redditrepostsleuth.core.model.image_index_api_result import APISearchResults, IndexSearchResult, ImageMatch
+from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService, INDEX_API_TIMEOUT
 from redditrepostsleuth.core.exception import NoIndexException
 from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
 
@@ -50,3 +51,87 @@ class TestDuplicateImageService(TestCase):
         r = dup_svc._remove_duplicates(matches)
         self.assertEqual(2, len(r))
 
+    def test__get_matches_batch_falls_back_on_404(self):
+        with mock.patch('redditrepostsleuth.core.services.duplicateimageservice.requests.post') as mock_post:
+            dup_svc = DuplicateImageService(Mock(), Mock(), Mock(), config=MagicMock(index_api='http://test.com'))
+            mock_post.return_value = SimpleNamespace(**{'status_code': 404, 'text': 'result'})
+            dup_svc._get_matches = MagicMock(return_value=APISearchResults())
+            search_results = [MagicMock(target_hash='aaa'), MagicMock(target_hash='bbb')]
+            r = dup_svc._get_matches_batch(search_results)
+            self.assertEqual(2, len(r))
+            self.assertEqual(2, dup_svc._get_matches.call_count)
+            self.assertFalse(dup_svc.batch_search_supported)
+
+            dup_svc._get_matches_batch(search_results)
+            self.assertEqual(1, mock_post.call_count)
+            self.assertEqual(4, dup_svc._get_matches.call_count)
+
+    def test__get_matches_batch_one_request(self):
+        with mock.patch('redditrepostsleuth.core.services.duplicateimageservice.requests.post') as mock_post:
+            dup_svc = DuplicateImageService(Mock(), Mock(), Mock(), config=MagicMock(index_api='http://test.com'))
+            mock_post.return_value = SimpleNamespace(**{
+                'status_code': 200,
+                'text': json.dumps({'results': [{'total_searched': 10}, {'total_searched': 20}]})
+            })
+            search_results = [MagicMock(target_hash='aaa'), MagicMock(target_hash='bbb')]
+            r = dup_svc._get_matches_batch(search_results)
+            self.assertEqual(1, mock_post.call_count)
+            self.assertEqual(INDEX_API_TIMEOUT, mock_post.call_args[1]['timeout'])
+            self.assertEqual([10, 20], [x.total_searched for x in r])
+
+    def test__build_search_results_uses_provided_posts(self):
+        dup_svc = DuplicateImageService(Mock(), Mock(), Mock(), config=MagicMock())
+        api_results = APISearchResults(results=[
+            IndexSearchResult(index_name='current', matches=[ImageMatch(id=5, distance=10), ImageMatch(id=6, distance=20)])
+        ])
+        post = Post(id=1)
+        r = dup_svc._build_search_results(api_results, 'test.com', 'aaaa', match_posts={('current', 5): (post, 'aaab')})
+        self.assertEqual(1, len(r))
+        self.assertEqual(1, r[0].hamming_distance)
+        self.assertEqual(10, r[0].annoy_distance)
+        dup_svc.uowm.start.assert_not_called()
+
+    def test__get_match_posts_skips_posts_without_dhash(self):
+        uowm = MagicMock()
+        uow = uowm.start.return_value.__enter__.return_value
+        uow.image_index_map.get_all_in_by_index_ids.return_value = [
+            SimpleNamespace(index_name='current', annoy_index_id=5, post=Post(id=1, hashes=[PostHash(hash='aaaa', hash_type_id=1)])),
+            SimpleNamespace(index_name='current', annoy_index_id=6, post=Post(id=2, hashes=[PostHash(hash='bbbb', hash_type_id=2)])),
+        ]
+        dup_svc = DuplicateImageService(uowm, Mock(), Mock(), config=MagicMock())
+        api_results = APISearchResults(results=[
+            IndexSearchResult(index_name='current', matches=[ImageMatch(id=5, distance=10), ImageMatch(id=6, distance=20)])
+        ])
+        r = dup_svc._get_match_posts([api_results])
+        self.assertEqual(['aaaa'], [h for _, h in r.values()])
+        uow.image_index_map.get_all_in_by_index_ids.assert_called_once_with({'current': [5, 6]})
+
+    def test_check_image_hash_does_not_download(self):
+        dup_svc = DuplicateImageService(MagicMock(), Mock(), Mock(), config=MagicMock(index_api='http://test.com'))
+        dup_svc._get_matches = MagicMock(return_value=APISearchResults())
+        dup_svc._get_meme_template = MagicMock(return_value=SimpleNamespace(id=1))
+        dup_svc._get_meme_hash = MagicMock()
+        search_settings = MagicMock(meme_filter=True, target_match_percent=90)
+        with mock.patch('redditrepostsleuth.core.model.search.image_search_results.get_image_hashes') as hashes, \
+                mock.patch('redditrepostsleuth.core.services.duplicateimageservice.log_search'):
+            r = dup_svc.check_image_hash('aaaa', meme_hash='bbbb', search_settings=search_settings)
+            hashes.assert_not_called()
+        self.assertEqual('aaaa', dup_svc._get_matches.call_args[0][0])
+        self.assertEqual('bbbb', r.meme_hash)
+        dup_svc._get_meme_hash.assert_not_called()
+
+
+    def test_check_image_uses_result_cache(self):
+        result_cache = MagicMock()
+        result_cache.load.return_value = True
+        dup_svc = DuplicateImageService(
+            MagicMock(), Mock(), Mock(), config=MagicMock(index_api='http://test.com'), result_cache=result_cache
+        )
+        dup_svc._get_matches = MagicMock()
+        post = Post(post_id='abc123', hashes=[PostHash(hash='aaaa', hash_type_id=1)])
+        with mock.patch('redditrepostsleuth.core.services.duplicateimageservice.log_search') as log_search:
+            dup_svc.check_image('http://test.com', post=post, search_settings=MagicMock(meme_filter=False))
+            log_search.assert_called_once()
+        self.assertEqual('abc123', result_cache.key.call_args[1]['post_id'])
+        dup_svc._get_matches.assert_not_called()
+        result_cache.save.assert_not_called()
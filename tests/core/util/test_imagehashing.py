@@ -0,0 +1,79 @@
+import random
+from io import BytesIO
+from unittest import TestCase
+
+import imagehash
+from PIL import Image
+
+from redditrepostsleuth.core.exception import ImageTooLargeException, ImageConversionException
+from redditrepostsleuth.core.util.imagehashing import compute_image_hashes, get_image_hashes_from_stream
+
+
+def _noise_image(mode: str, size: tuple[int, int], fmt: str) -> Image:
+    random.seed(size[0])
+    img = Image.new('RGB', size)
+    img.putdata([(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)) for _ in range(size[0] * size[1])])
+    img = img.convert(mode)
+    buffer = BytesIO()
+    img.save(buffer, format=fmt)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+class TestComputeImageHashes(TestCase):
+
+    def _assert_matches_imagehash(self, img: Image, hash_size: int):
+        result = compute_image_hashes(img, hash_size=hash_size, meme_hash_size=32)
+        self.assertEqual(str(imagehash.dhash(img, hash_size=hash_size)), result['dhash_h'])
+        self.assertEqual(str(imagehash.dhash_vertical(img, hash_size=hash_size)), result['dhash_v'])
+        self.assertEqual(str(imagehash.average_hash(img, hash_size=hash_size)), result['ahash'])
+        self.assertEqual(str(imagehash.dhash(img, hash_size=32)), result['meme_dhash'])
+
+    def test_bit_exact_jpeg(self):
+        self._assert_matches_imagehash(_noise_image('RGB', (300, 200), 'JPEG'), 16)
+
+    def test_bit_exact_png_rgba(self):
+        self._assert_matches_imagehash(_noise_image('RGBA', (120, 250), 'PNG'), 16)
+
+    def test_bit_exact_gif(self):
+        self._assert_matches_imagehash(_noise_image('P', (200, 200), 'GIF'), 16)
+
+    def test_bit_exact_odd_hash_size(self):
+        self._assert_matches_imagehash(_noise_image('L', (90, 90), 'PNG'), 7)
+
+    def test_only_requested_hashes(self):
+        result = compute_image_hashes(_noise_image('RGB', (50, 50), 'PNG'), hash_types=('dhash_h',))
+        self.assertEqual(['dhash_h'], list(result.keys()))
+
+    def test_invalid_hash_size(self):
+        with self.assertRaises(ValueError):
+            compute_image_hashes(_noise_image('RGB', (50, 50), 'PNG'), hash_size=1)
+
+
+class TestGetImageHashesFromStream(TestCase):
+
+    def _png_stream(self, size: tuple[int, int]) -> BytesIO:
+        buffer = BytesIO()
+        _noise_image('RGB', size, 'PNG').save(buffer, format='PNG')
+        buffer.seek(0)
+        return buffer
+
+    def test_matches_compute_image_hashes(self):
+        stream = self._png_stream((120, 80))
+        expected = compute_image_hashes(Image.open(BytesIO(stream.getvalue())), meme_hash_size=32)
+        result = get_image_hashes_from_stream(stream, 10_000_000, 10_000_000, meme_hash_size=32)
+        self.assertEqual(expected['dhash_h'], result['dhash_h'])
+        self.assertEqual(expected['meme_dhash'], result['meme_dhash'])
+
+    def test_too_many_bytes(self):
+        with self.assertRaises(ImageTooLargeException):
+            get_image_hashes_from_stream(self._png_stream((120, 80)), 100, 10_000_000)
+
+    def test_too_many_pixels(self):
+        with self.assertRaises(ImageTooLargeException):
+            get_image_hashes_from_stream(self._png_stream((120, 80)), 10_000_000, 120 * 79)
+
+    def test_not_an_image(self):
+        with self.assertRaises(ImageConversionException):
+            get_image_hashes_from_stream(BytesIO(b'not an image'), 10_000_000, 10_000_000)
+
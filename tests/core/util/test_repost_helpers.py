@@ -1,13 +1,17 @@
 from unittest import TestCase, mock
 from unittest.mock import Mock
 
-from redditrepostsleuth.core.db.databasemodels import Post
+from redditrepostsleuth.core.db.databasemodels import Post, PostType, Repost
 from redditrepostsleuth.core.model.repostmatch import RepostMatch
 from datetime import datetime
 
+from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
+from redditrepostsleuth.core.model.search.image_search_results import ImageSearchResults
 from redditrepostsleuth.core.model.search.search_match import SearchMatch
-from redditrepostsleuth.core.util.repost.repost_helpers import sort_reposts, get_first_active_match, get_closest_image_match
-from tests.core.helpers import get_image_search_results_multi_match
+from redditrepostsleuth.core.util.repost import repost_helpers
+from redditrepostsleuth.core.util.repost.repost_helpers import sort_reposts, get_first_active_match, \
+    get_closest_image_match, save_image_repost_results
+from tests.core.helpers import get_image_search_results_multi_match, get_sqlite_uowm, get_image_search_settings
 
 
 class TestHelpers(TestCase):
@@ -29,21 +33,22 @@ class TestHelpers(TestCase):
         self.assertEqual(3, result[0].post.id)
 
     def test_get_first_active_match(self):
-        def get_dummy_res(url, **kwargs):
-            if url == 'www.bad.com':
-                return Mock(status_code=400)
-            else:
-                return Mock(status_code=200)
-        with mock.patch('redditrepostsleuth.core.util.repost.repost_helpers.requests.head') as mock_head:
-            mock_head.side_effect = get_dummy_res
-            matches = [
-                SearchMatch('www.dummy.com', Post(id=1, url='www.bad.com')),
-                SearchMatch('www.dummy.com', Post(id=2, url='www.bad.com')),
-                SearchMatch('www.dummy.com', Post(id=3, url='www.good.com')),
-                SearchMatch('www.dummy.com', Post(id=4, url='www.good.com')),
-            ]
-            r = get_first_active_match(matches)
-            self.assertEqual(3, r.post.id)
+        checker = Mock(get_first_alive_index=Mock(return_value=2))
+        matches = [
+            SearchMatch('www.dummy.com', Post(id=1, url='www.bad.com')),
+            SearchMatch('www.dummy.com', Post(id=2, url='www.bad.com')),
+            SearchMatch('www.dummy.com', Post(id=3, url='www.good.com')),
+            SearchMatch('www.dummy.com', Post(id=4, url='www.good.com')),
+        ]
+        r = get_first_active_match(matches, liveness_checker=checker)
+        self.assertEqual(3, r.post.id)
+        checker.get_first_alive_index.assert_called_once_with(
+            ['www.bad.com', 'www.bad.com', 'www.good.com', 'www.good.com']
+        )
+
+    def test_get_first_active_match_none_alive(self):
+        checker = Mock(get_first_alive_index=Mock(return_value=None))
+        self.assertIsNone(get_first_active_match([SearchMatch('www.dummy.com', Post(id=1))], liveness_checker=checker))
 
     def test_get_closest_image_match(self):
         search_results = get_image_search_results_multi_match()
@@ -52,3 +57,56 @@ class TestHelpers(TestCase):
         search_results.matches[2].hamming_distance = 25
         r = get_closest_image_match(search_results.matches, validate_url=False)
         self.assertEqual(2, r.post.id)
+
+
+class TestSaveImageRepostResults(TestCase):
+
+    def setUp(self):
+        self.uowm = get_sqlite_uowm()
+        self.now = datetime.utcnow()
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.flush()
+            for i in range(1, 4):
+                uow.session.add(self._post(i))
+            uow.commit()
+
+    def _post(self, post_id: int) -> Post:
+        return Post(
+            id=post_id, post_id=f'post{post_id}', url='http://example.com', author='user', subreddit='sub',
+            title='title', url_hash='hash', post_type_id=2, created_at=self.now, ingested_at=self.now,
+            last_deleted_check=self.now
+        )
+
+    def _search_results(self, checked_id: int) -> ImageSearchResults:
+        search_results = ImageSearchResults(
+            'test.com', get_image_search_settings(), checked_post=self._post(checked_id)
+        )
+        search_results.target_hash = f'hash{checked_id}'
+        search_results.matches.append(ImageSearchMatch('test.com', 1, self._post(1), 2, 0.1, 32))
+        return search_results
+
+    def _saved_post_ids(self) -> list[int]:
+        with self.uowm.start() as uow:
+            return sorted(repost.post_id for repost in uow.session.query(Repost).all())
+
+    def test_save_batch(self):
+        batch = [self._search_results(2), self._search_results(3)]
+        with self.uowm.start() as uow, mock.patch.object(repost_helpers, 'invalidate_search_results') as invalidate:
+            result = save_image_repost_results(batch, uow, 'ingest')
+        self.assertEqual(batch, result.saved)
+        self.assertEqual([], result.failed)
+        self.assertEqual([2, 3], self._saved_post_ids())
+        invalidate.assert_called_once_with(
+            post_ids=['post2', 'post1', 'post3', 'post1'], image_hashes=['hash2', 'hash3']
+        )
+
+    def test_save_batch_with_duplicate_and_bad_row(self):
+        good, duplicate, missing_post = self._search_results(2), self._search_results(2), self._search_results(99)
+        with self.uowm.start() as uow, mock.patch.object(repost_helpers, 'invalidate_search_results') as invalidate:
+            result = save_image_repost_results([good, duplicate, missing_post], uow, 'ingest')
+        # The duplicate is only saved once and the post that doesn't exist doesn't stop the rest
+        self.assertEqual([good], result.saved)
+        self.assertEqual([missing_post], result.failed)
+        self.assertEqual([2], self._saved_post_ids())
+        invalidate.assert_called_once_with(post_ids=['post2', 'post1'], image_hashes=['hash2'])
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+from falcon import HTTPBadRequest
+from falcon.testing import create_req
+
+from redditrepostsleuth.repostsleuthsiteapi.util.pagination import get_page_params, encode_cursor, MAX_PAGE_SIZE
+
+
+class TestPagination(TestCase):
+
+    def test_get_page_params_defaults(self):
+        self.assertEqual((20, None), get_page_params(create_req()))
+
+    def test_get_page_params_cursor(self):
+        req = create_req(query_string=f'limit=-1&cursor={encode_cursor(55)}')
+        self.assertEqual((MAX_PAGE_SIZE, 55), get_page_params(req))
+
+    def test_get_page_params_invalid_cursor(self):
+        with self.assertRaises(HTTPBadRequest):
+            get_page_params(create_req(query_string='cursor=abc'))
+
+    def test_get_page_params_rejects_offset(self):
+        with self.assertRaises(HTTPBadRequest) as e:
+            get_page_params(create_req(query_string='offset=20'))
+        self.assertIn('cursor', e.exception.description)
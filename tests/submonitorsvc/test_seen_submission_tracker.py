@@ -0,0 +1,81 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from redditrepostsleuth.core.util.helpers import base36decode
+from redditrepostsleuth.submonitorsvc.seen_submission_tracker import SeenSubmissionTracker
+
+
+class _SortedSetRedis:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+
+    def exists(self, key):
+        return int(key in self.sets)
+
+    def zmscore(self, key, members):
+        return [self.sets.get(key, {}).get(m) for m in members]
+
+    def pipeline(self):
+        return self
+
+    def zadd(self, key, mapping):
+        self.sets.setdefault(key, {}).update(mapping)
+
+    def zremrangebyrank(self, key, start, end):
+        ordered = sorted(self.sets[key], key=self.sets[key].get)
+        for member in ordered[start:len(ordered) + end + 1]:
+            del self.sets[key][member]
+
+    def expire(self, key, ttl):
+        pass
+
+    def execute(self):
+        pass
+
+
+class TestSeenSubmissionTracker(TestCase):
+
+    def test_filter_unseen_first_run_returns_all(self):
+        tracker = SeenSubmissionTracker(_SortedSetRedis())
+        self.assertEqual(['abc', 'abb'], tracker.filter_unseen('test', ['abc', 'abb']))
+
+    def test_filter_unseen_skips_seen(self):
+        tracker = SeenSubmissionTracker(_SortedSetRedis())
+        tracker.mark_seen('test', 'abb')
+        self.assertEqual(['abc'], tracker.filter_unseen('test', ['abc', 'abb']))
+
+    def test_high_water_mark_stops_at_unseen(self):
+        redis = _SortedSetRedis()
+        tracker = SeenSubmissionTracker(redis)
+        tracker.mark_seen('Test', 'aaa', 'aab', 'aad')
+        self.assertEqual(['aac'], tracker.filter_unseen('test', ['aad', 'aac', 'aab', 'aaa']))
+        self.assertEqual(base36decode('aab'), base36decode(redis.get('submonitor:high-water-mark:test').decode()))
+
+        tracker.mark_seen('test', 'aac')
+        self.assertEqual(['aae'], tracker.filter_unseen('test', ['aae', 'aad', 'aac', 'aab']))
+        self.assertEqual(b'aad', redis.get('submonitor:high-water-mark:test'))
+
+    def test_ids_below_mark_skip_seen_set(self):
+        redis = _SortedSetRedis()
+        redis.set('submonitor:high-water-mark:test', 'aac')
+        tracker = SeenSubmissionTracker(redis)
+        self.assertEqual(['aad'], tracker.filter_unseen('test', ['aad', 'aac', 'aab']))
+
+    def test_mark_seen_trims_oldest(self):
+        redis = _SortedSetRedis()
+        tracker = SeenSubmissionTracker(redis, max_seen=2)
+        tracker.mark_seen('test', 'aaa', 'aab', 'aac')
+        self.assertEqual({'aab', 'aac'}, set(redis.sets['submonitor:seen:test']))
+
+    def test_seed_from_db_when_set_missing(self):
+        uowm = MagicMock()
+        uowm.start.return_value.__enter__.return_value.monitored_sub_checked.get_checked_post_ids.return_value = ['aaa']
+        tracker = SeenSubmissionTracker(_SortedSetRedis(), uowm=uowm)
+        self.assertEqual(['aab'], tracker.filter_unseen('test', ['aab', 'aaa'], monitored_sub_id=1))
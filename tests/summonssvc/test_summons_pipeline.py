@@ -0,0 +1,106 @@
+from datetime import datetime
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostType, Summons, Base
+from redditrepostsleuth.core.db.uow.unitofworkmanager import UnitOfWorkManager
+from redditrepostsleuth.summonssvc.summons_pipeline import SummonsPipeline
+from tests.core.helpers import _on_sqlite_connect
+
+
+def _get_threaded_sqlite_uowm() -> UnitOfWorkManager:
+    # Share one connection so the worker threads see the same in memory database
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    event.listen(engine, 'connect', _on_sqlite_connect)
+    Base.metadata.create_all(engine)
+    return UnitOfWorkManager(engine)
+
+
+def _get_mention(comment_id: str, post_id: str = 'post1', author: str = 'user') -> MagicMock:
+    comment = MagicMock()
+    comment.id = comment_id
+    comment.author.name = author
+    comment.created_utc = datetime.utcnow().timestamp()
+    comment.submission.id = post_id
+    comment.body = 'u/repostsleuthbot'
+    comment.subreddit.display_name = 'sub'
+    return comment
+
+
+class TestSummonsPipeline(TestCase):
+
+    def setUp(self):
+        self.uowm = _get_threaded_sqlite_uowm()
+        now = datetime.utcnow()
+        with self.uowm.start() as uow:
+            uow.session.add(PostType(id=2, name='image'))
+            uow.session.flush()
+            uow.session.add(Post(
+                id=1, post_id='post1', url='http://example.com', author='user', subreddit='sub', title='title',
+                url_hash='hash', post_type_id=2, created_at=now, ingested_at=now, last_deleted_check=now
+            ))
+            uow.commit()
+        self.handler = MagicMock()
+        self.event_logger = MagicMock()
+        self.pipeline = SummonsPipeline(self.uowm, lambda: self.handler, event_logger=self.event_logger, workers=2)
+
+    def test_intake_saves_and_queues_mentions(self):
+        reddit = MagicMock()
+        reddit.inbox.mentions.return_value = [
+            _get_mention('c1'), _get_mention('c2', author='AutoModerator'), _get_mention('c3', post_id='missing')
+        ]
+        self.assertEqual(1, self.pipeline.intake(reddit))
+        with self.uowm.start() as uow:
+            self.assertEqual(['c1'], [s.comment_id for s in uow.summons.get_all()])
+
+    def test_intake_skips_queued_summons(self):
+        reddit = MagicMock()
+        reddit.inbox.mentions.return_value = [_get_mention('c1')]
+        self.assertEqual(1, self.pipeline.intake(reddit))
+        self.assertEqual(0, self.pipeline.intake(reddit))
+
+    def test_workers_process_queue(self):
+        with self.uowm.start() as uow:
+            for i in range(5):
+                uow.summons.add(Summons(
+                    post_id=1, comment_id=f'c{i}', requestor='user', subreddit='sub',
+                    summons_received_at=datetime.utcnow()
+                ))
+            uow.commit()
+        self.pipeline.start()
+        self.assertEqual(5, self.pipeline.enqueue_unreplied())
+        self.pipeline.join()
+        self.pipeline.stop()
+
+        processed = sorted(call.args[0].comment_id for call in self.handler.process_summons.call_args_list)
+        self.assertEqual([f'c{i}' for i in range(5)], processed)
+        stages = {call.args[0].stage for call in self.event_logger.save_event.call_args_list}
+        self.assertEqual({'queue_wait', 'total'}, stages)
+
+    def test_rate_limit_penalizes_limiter(self):
+        with self.uowm.start() as uow:
+            uow.summons.add(Summons(post_id=1, comment_id='c1', requestor='user', subreddit='sub',
+                                    summons_received_at=datetime.utcnow()))
+            uow.commit()
+        rate_limiter = MagicMock()
+        self.handler.process_summons.side_effect = AssertionError('Unexpected status code: 429')
+        pipeline = SummonsPipeline(self.uowm, lambda: self.handler, rate_limiter=rate_limiter)
+        pipeline.process(1, self.handler)
+        rate_limiter.penalize.assert_called_once_with()
+
+    def test_each_worker_builds_its_own_handler(self):
+        handlers = []
+
+        def build_handler():
+            handler = MagicMock()
+            handlers.append(handler)
+            return handler
+
+        pipeline = SummonsPipeline(self.uowm, build_handler, workers=3)
+        pipeline.start()
+        pipeline.stop()
+        self.assertEqual(3, len(handlers))
+        self.assertEqual(3, len({id(handler) for handler in handlers}))
@@ -0,0 +1,83 @@
+"""
+Measure image ingest throughput against a local fixture HTTP server that adds latency to every response.
+
+Compares the sync process_image_post path used by save_new_post with the async hash_image_posts stage using a
+process pool for decode and hashing.
+
+Usage: python benchmark_async_image_ingest.py [post_count] [latency_ms] [processes]
+"""
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from io import BytesIO
+from time import perf_counter
+
+import numpy as np
+from PIL import Image
+
+from redditrepostsleuth.core.celery.task_logic.ingest_task_logic import process_image_post, hash_image_posts
+from redditrepostsleuth.core.db.databasemodels import Post
+
+
+def build_image() -> bytes:
+    rng = np.random.default_rng(1)
+    data = rng.integers(0, 255, (1080, 1440, 3), dtype=np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(data, 'RGB').save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    image = build_image()
+    latency = 0.2
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.image)))
+        self.end_headers()
+        self.wfile.write(self.image)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_posts(host: str, count: int) -> list[Post]:
+    # Spread across a few fake domains so the per domain limit isn't the only thing in play
+    return [
+        Post(post_id=str(i), url=f'http://{host}/{i % 4}/{i}.jpg', created_at=datetime.utcnow(), hashes=[])
+        for i in range(count)
+    ]
+
+
+if __name__ == '__main__':
+    post_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    FixtureHandler.latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 200) / 1000
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    host = f'127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    sync_posts = build_posts(host, post_count)
+    start = perf_counter()
+    for post in sync_posts:
+        process_image_post(post)
+    sync_time = perf_counter() - start
+
+    async_posts = build_posts(host, post_count)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        start = perf_counter()
+        hashed = asyncio.run(hash_image_posts(async_posts, executor=executor, per_domain_limit=50))
+        async_time = perf_counter() - start
+
+    server.shutdown()
+    matching = all(a.hashes[0].hash == b.hashes[0].hash for a, b in zip(sync_posts, hashed))
+    print(f'{post_count} images, {int(FixtureHandler.latency * 1000)}ms latency, {processes} hash processes')
+    print(f'sync: {round(sync_time, 2)}s ({round(post_count / sync_time, 1)} images/s)')
+    print(f'async: {round(async_time, 2)}s ({round(len(hashed) / async_time, 1)} images/s) | '
+          f'{round(sync_time / async_time, 1)}x | hashes match: {matching}')
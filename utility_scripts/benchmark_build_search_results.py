@@ -0,0 +1,86 @@
+"""
+Compare the old per row result assembly in DuplicateImageService._build_search_results against the dict indexed,
+vectorized version at different match counts.
+
+Usage: python benchmark_build_search_results.py [rounds]
+"""
+import random
+import sys
+from types import SimpleNamespace
+from time import perf_counter
+from unittest.mock import MagicMock
+
+from distance import hamming
+
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash
+from redditrepostsleuth.core.model.image_index_api_result import APISearchResults, IndexSearchResult, ImageMatch
+from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
+from redditrepostsleuth.core.services.duplicateimageservice import DuplicateImageService
+from redditrepostsleuth.core.services.hamming_search_index import hex_hamming_distances
+
+
+def random_hash() -> str:
+    return '%064x' % random.getrandbits(256)
+
+
+def build_fixture(match_count: int):
+    matches = [ImageMatch(id=i, distance=random.randint(0, 200)) for i in range(match_count)]
+    index_maps = [
+        SimpleNamespace(
+            index_name='current',
+            annoy_index_id=i,
+            post_id=i,
+            post=Post(id=i, hashes=[PostHash(hash=random_hash(), hash_type_id=2), PostHash(hash=random_hash(), hash_type_id=1)])
+        )
+        for i in range(match_count)
+    ]
+    return APISearchResults(results=[IndexSearchResult(index_name='current', matches=matches)]), index_maps
+
+
+def legacy_build(api_search_results: APISearchResults, index_matches, url: str, searched_hash: str):
+    results = []
+    for r in api_search_results.results:
+        for im in index_matches:
+            search_result = next((x for x in r.matches if x.id == im.annoy_index_id), None)
+            image_match_hash = next((i for i in im.post.hashes if i.hash_type_id == 1), None)
+            results.append(
+                ImageSearchMatch(url, im.post_id, im.post, hamming(searched_hash, image_match_hash.hash),
+                                 search_result.distance, len(image_match_hash.hash))
+            )
+    return results
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    searched_hash = random_hash()
+
+    for match_count in (50, 500, 5000):
+        api_search_results, index_maps = build_fixture(match_count)
+        uowm = MagicMock()
+        uowm.start.return_value.__enter__.return_value.image_index_map.get_all_in_by_index_ids.return_value = index_maps
+        dup_svc = DuplicateImageService(uowm, MagicMock(), MagicMock(), config=MagicMock())
+
+        start = perf_counter()
+        for _ in range(rounds):
+            legacy_build(api_search_results, index_maps, 'test.com', searched_hash)
+        legacy_time = (perf_counter() - start) / rounds
+
+        start = perf_counter()
+        for _ in range(rounds):
+            dup_svc._build_search_results(api_search_results, 'test.com', searched_hash)
+        new_time = (perf_counter() - start) / rounds
+
+        print(f'{match_count} matches: legacy {round(legacy_time * 1000, 2)}ms | '
+              f'new {round(new_time * 1000, 2)}ms | {round(legacy_time / new_time, 1)}x')
+
+        hashes = [im.post.hashes[1].hash for im in index_maps]
+        start = perf_counter()
+        for _ in range(rounds):
+            [hamming(searched_hash, h) for h in hashes]
+        legacy_time = (perf_counter() - start) / rounds
+        start = perf_counter()
+        for _ in range(rounds):
+            hex_hamming_distances(searched_hash, hashes)
+        new_time = (perf_counter() - start) / rounds
+        print(f'{match_count} hamming only: legacy {round(legacy_time * 1000, 2)}ms | '
+              f'new {round(new_time * 1000, 2)}ms | {round(legacy_time / new_time, 1)}x')
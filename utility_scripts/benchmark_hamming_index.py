@@ -0,0 +1,35 @@
+"""
+Benchmark the in process hamming index with random dhash_h values.
+
+Usage: python benchmark_hamming_index.py [index_size] [queries]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from time import perf_counter
+from unittest.mock import MagicMock
+
+from redditrepostsleuth.core.services.hamming_search_index import HammingSearchIndex
+
+def random_hash() -> str:
+    return '%064x' % random.getrandbits(256)
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    uowm = MagicMock()
+    uowm.start.return_value.__enter__.return_value.posts.get_existing_ids.side_effect = set
+    index = HammingSearchIndex(uowm, 3650, refresh_interval=86400)
+    index._last_refresh = datetime.utcnow()
+    now = datetime.utcnow()
+    start = perf_counter()
+    for i in range(size):
+        index.add(i, random_hash(), now - timedelta(minutes=i))
+    print(f'Built index of {len(index)} hashes in {round(perf_counter() - start, 2)}s')
+
+    start = perf_counter()
+    for _ in range(queries):
+        index.search(random_hash(), 64, 256, max_matches=500)
+    elapsed = perf_counter() - start
+    print(f'{queries} queries in {round(elapsed, 3)}s ({round(elapsed / queries * 1000, 2)}ms per query)')
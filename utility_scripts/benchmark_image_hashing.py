@@ -0,0 +1,76 @@
+"""
+Compare hashing with separate imagehash calls against the single decode compute_image_hashes pipeline.
+
+A fixture corpus of large JPEGs, PNGs and GIFs is generated in a temp dir unless a directory of images is provided.
+Results are checked for bit exactness.  Draft mode timings are shown separately along with how many of its hashes
+differ from imagehash.
+
+Usage: python benchmark_image_hashing.py [image_dir] [rounds]
+"""
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import imagehash
+import numpy as np
+from PIL import Image
+
+from redditrepostsleuth.core.util.imagehashing import compute_image_hashes
+
+
+def build_corpus(path: str) -> list[str]:
+    rng = np.random.default_rng(1)
+    files = []
+    for i, (size, fmt) in enumerate([((4032, 3024), 'JPEG'), ((3000, 2000), 'JPEG'), ((2048, 2048), 'PNG'), ((1200, 900), 'GIF')]):
+        x = np.linspace(0, 255, size[0], dtype=np.float32)
+        y = np.linspace(0, 255, size[1], dtype=np.float32)[:, None]
+        base = (x + y) / 2 + rng.normal(0, 30, (size[1], size[0]))
+        data = np.clip(np.stack([base, np.roll(base, i * 50, axis=1), 255 - base], axis=-1), 0, 255).astype(np.uint8)
+        img = Image.fromarray(data, 'RGB')
+        if fmt == 'GIF':
+            img = img.convert('P')
+        file = os.path.join(path, f'fixture_{i}.{fmt.lower()}')
+        img.save(file, format=fmt)
+        files.append(file)
+    return files
+
+
+def legacy_hashes(img: Image) -> dict:
+    return {
+        'dhash_h': str(imagehash.dhash(img, hash_size=16)),
+        'dhash_v': str(imagehash.dhash_vertical(img, hash_size=16)),
+        'ahash': str(imagehash.average_hash(img, hash_size=16)),
+        'meme_dhash': str(imagehash.dhash(img, hash_size=32)),
+    }
+
+
+def time_hashing(files: list[str], rounds: int, hash_func) -> tuple[float, list[dict]]:
+    results = []
+    start = perf_counter()
+    for _ in range(rounds):
+        results = [hash_func(Image.open(file)) for file in files]
+    return (perf_counter() - start) / rounds, results
+
+
+if __name__ == '__main__':
+    image_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if image_dir:
+            files = [os.path.join(image_dir, f) for f in os.listdir(image_dir)]
+        else:
+            files = build_corpus(tmp)
+
+        legacy_time, legacy = time_hashing(files, rounds, legacy_hashes)
+        new_time, new = time_hashing(files, rounds, lambda img: compute_image_hashes(img, meme_hash_size=32))
+        draft_time, draft = time_hashing(files, rounds, lambda img: compute_image_hashes(img, meme_hash_size=32, draft=True))
+
+    print(f'{len(files)} images, {rounds} rounds')
+    print(f'imagehash: {round(legacy_time * 1000, 1)}ms per corpus')
+    print(f'single decode: {round(new_time * 1000, 1)}ms per corpus ({round(legacy_time / new_time, 2)}x) | '
+          f'bit exact: {legacy == new}')
+    draft_diffs = sum(1 for a, b in zip(legacy, draft) for k in a if a[k] != b[k])
+    print(f'draft mode: {round(draft_time * 1000, 1)}ms per corpus ({round(legacy_time / draft_time, 2)}x) | '
+          f'{draft_diffs} of {len(legacy) * 4} hashes differ from imagehash')
@@ -0,0 +1,79 @@
+"""
+Compare broker bytes and serialize/deserialize cost of the pickled ORM task arguments against the compact JSON
+payloads for check_image_repost_save, sub_monitor_check_post and notify_watch.
+
+Usage: python benchmark_task_payloads.py [rounds]
+"""
+import random
+import sys
+from datetime import datetime
+from time import perf_counter
+
+from kombu.serialization import dumps, loads
+
+from redditrepostsleuth.core.celery.task_payloads import post_payload, monitored_sub_payload, repost_watch_payload
+from redditrepostsleuth.core.db.databasemodels import Post, PostHash, MonitoredSub, RepostWatch
+from redditrepostsleuth.core.model.search.image_search_match import ImageSearchMatch
+from redditrepostsleuth.core.util.default_bot_config import DEFAULT_CONFIG_VALUES
+
+
+def random_hash() -> str:
+    return '%064x' % random.getrandbits(256)
+
+
+def build_post(id: int) -> Post:
+    return Post(
+        id=id,
+        post_id=f'p{id}',
+        url=f'https://i.redd.it/{random_hash()[:13]}.jpg',
+        perma_link=f'/r/pics/comments/p{id}/some_title_that_is_fairly_long/',
+        author='someuser',
+        subreddit='pics',
+        title='Some title that is fairly long like most titles are',
+        post_type_id=2,
+        nsfw=False,
+        created_at=datetime.utcnow(),
+        hashes=[PostHash(hash=random_hash(), hash_type_id=1), PostHash(hash=random_hash(), hash_type_id=2)]
+    )
+
+
+def build_fixtures() -> dict:
+    post = build_post(1)
+    monitored_sub = MonitoredSub(id=5, **{**DEFAULT_CONFIG_VALUES, 'name': 'pics'})
+    watches = [
+        {
+            'match': ImageSearchMatch('https://example.com', i, build_post(100 + i), 2, 10, 64),
+            'watch': RepostWatch(id=i, post_id=100 + i, user=f'user{i}', enabled=True)
+        }
+        for i in range(3)
+    ]
+    return {
+        'check_image_repost_save': ((post,), (post_payload(post),)),
+        'sub_monitor_check_post': (('abc123', monitored_sub), ('abc123', monitored_sub_payload(monitored_sub))),
+        'notify_watch': ((watches, post), (repost_watch_payload(watches, post),)),
+    }
+
+
+def measure(args: tuple, serializer: str, rounds: int) -> tuple[int, float, float]:
+    _, _, body = dumps(args, serializer=serializer)
+    content_type = 'application/x-python-serialize' if serializer == 'pickle' else 'application/json'
+    start = perf_counter()
+    for _ in range(rounds):
+        dumps(args, serializer=serializer)
+    dump_time = (perf_counter() - start) / rounds
+    start = perf_counter()
+    for _ in range(rounds):
+        loads(body, content_type, 'binary' if serializer == 'pickle' else 'utf-8', accept={content_type})
+    load_time = (perf_counter() - start) / rounds
+    return len(body), dump_time, load_time
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    random.seed(1)
+    for task, (legacy_args, payload_args) in build_fixtures().items():
+        legacy_size, legacy_dump, legacy_load = measure(legacy_args, 'pickle', rounds)
+        new_size, new_dump, new_load = measure(payload_args, 'json', rounds)
+        print(f'{task}: pickle {legacy_size}B dump {round(legacy_dump * 1e6, 1)}us load {round(legacy_load * 1e6, 1)}us | '
+              f'json {new_size}B dump {round(new_dump * 1e6, 1)}us load {round(new_load * 1e6, 1)}us | '
+              f'{round(legacy_size / new_size, 1)}x smaller')
@@ -0,0 +1,94 @@
+"""
+Compare worker startup with every task building its own services against the shared service registry.
+
+Instantiates every task registered on the Celery app, the same as a worker does at startup, and reports the time
+taken, how many DB engines were created and the max DB connections a single worker process could open.  The legacy
+numbers are measured by building the services each task class used to build for itself, so they don't include the
+task specific objects that are built either way.
+
+No DB, Redis or Reddit connections are opened.  Dummy config values are used if no config is found
+
+Usage: python benchmark_task_startup.py
+"""
+import importlib
+from time import perf_counter
+from unittest.mock import patch
+
+from redditrepostsleuth.core.config import Config
+
+TASK_MODULES = [
+    'redditrepostsleuth.core.celery.admin_tasks',
+    'redditrepostsleuth.core.celery.tasks.ingest_tasks',
+    'redditrepostsleuth.core.celery.tasks.repost_tasks',
+    'redditrepostsleuth.core.celery.tasks.monitored_sub_tasks',
+    'redditrepostsleuth.core.celery.tasks.reddit_action_tasks',
+    'redditrepostsleuth.core.celery.tasks.scheduled_tasks',
+    'redditrepostsleuth.core.celery.tasks.maintenance_tasks',
+]
+
+DUMMY_CONFIG = {
+    'db_user': 'user', 'db_password': 'password', 'db_host': 'localhost', 'db_name': 'reddit',
+    'redis_host': 'localhost', 'redis_port': 6379, 'redis_database': 0, 'redis_password': '',
+    'reddit_client_id': 'id', 'reddit_client_secret': 'secret', 'reddit_useragent': 'benchmark',
+    'reddit_username': 'user', 'reddit_password': 'password',
+    'influx_host': 'localhost', 'influx_port': 8086, 'influx_token': 'token', 'influx_org': 'org',
+    'influx_bucket': 'bucket',
+}
+
+
+def max_connections(engines: list) -> int:
+    return sum(engine.pool.size() + engine.pool._max_overflow for engine in engines)
+
+
+if __name__ == '__main__':
+    if not Config().custom:
+        Config.CONFIG = DUMMY_CONFIG
+
+    from sqlalchemy import create_engine as sa_create_engine
+    from redditrepostsleuth.core.db import db_utils
+
+    engines = []
+
+    def tracking_create_engine(*args, **kwargs):
+        engine = sa_create_engine(*args, **kwargs)
+        engines.append(engine)
+        return engine
+
+    with patch.object(db_utils, 'create_engine', tracking_create_engine):
+        from redditrepostsleuth.core.celery import celery
+        from redditrepostsleuth.core.services import service_registry
+        from redditrepostsleuth.core.services.service_registry import set_worker_options
+        set_worker_options('prefork', 8)
+        for module in TASK_MODULES:
+            importlib.import_module(module)
+
+        task_names = [name for name in celery.tasks.keys() if name.startswith('redditrepostsleuth')]
+
+        # Start from a cold registry and build a fresh instance of every task
+        service_registry._service_registry = None
+        engines.clear()
+        start = perf_counter()
+        tasks = [type(celery.tasks[name])() for name in task_names]
+        registry_time = perf_counter() - start
+        db_task_count = len([task for task in tasks if hasattr(task, 'uowm')])
+        registry_engines = list(engines)
+
+        from redditrepostsleuth.core.notification.notification_service import NotificationService
+        from redditrepostsleuth.core.services.eventlogging import EventLogging
+        from redditrepostsleuth.core.util.reddithelpers import get_reddit_instance
+        engines.clear()
+        start = perf_counter()
+        for _ in range(db_task_count):
+            config = Config()
+            db_utils.get_db_engine(config)
+            EventLogging(config=config)
+            get_reddit_instance(config)
+            NotificationService(config)
+        legacy_time = perf_counter() - start
+        legacy_engines = list(engines)
+
+    print(f'{len(task_names)} tasks, {db_task_count} with DB access')
+    print(f'Legacy: {round(legacy_time * 1000, 1)}ms | {len(legacy_engines)} engines | '
+          f'{max_connections(legacy_engines)} max DB connections per process')
+    print(f'Registry: {round(registry_time * 1000, 1)}ms | {len(registry_engines)} engines | '
+          f'{max_connections(registry_engines)} max DB connections per process')